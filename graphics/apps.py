@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GraphicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'graphics'
+
+    def ready(self):
+        # 統合科目インデックスを書き込み時に更新するシグナルを登録
+        from . import signals  # noqa: F401
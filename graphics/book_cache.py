@@ -0,0 +1,268 @@
+"""
+ISBNごとの書誌情報キャッシュ
+
+OpenBD / Google Books へのHTTP呼び出しはリクエスト処理中に最大で数十秒ブロックするため、
+取得結果を Book テーブルに永続化し、さらにプロセス内のLRUに載せて再利用する。
+Book を作るのは、書誌情報が見つかった場合とレビューに関連付ける場合だけ（入力途中・誤入力のISBNでは作らない）。
+見つからなかったISBNはLRUに短めのTTLで記録し、同じISBNで何度も外部APIを叩かないようにする。
+TTL切れの Book はリクエスト中には問い合わせ直さず、`manage.py refresh_book_info` で更新する。
+
+書誌情報の取得元（プロバイダ）は差し替え可能:
+    settings.GRAPHICS_BOOK_INFO_PROVIDER = 'graphics.book_cache.StaticBookInfoProvider'
+または set_provider() でテスト・ベンチマーク用のスタブを設定する。
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Book
+from .utils import fetch_book_info_from_openbd
+
+# 見つかった書誌情報の有効期間
+POSITIVE_TTL = getattr(settings, 'GRAPHICS_BOOK_INFO_POSITIVE_TTL', timedelta(days=30))
+# 見つからなかったISBNを再問い合わせしない期間
+NEGATIVE_TTL = getattr(settings, 'GRAPHICS_BOOK_INFO_NEGATIVE_TTL', timedelta(days=1))
+# プロセス内LRUの最大件数
+LRU_MAX_SIZE = getattr(settings, 'GRAPHICS_BOOK_INFO_LRU_SIZE', 1024)
+
+BOOK_INFO_FIELDS = ('title', 'author', 'publication_date', 'cover_image_url')
+
+
+class OpenBDProvider:
+    """OpenBD（表紙がなければGoogle Books）から書誌情報を取得する標準プロバイダ"""
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or getattr(settings, 'GRAPHICS_BOOK_INFO_TIMEOUT', 5)
+
+    def fetch(self, isbn):
+        return fetch_book_info_from_openbd(isbn, timeout=self.timeout)
+
+
+class StaticBookInfoProvider:
+    """
+    外部APIを呼ばずに、与えられた辞書から書誌情報を返すスタブプロバイダ
+    テストやベンチマークで OpenBD / Google Books の代わりに使う
+    """
+
+    def __init__(self, books=None):
+        self.books = dict(books or {})
+        self.calls = 0
+
+    def fetch(self, isbn):
+        self.calls += 1
+        info = self.books.get(isbn)
+        return dict(info) if info else None
+
+
+class _LRUCache:
+    """TTL付きのスレッドセーフなLRU（値は (有効期限, 書誌情報 or None)）"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(ヒットしたか, 値) を返す。期限切れはミス扱い"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at <= timezone.now():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (timezone.now() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_lru = _LRUCache(LRU_MAX_SIZE)
+_provider = None
+
+
+def get_provider():
+    """設定されたプロバイダを返す（未設定なら OpenBDProvider）"""
+    global _provider
+    if _provider is None:
+        provider_path = getattr(settings, 'GRAPHICS_BOOK_INFO_PROVIDER', 'graphics.book_cache.OpenBDProvider')
+        _provider = import_string(provider_path)()
+    return _provider
+
+
+def set_provider(provider):
+    """
+    プロバイダを差し替える（テスト・ベンチマーク用）
+    差し替え前のキャッシュは無効化する
+
+    Returns:
+        差し替え前のプロバイダ
+    """
+    global _provider
+    previous = _provider
+    _provider = provider
+    _lru.clear()
+    return previous
+
+
+def clear_cache():
+    """プロセス内LRUを空にする"""
+    _lru.clear()
+
+
+def _book_to_info(book):
+    return {field: getattr(book, field) for field in BOOK_INFO_FIELDS}
+
+
+def _is_found(book):
+    # 取得結果が記録されていない旧データはタイトルの有無で判定する
+    if book.info_found is None:
+        return bool(book.title)
+    return book.info_found
+
+
+def _is_fresh(book, now=None):
+    now = now or timezone.now()
+    fetched_at = book.info_fetched_at or book.updated_at
+    ttl = POSITIVE_TTL if _is_found(book) else NEGATIVE_TTL
+    return fetched_at is not None and fetched_at + ttl > now
+
+
+def _store(isbn, info, using):
+    """取得結果を Book テーブルに保存する（取得失敗時は既存の書誌情報を残す）"""
+    now = timezone.now()
+    book, _ = Book.objects.using(using).get_or_create(isbn=isbn)
+    if info:
+        for field in BOOK_INFO_FIELDS:
+            setattr(book, field, info.get(field))
+        book.info_found = True
+    elif book.info_found is None:
+        book.info_found = bool(book.title)
+    book.info_fetched_at = now
+    book.save(using=using)
+    return book
+
+
+def _remember(book):
+    info = _book_to_info(book) if _is_found(book) else None
+    _lru.set(book.isbn, info, POSITIVE_TTL if info else NEGATIVE_TTL)
+    return info
+
+
+def get_book(isbn, using='graphics'):
+    """
+    レビューに関連付ける、ISBNに対応する Book を返す
+    未登録の場合のみプロバイダに問い合わせて Book を作成する（TTL切れでもその場では問い合わせ直さない）
+
+    Args:
+        isbn (str): ISBNコード（ハイフンなし）
+        using (str): DBエイリアス
+
+    Returns:
+        Book: 書誌情報が見つからなかった場合もタイトル等が空の Book を返す
+    """
+    book = Book.objects.using(using).filter(isbn=isbn).first()
+    if book is None:
+        book = _store(isbn, get_provider().fetch(isbn), using)
+    _remember(book)
+    return book
+
+
+def get_book_info(isbn, using='graphics'):
+    """
+    ISBNから書誌情報を取得する（LRU → Book テーブル → プロバイダの順に参照）
+    Book を作るのは書誌情報が見つかった場合のみ。見つからなければLRUにだけ記録する
+
+    Args:
+        isbn (str): ISBNコード（ハイフンなし）
+        using (str): DBエイリアス
+
+    Returns:
+        dict: 書誌情報 (title, author, publication_date, cover_image_url) or None
+    """
+    hit, info = _lru.get(isbn)
+    if hit:
+        return dict(info) if info else None
+
+    book = Book.objects.using(using).filter(isbn=isbn).first()
+    if book is None:
+        info = get_provider().fetch(isbn)
+        if not info:
+            _lru.set(isbn, None, NEGATIVE_TTL)
+            return None
+        book = _store(isbn, info, using)
+    info = _remember(book)
+    return dict(info) if info else None
+
+
+def prefetch_book_info(isbns, max_workers=8, using='graphics', force=False):
+    """
+    複数のISBNの書誌情報をまとめて取得してキャッシュに載せる
+    外部APIへの問い合わせはスレッドプールで並行に行い、DBへの保存は呼び出し元スレッドで行う
+
+    Args:
+        isbns (iterable): ISBNコード
+        max_workers (int): 並行して問い合わせる数
+        using (str): DBエイリアス
+        force (bool): TTL内のものも問い合わせ直す
+
+    Returns:
+        dict: {'fetched': 問い合わせ件数, 'found': 見つかった件数, 'cached': キャッシュ済み件数}
+    """
+    isbns = list(dict.fromkeys(isbns))
+    books = Book.objects.using(using).in_bulk(isbns)
+    now = timezone.now()
+    targets = [isbn for isbn in isbns if force or isbn not in books or not _is_fresh(books[isbn], now)]
+
+    for isbn in isbns:
+        if isbn not in targets:
+            _remember(books[isbn])
+
+    provider = get_provider()
+    found = 0
+    if targets:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(provider.fetch, targets))
+        for isbn, info in zip(targets, results):
+            if info or isbn in books:
+                _remember(_store(isbn, info, using))
+            else:
+                # 見つからず Book もないISBNは作らずにLRUにだけ記録する
+                _lru.set(isbn, None, NEGATIVE_TTL)
+            if info:
+                found += 1
+
+    return {'fetched': len(targets), 'found': found, 'cached': len(isbns) - len(targets)}
+
+
+def stale_isbns(using='graphics'):
+    """
+    TTL切れ・未取得の Book のISBNを返す（定期リフレッシュ用）
+
+    Returns:
+        list: ISBNコード
+    """
+    now = timezone.now()
+    candidates = Book.objects.using(using).filter(
+        Q(info_fetched_at__isnull=True)
+        | Q(info_fetched_at__lt=now - POSITIVE_TTL)
+        | Q(info_found=False, info_fetched_at__lt=now - NEGATIVE_TTL)
+    )
+    return [book.isbn for book in candidates if not _is_fresh(book, now)]
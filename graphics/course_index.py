@@ -0,0 +1,149 @@
+"""
+統合科目インデックス（UnifiedCourse）の維持処理
+
+科目検索では「科目名・開講学科・開講学期」が同じ開講情報を1件にまとめて表示する。
+検索のたびにPythonでグループ化すると開講情報の件数に比例してクエリが増えるため、
+書き込み時に UnifiedCourse を更新しておき、検索は1回のページングクエリで済ませる。
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import CourseOffering, SubjectReview, SubjectReviewStats, UnifiedCourse
+
+
+def make_department_key(department_names):
+    """
+    学科名のリストから統合キーを作成する
+
+    Args:
+        department_names (iterable): 学科名
+
+    Returns:
+        str: ソートしてカンマ連結した学科名 (e.g., "1系,3系")
+    """
+    return ','.join(sorted(department_names))
+
+
+def refresh_unified_course(unified_course_id, using='graphics'):
+    """
+    統合科目の最新開講情報とレビュー集計を再計算する
+    所属する開講情報がなくなった場合は統合科目を削除する
+
+    Args:
+        unified_course_id (int): UnifiedCourse の主キー
+        using (str): DBエイリアス
+    """
+    if unified_course_id is None:
+        return
+
+    latest = CourseOffering.objects.using(using).filter(
+        unified_course_id=unified_course_id
+    ).order_by('-year', 'pk').first()
+
+    if latest is None:
+        UnifiedCourse.objects.using(using).filter(pk=unified_course_id).delete()
+        return
+
+    # 開講情報ごとのレビュー集計（SubjectReviewStats）を合算する
+    stats = SubjectReviewStats.objects.using(using).filter(
+        course_offering__unified_course_id=unified_course_id
+    ).aggregate(review_count=Sum('review_count'), rating_sum=Sum('rating_sum'))
+    review_count = stats['review_count'] or 0
+
+    UnifiedCourse.objects.using(using).filter(pk=unified_course_id).update(
+        latest_offering=latest,
+        review_count=review_count,
+        avg_rating=stats['rating_sum'] / review_count if review_count > 0 else 0,
+    )
+
+
+def sync_course_offering(offering, using='graphics'):
+    """
+    開講情報を所属すべき統合科目に割り当て、関係する統合科目を再計算する
+    学科や学期が変わった場合は旧グループからも外す
+
+    Args:
+        offering (CourseOffering): 保存済みの開講情報
+        using (str): DBエイリアス
+    """
+    department_key = make_department_key(
+        offering.departments.using(using).values_list('name', flat=True)
+    )
+    unified_course, _ = UnifiedCourse.objects.using(using).get_or_create(
+        subject_id=offering.subject_id,
+        semester=offering.semester,
+        department_key=department_key,
+    )
+
+    previous_id = CourseOffering.objects.using(using).filter(
+        pk=offering.pk
+    ).values_list('unified_course_id', flat=True).first()
+
+    if previous_id != unified_course.pk:
+        # save() を経由するとシグナルが再発火するため update で付け替える
+        CourseOffering.objects.using(using).filter(pk=offering.pk).update(
+            unified_course=unified_course
+        )
+        offering.unified_course_id = unified_course.pk
+
+    refresh_unified_course(unified_course.pk, using=using)
+    if previous_id is not None and previous_id != unified_course.pk:
+        refresh_unified_course(previous_id, using=using)
+
+
+def rebuild_unified_courses(using='graphics'):
+    """
+    全開講情報から統合科目インデックスを作り直す
+    一括インポート後やインデックスの不整合が疑われる場合に使用する
+
+    Args:
+        using (str): DBエイリアス
+
+    Returns:
+        int: 作成した統合科目の件数
+    """
+    offerings = CourseOffering.objects.using(using).prefetch_related('departments').order_by('-year', 'pk')
+
+    # (科目, 学期, 学科キー) ごとにグループ化（年度の降順なので先頭が最新年度）
+    grouped = defaultdict(list)
+    for offering in offerings:
+        department_key = make_department_key(dept.name for dept in offering.departments.all())
+        grouped[(offering.subject_id, offering.semester, department_key)].append(offering)
+
+    # 開講情報ごとのレビュー件数・評価合計を1クエリで取得
+    review_stats = {
+        row['course_offering_id']: row
+        for row in SubjectReview.objects.using(using).values('course_offering_id').annotate(
+            review_count=Count('pk'), rating_sum=Sum('rating')
+        ).order_by()
+    }
+
+    with transaction.atomic(using=using):
+        UnifiedCourse.objects.using(using).all().delete()
+
+        unified_courses = []
+        for (subject_id, semester, department_key), members in grouped.items():
+            review_count = sum(review_stats.get(o.pk, {}).get('review_count', 0) for o in members)
+            rating_sum = sum(review_stats.get(o.pk, {}).get('rating_sum', 0) for o in members)
+            unified_courses.append(UnifiedCourse(
+                subject_id=subject_id,
+                semester=semester,
+                department_key=department_key,
+                latest_offering=members[0],
+                review_count=review_count,
+                avg_rating=rating_sum / review_count if review_count > 0 else 0,
+            ))
+        UnifiedCourse.objects.using(using).bulk_create(unified_courses)
+
+        # SQLite では bulk_create 後に主キーが取れるので、そのまま開講情報へ反映する
+        updated_offerings = []
+        for unified_course, members in zip(unified_courses, grouped.values()):
+            for offering in members:
+                offering.unified_course = unified_course
+                updated_offerings.append(offering)
+        CourseOffering.objects.using(using).bulk_update(updated_offerings, ['unified_course'], batch_size=500)
+
+    return len(unified_courses)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from graphics.course_index import rebuild_unified_courses
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the unified course index (UnifiedCourse) used by the course search.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='graphics', help='DB alias (default: graphics)')
+
+    def handle(self, *args, **options):
+        count = rebuild_unified_courses(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} unified courses."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from graphics.course_index import rebuild_unified_courses
+from graphics.review_stats import rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds per-offering and per-book review aggregates (and the unified course index built on them).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='graphics', help='DB alias (default: graphics)')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        subject_count, book_count = rebuild_review_stats(using=using)
+        self.stdout.write(f"Rebuilt {subject_count} subject review stats and {book_count} book review stats.")
+        unified_count = rebuild_unified_courses(using=using)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {unified_count} unified courses."))
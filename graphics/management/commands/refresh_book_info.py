@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from graphics.book_cache import prefetch_book_info, stale_isbns
+from graphics.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Refreshes cached book metadata (OpenBD / Google Books) concurrently for stale or given ISBNs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('isbns', nargs='*', help='ISBNs to resolve (default: all stale books)')
+        parser.add_argument('--all', action='store_true', help='Refresh every book regardless of TTL')
+        parser.add_argument('--workers', type=int, default=8, help='Number of concurrent lookups (default: 8)')
+        parser.add_argument('--database', default='graphics', help='DB alias (default: graphics)')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['isbns']:
+            isbns = [isbn.replace('-', '') for isbn in options['isbns']]
+        elif options['all']:
+            isbns = list(Book.objects.using(using).values_list('isbn', flat=True))
+        else:
+            isbns = stale_isbns(using=using)
+
+        started = time.perf_counter()
+        result = prefetch_book_info(isbns, max_workers=options['workers'], using=using, force=options['all'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {result['fetched']} ISBNs ({result['found']} found, {result['cached']} already cached) "
+            f"in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphics', '0016_migrate_books_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnifiedCourse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semester', models.CharField(max_length=50, verbose_name='開講学期')),
+                ('department_key', models.CharField(blank=True, default='', max_length=500, verbose_name='開講学科キー')),
+                ('review_count', models.IntegerField(default=0, verbose_name='レビュー数')),
+                ('avg_rating', models.FloatField(default=0, verbose_name='平均評価')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新日時')),
+                ('latest_offering', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='graphics.courseoffering', verbose_name='最新年度の開講情報')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='graphics.subject', verbose_name='科目')),
+            ],
+            options={
+                'verbose_name': '統合科目',
+                'verbose_name_plural': '統合科目',
+                'unique_together': {('subject', 'department_key', 'semester')},
+            },
+        ),
+        migrations.AddField(
+            model_name='courseoffering',
+            name='unified_course',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='offerings', to='graphics.unifiedcourse', verbose_name='統合科目'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def populate_unified_courses(apps, schema_editor):
+    """既存のCourseOfferingから統合科目インデックスを作成"""
+    CourseOffering = apps.get_model('graphics', 'CourseOffering')
+    SubjectReview = apps.get_model('graphics', 'SubjectReview')
+    UnifiedCourse = apps.get_model('graphics', 'UnifiedCourse')
+
+    db_alias = schema_editor.connection.alias
+
+    # 科目・学期・学科キーごとにグループ化（年度の降順なので先頭が最新年度）
+    grouped = defaultdict(list)
+    offerings = CourseOffering.objects.using(db_alias).prefetch_related('departments').order_by('-year', 'pk')
+    for offering in offerings:
+        department_key = ','.join(sorted(dept.name for dept in offering.departments.all()))
+        grouped[(offering.subject_id, offering.semester, department_key)].append(offering)
+
+    review_stats = {
+        row['course_offering_id']: row
+        for row in SubjectReview.objects.using(db_alias).values('course_offering_id').annotate(
+            review_count=Count('pk'), rating_sum=Sum('rating')
+        ).order_by()
+    }
+
+    for (subject_id, semester, department_key), members in grouped.items():
+        review_count = sum(review_stats.get(o.pk, {}).get('review_count', 0) for o in members)
+        rating_sum = sum(review_stats.get(o.pk, {}).get('rating_sum', 0) for o in members)
+        unified_course = UnifiedCourse.objects.using(db_alias).create(
+            subject_id=subject_id,
+            semester=semester,
+            department_key=department_key,
+            latest_offering=members[0],
+            review_count=review_count,
+            avg_rating=rating_sum / review_count if review_count > 0 else 0,
+        )
+        CourseOffering.objects.using(db_alias).filter(
+            pk__in=[o.pk for o in members]
+        ).update(unified_course=unified_course)
+
+    print(f"統合科目インデックス作成: {len(grouped)}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：統合科目インデックスを削除"""
+    CourseOffering = apps.get_model('graphics', 'CourseOffering')
+    UnifiedCourse = apps.get_model('graphics', 'UnifiedCourse')
+    db_alias = schema_editor.connection.alias
+
+    CourseOffering.objects.using(db_alias).update(unified_course=None)
+    UnifiedCourse.objects.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphics', '0017_unifiedcourse'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_unified_courses, reverse_migration),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphics', '0018_populate_unifiedcourse'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubjectReviewStats',
+            fields=[
+                ('course_offering', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='graphics.courseoffering', verbose_name='開講情報')),
+                ('review_count', models.IntegerField(default=0, verbose_name='レビュー数')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='評価合計')),
+                ('last_reviewed_at', models.DateTimeField(blank=True, null=True, verbose_name='最新レビュー日時')),
+            ],
+            options={
+                'verbose_name': '科目レビュー集計',
+                'verbose_name_plural': '科目レビュー集計',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookReviewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=200, verbose_name='科目名')),
+                ('review_count', models.IntegerField(default=0, verbose_name='レビュー数')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='評価合計')),
+                ('rated_count', models.IntegerField(default=0, verbose_name='評価付きレビュー数')),
+                ('last_reviewed_at', models.DateTimeField(blank=True, null=True, verbose_name='最新レビュー日時')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_stats', to='graphics.book', verbose_name='書籍')),
+            ],
+            options={
+                'verbose_name': '参考書レビュー集計',
+                'verbose_name_plural': '参考書レビュー集計',
+                'unique_together': {('book', 'subject')},
+            },
+        ),
+    ]
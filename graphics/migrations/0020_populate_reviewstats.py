@@ -0,0 +1,59 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Max, Sum
+
+
+def populate_review_stats(apps, schema_editor):
+    """既存のレビューから開講情報ごと・書籍×科目名ごとの集計を作成"""
+    SubjectReview = apps.get_model('graphics', 'SubjectReview')
+    BookReview = apps.get_model('graphics', 'BookReview')
+    SubjectReviewStats = apps.get_model('graphics', 'SubjectReviewStats')
+    BookReviewStats = apps.get_model('graphics', 'BookReviewStats')
+
+    db_alias = schema_editor.connection.alias
+
+    subject_rows = SubjectReview.objects.using(db_alias).values('course_offering_id').annotate(
+        review_count=Count('pk'), rating_sum=Sum('rating'), last_reviewed_at=Max('created_at'),
+    ).order_by()
+    SubjectReviewStats.objects.using(db_alias).bulk_create([
+        SubjectReviewStats(**row) for row in subject_rows
+    ])
+
+    # スター未選択（rating=0）を除いた件数
+    rated_counts = defaultdict(int)
+    for row in BookReview.objects.using(db_alias).filter(book__isnull=False, rating__gt=0).values(
+        'book_id', 'subject'
+    ).annotate(rated_count=Count('pk')).order_by():
+        rated_counts[(row['book_id'], row['subject'])] = row['rated_count']
+
+    book_rows = BookReview.objects.using(db_alias).filter(book__isnull=False).values('book_id', 'subject').annotate(
+        review_count=Count('pk'), rating_sum=Sum('rating'), last_reviewed_at=Max('created_at'),
+    ).order_by()
+    BookReviewStats.objects.using(db_alias).bulk_create([
+        BookReviewStats(rated_count=rated_counts[(row['book_id'], row['subject'])], **row)
+        for row in book_rows
+    ])
+
+    print(f"レビュー集計作成: 科目{len(subject_rows)}件、参考書{len(book_rows)}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：集計を削除"""
+    SubjectReviewStats = apps.get_model('graphics', 'SubjectReviewStats')
+    BookReviewStats = apps.get_model('graphics', 'BookReviewStats')
+    db_alias = schema_editor.connection.alias
+
+    SubjectReviewStats.objects.using(db_alias).all().delete()
+    BookReviewStats.objects.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphics', '0019_reviewstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_review_stats, reverse_migration),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('graphics', '0020_populate_reviewstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='info_fetched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='書誌情報取得日時'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='info_found',
+            field=models.BooleanField(blank=True, null=True, verbose_name='書誌情報あり'),
+        ),
+    ]
@@ -105,6 +105,15 @@ class CourseOffering(models.Model):
     numbering = models.CharField(max_length=50, null=True, blank=True, verbose_name="ナンバリング")
     teachers = models.ManyToManyField(Teacher, verbose_name="担当教員")
     departments = models.ManyToManyField(Department, verbose_name="開講学科")
+    # 科目検索の統合単位（graphics.course_index が書き込み時に維持する）
+    unified_course = models.ForeignKey(
+        'UnifiedCourse',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='offerings',
+        verbose_name="統合科目",
+    )
 
     def __str__(self):
         return f"{self.subject.name} ({self.year}年度, {self.semester}, {self.grade})"
@@ -114,6 +123,37 @@ class CourseOffering(models.Model):
         verbose_name_plural = "開講情報"
 
 
+class UnifiedCourse(models.Model):
+    """
+    統合科目インデックス
+    科目・開講学科の組み合わせ・開講学期が同じ開講情報を1件にまとめ、
+    最新年度の開講情報とレビュー集計を保持する（検索結果の1行に相当）
+    """
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, verbose_name="科目")
+    semester = models.CharField(max_length=50, verbose_name="開講学期")
+    # 学科名をソートしてカンマで連結したキー
+    department_key = models.CharField(max_length=500, blank=True, default='', verbose_name="開講学科キー")
+    latest_offering = models.ForeignKey(
+        CourseOffering,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="最新年度の開講情報",
+    )
+    review_count = models.IntegerField(default=0, verbose_name="レビュー数")
+    avg_rating = models.FloatField(default=0, verbose_name="平均評価")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        unique_together = ('subject', 'department_key', 'semester')
+        verbose_name = "統合科目"
+        verbose_name_plural = "統合科目"
+
+    def __str__(self):
+        return f"{self.subject.name} ({self.semester}, {self.department_key})"
+
+
 class SubjectReview(models.Model):
     """
     科目レビューモデル
@@ -146,6 +186,9 @@ class Book(models.Model):
     author = models.CharField(max_length=200, verbose_name="著者", null=True, blank=True)
     publication_date = models.CharField(max_length=20, verbose_name="発行日", null=True, blank=True)
     cover_image_url = models.URLField(max_length=500, verbose_name="表紙画像URL", null=True, blank=True)
+    # 書誌情報APIの取得結果（graphics.book_cache のTTL判定に使用）
+    info_fetched_at = models.DateTimeField(verbose_name="書誌情報取得日時", null=True, blank=True)
+    info_found = models.BooleanField(verbose_name="書誌情報あり", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
 
@@ -185,4 +228,49 @@ class BookReview(models.Model):
     def __str__(self):
         if self.book:
             return f"{self.subject} - {self.book.title}"
-        return f"{self.subject} - ISBN:{self.isbn}"
\ No newline at end of file
+        return f"{self.subject} - ISBN:{self.isbn}"
+
+class SubjectReviewStats(models.Model):
+    """
+    開講情報ごとの科目レビュー集計
+    レビューの作成・編集・削除と同じトランザクションで更新する（graphics.review_stats）
+    """
+    course_offering = models.OneToOneField(
+        CourseOffering,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='review_stats',
+        verbose_name="開講情報",
+    )
+    review_count = models.IntegerField(default=0, verbose_name="レビュー数")
+    rating_sum = models.IntegerField(default=0, verbose_name="評価合計")
+    last_reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name="最新レビュー日時")
+
+    class Meta:
+        verbose_name = "科目レビュー集計"
+        verbose_name_plural = "科目レビュー集計"
+
+    def __str__(self):
+        return f"{self.course_offering_id}: {self.review_count}件"
+
+
+class BookReviewStats(models.Model):
+    """
+    書籍×科目名ごとの参考書レビュー集計
+    科目詳細では科目名で、書籍詳細では書籍で集計行を引く
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='review_stats', verbose_name="書籍")
+    subject = models.CharField(max_length=200, verbose_name="科目名")
+    review_count = models.IntegerField(default=0, verbose_name="レビュー数")
+    rating_sum = models.IntegerField(default=0, verbose_name="評価合計")
+    # スター未選択（rating=0）を除いた件数（平均評価の分母）
+    rated_count = models.IntegerField(default=0, verbose_name="評価付きレビュー数")
+    last_reviewed_at = models.DateTimeField(null=True, blank=True, verbose_name="最新レビュー日時")
+
+    class Meta:
+        unique_together = ('book', 'subject')
+        verbose_name = "参考書レビュー集計"
+        verbose_name_plural = "参考書レビュー集計"
+
+    def __str__(self):
+        return f"{self.subject} - {self.book_id}: {self.review_count}件"
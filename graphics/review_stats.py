@@ -0,0 +1,170 @@
+"""
+レビュー集計（SubjectReviewStats / BookReviewStats）の増分更新
+
+詳細ページでレビューを全件読み込んで平均を計算しないよう、
+レビューの作成・編集・削除のたびに件数と評価合計を差分で更新する。
+呼び出し側（ビュー）でレビューの保存と同じトランザクションに入れること。
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+
+from .models import BookReview, BookReviewStats, SubjectReview, SubjectReviewStats
+
+
+def _subject_key(offering_id):
+    return {'course_offering_id': offering_id} if offering_id else None
+
+
+def _book_key(book_id, subject):
+    return {'book_id': book_id, 'subject': subject} if book_id else None
+
+
+def _add(stats_model, key, rating, reviewed_at, using):
+    """集計行にレビュー1件を加算する（集計行がなければ作成）"""
+    stats, _ = stats_model.objects.using(using).get_or_create(**key)
+    updates = {
+        'review_count': F('review_count') + 1,
+        'rating_sum': F('rating_sum') + rating,
+    }
+    if stats_model is BookReviewStats and rating > 0:
+        updates['rated_count'] = F('rated_count') + 1
+    if reviewed_at and (stats.last_reviewed_at is None or reviewed_at > stats.last_reviewed_at):
+        updates['last_reviewed_at'] = reviewed_at
+    stats_model.objects.using(using).filter(pk=stats.pk).update(**updates)
+
+
+def _remove(stats_model, key, rating, reviewed_at, remaining_reviews, using):
+    """
+    集計行からレビュー1件を減算する
+    連鎖削除中に集計行が先に消えている場合もあるため、集計行の作成は行わない
+    """
+    stats_qs = stats_model.objects.using(using).filter(**key)
+    updates = {
+        'review_count': F('review_count') - 1,
+        'rating_sum': F('rating_sum') - rating,
+    }
+    if stats_model is BookReviewStats and rating > 0:
+        updates['rated_count'] = F('rated_count') - 1
+    stats_qs.update(**updates)
+
+    # 最新のレビューが消えた場合のみ、残りのレビューから最新日時を取り直す
+    if reviewed_at and stats_qs.filter(last_reviewed_at=reviewed_at).exists():
+        last_reviewed_at = remaining_reviews.aggregate(last=Max('created_at'))['last']
+        stats_qs.update(last_reviewed_at=last_reviewed_at)
+
+
+def load_previous_state(review, using='graphics'):
+    """
+    保存前のレビューの集計キーと評価をDBから読み込む（新規作成ならNone）
+
+    Args:
+        review (SubjectReview | BookReview): 保存しようとしているレビュー
+        using (str): DBエイリアス
+
+    Returns:
+        dict: 保存前の値 or None
+    """
+    if isinstance(review, SubjectReview):
+        fields = ('course_offering_id', 'rating', 'created_at')
+    else:
+        fields = ('book_id', 'subject', 'rating', 'created_at')
+    return type(review).objects.using(using).filter(pk=review.pk).values(*fields).first()
+
+
+def record_subject_review_saved(review, previous, using='graphics'):
+    """
+    科目レビューの作成・編集を集計に反映する
+
+    Args:
+        review (SubjectReview): 保存後のレビュー
+        previous (dict): load_previous_state() の戻り値
+        using (str): DBエイリアス
+    """
+    with transaction.atomic(using=using):
+        if previous:
+            old_key = _subject_key(previous['course_offering_id'])
+            remaining = SubjectReview.objects.using(using).filter(
+                course_offering_id=previous['course_offering_id']
+            ).exclude(pk=review.pk)
+            _remove(SubjectReviewStats, old_key, previous['rating'], previous['created_at'], remaining, using)
+        _add(SubjectReviewStats, _subject_key(review.course_offering_id), review.rating, review.created_at, using)
+
+
+def record_subject_review_deleted(review, using='graphics'):
+    """科目レビューの削除を集計に反映する"""
+    remaining = SubjectReview.objects.using(using).filter(course_offering_id=review.course_offering_id)
+    with transaction.atomic(using=using):
+        _remove(SubjectReviewStats, _subject_key(review.course_offering_id), review.rating,
+                review.created_at, remaining, using)
+
+
+def record_book_review_saved(review, previous, using='graphics'):
+    """
+    参考書レビューの作成・編集を集計に反映する
+    書籍が未設定の旧データは集計対象外
+
+    Args:
+        review (BookReview): 保存後のレビュー
+        previous (dict): load_previous_state() の戻り値
+        using (str): DBエイリアス
+    """
+    with transaction.atomic(using=using):
+        if previous:
+            old_key = _book_key(previous['book_id'], previous['subject'])
+            if old_key:
+                remaining = BookReview.objects.using(using).filter(**old_key).exclude(pk=review.pk)
+                _remove(BookReviewStats, old_key, previous['rating'], previous['created_at'], remaining, using)
+        new_key = _book_key(review.book_id, review.subject)
+        if new_key:
+            _add(BookReviewStats, new_key, review.rating, review.created_at, using)
+
+
+def record_book_review_deleted(review, using='graphics'):
+    """参考書レビューの削除を集計に反映する"""
+    key = _book_key(review.book_id, review.subject)
+    if not key:
+        return
+    remaining = BookReview.objects.using(using).filter(**key)
+    with transaction.atomic(using=using):
+        _remove(BookReviewStats, key, review.rating, review.created_at, remaining, using)
+
+
+def rebuild_review_stats(using='graphics'):
+    """
+    全レビューから集計テーブルを作り直す
+
+    Args:
+        using (str): DBエイリアス
+
+    Returns:
+        tuple: (科目レビュー集計の件数, 参考書レビュー集計の件数)
+    """
+    subject_rows = SubjectReview.objects.using(using).values('course_offering_id').annotate(
+        review_count=Count('pk'), rating_sum=Sum('rating'), last_reviewed_at=Max('created_at'),
+    ).order_by()
+
+    book_rows = BookReview.objects.using(using).filter(book__isnull=False).values('book_id', 'subject').annotate(
+        review_count=Count('pk'), rating_sum=Sum('rating'), last_reviewed_at=Max('created_at'),
+    ).order_by()
+    rated_counts = defaultdict(int)
+    for row in BookReview.objects.using(using).filter(book__isnull=False, rating__gt=0).values(
+        'book_id', 'subject'
+    ).annotate(rated_count=Count('pk')).order_by():
+        rated_counts[(row['book_id'], row['subject'])] = row['rated_count']
+
+    with transaction.atomic(using=using):
+        SubjectReviewStats.objects.using(using).all().delete()
+        BookReviewStats.objects.using(using).all().delete()
+
+        subject_stats = SubjectReviewStats.objects.using(using).bulk_create([
+            SubjectReviewStats(**row) for row in subject_rows
+        ])
+        book_stats = BookReviewStats.objects.using(using).bulk_create([
+            BookReviewStats(rated_count=rated_counts[(row['book_id'], row['subject'])], **row)
+            for row in book_rows
+        ])
+
+    return len(subject_stats), len(book_stats)
@@ -8,13 +8,19 @@ CSVディレクトリパスを引数に取り、科目情報をデータベー
 使用方法:
     python build_course_db.py <csv_directory_path>
     例: python build_course_db.py graphics/2025
+
+一括インポートモード（複数年度をまとめて高速に登録）:
+    python build_course_db.py --batch <csv_directory_path> [<csv_directory_path> ...]
+    例: python build_course_db.py --batch graphics/2024 graphics/2025
 """
 
 import os
 import sys
+import time
 import django
 import csv
 import re
+from collections import defaultdict
 from pathlib import Path
 
 # Djangoプロジェクトのルートディレクトリを追加
@@ -25,6 +31,9 @@ sys.path.append(str(project_root))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pbl_project.settings')
 django.setup()
 
+from django.db import transaction
+
+from graphics.course_index import rebuild_unified_courses
 from graphics.models import Subject, Teacher, Department, CourseOffering
 
 
@@ -308,34 +317,301 @@ def consolidate_grades():
     print("=" * 80)
 
 
-def main():
-    if len(sys.argv) < 2:
-        print("使用方法: python build_course_db.py <csv_directory_path>")
-        print("例: python build_course_db.py graphics/2025")
-        sys.exit(1)
+# ============================================================
+# 一括インポートモード
+# 行ごとに get_or_create や重複チェックのクエリを発行せず、
+# 全CSVを読み込んでからマスタ・開講情報をメモリ上の辞書で解決し、
+# bulk_create / bulk_update で1トランザクションにまとめて書き込む
+# ============================================================
+
+def read_csv_rows(csv_path, year):
+    """
+    CSVファイルを読み込み、開講情報1件分の辞書のリストを返す
+    5つの系のいずれにも該当しない行は None 扱いでスキップ件数に数える
+    """
+    rows = []
+    skipped = 0
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+
+        for row in reader:
+            departments = []
+            for dept_name in parse_departments(row['開講学科'].strip()):
+                system_name = map_department_to_system(dept_name)
+                if system_name is not None and system_name not in departments:
+                    departments.append(system_name)
+
+            # 5つの系のいずれにも該当しない場合はスキップ
+            if not departments:
+                skipped += 1
+                continue
+
+            rows.append({
+                'subject': row['科目名'].strip(),
+                'year': year,
+                'semester': row['開講学期'].strip(),
+                'grade': row['開講年次'].strip(),
+                'is_required': row['選択必須'].strip() == '必修',
+                'teachers': parse_teachers(row['担当教員'].strip()),
+                'departments': departments,
+                'timetable_number': row.get('時間割番号', '').strip(),
+                'numbering': row.get('ナンバリング', '').strip(),
+            })
+
+    return rows, skipped
+
+
+def resolve_master(model, names):
+    """
+    マスタ（科目・教員・学科）を名前→IDの辞書で返す
+    存在しない名前は bulk_create でまとめて作成する
+
+    Returns:
+        tuple: (名前→IDの辞書, 新規作成件数)
+    """
+    existing = dict(model.objects.using('graphics').filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        model.objects.using('graphics').bulk_create(
+            [model(name=name) for name in missing], ignore_conflicts=True, batch_size=500
+        )
+        existing = dict(model.objects.using('graphics').filter(name__in=names).values_list('name', 'id'))
+    return existing, len(missing)
+
+
+def offering_key(subject_id, year, semester, grade, is_required, teacher_ids, department_ids):
+    """開講情報の重複判定キー（科目、年度、学期、学年、選択必須、担当教員、学科が完全一致）"""
+    return (subject_id, year, semester, grade, is_required, frozenset(teacher_ids), frozenset(department_ids))
+
+
+def load_existing_offerings(years):
+    """
+    対象年度の既存開講情報を重複判定キー→開講情報の辞書で返す
+    担当教員・学科は中間テーブルから一括で取得する
+    """
+    offerings = CourseOffering.objects.using('graphics').filter(year__in=years).order_by('pk')
+
+    teacher_ids = defaultdict(set)
+    for offering_id, teacher_id in CourseOffering.teachers.through.objects.using('graphics').filter(
+        courseoffering__year__in=years
+    ).values_list('courseoffering_id', 'teacher_id'):
+        teacher_ids[offering_id].add(teacher_id)
+
+    department_ids = defaultdict(set)
+    for offering_id, department_id in CourseOffering.departments.through.objects.using('graphics').filter(
+        courseoffering__year__in=years
+    ).values_list('courseoffering_id', 'department_id'):
+        department_ids[offering_id].add(department_id)
+
+    by_key = {}
+    for offering in offerings:
+        key = offering_key(
+            offering.subject_id, offering.year, offering.semester, offering.grade,
+            offering.is_required, teacher_ids[offering.pk], department_ids[offering.pk],
+        )
+        # 同じキーが複数ある場合は逐次モードと同じく最初の1件を使う
+        by_key.setdefault(key, offering)
+    return by_key
+
+
+def import_rows_batch(rows):
+    """
+    読み込んだ全行を一括で登録する
+
+    Returns:
+        dict: 件数の内訳
+    """
+    subject_ids, subjects_created = resolve_master(Subject, sorted({r['subject'] for r in rows}))
+    teacher_ids, teachers_created = resolve_master(Teacher, sorted({t for r in rows for t in r['teachers']}))
+    department_ids, departments_created = resolve_master(Department, sorted({d for r in rows for d in r['departments']}))
+
+    existing = load_existing_offerings(sorted({r['year'] for r in rows}))
+
+    new_offerings = {}
+    links = {}
+    updated = {}
+
+    for r in rows:
+        r_teacher_ids = [teacher_ids[t] for t in r['teachers']]
+        r_department_ids = [department_ids[d] for d in r['departments']]
+        key = offering_key(
+            subject_ids[r['subject']], r['year'], r['semester'], r['grade'],
+            r['is_required'], r_teacher_ids, r_department_ids,
+        )
+
+        offering = existing.get(key) or new_offerings.get(key)
+        if offering is not None:
+            # 完全に同じ開講情報がある場合は、時間割番号とナンバリングのみ更新
+            if r['timetable_number']:
+                offering.timetable_number = r['timetable_number']
+            if r['numbering']:
+                offering.numbering = r['numbering']
+            if offering.pk is not None:
+                updated[offering.pk] = offering
+            continue
+
+        new_offerings[key] = CourseOffering(
+            subject_id=subject_ids[r['subject']],
+            year=r['year'],
+            semester=r['semester'],
+            is_required=r['is_required'],
+            grade=r['grade'],
+            timetable_number=r['timetable_number'] or None,
+            numbering=r['numbering'] or None,
+        )
+        links[key] = (set(r_teacher_ids), set(r_department_ids))
+
+    # bulk_create は SQLite で主キーを返すため、そのまま中間テーブルの行を作れる
+    CourseOffering.objects.using('graphics').bulk_create(list(new_offerings.values()), batch_size=500)
+    CourseOffering.objects.using('graphics').bulk_update(
+        list(updated.values()), ['timetable_number', 'numbering'], batch_size=500
+    )
+
+    TeacherLink = CourseOffering.teachers.through
+    DepartmentLink = CourseOffering.departments.through
+    teacher_links = []
+    department_links = []
+    for key, offering in new_offerings.items():
+        r_teacher_ids, r_department_ids = links[key]
+        teacher_links.extend(TeacherLink(courseoffering_id=offering.pk, teacher_id=t) for t in r_teacher_ids)
+        department_links.extend(DepartmentLink(courseoffering_id=offering.pk, department_id=d) for d in r_department_ids)
+    TeacherLink.objects.using('graphics').bulk_create(teacher_links, batch_size=500)
+    DepartmentLink.objects.using('graphics').bulk_create(department_links, batch_size=500)
+
+    return {
+        'subjects_created': subjects_created,
+        'teachers_created': teachers_created,
+        'departments_created': departments_created,
+        'offerings_created': len(new_offerings),
+        'offerings_updated': len(updated),
+    }
+
+
+def consolidate_grades_batch(years):
+    """
+    consolidate_grades() の一括版
+    担当教員・学科をプリフェッチしてメモリ上でグループ化し、更新と削除をまとめて行う
 
-    csv_dir = sys.argv[1]
+    Returns:
+        int: 統合により削除した開講情報の件数
+    """
+    offerings = CourseOffering.objects.using('graphics').filter(year__in=years).prefetch_related(
+        'teachers', 'departments'
+    ).order_by('pk')
+
+    # 科目、年度、学期、選択必須、担当教員、学科が一致するものをグループ化
+    grouped = defaultdict(list)
+    for offering in offerings:
+        key = (
+            offering.subject_id, offering.year, offering.semester, offering.is_required,
+            frozenset(t.pk for t in offering.teachers.all()),
+            frozenset(d.pk for d in offering.departments.all()),
+        )
+        grouped[key].append(offering)
+
+    to_update = []
+    to_delete = []
+    for members in grouped.values():
+        if len(members) <= 1:
+            continue
+
+        # 学年を統合（重複を除去）
+        grades_set = set()
+        for offering in members:
+            for grade in offering.grade.split(','):
+                grades_set.add(grade.strip())
+
+        first = members[0]
+        first.grade = ', '.join(sorted(grades_set))
+        to_update.append(first)
+        to_delete.extend(other.pk for other in members[1:])
+
+    CourseOffering.objects.using('graphics').bulk_update(to_update, ['grade'], batch_size=500)
+    CourseOffering.objects.using('graphics').filter(pk__in=to_delete).delete()
+    return len(to_delete)
+
+
+def run_batch_import(csv_dirs):
+    """
+    複数の年度ディレクトリをまとめてインポートする
+    """
+    started = time.perf_counter()
+
+    rows = []
+    skipped = 0
+    file_count = 0
+    for csv_dir_path, year in csv_dirs:
+        for csv_file in csv_dir_path.glob('*.csv'):
+            file_rows, file_skipped = read_csv_rows(csv_file, year)
+            rows.extend(file_rows)
+            skipped += file_skipped
+            file_count += 1
+    parsed = time.perf_counter()
+
+    years = sorted({year for _, year in csv_dirs})
+    with transaction.atomic(using='graphics'):
+        counts = import_rows_batch(rows)
+        imported = time.perf_counter()
+        counts['offerings_consolidated'] = consolidate_grades_batch(years)
+        # bulk操作ではシグナルが発火しないため、統合科目インデックスは最後に作り直す
+        unified_count = rebuild_unified_courses(using='graphics')
+    finished = time.perf_counter()
+
+    print("\n=== 一括インポート結果 ===")
+    print(f"年度: {', '.join(str(y) for y in years)}")
+    print(f"CSVファイル数: {file_count}")
+    print(f"読み込み行数: {len(rows) + skipped}（スキップ: {skipped}）")
+    print(f"新規科目: {counts['subjects_created']} / 新規教員: {counts['teachers_created']} / 新規学科: {counts['departments_created']}")
+    print(f"新規開講情報: {counts['offerings_created']} / 更新: {counts['offerings_updated']} / 学年統合で削除: {counts['offerings_consolidated']}")
+    print(f"統合科目: {unified_count}")
+    print(f"所要時間: 読み込み {parsed - started:.2f}秒 / 登録 {imported - parsed:.2f}秒 / 統合・索引 {finished - imported:.2f}秒 / 合計 {finished - started:.2f}秒")
+
+
+def resolve_csv_dir(csv_dir):
+    """
+    CSVディレクトリを検証し、(パス, 年度) を返す
+    年度はディレクトリ名から取得する
+    """
     csv_dir_path = Path(csv_dir)
 
     if not csv_dir_path.exists():
         print(f"エラー: ディレクトリが存在しません: {csv_dir}")
         sys.exit(1)
 
-    # 年度をディレクトリ名から取得
     dir_name = csv_dir_path.name
     year_match = re.search(r'\d{4}', dir_name)
     if not year_match:
         print(f"エラー: ディレクトリ名から年度を取得できません: {dir_name}")
         sys.exit(1)
 
-    year = int(year_match.group())
+    if not list(csv_dir_path.glob('*.csv')):
+        print(f"エラー: CSVファイルが見つかりません: {csv_dir}")
+        sys.exit(1)
+
+    return csv_dir_path, int(year_match.group())
+
+
+def main():
+    args = sys.argv[1:]
+    batch_mode = '--batch' in args
+    csv_dirs = [arg for arg in args if arg != '--batch']
+
+    if not csv_dirs:
+        print("使用方法: python build_course_db.py [--batch] <csv_directory_path> [<csv_directory_path> ...]")
+        print("例: python build_course_db.py graphics/2025")
+        print("例: python build_course_db.py --batch graphics/2024 graphics/2025")
+        sys.exit(1)
+
+    if batch_mode:
+        run_batch_import([resolve_csv_dir(csv_dir) for csv_dir in csv_dirs])
+        return
+
+    csv_dir_path, year = resolve_csv_dir(csv_dirs[0])
     print(f"年度: {year}")
 
     # CSVファイルを取得
     csv_files = list(csv_dir_path.glob('*.csv'))
-    if not csv_files:
-        print(f"エラー: CSVファイルが見つかりません: {csv_dir}")
-        sys.exit(1)
 
     print(f"処理するCSVファイル数: {len(csv_files)}")
 
@@ -0,0 +1,97 @@
+"""
+開講情報・レビューの書き込みに合わせて統合科目インデックスとレビュー集計を更新するシグナル
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .course_index import refresh_unified_course, sync_course_offering
+from .models import BookReview, CourseOffering, SubjectReview
+from .review_stats import (
+    load_previous_state,
+    record_book_review_deleted,
+    record_book_review_saved,
+    record_subject_review_deleted,
+    record_subject_review_saved,
+)
+
+
+@receiver(post_save, sender=CourseOffering)
+def sync_offering_on_save(sender, instance, using, raw=False, **kwargs):
+    # fixture読み込み時は関連データが揃っていないため、rebuild_course_index に任せる
+    if raw:
+        return
+    sync_course_offering(instance, using=using)
+
+
+@receiver(m2m_changed, sender=CourseOffering.departments.through)
+def sync_offering_on_departments_change(sender, instance, action, using, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_course_offering(instance, using=using)
+        return
+    # 学科側から追加・削除された場合は pk_set が開講情報のID
+    for offering in CourseOffering.objects.using(using).filter(pk__in=pk_set or []):
+        sync_course_offering(offering, using=using)
+
+
+@receiver(pre_delete, sender=CourseOffering)
+def load_unified_course_before_delete(sender, instance, using, **kwargs):
+    # インデックス再構築でIDが変わっている可能性があるため、削除前にDBの値を読み直す
+    instance.unified_course_id = CourseOffering.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('unified_course_id', flat=True).first()
+
+
+@receiver(post_delete, sender=CourseOffering)
+def refresh_on_offering_delete(sender, instance, using, **kwargs):
+    refresh_unified_course(instance.unified_course_id, using=using)
+
+
+@receiver(pre_save, sender=SubjectReview)
+@receiver(pre_save, sender=BookReview)
+def load_review_before_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    # 編集時は変更前の値との差分で集計を更新するため、保存前の値を保持しておく
+    instance._previous_review_state = load_previous_state(instance, using=using)
+
+
+@receiver(post_save, sender=SubjectReview)
+def update_stats_on_subject_review_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_review_state', None)
+    record_subject_review_saved(instance, previous, using=using)
+    refresh_unified_course(_unified_course_id(instance, using), using=using)
+    if previous and previous['course_offering_id'] != instance.course_offering_id:
+        refresh_unified_course(
+            _unified_course_id(SubjectReview(course_offering_id=previous['course_offering_id']), using),
+            using=using,
+        )
+
+
+@receiver(post_delete, sender=SubjectReview)
+def update_stats_on_subject_review_delete(sender, instance, using, **kwargs):
+    record_subject_review_deleted(instance, using=using)
+    refresh_unified_course(_unified_course_id(instance, using), using=using)
+
+
+@receiver(post_save, sender=BookReview)
+def update_stats_on_book_review_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    record_book_review_saved(instance, getattr(instance, '_previous_review_state', None), using=using)
+
+
+@receiver(post_delete, sender=BookReview)
+def update_stats_on_book_review_delete(sender, instance, using, **kwargs):
+    record_book_review_deleted(instance, using=using)
+
+
+def _unified_course_id(review, using):
+    # 開講情報の連鎖削除中でも参照できるよう、統合科目IDはDBから直接取得する
+    return CourseOffering.objects.using(using).filter(
+        pk=review.course_offering_id
+    ).values_list('unified_course_id', flat=True).first()
@@ -0,0 +1,231 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Max, Q, Sum
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import book_cache
+from .models import (
+    Book,
+    BookReview,
+    BookReviewStats,
+    CourseOffering,
+    Subject,
+    SubjectReview,
+    SubjectReviewStats,
+)
+from .review_stats import rebuild_review_stats
+
+DB = 'graphics'
+
+
+def create_offering(subject, year=2025):
+    return CourseOffering.objects.using(DB).create(subject=subject, year=year, semester='前期', grade='2年')
+
+
+class ReviewStatsTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.subject = Subject.objects.using(DB).create(name='線形代数')
+        self.offering = create_offering(self.subject)
+        self.other_offering = create_offering(Subject.objects.using(DB).create(name='微分積分'))
+        self.book = Book.objects.using(DB).create(isbn='9784000000001', title='線形代数入門')
+        self.other_book = Book.objects.using(DB).create(isbn='9784000000002', title='微分積分入門')
+
+    def assertStatsMatchReviews(self):
+        """集計テーブルが、レビューをその場で集計した結果と一致すること"""
+        subject_expected = {
+            row['course_offering_id']: (row['review_count'], row['rating_sum'], row['last_reviewed_at'])
+            for row in SubjectReview.objects.using(DB).values('course_offering_id').annotate(
+                review_count=Count('pk'), rating_sum=Sum('rating'), last_reviewed_at=Max('created_at'),
+            ).order_by()
+        }
+        subject_stats = SubjectReviewStats.objects.using(DB).values_list(
+            'course_offering_id', 'review_count', 'rating_sum', 'last_reviewed_at'
+        )
+        self.assertEqual(
+            {offering_id: rest for offering_id, *rest in subject_stats if rest[0]},
+            {key: list(value) for key, value in subject_expected.items()},
+        )
+
+        book_expected = {
+            (row['book_id'], row['subject']): [
+                row['review_count'], row['rating_sum'], row['rated_count'], row['last_reviewed_at']
+            ]
+            for row in BookReview.objects.using(DB).filter(book__isnull=False).values('book_id', 'subject').annotate(
+                review_count=Count('pk'), rating_sum=Sum('rating'),
+                rated_count=Count('pk', filter=Q(rating__gt=0)), last_reviewed_at=Max('created_at'),
+            ).order_by()
+        }
+        book_stats = BookReviewStats.objects.using(DB).values_list(
+            'book_id', 'subject', 'review_count', 'rating_sum', 'rated_count', 'last_reviewed_at'
+        )
+        self.assertEqual(
+            {(book_id, subject): rest for book_id, subject, *rest in book_stats if rest[0]},
+            book_expected,
+        )
+
+        # レビューがなくなった集計行は 0 件のまま残る
+        for stats in SubjectReviewStats.objects.using(DB).filter(review_count=0):
+            self.assertEqual((stats.rating_sum, stats.last_reviewed_at), (0, None))
+        for stats in BookReviewStats.objects.using(DB).filter(review_count=0):
+            self.assertEqual((stats.rating_sum, stats.rated_count, stats.last_reviewed_at), (0, 0, None))
+
+    def test_subject_review_create_edit_move_delete(self):
+        first = SubjectReview.objects.using(DB).create(course_offering=self.offering, review='良い', rating=4)
+        second = SubjectReview.objects.using(DB).create(course_offering=self.offering, review='普通', rating=3)
+        self.assertStatsMatchReviews()
+
+        first.rating = 1
+        first.save()
+        self.assertStatsMatchReviews()
+        self.assertEqual(SubjectReviewStats.objects.using(DB).get(course_offering=self.offering).rating_sum, 4)
+
+        # 最新のレビューを別の開講情報に移すと、移動元の最新日時も取り直す
+        second.course_offering = self.other_offering
+        second.save()
+        self.assertStatsMatchReviews()
+
+        first.delete()
+        self.assertStatsMatchReviews()
+        second.delete()
+        self.assertStatsMatchReviews()
+
+    def test_book_review_create_edit_move_delete(self):
+        first = BookReview.objects.using(DB).create(subject='線形代数', book=self.book, review='良い', rating=5)
+        second = BookReview.objects.using(DB).create(subject='線形代数', book=self.book, review='未評価', rating=0)
+        legacy = BookReview.objects.using(DB).create(subject='線形代数', review='書籍なし', rating=3)
+        self.assertStatsMatchReviews()
+        stats = BookReviewStats.objects.using(DB).get(book=self.book, subject='線形代数')
+        self.assertEqual((stats.review_count, stats.rated_count), (2, 1))
+
+        second.rating = 2
+        second.save()
+        self.assertStatsMatchReviews()
+
+        # 別の書籍・別の科目への移動
+        first.book = self.other_book
+        first.save()
+        self.assertStatsMatchReviews()
+        second.subject = '線形代数II'
+        second.save()
+        self.assertStatsMatchReviews()
+
+        # 書籍が未設定の旧データに書籍を付けると集計対象になる
+        legacy.book = self.book
+        legacy.save()
+        self.assertStatsMatchReviews()
+
+        for review in (first, second, legacy):
+            review.delete()
+            self.assertStatsMatchReviews()
+
+    def test_offering_delete_cascades_without_errors(self):
+        SubjectReview.objects.using(DB).create(course_offering=self.offering, review='良い', rating=4)
+        SubjectReview.objects.using(DB).create(course_offering=self.other_offering, review='普通', rating=2)
+
+        self.offering.delete()
+        self.assertStatsMatchReviews()
+        self.assertFalse(SubjectReviewStats.objects.using(DB).filter(course_offering_id=self.offering.pk).exists())
+
+    def test_rebuild_review_stats(self):
+        SubjectReview.objects.using(DB).create(course_offering=self.offering, review='良い', rating=4)
+        SubjectReview.objects.using(DB).create(course_offering=self.offering, review='普通', rating=3)
+        BookReview.objects.using(DB).create(subject='線形代数', book=self.book, review='良い', rating=5)
+        BookReview.objects.using(DB).create(subject='線形代数', book=self.book, review='未評価', rating=0)
+        BookReview.objects.using(DB).create(subject='線形代数', review='書籍なし', rating=3)
+
+        # 集計を壊してから作り直す
+        SubjectReviewStats.objects.using(DB).update(review_count=10, rating_sum=0)
+        BookReviewStats.objects.using(DB).all().delete()
+        BookReviewStats.objects.using(DB).create(book=self.other_book, subject='微分積分', review_count=3)
+
+        self.assertEqual(rebuild_review_stats(using=DB), (1, 1))
+        self.assertStatsMatchReviews()
+        self.assertEqual(BookReviewStats.objects.using(DB).get().rated_count, 1)
+
+
+class BookCacheTest(TestCase):
+    databases = '__all__'
+
+    FOUND = '9784000000010'
+    MISSING = '9784000000099'
+
+    def setUp(self):
+        self.provider = book_cache.StaticBookInfoProvider({
+            self.FOUND: {'title': '線形代数入門', 'author': '山田太郎', 'publication_date': '2020-04',
+                         'cover_image_url': None},
+        })
+        previous = book_cache.set_provider(self.provider)
+        self.addCleanup(book_cache.set_provider, previous)
+
+    def lookup(self, isbn):
+        return self.client.get(reverse('graphics:isbn_lookup'), {'isbn': isbn}).json()
+
+    def test_found_isbn_is_stored_and_served_from_cache(self):
+        self.assertEqual(self.lookup(self.FOUND)['title'], '線形代数入門')
+        self.assertTrue(Book.objects.using(DB).get(isbn=self.FOUND).info_found)
+
+        # 2 回目はLRU、LRUが空なら Book テーブルから（プロバイダには問い合わせない）
+        self.assertEqual(self.lookup(self.FOUND)['author'], '山田太郎')
+        book_cache.clear_cache()
+        self.assertEqual(book_cache.get_book_info(self.FOUND)['title'], '線形代数入門')
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_missing_isbn_is_negatively_cached_without_a_book(self):
+        self.assertFalse(self.lookup(self.MISSING)['success'])
+        self.assertFalse(self.lookup(self.MISSING)['success'])
+        self.assertEqual(self.provider.calls, 1)
+        self.assertFalse(Book.objects.using(DB).filter(isbn=self.MISSING).exists())
+
+        # LRUから消えれば問い合わせ直す（その間に見つかるようになった）
+        book_cache.clear_cache()
+        self.provider.books[self.MISSING] = {'title': '後から登録された本'}
+        self.assertEqual(book_cache.get_book_info(self.MISSING)['title'], '後から登録された本')
+        self.assertEqual(self.provider.calls, 2)
+
+        # refresh_book_info で指定しても、見つからないISBNの Book は作らない
+        call_command('refresh_book_info', '9784000000098', stdout=StringIO())
+        self.assertFalse(Book.objects.using(DB).filter(isbn='9784000000098').exists())
+
+    def test_review_keeps_a_book_for_a_missing_isbn(self):
+        book = book_cache.get_book(self.MISSING)
+        self.assertEqual((book.title, book.info_found), (None, False))
+        self.assertIsNone(book_cache.get_book_info(self.MISSING))
+        self.assertEqual(self.provider.calls, 1)
+
+    def test_stale_book_is_refreshed_outside_the_request(self):
+        book_cache.get_book_info(self.FOUND)
+        Book.objects.using(DB).filter(isbn=self.FOUND).update(
+            info_fetched_at=timezone.now() - book_cache.POSITIVE_TTL - timedelta(hours=1)
+        )
+        self.provider.books[self.FOUND] = dict(self.provider.books[self.FOUND], title='線形代数入門 第2版')
+        book_cache.clear_cache()
+
+        # TTL切れでもリクエスト中は保存済みの情報を返す
+        self.assertEqual(self.lookup(self.FOUND)['title'], '線形代数入門')
+        self.assertEqual(book_cache.get_book(self.FOUND).title, '線形代数入門')
+        self.assertEqual(self.provider.calls, 1)
+        self.assertEqual(book_cache.stale_isbns(), [self.FOUND])
+
+        call_command('refresh_book_info', stdout=StringIO())
+        self.assertEqual(self.provider.calls, 2)
+        self.assertEqual(Book.objects.using(DB).get(isbn=self.FOUND).title, '線形代数入門 第2版')
+        self.assertEqual(book_cache.stale_isbns(), [])
+
+    def test_lru_evicts_least_recently_used_and_expired(self):
+        lru = book_cache._LRUCache(2)
+        lru.set('a', {'title': 'A'}, timedelta(minutes=1))
+        lru.set('b', None, timedelta(minutes=1))
+        self.assertEqual(lru.get('a'), (True, {'title': 'A'}))
+        lru.set('c', {'title': 'C'}, timedelta(minutes=1))
+
+        # 最近参照していない b が追い出される（None は「見つからなかった」としてヒットする）
+        self.assertEqual(lru.get('b'), (False, None))
+        self.assertEqual(lru.get('a'), (True, {'title': 'A'}))
+        lru.set('d', None, timedelta(0))
+        self.assertEqual(lru.get('d'), (False, None))
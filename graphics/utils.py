@@ -55,12 +55,13 @@ def format_publication_date(pubdate_raw):
     return None
 
 
-def fetch_cover_image_from_google_books(isbn):
+def fetch_cover_image_from_google_books(isbn, timeout=10):
     """
     Fetch book cover image from Google Books API
 
     Args:
         isbn (str): ISBN code
+        timeout (float): HTTP timeout in seconds
 
     Returns:
         str: Cover image URL or None
@@ -68,7 +69,7 @@ def fetch_cover_image_from_google_books(isbn):
     url = f"https://www.googleapis.com/books/v1/volumes?q=isbn:{isbn}"
 
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
             data = json.loads(response.read().decode('utf-8'))
 
             if data.get('totalItems', 0) > 0 and 'items' in data:
@@ -98,12 +99,13 @@ def fetch_cover_image_from_google_books(isbn):
     return None
 
 
-def fetch_book_info_from_openbd(isbn):
+def fetch_book_info_from_openbd(isbn, timeout=10):
     """
     Fetch book information from OpenBD API and Google Books API
 
     Args:
         isbn (str): ISBN code
+        timeout (float): HTTP timeout in seconds (applied to each API call)
 
     Returns:
         dict: Book information (title, author, publication_date, cover_image_url) or None
@@ -111,7 +113,7 @@ def fetch_book_info_from_openbd(isbn):
     url = f"https://api.openbd.jp/v1/get?isbn={isbn}"
 
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
             data = json.loads(response.read().decode('utf-8'))
 
             if data and data[0]:
@@ -141,7 +143,7 @@ def fetch_book_info_from_openbd(isbn):
 
                 # If OpenBD doesn't have cover image, try Google Books API
                 if not cover_image_url or cover_image_url.strip() == '':
-                    cover_image_url = fetch_cover_image_from_google_books(isbn)
+                    cover_image_url = fetch_cover_image_from_google_books(isbn, timeout=timeout)
 
                 return {
                     'title': title,
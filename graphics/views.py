@@ -1,17 +1,18 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Cast
 from django.http import JsonResponse
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from .models import Member, BookReview, SubjectReview, CourseOffering, Teacher, GraphicsUser, Book
+from .models import Member, BookReview, SubjectReview, CourseOffering, Teacher, GraphicsUser, Book, UnifiedCourse, SubjectReviewStats, BookReviewStats
 from .forms import BookReviewForm, SubjectReviewForm, SignupForm, LoginForm, PasswordResetRequestForm, PasswordResetForm, BookReviewEditForm, SubjectReviewEditForm
+from .book_cache import get_book, get_book_info
 from .utils import (
-    fetch_book_info_from_openbd,
     get_year_choices,
     get_semester_choices,
     get_all_reviews
 )
-from datetime import datetime
 
 
 # ログインチェック用デコレータ
@@ -92,29 +93,15 @@ def add_book_review(request):
             if review.isbn:
                 isbn = review.isbn
 
-                # 既存の書籍レコードを検索
-                try:
-                    book = Book.objects.using('graphics').get(isbn=isbn)
-                except Book.DoesNotExist:
-                    # 書籍が存在しない場合、APIから情報を取得して作成
-                    book_info = fetch_book_info_from_openbd(isbn)
-
-                    if book_info:
-                        book = Book.objects.using('graphics').create(
-                            isbn=isbn,
-                            title=book_info.get('title'),
-                            author=book_info.get('author'),
-                            publication_date=book_info.get('publication_date'),
-                            cover_image_url=book_info.get('cover_image_url')
-                        )
-                    else:
-                        # API情報がない場合は空の書籍レコードを作成
-                        book = Book.objects.using('graphics').create(isbn=isbn)
+                # 既存の書籍レコードを取得（未登録の場合のみAPIから情報を取得）
+                book = get_book(isbn)
 
                 # レビューに書籍を関連付け
                 review.book = book
 
-            review.save(using='graphics')
+            # レビュー集計もシグナル経由で同じトランザクション内で更新する
+            with transaction.atomic(using='graphics'):
+                review.save(using='graphics')
             messages.success(request, '参考書レビューを登録しました。')
             return redirect('graphics:my_reviews')
         else:
@@ -192,7 +179,8 @@ def add_subject_review(request):
             if user_id:
                 review.user_id = user_id
 
-            review.save(using='graphics')
+            with transaction.atomic(using='graphics'):
+                review.save(using='graphics')
             messages.success(request, '科目レビューを登録しました。')
             return redirect('graphics:my_reviews')
         else:
@@ -277,72 +265,26 @@ def search_courses(request):
         if teacher_name:
             courses = courses.filter(teachers__name__icontains=teacher_name)
 
-        # 重複を除去
-        courses = courses.distinct()
+        # 統合科目インデックスから検索条件に一致するものを取得
+        # （科目名・開講学科・開講学期が同じ開講情報は1件にまとめて表示）
+        unified_courses = UnifiedCourse.objects.using('graphics').filter(
+            pk__in=courses.values('unified_course_id')
+        )
 
-        # 科目を統合: 科目名・開講学科・開講学期が同じものを1つにまとめる
-        unified_courses = {}
-        for course in courses:
-            # 学科名のリストを取得してソート（一意なキーを作るため）
-            dept_names = sorted([dept.name for dept in course.departments.all()])
-            dept_key = ','.join(dept_names)
+        # 評価があるもののみを表示フィルタ
+        if has_review:
+            unified_courses = unified_courses.filter(review_count__gt=0)
 
-            # 一意なキー: 科目名 + 学科 + 学期
-            unique_key = f"{course.subject.name}|{dept_key}|{course.semester}"
-
-            if unique_key not in unified_courses:
-                # 最新年度の情報を代表として使用
-                unified_courses[unique_key] = course
-            else:
-                # より新しい年度があれば更新
-                if course.year > unified_courses[unique_key].year:
-                    unified_courses[unique_key] = course
-
-        # 各コースに学科数、平均評価、レビュー数を追加
-        courses_with_ratings = []
-        for unique_key, course in unified_courses.items():
-            course.dept_count = course.departments.count()
-
-            # この科目の全年度のレビューを集計
-            # 科目名・学科・学期が同じすべてのCourseOfferingのレビューを取得
-            dept_names = sorted([dept.name for dept in course.departments.all()])
-            same_courses = CourseOffering.objects.using('graphics').filter(
-                subject__name=course.subject.name,
-                semester=course.semester
-            )
-            # 学科も一致するものだけ
-            for sc in same_courses:
-                sc_dept_names = sorted([dept.name for dept in sc.departments.all()])
-                if sc_dept_names != dept_names:
-                    same_courses = same_courses.exclude(id=sc.id)
-
-            # 科目レビューの平均評価とレビュー数を計算（全年度分）
-            subject_reviews = SubjectReview.objects.using('graphics').filter(
-                course_offering__in=same_courses
-            )
-            review_count = subject_reviews.count()
-            course.review_count = review_count
-
-            if review_count > 0:
-                # 平均評価を計算
-                total_rating = sum(review.rating for review in subject_reviews)
-                course.avg_rating = total_rating / review_count
-            else:
-                course.avg_rating = 0
-
-            # 評価があるもののみを表示フィルタ
-            if has_review:
-                if review_count > 0:
-                    courses_with_ratings.append(course)
-            else:
-                courses_with_ratings.append(course)
-
-        # フィルタ適用後のコースリストを使用
-        courses = courses_with_ratings
-        total_count = len(courses_with_ratings)
+        # 条件に一致した開講情報のうち最新年度のものを代表として表示
+        display_offering = courses.filter(
+            unified_course_id=OuterRef('pk')
+        ).order_by('-year', 'pk').values('pk')[:1]
+        unified_courses = unified_courses.annotate(
+            display_offering_id=Subquery(display_offering)
+        ).order_by('pk')
 
         # ページネーション (1ページあたり10件)
-        paginator = Paginator(courses, 10)
+        paginator = Paginator(unified_courses, 10)
         page = request.GET.get('page', 1)
 
         try:
@@ -353,6 +295,21 @@ def search_courses(request):
         except EmptyPage:
             # ページ番号が範囲外の場合、最後のページを表示
             courses = paginator.page(paginator.num_pages)
+
+        total_count = paginator.count
+
+        # 表示中のページ分だけ開講情報を取得し、学科数・平均評価・レビュー数を追加
+        offerings = CourseOffering.objects.using('graphics').select_related('subject').prefetch_related(
+            'departments'
+        ).in_bulk([unified.display_offering_id for unified in courses.object_list])
+        courses_with_ratings = []
+        for unified in courses.object_list:
+            course = offerings[unified.display_offering_id]
+            course.dept_count = len(course.departments.all())
+            course.review_count = unified.review_count
+            course.avg_rating = unified.avg_rating
+            courses_with_ratings.append(course)
+        courses.object_list = courses_with_ratings
     else:
         total_count = 0
 
@@ -414,8 +371,8 @@ def isbn_lookup(request):
     if len(isbn) != 13 or not isbn.isdigit():
         return JsonResponse({'success': False, 'error': 'ISBNコードは13桁の数字で入力してください'})
 
-    # OpenBD APIから情報を取得
-    book_info = fetch_book_info_from_openbd(isbn)
+    # キャッシュ（LRU → Bookテーブル）になければOpenBD APIから情報を取得
+    book_info = get_book_info(isbn)
 
     if book_info:
         return JsonResponse({
@@ -520,7 +477,7 @@ def course_detail(request, subject_name, semester):
     courses = CourseOffering.objects.using('graphics').filter(
         subject__name=subject_name,
         semester=semester
-    ).order_by('-year')  # 新しい年度順
+    ).select_related('subject').prefetch_related('teachers', 'departments').order_by('-year')  # 新しい年度順
 
     if not courses.exists():
         messages.error(request, '科目が見つかりませんでした。')
@@ -529,6 +486,12 @@ def course_detail(request, subject_name, semester):
     # 最新年度の情報を代表として使用
     latest_course = courses.first()
 
+    # 開講情報ごとのレビュー集計（年度別件数・全体件数に使用）
+    stats_by_offering = {
+        stats.course_offering_id: stats
+        for stats in SubjectReviewStats.objects.using('graphics').filter(course_offering__in=courses)
+    }
+
     # 過去年度の担当教員情報を収集
     past_teachers_by_year = []
     for course in courses:
@@ -540,6 +503,13 @@ def course_detail(request, subject_name, semester):
                 'teachers': teacher_names
             })
 
+    # 年度別レビュー件数（開講情報ごとの集計行を年度で合算）
+    years = sorted(list({c.year for c in courses}), reverse=True)
+    year_counts = {}
+    for course in courses:
+        stats = stats_by_offering.get(course.id)
+        year_counts[course.year] = year_counts.get(course.year, 0) + (stats.review_count if stats else 0)
+
     # この科目の全年度のレビューを取得
     subject_reviews_qs = SubjectReview.objects.using('graphics').filter(
         course_offering__in=courses
@@ -551,6 +521,9 @@ def course_detail(request, subject_name, semester):
     # selected_year が数値で来ている場合のみフィルタを適用
     if selected_year and str(selected_year).isdigit():
         subject_reviews_qs = subject_reviews_qs.filter(course_offering__year=int(selected_year))
+        subject_reviews_count = year_counts.get(int(selected_year), 0)
+    else:
+        subject_reviews_count = sum(year_counts.values())
 
     # ソート（rating_high, rating_low, default: 作成日時順）
     selected_sort = request.GET.get('sort', '')
@@ -569,56 +542,26 @@ def course_detail(request, subject_name, semester):
     except EmptyPage:
         subject_reviews = subject_paginator.page(subject_paginator.num_pages)
 
-    # この科目に関連する参考書レビューを取得
-    book_reviews = BookReview.objects.using('graphics').filter(
-        subject=latest_course.subject.name
-    ).order_by('-created_at')
-
-    # 書籍ごとにグループ化
-    books_dict = {}
-    for review in book_reviews:
-        if review.book:
-            isbn = review.book.isbn
-            if isbn not in books_dict:
-                books_dict[isbn] = {
-                    'book': review.book,
-                    'review_count': 0,
-                    'avg_rating': 0,
-                    'total_rating': 0,
-                    'latest_created_at': None,
-                }
-            books_dict[isbn]['review_count'] += 1
-            # rating が 0 以上の場合のみ集計（スター未選択を除外）
-            if review.rating > 0:
-                books_dict[isbn]['total_rating'] += review.rating
-            # 最新のレビュー日時を記録
-            created_at = getattr(review, 'created_at', None)
-            if created_at:
-                cur = books_dict[isbn].get('latest_created_at')
-                if not cur or created_at > cur:
-                    books_dict[isbn]['latest_created_at'] = created_at
-
-    # 平均評価を計算
-    books_with_reviews = []
-    for isbn, data in books_dict.items():
-        data['avg_rating'] = data['total_rating'] / data['review_count'] if data['review_count'] > 0 else 0
-        books_with_reviews.append(data)
-
-    # デフォルト: 新着順（最新レビュー日時の降順）
-    books_with_reviews.sort(key=lambda x: x.get('latest_created_at') or datetime.min, reverse=True)
+    # この科目に関連する参考書の集計を取得（書籍×科目名ごとに1行）
+    # 平均評価はスター未選択（rating=0）を除いた合計をレビュー数で割る
+    books_with_reviews = BookReviewStats.objects.using('graphics').filter(
+        subject=latest_course.subject.name,
+        review_count__gt=0,
+    ).select_related('book').annotate(
+        avg_rating=Cast('rating_sum', FloatField()) / F('review_count')
+    )
 
     # 参考書リストのソート（GETパラメータ 'book_sort'）
     # options: avg_high, avg_low, count_high, count_low
+    # デフォルト: 新着順（最新レビュー日時の降順）
     book_sort = request.GET.get('book_sort', '')
-    if book_sort:
-        if book_sort == 'avg_high':
-            books_with_reviews.sort(key=lambda x: (x.get('avg_rating', 0)), reverse=True)
-        elif book_sort == 'avg_low':
-            books_with_reviews.sort(key=lambda x: (x.get('avg_rating', 0)))
-        elif book_sort == 'count_high':
-            books_with_reviews.sort(key=lambda x: (x.get('review_count', 0)), reverse=True)
-        elif book_sort == 'count_low':
-            books_with_reviews.sort(key=lambda x: (x.get('review_count', 0)))
+    book_orderings = {
+        'avg_high': ('-avg_rating', '-last_reviewed_at'),
+        'avg_low': ('avg_rating', '-last_reviewed_at'),
+        'count_high': ('-review_count', '-last_reviewed_at'),
+        'count_low': ('review_count', '-last_reviewed_at'),
+    }
+    books_with_reviews = books_with_reviews.order_by(*book_orderings.get(book_sort, ('-last_reviewed_at',)))
 
     # ページネーション（参考書） - ソート後にページネート
     books_paginator = Paginator(books_with_reviews, 5)
@@ -638,14 +581,6 @@ def course_detail(request, subject_name, semester):
     departments = latest_course.departments.all()
     department_names = ', '.join([dept.name for dept in departments])
 
-    # 年度別レビュー件数と最新年度
-    years = sorted(list({c.year for c in courses}), reverse=True)
-    year_counts = {}
-    for y in years:
-        # 当該年度に該当するCourseOfferingのレビュー数を集計
-        year_offerings = courses.filter(year=y)
-        year_counts[y] = SubjectReview.objects.using('graphics').filter(course_offering__in=year_offerings).count()
-
     # 最新年度（courses が存在する前提で latest_course.year を使用）
     latest_year = latest_course.year if latest_course else (years[0] if years else None)
 
@@ -659,8 +594,8 @@ def course_detail(request, subject_name, semester):
         'past_teachers_by_year': past_teachers_by_year,  # 過去年度の担当教員
         'subject_reviews': subject_reviews,
         'books_with_reviews': books_with_reviews_paginated,
-        'subject_reviews_count': subject_reviews_qs.count(),
-        'books_count': len(books_with_reviews),
+        'subject_reviews_count': subject_reviews_count,
+        'books_count': books_paginator.count,
         # 年度選択用（テンプレートで利用）
         'year_choices': years,
         'year_options': year_options,
@@ -704,13 +639,12 @@ def book_detail(request, isbn):
         reviews_qs = reviews_qs.order_by('-created_at')
 
     # 平均評価を計算（rating > 0 のレビューのみ）
-    total_rating = 0
-    rating_count = 0
-    for review in reviews_qs:
-        if review.rating > 0:
-            total_rating += review.rating
-            rating_count += 1
-    avg_rating = total_rating / rating_count if rating_count > 0 else 0
+    # 書籍×科目名ごとの集計行を合算するため、レビュー件数によらず読み込むのは数行
+    stats = BookReviewStats.objects.using('graphics').filter(book=book).aggregate(
+        review_count=Sum('review_count'), rating_sum=Sum('rating_sum'), rated_count=Sum('rated_count')
+    )
+    rating_count = stats['rated_count'] or 0
+    avg_rating = stats['rating_sum'] / rating_count if rating_count > 0 else 0
 
     # ページネーション（参考書レビュー）
     paginator = Paginator(reviews_qs, 5)
@@ -725,7 +659,7 @@ def book_detail(request, isbn):
     context = {
         'book': book,
         'reviews': reviews,
-        'reviews_count': reviews_qs.count(),
+        'reviews_count': stats['review_count'] or 0,
         'avg_rating': avg_rating,
         'course_id': course_id,  # 遷移元のcourse_idをテンプレートに渡す
         'book_selected_sort': book_selected_sort,
@@ -793,7 +727,8 @@ def edit_book_review(request, review_id):
         form = BookReviewEditForm(request.POST, instance=review)
         if form.is_valid():
             updated_review = form.save(commit=False)
-            updated_review.save(using='graphics')
+            with transaction.atomic(using='graphics'):
+                updated_review.save(using='graphics')
             messages.success(request, '参考書レビューを更新しました。')
             return redirect('graphics:my_reviews')
     else:
@@ -824,7 +759,8 @@ def edit_subject_review(request, review_id):
         form = SubjectReviewEditForm(request.POST, instance=review)
         if form.is_valid():
             updated_review = form.save(commit=False)
-            updated_review.save(using='graphics')
+            with transaction.atomic(using='graphics'):
+                updated_review.save(using='graphics')
             messages.success(request, '科目レビューを更新しました。')
             return redirect('graphics:my_reviews')
     else:
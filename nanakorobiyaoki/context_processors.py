@@ -1,34 +1,32 @@
-from .models import MyPage, Message, Post, CommunityReadStatus
+from pbl_project.context_processors import LazyValue
+
+from .models import MyPage, Message
+from .unread import joined_communities_with_unread
 
 def nanakorobiyaoki_context(request):
-    if 'user_id' in request.session:
-        try:
-            user = MyPage.objects.get(user_id=request.session['user_id'])
-            joined_communities = list(user.communities.all().order_by('-created_at'))
-            unread_count = Message.objects.filter(receiver=user, is_read=False).count()
-            
-            # 各コミュニティの未読投稿数を計算
-            for community in joined_communities:
-                read_status = CommunityReadStatus.objects.filter(user=user, community=community).first()
-                if read_status:
-                    community.unread_posts_count = Post.objects.filter(
-                        community=community,
-                        created_at__gt=read_status.last_read_at
-                    ).exclude(author=user).count()
-                else:
-                    # 一度も見ていない場合は全ての投稿（自分以外）を未読とする
-                    community.unread_posts_count = Post.objects.filter(
-                        community=community
-                    ).exclude(author=user).count()
+    """
+    ナビゲーション（ログインユーザー・参加コミュニティと未読投稿数・未読メッセージ数）の値
+    /nanakorobiyaoki/ のページだけで呼ばれ（settings.APP_CONTEXT_PROCESSORS）、
+    テンプレートが使った値だけを読み込む
+    """
+    user_id = request.session.get('user_id')
+    login_user = LazyValue(lambda: MyPage.objects.filter(user_id=user_id).first() if user_id else None)
+
+    def joined_communities():
+        user = login_user()
+        if user is None:
+            return []
+        # 未読投稿数も含めて 1 クエリ
+        return joined_communities_with_unread(user)
+
+    def unread_messages_count():
+        user = login_user()
+        if user is None:
+            return 0
+        return Message.objects.filter(receiver=user, is_read=False).count()
 
-            return {
-                'login_user': user,
-                'joined_communities': joined_communities,
-                'unread_messages_count': unread_count,
-            }
-        except MyPage.DoesNotExist:
-            pass
     return {
-        'joined_communities': [],
-        'unread_messages_count': 0,
+        'login_user': login_user,
+        'joined_communities': LazyValue(joined_communities),
+        'unread_messages_count': LazyValue(unread_messages_count),
     }
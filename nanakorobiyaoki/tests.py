@@ -1,3 +1,86 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.template import engines
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from .models import Community, CommunityReadStatus, Message, MyPage, Post
+from .unread import joined_communities_with_unread
+
+
+class NavigationContextTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = MyPage.objects.create(name='Alice', user_id='100001', email='a@example.com', password='x')
+        other = MyPage.objects.create(name='Bob', user_id='100002', email='b@example.com', password='x')
+        community = Community.objects.create(name='Lab')
+        community.members.add(self.user, other)
+        Post.objects.create(community=community, author=other, content='Hello')
+        Message.objects.create(sender=other, receiver=self.user, content='Hi')
+
+    def render(self, path, source):
+        request = RequestFactory().get(path)
+        request.session = {'user_id': self.user.user_id}
+        return engines['django'].from_string(source).render(request=request)
+
+    def test_other_apps_pages_do_not_query(self):
+        # team_UD も同じ session['user_id'] を使うが、nanakorobiyaoki のナビゲーションは読み込まない
+        with self.assertNumQueries(0, using='nanakorobiyaoki'):
+            html = self.render('/team_UD/', '[{{ unread_messages_count }}]{{ login_user }}')
+        self.assertEqual(html, '[]')
+
+    def test_values_are_loaded_only_when_used(self):
+        with self.assertNumQueries(0, using='nanakorobiyaoki'):
+            self.render('/nanakorobiyaoki/home/', 'no navigation')
+
+        with self.assertNumQueries(2, using='nanakorobiyaoki'):
+            html = self.render(
+                '/nanakorobiyaoki/home/',
+                '{% if unread_messages_count > 0 %}{{ unread_messages_count }}{% endif %} {{ login_user.name }}',
+            )
+        self.assertEqual(html, '1 Alice')
+
+    def test_joined_communities_have_unread_counts(self):
+        html = self.render(
+            '/nanakorobiyaoki/home/',
+            '{% for c in joined_communities %}{{ c.name }}:{{ c.unread_posts_count }}{% endfor %}',
+        )
+        self.assertEqual(html, 'Lab:1')
+
+
+class UnreadCountTest(TestCase):
+    databases = '__all__'
+
+    def test_counts_unread_posts_for_all_communities_in_one_query(self):
+        now = timezone.now()
+        user = MyPage.objects.create(name='Alice', user_id='100001', email='a@example.com', password='x')
+        other = MyPage.objects.create(name='Bob', user_id='100002', email='b@example.com', password='x')
+
+        def community(name, posts, read_at=None, days_ago=0):
+            c = Community.objects.create(name=name)
+            Community.objects.filter(pk=c.pk).update(created_at=now - timedelta(days=days_ago))
+            c.members.add(user, other)
+            for author, hours_ago in posts:
+                post = Post.objects.create(community=c, author=author, content='post')
+                Post.objects.filter(pk=post.pk).update(created_at=now - timedelta(hours=hours_ago))
+            if read_at is not None:
+                status = CommunityReadStatus.objects.create(user=user, community=c)
+                CommunityReadStatus.objects.filter(pk=status.pk).update(last_read_at=now - timedelta(hours=read_at))
+            return c
+
+        # 最終閲覧より新しい他人の投稿だけが未読（自分の投稿と、読んだ後の投稿は数えない）
+        community('Read', [(other, 5), (other, 1), (user, 1)], read_at=3, days_ago=2)
+        # 一度も見ていないコミュニティは他人の投稿がすべて未読
+        community('Never read', [(other, 5), (other, 4), (user, 1)], days_ago=1)
+        community('Empty', [], read_at=1)
+        # 参加していないコミュニティは含めない
+        Community.objects.create(name='Not joined')
+
+        with self.assertNumQueries(1, using='nanakorobiyaoki'):
+            communities = joined_communities_with_unread(user)
+
+        self.assertEqual(
+            [(c.name, c.unread_posts_count) for c in communities],
+            [('Empty', 0), ('Never read', 2), ('Read', 1)],
+        )
@@ -0,0 +1,33 @@
+"""
+コミュニティの未読投稿数
+
+以前のナビゲーションは参加コミュニティごとに CommunityReadStatus の取得と Post の COUNT を行っており、
+参加コミュニティ数 N に対して 2N 回のクエリが発生していた。
+ここでは最終閲覧日時（CommunityReadStatus.last_read_at）を相関サブクエリで取り、
+それより新しい自分以外の投稿をコミュニティごとに 1 回の GROUP BY で数える。
+"""
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+
+from .models import CommunityReadStatus
+
+
+def joined_communities_with_unread(user):
+    """
+    ユーザーが参加しているコミュニティ（作成日時の新しい順）に、未読投稿数 unread_posts_count を付けて返す
+    一度も見ていないコミュニティは、自分以外の全ての投稿を未読とする
+
+    Returns:
+        list: Community のリスト（1 クエリ）
+    """
+    last_read = CommunityReadStatus.objects.filter(
+        user=user,
+        community=OuterRef('pk')
+    ).values('last_read_at')[:1]
+
+    unread = (Q(last_read_at__isnull=True) | Q(posts__created_at__gt=F('last_read_at'))) & ~Q(posts__author=user)
+    return list(
+        user.communities.annotate(last_read_at=Subquery(last_read))
+        .annotate(unread_posts_count=Count('posts', filter=unread))
+        .order_by('-created_at')
+    )
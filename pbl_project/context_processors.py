@@ -0,0 +1,56 @@
+"""
+アプリごとの context processor
+
+settings.TEMPLATES に各チームの context processor を並べると、全アプリのすべてのページの描画で実行され、
+関係のないアプリのページでもクエリが発生する（セッションのキーが他のアプリと同じだとなおさら）。
+
+ここでは settings.APP_CONTEXT_PROCESSORS にアプリの URL の接頭辞ごとに context processor を登録し、
+app_context がその接頭辞のページを描画するときだけ呼ぶ。
+各 context processor は値を LazyValue で包んで返し、テンプレートが変数を使ったときに初めて DB を読む。
+
+    APP_CONTEXT_PROCESSORS = {
+        "/nanakorobiyaoki/": ["nanakorobiyaoki.context_processors.nanakorobiyaoki_context"],
+    }
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class LazyValue:
+    """
+    テンプレートで初めて使われたときに計算し、結果を覚えておく値
+
+    Django のテンプレートは変数が呼び出し可能なら呼び出した結果を使うので、
+    {% if %} や {% for %}、フィルタからは計算済みの値として見える。
+    Python から使う場合は呼び出して値を取り出す。
+    """
+
+    def __init__(self, func):
+        self._func = func
+        self._evaluated = False
+        self._value = None
+
+    def __call__(self):
+        if not self._evaluated:
+            self._value = self._func()
+            self._evaluated = True
+            self._func = None
+        return self._value
+
+
+@lru_cache(maxsize=None)
+def _load(path):
+    return import_string(path)
+
+
+def app_context(request):
+    """リクエストの URL が接頭辞に一致するアプリの context processor だけを呼ぶ"""
+    context = {}
+    for prefix, processors in getattr(settings, 'APP_CONTEXT_PROCESSORS', {}).items():
+        if request.path_info.startswith(prefix):
+            for path in processors:
+                context.update(_load(path)(request))
+    return context
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -62,9 +64,13 @@ INSTALLED_APPS = [
     'team_giryulink',
     'takenoko',
     'teachers',
+    'perf',  # クエリ数・応答時間の計測（PERF_PROFILING で有効化）
+    'thumbnails',  # アップロード画像の一覧用サムネイル（team_giryulink・takenoko）
 ]
 
 MIDDLEWARE = [
+    # 先頭に置いてセッション等を含む全クエリを計測する（無効時は読み込まれない）
+    "perf.middleware.QueryProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "h34vvy_u53rzz.middleware.H34vvySessionMiddleware",
@@ -88,13 +94,19 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
-                "nanakorobiyaoki.context_processors.nanakorobiyaoki_context",
-                "takenoko.context_processors.takenoko_user",
+                # アプリ固有の context processor は APP_CONTEXT_PROCESSORS に登録する
+                "pbl_project.context_processors.app_context",
             ],
         },
     },
 ]
 
+# アプリの URL の接頭辞ごとの context processor（そのアプリのページを描画するときだけ呼ばれる）
+APP_CONTEXT_PROCESSORS = {
+    "/nanakorobiyaoki/": ["nanakorobiyaoki.context_processors.nanakorobiyaoki_context"],
+    "/takenoko/": ["takenoko.context_processors.takenoko_user"],
+}
+
 WSGI_APPLICATION = "pbl_project.wsgi.application"
 
 
@@ -206,6 +218,11 @@ DATABASES = {
     'team_terrace': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'team_terrace' / 'db.sqlite3',
+        # 同時書き込みのテストで本番と同じファイルのロックで動かすため、テストDBもファイルにする
+        # （同時に走る別のテスト実行と共有しないよう、一時ディレクトリに実行ごとの名前で作る）
+        'TEST': {
+            'NAME': Path(tempfile.gettempdir()) / f'pbl_team_terrace_test_{os.getpid()}.sqlite3',
+        },
     },
     'teachers': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -264,6 +281,10 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# 一覧用サムネイルの長辺（px）と WebP の画質（thumbnails.derivatives）
+THUMBNAILS_SIZE = 512
+THUMBNAILS_QUALITY = 80
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
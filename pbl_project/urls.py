@@ -48,6 +48,7 @@ urlpatterns = [
     path('team_giryulink/', include('team_giryulink.urls')),
     path('takenoko/', include('takenoko.urls')), 
     path('teachers/', include('teachers.urls')),
+    path('perf/', include('perf.urls')),
     path("", lambda request: redirect("team_giryulink:index")),
     path("admin/", admin.site.urls),
     path("team_giryulink/", include("team_giryulink.urls")),
@@ -0,0 +1,170 @@
+# perf/bench.py
+"""
+チームごとの主要エンドポイントの負荷テスト（manage.py bench から使う）
+
+テスト用のDB（各エイリアスの test_ DB）を作ってシナリオごとに合成データを投入し、
+Django のテストクライアントで同じエンドポイントを繰り返し叩いて
+レイテンシ（p50/p95/p99）と 1 リクエストあたりのクエリ数を測る。
+本番・開発用の db.sqlite3 には触れない。
+
+シナリオは perf/bench_scenarios.py に @scenario で登録する。
+"""
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.test import Client
+
+from .recorder import QueryRecorder
+from .store import percentile
+
+# --scale で指定できるデータ量（シナリオの主テーブルの行数）
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+
+# 既定の許容幅：p95 がベースラインの 1.2 倍を超え、かつ差が MIN_REGRESSION_MS 以上なら劣化とみなす
+DEFAULT_TOLERANCE = 0.2
+MIN_REGRESSION_MS = 1.0
+
+
+@dataclass
+class Endpoint:
+    """計測するリクエスト 1 種類"""
+    name: str
+    path: str
+    method: str = "get"
+    data: dict = None
+    # POST の本文を JSON で送るか（False ならフォーム）
+    json: bool = True
+
+
+@dataclass
+class Setup:
+    """シナリオの seed が返す計測条件"""
+    endpoints: list
+    # テストクライアントのセッションに入れる値（各チームのログイン状態）
+    session: dict = field(default_factory=dict)
+    # 計測後に呼ぶ後片付け（seed で差し替えた設定やスタブを戻す）
+    teardown: callable = None
+
+
+@dataclass
+class Scenario:
+    name: str
+    # 使うDBエイリアス（セッション用の default は常に含める）
+    databases: tuple
+    seed: callable
+
+
+SCENARIOS = {}
+
+
+def scenario(name, databases):
+    """seed(rows) -> Setup をシナリオとして登録するデコレータ"""
+    def decorator(seed):
+        SCENARIOS[name] = Scenario(name, tuple(databases), seed)
+        return seed
+    return decorator
+
+
+def required_databases(scenarios):
+    aliases = {"default"}
+    for s in scenarios:
+        aliases.update(s.databases)
+    return aliases
+
+
+def make_client(session):
+    client = Client(raise_request_exception=False)
+    if session:
+        s = client.session
+        s.update(session)
+        s.save()
+    return client
+
+
+def measure(client, endpoint, requests, warmup=1):
+    """
+    1 エンドポイントを繰り返し叩いて計測する
+
+    Returns:
+        dict: {requests, p50_ms, p95_ms, p99_ms, avg_ms, avg_queries, max_queries, statuses}
+    """
+    call = getattr(client, endpoint.method)
+    kwargs = {}
+    if endpoint.data is not None:
+        kwargs["data"] = endpoint.data
+        if endpoint.method != "get" and endpoint.json:
+            kwargs["content_type"] = "application/json"
+
+    for _ in range(warmup):
+        call(endpoint.path, **kwargs)
+
+    durations, queries, statuses = [], [], Counter()
+    for _ in range(requests):
+        recorder = QueryRecorder()
+        with recorder.install():
+            start = time.perf_counter()
+            response = call(endpoint.path, **kwargs)
+            elapsed = time.perf_counter() - start
+        durations.append(elapsed * 1000)
+        queries.append(recorder.query_count)
+        statuses[response.status_code] += 1
+
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(durations, 50), 3),
+        "p95_ms": round(percentile(durations, 95), 3),
+        "p99_ms": round(percentile(durations, 99), 3),
+        "avg_ms": round(sum(durations) / requests, 3),
+        "avg_queries": round(sum(queries) / requests, 2),
+        "max_queries": max(queries),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def run_scenario(s, rows, requests, warmup=1):
+    """
+    シナリオのデータを投入して全エンドポイントを計測する
+
+    Returns:
+        dict: {"<シナリオ>:<エンドポイント>": measure() の結果}
+    """
+    setup = s.seed(rows)
+    try:
+        client = make_client(setup.session)
+        return {
+            f"{s.name}:{endpoint.name}": measure(client, endpoint, requests, warmup)
+            for endpoint in setup.endpoints
+        }
+    finally:
+        if setup.teardown is not None:
+            setup.teardown()
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    ベースラインと比べて劣化したエンドポイントを返す
+
+    クエリ数は決定的なので 1 件でも増えたら劣化、
+    p95 は (1 + tolerance) 倍を超え、かつ MIN_REGRESSION_MS 以上遅くなったら劣化とする。
+    ベースラインに無いエンドポイントは比較しない。
+
+    Args:
+        results (dict): 今回の計測結果（run_scenario の結果をまとめたもの）
+        baseline (dict): 保存済みの計測結果
+        tolerance (float): p95 の許容幅
+
+    Returns:
+        list: (エンドポイント, 項目, ベースライン値, 今回の値) のタプル
+    """
+    regressions = []
+    for key, current in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if current["avg_queries"] > base["avg_queries"]:
+            regressions.append((key, "avg_queries", base["avg_queries"], current["avg_queries"]))
+        limit = base["p95_ms"] * (1 + tolerance)
+        if current["p95_ms"] > limit and current["p95_ms"] - base["p95_ms"] >= MIN_REGRESSION_MS:
+            regressions.append((key, "p95_ms", base["p95_ms"], current["p95_ms"]))
+    return regressions
@@ -0,0 +1,609 @@
+# perf/bench_scenarios.py
+"""
+manage.py bench のシナリオ（チームごとの合成データ投入と計測するエンドポイント）
+
+seed(rows) は rows 件規模のデータを bulk_create で投入し、計測条件（Setup）を返す。
+bulk_create ではシグナルが動かないので、非正規化カラムや集計テーブルは
+各チームの rebuild_* 関数でまとめて作り直す。
+"""
+import random
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.test import override_settings
+from django.utils import timezone
+
+from .bench import Endpoint, Setup, scenario
+
+BATCH_SIZE = 2000
+
+# 実行ごとに同じデータになるよう乱数を固定する
+SEED = 2025
+
+
+# =========================
+# shiokara
+# =========================
+
+@scenario("shiokara", databases=["shiokara"])
+def seed_shiokara(rows):
+    """企業 rows/10 社・口コミ rows 件"""
+    from shiokara.models import Company, CompanyReview, Department, Person
+    from shiokara.search import AREA_KEYWORDS, rebuild_company_search
+    from shiokara.sidebar import invalidate_sidebar
+
+    db = "shiokara"
+    rng = random.Random(SEED)
+    areas = [word for words in AREA_KEYWORDS.values() for word in words] + ["北海道", "福岡"]
+
+    departments = Department.objects.using(db).bulk_create([
+        Department(name=f"{i}系", short_name=f"d{i}") for i in range(1, 9)
+    ])
+    companies = Company.objects.using(db).bulk_create(
+        [
+            Company(
+                name=f"サンプル工業{i}",
+                description=f"{rng.choice(['機械', '電気', '情報', '化学'])}系の製品を扱う企業です。",
+                area=" ".join(rng.sample(areas, 2)),
+                avg_annual_income=rng.randint(400, 900),
+                tut_recommendation=rng.random() < 0.3,
+                oncampus_briefing=rng.choice(["", "機械", "情報"]),
+            )
+            for i in range(max(rows // 10, 10))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Through = Company.departments.through
+    Through.objects.using(db).bulk_create(
+        [
+            Through(company_id=company.pk, department_id=dept.pk)
+            for company in companies
+            for dept in rng.sample(departments, rng.randint(1, 3))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    CompanyReview.objects.using(db).bulk_create(
+        [
+            CompanyReview(
+                company=rng.choice(companies),
+                grade="M1",
+                department_name="情報・知能工学系",
+                comment="説明会の雰囲気が良かった。",
+                rating=rng.randint(1, 5),
+            )
+            for _ in range(rows)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_company_search(using=db)
+    invalidate_sidebar()
+
+    person = Person.objects.using(db).create(
+        student_id="B000000", course="B", grade=4, department_name="情報・知能工学系",
+        lab_field="情報", password="!", points=10,
+    )
+    company = companies[0]
+    return Setup(
+        session={"person_id": person.pk},
+        endpoints=[
+            Endpoint("department_list", "/shiokara/"),
+            Endpoint("search_all", "/shiokara/search/"),
+            Endpoint("search_keyword", "/shiokara/search/", data={"q": "サンプル工業1"}),
+            Endpoint("search_filtered", "/shiokara/search/",
+                     data={"q": "情報", "dept": ["d1", "d2"], "area": "tokai", "sort": "review_count"}),
+            # 2回目以降は閲覧済みなのでポイントは減らない
+            Endpoint("company_detail", f"/shiokara/company/{company.pk}/"),
+        ],
+    )
+
+
+# =========================
+# graphics
+# =========================
+
+@scenario("graphics", databases=["graphics"])
+def seed_graphics(rows):
+    """開講情報 rows/10 件・科目レビュー rows 件"""
+    from graphics.course_index import rebuild_unified_courses
+    from graphics.models import (
+        CourseOffering, Department, GraphicsUser, Subject, SubjectReview, Teacher,
+    )
+    from graphics.review_stats import rebuild_review_stats
+
+    db = "graphics"
+    rng = random.Random(SEED)
+    offerings_count = max(rows // 10, 10)
+    semesters = ["前期", "後期", "前期1", "後期2", "通年"]
+
+    subjects = Subject.objects.using(db).bulk_create(
+        [Subject(name=f"科目{i}") for i in range(offerings_count // 4 + 1)], batch_size=BATCH_SIZE,
+    )
+    teachers = Teacher.objects.using(db).bulk_create(
+        [Teacher(name=f"教員{i}") for i in range(50)], batch_size=BATCH_SIZE,
+    )
+    departments = Department.objects.using(db).bulk_create(
+        [Department(name=f"{i}系") for i in range(1, 6)],
+    )
+    offerings = CourseOffering.objects.using(db).bulk_create(
+        [
+            CourseOffering(
+                subject=subjects[i % len(subjects)],
+                year=2021 + i % 5,
+                semester=rng.choice(semesters),
+                is_required=rng.random() < 0.2,
+                grade=f"{rng.randint(1, 4)}年",
+            )
+            for i in range(offerings_count)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    TeacherThrough = CourseOffering.teachers.through
+    TeacherThrough.objects.using(db).bulk_create(
+        [TeacherThrough(courseoffering_id=o.pk, teacher_id=rng.choice(teachers).pk) for o in offerings],
+        batch_size=BATCH_SIZE,
+    )
+    DepartmentThrough = CourseOffering.departments.through
+    DepartmentThrough.objects.using(db).bulk_create(
+        [DepartmentThrough(courseoffering_id=o.pk, department_id=rng.choice(departments).pk) for o in offerings],
+        batch_size=BATCH_SIZE,
+    )
+
+    user = GraphicsUser(email="bench@example.com", nickname="bench")
+    user.set_password("bench")
+    user.save(using=db)
+    SubjectReview.objects.using(db).bulk_create(
+        [
+            SubjectReview(
+                user=user,
+                course_offering=rng.choice(offerings),
+                review="課題が多いが力がつく。",
+                rating=rng.randint(0, 5),
+            )
+            for _ in range(rows)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_unified_courses(using=db)
+    rebuild_review_stats(using=db)
+
+    return Setup(
+        session={"graphics_user_id": str(user.user_id), "graphics_user_nickname": user.nickname},
+        endpoints=[
+            Endpoint("index", "/graphics/"),
+            Endpoint("search_courses", "/graphics/search/",
+                     data={"grade": "全体", "department": "全体", "semester": "全", "required": "全体"}),
+            Endpoint("search_filtered", "/graphics/search/",
+                     data={"department": "1系", "semester": "前", "subject_name": "科目1", "has_review": "1"}),
+            Endpoint("subject_autocomplete", "/graphics/api/subject-autocomplete/", data={"q": "科目1"}),
+            Endpoint("teacher_autocomplete", "/graphics/api/teacher-autocomplete/", data={"q": "教員"}),
+        ],
+    )
+
+
+# =========================
+# team_tansaibou
+# =========================
+
+@scenario("team_tansaibou", databases=["team_tansaibou"])
+def seed_tansaibou(rows):
+    """取引 rows 件（明細は 1〜3 件ずつ）を直近 2 年の学園祭期間に分散"""
+    from team_tansaibou.models import Member, Product, Store, Transaction, TransactionItem
+    from team_tansaibou.sales_rollup import rebuild_sales_rollups
+    from team_tansaibou.views import SESSION_KEY
+
+    db = "team_tansaibou"
+    rng = random.Random(SEED)
+
+    store = Store(username="bench", name="ベンチ店")
+    store.set_password("bench")
+    store.save(using=db)
+    member = Member.objects.using(db).create(store=store, name="担当者")
+    products = Product.objects.using(db).bulk_create([
+        Product(store=store, name=f"商品{i}", current_price=Decimal(100 + 50 * (i % 6)), stock=rows)
+        for i in range(20)
+    ])
+
+    now = timezone.now()
+    days = [now - timedelta(days=d) for d in (0, 1, 365, 366)]
+    transactions = Transaction.objects.using(db).bulk_create(
+        [
+            Transaction(
+                store=store,
+                transaction_date=rng.choice(days) - timedelta(minutes=rng.randint(0, 8 * 60)),
+                total_amount=Decimal(0),
+                recorded_by=member,
+            )
+            for _ in range(rows)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    items = []
+    for transaction in transactions:
+        for product in rng.sample(products, rng.randint(1, 3)):
+            quantity = rng.randint(1, 3)
+            items.append(TransactionItem(
+                transaction=transaction, product=product, quantity=quantity,
+                price_at_sale=product.current_price, subtotal=product.current_price * quantity,
+            ))
+            transaction.total_amount += product.current_price * quantity
+    TransactionItem.objects.using(db).bulk_create(items, batch_size=BATCH_SIZE)
+    Transaction.objects.using(db).bulk_update(transactions, ["total_amount"], batch_size=BATCH_SIZE)
+    rebuild_sales_rollups(using=db)
+
+    api = "/team_tansaibou/api/dashboard"
+    return Setup(
+        session={SESSION_KEY: store.pk},
+        endpoints=[
+            Endpoint("today_sales", f"{api}/today-sales/"),
+            Endpoint("hourly_stats", f"{api}/hourly-stats/"),
+            Endpoint("yearly_comparison", f"{api}/yearly-comparison/"),
+            Endpoint("daily_comparison", f"{api}/daily-comparison/"),
+            Endpoint("product_ranking", f"{api}/product-ranking/"),
+            Endpoint("stock_prediction", f"{api}/stock-prediction/"),
+            Endpoint("snapshot", f"{api}/snapshot/"),
+        ],
+    )
+
+
+# =========================
+# team_terrace
+# =========================
+
+@scenario("team_terrace", databases=["team_terrace"])
+def seed_terrace(rows):
+    """1 ルームにメッセージ rows 件・リアクション rows/10 件"""
+    from team_terrace.models import ChatMessage, ChatRoom, Reaction
+
+    db = "team_terrace"
+    rng = random.Random(SEED)
+
+    room = ChatRoom.objects.using(db).create(title="ベンチ用ルーム")
+    messages = ChatMessage.objects.using(db).bulk_create(
+        [
+            ChatMessage(
+                room=room,
+                content=f"メッセージ{i}",
+                is_question=rng.random() < 0.1,
+                like_count=rng.choice([0, 0, 0, 1, 2, 5]),
+            )
+            for i in range(rows)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Reaction.objects.using(db).bulk_create(
+        [Reaction(room=room, reaction_type=rng.choice(["👏", "👍", "❓"])) for _ in range(max(rows // 10, 1))],
+        batch_size=BATCH_SIZE,
+    )
+
+    api = f"/team_terrace/api/room/{room.pk}"
+    # ポーリング時の差分取得を想定して、末尾 50 件より後ろを取る
+    recent = messages[-min(50, len(messages))].pk
+    return Setup(
+        endpoints=[
+            Endpoint("messages_all", f"{api}/messages/list/"),
+            Endpoint("messages_after", f"{api}/messages/list/", data={"after_id": recent}),
+            Endpoint("reactions", f"{api}/reactions/list/"),
+            Endpoint("likes", f"{api}/likes/"),
+            Endpoint("post_message", f"{api}/messages/", method="post", data={"content": "ベンチ"}),
+            Endpoint("post_reaction", f"{api}/reactions/", method="post", data={"reaction_type": "👏"}),
+            Endpoint("post_like", f"/team_terrace/api/messages/{messages[-1].pk}/like/", method="post"),
+        ],
+    )
+
+
+# =========================
+# team_TeXTeX
+# =========================
+
+class StubCompiler:
+    """
+    TeX の代わりに、メインファイルの内容をそのまま PDF として書き出すコンパイラ
+    計測する環境に TeX がなくても、スナップショットやキャッシュの処理を測れるようにする
+    """
+
+    name = "bench"
+
+    def compile(self, workdir, main):
+        pdf_path = Path(workdir) / "main.pdf"
+        pdf_path.write_bytes(b"%PDF-bench\n" + (Path(workdir) / main).read_bytes())
+        return pdf_path, ""
+
+
+SNIPPET = "\\documentclass{article}\n\\begin{document}\nHello\n\\end{document}\n"
+
+
+@scenario("team_TeXTeX", databases=["team_TeXTeX"])
+def seed_textex(rows):
+    """
+    ファイル rows/100 件のプロジェクト 1 件と、スニペット 1 件
+    どちらも PDF をキャッシュに入れておき、同じ内容を開き直したときの（コンパイルしない）経路を測る
+    ビルド用のディレクトリは一時ディレクトリにし、コンパイラはスタブに差し替える（teardown で戻す）
+    """
+    from team_TeXTeX import compiler
+    from team_TeXTeX.models import Project, ProjectFile, Users
+
+    db = "team_TeXTeX"
+    rng = random.Random(SEED)
+
+    build = tempfile.mkdtemp(prefix="bench-textex-")
+    settings_override = override_settings(TEAM_TEXTEX_BUILD_DIR=build)
+    settings_override.enable()
+    previous = {kind: compiler.set_compiler(StubCompiler(), kind) for kind in ("project", "snippet")}
+
+    def teardown():
+        for kind, previous_compiler in previous.items():
+            compiler.set_compiler(previous_compiler, kind)
+        settings_override.disable()
+        shutil.rmtree(build, ignore_errors=True)
+
+    owner = Users.objects.using(db).create(user_id=1, user="bench")
+    project = Project.objects.using(db).create(name="ベンチ用プロジェクト", owner=owner)
+    files = ProjectFile.objects.using(db).bulk_create(
+        [ProjectFile(project=project, filename="main.tex", content=SNIPPET, is_main=True)]
+        + [
+            ProjectFile(
+                project=project,
+                filename=f"sections/section{i}.tex",
+                content="\n".join(f"\\section{{節{i}-{j}}} 本文" * rng.randint(1, 5) for j in range(20)),
+            )
+            for i in range(max(rows // 100, 10))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    seed_pdf = Path(build) / "seed.pdf"
+    seed_pdf.write_bytes(b"%PDF-bench\n")
+    project_digest = compiler.snapshot_project(project).digest
+    compiler.get_pdf_cache().store(project_digest, seed_pdf)
+    snippet_digest, _ = compiler.compile_snippet(SNIPPET)
+
+    return Setup(
+        teardown=teardown,
+        endpoints=[
+            Endpoint("compile_project", f"/team_TeXTeX/project/{project.pk}/compile/"),
+            Endpoint("project_pdf", f"/team_TeXTeX/project/{project.pk}/pdf/{project_digest}/"),
+            Endpoint("file_list", "/team_TeXTeX/api/file/list/", data={"project_id": project.pk}),
+            Endpoint("file_content", "/team_TeXTeX/api/file/content/", data={"file_id": files[0].pk}),
+            Endpoint("compile_snippet", "/team_TeXTeX/api/compile/", method="post",
+                     data={"latex_code": SNIPPET}, json=False),
+            Endpoint("snippet_pdf", f"/team_TeXTeX/api/compile/pdf/{snippet_digest}/"),
+        ],
+    )
+
+
+# =========================
+# team_UD
+# =========================
+
+@scenario("team_UD", databases=["team_UD"])
+def seed_team_ud(rows):
+    """イベント rows 件（前後 1 年・20 アカウントと共通）・面接メモ rows/10 件（1 件 3 問）"""
+    from team_UD import schedule
+    from team_UD.models import Account, Company, Event, InterviewQuestion, Memo
+    from team_UD.question_index import INTERVIEW_STAGES, question_hash, split_questions
+
+    db = "team_UD"
+    rng = random.Random(SEED)
+    now = timezone.now()
+    today = timezone.localdate()
+
+    accounts = Account.objects.using(db).bulk_create(
+        [Account(username=f"bench{i}", password="!") for i in range(20)]
+    )
+    companies = Company.objects.using(db).bulk_create(
+        [Company(name=f"サンプル商事{i}") for i in range(max(rows // 100, 10))], batch_size=BATCH_SIZE,
+    )
+    events = []
+    for i in range(rows):
+        start = now + timedelta(days=rng.randint(-365, 365), hours=rng.randint(-12, 12))
+        # 大半は 1〜2 時間、一部は日をまたぐ
+        events.append(Event(
+            account=rng.choice(accounts + [None]), title=f"説明会{i}",
+            start_time=start, end_time=start + timedelta(hours=rng.choice([1, 1, 1, 2, 30])),
+        ))
+    Event.objects.using(db).bulk_create(events, batch_size=BATCH_SIZE)
+
+    questions = ["志望動機を教えてください", "学生時代に力を入れたこと", "研究の内容", "逆質問はありますか？",
+                 "長所と短所", "入社後にやりたいこと", "他社の選考状況", "チームでの役割"]
+    memos = Memo.objects.using(db).bulk_create(
+        [
+            Memo(
+                account=rng.choice(accounts),
+                company=rng.choice(companies),
+                interview_stage=rng.choice(INTERVIEW_STAGES + ["説明会"]),
+                interview_date=today + timedelta(days=rng.randint(-180, 60)),
+                interview_questions="\n".join(rng.sample(questions, 3)),
+                content="面接のメモ",
+                date=today + timedelta(days=rng.randint(-365, 365)),
+            )
+            for _ in range(max(rows // 10, 10))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    # bulk_create ではメモの保存時の索引づけ（signals.py）が動かないので、ここで書き出す
+    InterviewQuestion.objects.using(db).bulk_create(
+        [
+            InterviewQuestion(
+                memo=memo, company=memo.company, stage=memo.interview_stage, interview_date=memo.interview_date,
+                question=question, question_hash=question_hash(question),
+            )
+            for memo in memos
+            if memo.interview_stage in INTERVIEW_STAGES
+            for question in split_questions(memo.interview_questions)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    # 前のスケールで作った月のキャッシュを使わない
+    schedule.invalidate_events()
+
+    return Setup(
+        session={"user_id": accounts[0].pk, "username": accounts[0].username},
+        endpoints=[
+            Endpoint("calendar_month", f"/team_UD/api/calendar/{today.year}/{today.month}/"),
+            Endpoint("calendar_week", f"/team_UD/api/calendar/week/{today.year}/{today.month}/{today.day}/"),
+            Endpoint("calendar_range", "/team_UD/api/calendar/range/",
+                     data={"start": str(today - timedelta(days=30)), "end": str(today + timedelta(days=30))}),
+            Endpoint("statistics", "/team_UD/api/statistics/"),
+            Endpoint("statistics_filtered", "/team_UD/api/statistics/",
+                     data={"search": "サンプル商事1", "stage": INTERVIEW_STAGES[0]}),
+            Endpoint("company_questions", f"/team_UD/api/questions/company/{companies[0].pk}/"),
+        ],
+    )
+
+
+# =========================
+# nanakorobiyaoki
+# =========================
+
+@scenario("nanakorobiyaoki", databases=["nanakorobiyaoki"])
+def seed_nanakorobiyaoki(rows):
+    """コミュニティ rows/100 件（ログインユーザーはすべてに参加）・投稿 rows 件・メッセージ rows/10 件"""
+    from nanakorobiyaoki.models import Community, CommunityReadStatus, Message, MyPage, Post
+
+    db = "nanakorobiyaoki"
+    rng = random.Random(SEED)
+
+    users = MyPage.objects.using(db).bulk_create(
+        [MyPage(name=f"ユーザー{i}", user_id=f"{100000 + i}", email=f"user{i}@example.com", password="!")
+         for i in range(50)]
+    )
+    user = users[0]
+    communities = Community.objects.using(db).bulk_create(
+        [Community(name=f"コミュニティ{i}", description="ベンチ用") for i in range(max(rows // 100, 10))],
+        batch_size=BATCH_SIZE,
+    )
+    Through = Community.members.through
+    Through.objects.using(db).bulk_create(
+        [Through(community_id=community.pk, mypage_id=user.pk) for community in communities]
+        + [
+            Through(community_id=community.pk, mypage_id=member.pk)
+            for community in communities
+            for member in rng.sample(users[1:], 5)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    def posts(count):
+        Post.objects.using(db).bulk_create(
+            [Post(community=rng.choice(communities), author=rng.choice(users), content="投稿") for _ in range(count)],
+            batch_size=BATCH_SIZE,
+        )
+
+    # created_at / last_read_at は保存時刻になるので、既読の前後に分けて投稿し、未読と既読を混ぜる
+    posts(rows // 2)
+    CommunityReadStatus.objects.using(db).bulk_create(
+        [CommunityReadStatus(user=user, community=community) for community in communities[::2]],
+        batch_size=BATCH_SIZE,
+    )
+    posts(rows - rows // 2)
+    Message.objects.using(db).bulk_create(
+        [
+            Message(sender=rng.choice(users[1:]), receiver=user, content="メッセージ", is_read=rng.random() < 0.8)
+            for _ in range(max(rows // 10, 1))
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    return Setup(
+        session={"user_id": user.user_id},
+        endpoints=[
+            Endpoint("home", "/nanakorobiyaoki/home/"),
+            Endpoint("community_list", "/nanakorobiyaoki/communities/"),
+        ],
+    )
+
+
+# =========================
+# team_giryulink / takenoko（一覧ページ）
+# =========================
+
+@scenario("team_giryulink", databases=["team_giryulink"])
+def seed_giryulink(rows):
+    """
+    商品 rows/10 件（1 割は取引完了で一覧に出ない）
+    画像とサムネイルはパスだけを入れる（作成済みのサムネイルの URL を返すだけなのでファイルは読まない）
+    """
+    from team_giryulink.models import GiryulinkUser, Product
+
+    db = "team_giryulink"
+    rng = random.Random(SEED)
+
+    users = GiryulinkUser.objects.using(db).bulk_create(
+        [GiryulinkUser(email=f"bench{i}@tut.jp", password="!", name=f"ユーザー{i}") for i in range(20)]
+    )
+    products = []
+    for i in range(max(rows // 10, 10)):
+        completed = rng.random() < 0.1
+        products.append(Product(
+            title=f"教科書{i}", price=rng.randint(0, 5000), description="書き込みはありません。",
+            image=f"team_giryulink/products/{i}.jpg",
+            thumbnail=f"team_giryulink/products/thumbs/{i}.000000000000.webp",
+            user=rng.choice(users), buyer=rng.choice(users) if completed else None,
+            seller_confirmed=completed, buyer_confirmed=completed,
+        ))
+    Product.objects.using(db).bulk_create(products, batch_size=BATCH_SIZE)
+
+    return Setup(
+        session={"giryulink_user_id": users[0].pk},
+        endpoints=[
+            Endpoint("index", "/team_giryulink/"),
+            Endpoint("index_search", "/team_giryulink/", data={"search": "教科書1"}),
+        ],
+    )
+
+
+@scenario("takenoko", databases=["takenoko"])
+def seed_takenoko(rows):
+    """商品 rows 件（画像 1〜3 枚・タグ 1〜2 件）。画像とサムネイルはパスだけを入れる"""
+    from takenoko.models import Item, ItemImage, Tag, TakenokoUser
+    from takenoko.views import SESSION_KEY
+
+    db = "takenoko"
+    rng = random.Random(SEED)
+
+    users = TakenokoUser.objects.using(db).bulk_create(
+        [TakenokoUser(email=f"bench{i}@example.com", password="!", nickname=f"ユーザー{i}", student_id=f"B{i:06d}")
+         for i in range(20)]
+    )
+    tags = Tag.objects.using(db).bulk_create(
+        [Tag(name=f"tag{i}", display_name=f"タグ{i}") for i in range(10)]
+    )
+    items = Item.objects.using(db).bulk_create(
+        [
+            Item(
+                name=f"教科書{i}", price=rng.choice([0, 300, 500, 1000]), seller=rng.choice(users),
+                status=rng.choice(["active", "active", "active", "negotiation", "sold"]),
+            )
+            for i in range(rows)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    ItemImage.objects.using(db).bulk_create(
+        [
+            ItemImage(
+                item=item, order=order, image=f"takenoko/items/{item.pk}_{order}.jpg",
+                thumbnail=f"takenoko/items/thumbs/{item.pk}_{order}.000000000000.webp",
+            )
+            for item in items
+            for order in range(1, rng.randint(1, 3) + 1)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    TagThrough = Item.tags.through
+    TagThrough.objects.using(db).bulk_create(
+        [TagThrough(item_id=item.pk, tag_id=tag.pk) for item in items for tag in rng.sample(tags, rng.randint(1, 2))],
+        batch_size=BATCH_SIZE,
+    )
+
+    return Setup(
+        session={SESSION_KEY: str(users[0].user_id)},
+        endpoints=[
+            Endpoint("main", "/takenoko/"),
+            Endpoint("main_tag", "/takenoko/", data={"tag": "tag1"}),
+            Endpoint("main_search", "/takenoko/", data={"q": "教科書1"}),
+            Endpoint("main_free", "/takenoko/", data={"price": "free"}),
+        ],
+    )
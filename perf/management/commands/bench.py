@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment,
+)
+
+from perf import bench_scenarios  # noqa: F401  シナリオを登録する
+from perf.bench import DEFAULT_TOLERANCE, SCALES, SCENARIOS, compare, required_databases, run_scenario
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds throwaway test databases with synthetic data and load-tests each team\'s hot endpoints, '
+        'reporting p50/p95/p99 latency and queries per request. '
+        'Optionally compares the results against a stored baseline JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES, key=SCALES.get), default='1k',
+                            help='Rows of synthetic data per scenario (default: 1k)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint (default: 50)')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                            help='Scenario to run (repeatable, default: all)')
+        parser.add_argument('--baseline', help='Compare against this baseline JSON and fail on regressions')
+        parser.add_argument('--save-baseline', help='Write the results to this JSON file')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Allowed p95 slowdown relative to the baseline (default: 0.2 = 20%%)')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        baseline = self.load_baseline(options['baseline'], options['scale'])
+        scenarios = [SCENARIOS[name] for name in (options['scenario'] or sorted(SCENARIOS))]
+        rows = SCALES[options['scale']]
+
+        results = {}
+        setup_test_environment(debug=False)
+        old_config = setup_databases(
+            verbosity=0, interactive=False, aliases=required_databases(scenarios),
+        )
+        try:
+            with override_settings(PERF_PROFILING=False):
+                for s in scenarios:
+                    if not options['json']:
+                        self.stdout.write(f"seeding {s.name} ({rows} rows)...")
+                    results.update(run_scenario(s, rows, options['requests']))
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        output = {"scale": options['scale'], "requests": options['requests'], "results": results}
+        if options['json']:
+            self.stdout.write(json.dumps(output, ensure_ascii=False, indent=2))
+        else:
+            self.print_results(results)
+
+        if options['save_baseline']:
+            path = Path(options['save_baseline'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding='utf-8')
+            if not options['json']:
+                self.stdout.write(self.style.SUCCESS(f"Saved baseline to {path}"))
+
+        if baseline is not None:
+            self.check_regressions(results, baseline, options['tolerance'])
+
+    def load_baseline(self, path, scale):
+        if not path:
+            return None
+        try:
+            data = json.loads(Path(path).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read baseline {path}: {e}")
+        if data.get('scale') != scale:
+            raise CommandError(f"Baseline {path} was recorded at --scale {data.get('scale')}, not {scale}")
+        return data['results']
+
+    def print_results(self, results):
+        self.stdout.write(
+            f"\n{'endpoint':<40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}  statuses"
+        )
+        for key, r in results.items():
+            statuses = ' '.join(f"{code}x{n}" for code, n in r['statuses'].items())
+            line = (
+                f"{key:<40} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                f"{r['avg_queries']:>8.1f}  {statuses}"
+            )
+            if any(int(code) >= 500 for code in r['statuses']):
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+    def check_regressions(self, results, baseline, tolerance):
+        regressions = compare(results, baseline, tolerance)
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+            return
+        for key, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f"{key}: {metric} {before} -> {after}"))
+        raise CommandError(f"{len(regressions)} regression(s) against the baseline")
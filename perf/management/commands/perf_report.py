@@ -0,0 +1,70 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from perf.store import get_store, report
+
+
+class Command(BaseCommand):
+    help = (
+        'Lists the slowest views and the views with the most queries per team, '
+        'from the stats recorded by perf.middleware.QueryProfilingMiddleware.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', help='Only show this team (app name)')
+        parser.add_argument('--since', type=float, help='Only use requests from the last N seconds')
+        parser.add_argument('--limit', type=int, default=10, help='Views per team (default: 10)')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+        parser.add_argument('--max-queries', type=float, help='Fail if any view averages more queries than this')
+        parser.add_argument('--max-p95-ms', type=float, help='Fail if any view has a p95 latency above this')
+        parser.add_argument('--clear', action='store_true', help='Delete all recorded stats and exit')
+
+    def handle(self, *args, **options):
+        store = get_store()
+        if options['clear']:
+            store.clear()
+            self.stdout.write(self.style.SUCCESS("Cleared recorded stats."))
+            return
+
+        since = time.time() - options['since'] if options['since'] else None
+        rows = store.rows(since=since, team=options['team'])
+        result = report(rows, limit=options['limit'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({"requests": len(rows), **result}, ensure_ascii=False, indent=2))
+        else:
+            self.print_report(rows, result)
+
+        self.check_thresholds(result, options['max_queries'], options['max_p95_ms'])
+
+    def print_report(self, rows, result):
+        self.stdout.write(f"{len(rows)} requests recorded")
+        for team, views in result["teams"].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n[{team}]"))
+            self.stdout.write("  slowest (p95 ms / avg ms / requests):")
+            for v in views["slowest"]:
+                self.stdout.write(f"    {v['p95_ms']:>9.1f} {v['avg_ms']:>9.1f} {v['requests']:>6}  {v['view']}")
+            self.stdout.write("  most queries (avg / max / duplicates):")
+            for v in views["most_queries"]:
+                self.stdout.write(
+                    f"    {v['avg_queries']:>9.1f} {v['max_queries']:>9} {v['avg_duplicates']:>6.1f}  {v['view']}"
+                )
+
+        if result["databases"]:
+            self.stdout.write(self.style.MIGRATE_HEADING("\n[databases] (total ms / queries)"))
+            for db in result["databases"]:
+                self.stdout.write(f"    {db['ms']:>9.1f} {db['queries']:>9}  {db['alias']}")
+
+    def check_thresholds(self, result, max_queries, max_p95_ms):
+        """しきい値を超えたビューがあればエラー終了する（CI での回帰検出用）"""
+        failures = []
+        for team, views in result["teams"].items():
+            for v in views["most_queries"] + views["slowest"]:
+                if max_queries is not None and v["avg_queries"] > max_queries:
+                    failures.append(f"{v['view']}: {v['avg_queries']} queries/request > {max_queries}")
+                if max_p95_ms is not None and v["p95_ms"] > max_p95_ms:
+                    failures.append(f"{v['view']}: p95 {v['p95_ms']} ms > {max_p95_ms}")
+        if failures:
+            raise CommandError("Thresholds exceeded:\n" + "\n".join(sorted(set(failures))))
@@ -0,0 +1,69 @@
+# perf/middleware.py
+"""
+リクエストごとのクエリ数・DBエイリアス別のクエリ時間・ビュー名・応答時間を記録するミドルウェア
+
+settings.PERF_PROFILING = True または環境変数 PBL_PERF_PROFILING=1 のときだけ有効になる。
+（無効時は MiddlewareNotUsed で外れるので、本番のオーバーヘッドはない）
+結果は `manage.py perf_report` と /perf/report/（スタッフのみ）で確認できる。
+"""
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .recorder import QueryRecorder
+from .store import get_store
+
+# 計測しないパス（静的ファイル・計測結果自体）
+DEFAULT_SKIP_PREFIXES = ("/static/", "/media/", "/perf/", "/favicon.ico")
+
+
+def profiling_enabled():
+    return bool(getattr(settings, "PERF_PROFILING", False)) or os.environ.get("PBL_PERF_PROFILING") == "1"
+
+
+def resolve_view(request):
+    """(チーム名, ビュー名) を返す。チーム名はビューが定義されたアプリのパッケージ名"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "-", "unresolved"
+    func = getattr(match.func, "view_class", match.func)
+    team = (getattr(func, "__module__", "") or "-").split(".")[0]
+    return team, match.view_name or match._func_path
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        if not profiling_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.skip_prefixes = tuple(getattr(settings, "PERF_SKIP_PREFIXES", DEFAULT_SKIP_PREFIXES))
+        self.store = get_store()
+
+    def __call__(self, request):
+        if request.path.startswith(self.skip_prefixes):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with recorder.install():
+            response = self.get_response(request)
+        # ストリーミング応答は本文の生成中のクエリを含まない（ヘッダーを返すまでの計測）
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        team, view = resolve_view(request)
+        self.store.record({
+            "ts": time.time(),
+            "team": team,
+            "view": view,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "query_count": recorder.query_count,
+            "query_ms": round(recorder.query_seconds * 1000, 3),
+            "duplicate_queries": recorder.duplicate_queries,
+            "aliases": recorder.alias_stats(),
+        })
+        return response
@@ -0,0 +1,66 @@
+# perf/recorder.py
+"""
+1リクエスト中に実行された SQL を DB エイリアスごとに数えるレコーダー
+
+各チームのアプリは routers.TeamPerAppRouter で別々の SQLite に振り分けられるので、
+全エイリアスの接続に execute_wrapper を差し込み、どのDBでどれだけ時間を使ったかを集計する。
+"""
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# 同じ形の SQL をまとめるため、リテラルを ? に置き換える
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(sql):
+    return _LITERAL_RE.sub("?", sql)
+
+
+class QueryRecorder:
+    """リクエスト単位の SQL 計測結果"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        # エイリアス → [件数, 秒]
+        self.by_alias = defaultdict(lambda: [0, 0.0])
+        self.statements = Counter()
+
+    def _wrapper(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.query_count += 1
+                self.query_seconds += elapsed
+                stats = self.by_alias[alias]
+                stats[0] += 1
+                stats[1] += elapsed
+                self.statements[normalize_sql(sql)] += 1
+        return wrapper
+
+    @contextmanager
+    def install(self):
+        """全DBエイリアスの接続に計測用の wrapper を差し込む"""
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self._wrapper(alias)))
+            yield self
+
+    @property
+    def duplicate_queries(self):
+        """同じ形の SQL が繰り返された回数（N+1 の目安）"""
+        return sum(n - 1 for n in self.statements.values() if n > 1)
+
+    def alias_stats(self):
+        """{エイリアス: {"queries": 件数, "ms": ミリ秒}}"""
+        return {
+            alias: {"queries": count, "ms": round(seconds * 1000, 3)}
+            for alias, (count, seconds) in self.by_alias.items()
+        }
@@ -0,0 +1,248 @@
+# perf/store.py
+"""
+リクエスト計測結果の保存と集計
+
+計測結果はプロセス内のリングバッファに入れ、一定件数・一定時間ごとに
+ローカルの SQLite（settings.PERF_STATS_DB、既定は perf/stats.sqlite3）へまとめて書き出す。
+チームのDBとは別ファイルで、Django の接続も使わないので計測対象には含まれない。
+PERF_STATS_DB = None にするとリングバッファだけで動く（レポートはそのプロセス内の分のみ）。
+"""
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from django.conf import settings
+
+RING_SIZE = getattr(settings, "PERF_RING_SIZE", 2000)
+# この件数または秒数が溜まったら SQLite に書き出す
+FLUSH_EVERY = getattr(settings, "PERF_FLUSH_EVERY", 50)
+FLUSH_INTERVAL = getattr(settings, "PERF_FLUSH_INTERVAL", 10)
+
+COLUMNS = (
+    "ts", "team", "view", "method", "path", "status",
+    "duration_ms", "query_count", "query_ms", "duplicate_queries", "aliases",
+)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS request_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    team TEXT NOT NULL,
+    view TEXT NOT NULL,
+    method TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    duration_ms REAL NOT NULL,
+    query_count INTEGER NOT NULL,
+    query_ms REAL NOT NULL,
+    duplicate_queries INTEGER NOT NULL,
+    aliases TEXT NOT NULL
+)
+"""
+
+
+def stats_db_path():
+    """SQLite の保存先（None ならリングバッファのみ）"""
+    default = Path(settings.BASE_DIR) / "perf" / "stats.sqlite3"
+    path = getattr(settings, "PERF_STATS_DB", default)
+    return Path(path) if path else None
+
+
+class StatsStore:
+    """リングバッファ + SQLite への遅延書き出し"""
+
+    def __init__(self, db_path=None, ring_size=RING_SIZE):
+        self.db_path = db_path
+        self.ring = deque(maxlen=ring_size)
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.db_path), timeout=5)
+        conn.execute(CREATE_TABLE)
+        conn.execute("CREATE INDEX IF NOT EXISTS request_stats_ts ON request_stats (ts)")
+        return conn
+
+    def record(self, row):
+        """1リクエスト分の計測結果を追加する"""
+        with self._lock:
+            self.ring.append(row)
+            if self.db_path is None:
+                return
+            self._pending.append(row)
+            due = (
+                len(self._pending) >= FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """溜まっている計測結果を SQLite に書き出す"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+        if not pending or self.db_path is None:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT INTO request_stats ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [tuple(_encode(row)[col] for col in COLUMNS) for row in pending],
+                )
+        finally:
+            conn.close()
+
+    def rows(self, since=None, team=None):
+        """
+        計測結果を返す（SQLite があればそちら、なければリングバッファ）
+
+        Args:
+            since (float): この UNIX 時刻以降のもの
+            team (str): チーム（アプリ名）で絞り込む
+        """
+        if self.db_path is None:
+            with self._lock:
+                rows = list(self.ring)
+            return [
+                row for row in rows
+                if (since is None or row["ts"] >= since) and (team is None or row["team"] == team)
+            ]
+
+        self.flush()
+        if not self.db_path.exists():
+            return []
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if team is not None:
+            where.append("team = ?")
+            params.append(team)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM request_stats"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        conn = self._connect()
+        try:
+            return [_decode(dict(zip(COLUMNS, values))) for values in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def clear(self):
+        with self._lock:
+            self.ring.clear()
+            self._pending = []
+        if self.db_path is not None and self.db_path.exists():
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM request_stats")
+            finally:
+                conn.close()
+
+
+def _encode(row):
+    return {**row, "aliases": json.dumps(row["aliases"])}
+
+
+def _decode(row):
+    return {**row, "aliases": json.loads(row["aliases"])}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StatsStore(stats_db_path())
+        return _store
+
+
+# =========================
+# 集計
+# =========================
+
+def percentile(values, pct):
+    """最近傍法のパーセンタイル（values は空でないこと）"""
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(rows):
+    """
+    計測結果をビューごと・DBエイリアスごとに集計する
+
+    Returns:
+        dict: {
+            "views": [{team, view, requests, avg_ms, p95_ms, max_ms,
+                       avg_queries, max_queries, avg_duplicates, avg_query_ms}, ...],
+            "databases": [{alias, queries, ms}, ...]（ms の降順）,
+        }
+    """
+    grouped = defaultdict(list)
+    databases = defaultdict(lambda: {"queries": 0, "ms": 0.0})
+    for row in rows:
+        grouped[(row["team"], row["view"])].append(row)
+        for alias, stats in row["aliases"].items():
+            databases[alias]["queries"] += stats["queries"]
+            databases[alias]["ms"] += stats["ms"]
+
+    views = []
+    for (team, view), members in grouped.items():
+        durations = [r["duration_ms"] for r in members]
+        queries = [r["query_count"] for r in members]
+        n = len(members)
+        views.append({
+            "team": team,
+            "view": view,
+            "requests": n,
+            "avg_ms": round(sum(durations) / n, 2),
+            "p95_ms": round(percentile(durations, 95), 2),
+            "max_ms": round(max(durations), 2),
+            "avg_queries": round(sum(queries) / n, 2),
+            "max_queries": max(queries),
+            "avg_duplicates": round(sum(r["duplicate_queries"] for r in members) / n, 2),
+            "avg_query_ms": round(sum(r["query_ms"] for r in members) / n, 2),
+        })
+
+    return {
+        "views": views,
+        "databases": sorted(
+            ({"alias": alias, "queries": s["queries"], "ms": round(s["ms"], 2)} for alias, s in databases.items()),
+            key=lambda d: d["ms"],
+            reverse=True,
+        ),
+    }
+
+
+def report(rows, limit=10):
+    """
+    チームごとに遅いビュー（p95 の降順）とクエリの多いビュー（平均クエリ数の降順）を並べる
+
+    Returns:
+        dict: {"teams": {team: {"slowest": [...], "most_queries": [...]}}, "databases": [...]}
+    """
+    summary = summarize(rows)
+    by_team = defaultdict(list)
+    for view in summary["views"]:
+        by_team[view["team"]].append(view)
+
+    teams = {}
+    for team in sorted(by_team):
+        views = by_team[team]
+        teams[team] = {
+            "slowest": sorted(views, key=lambda v: v["p95_ms"], reverse=True)[:limit],
+            "most_queries": sorted(views, key=lambda v: v["avg_queries"], reverse=True)[:limit],
+        }
+    return {"teams": teams, "databases": summary["databases"]}
@@ -0,0 +1,25 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class ReportViewTest(TestCase):
+    databases = "__all__"
+
+    @override_settings(DEBUG=True, PERF_PROFILING=False)
+    def test_disabled_profiling_hides_report_even_in_debug(self):
+        self.assertEqual(self.client.get(reverse("perf:report")).status_code, 404)
+
+    @override_settings(DEBUG=True, PERF_PROFILING=True)
+    def test_report_requires_staff(self):
+        self.assertEqual(self.client.get(reverse("perf:report")).status_code, 403)
+
+        user = User.objects.create_user("member", password="pw")
+        self.client.force_login(user, backend="django.contrib.auth.backends.ModelBackend")
+        self.assertEqual(self.client.get(reverse("perf:report")).status_code, 403)
+
+        user.is_staff = True
+        user.save()
+        response = self.client.get(reverse("perf:report"), {"team": "no_such_team"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["requests"], 0)
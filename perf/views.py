@@ -0,0 +1,32 @@
+import time
+
+from django.http import JsonResponse
+
+from .middleware import profiling_enabled
+from .store import get_store, report
+
+
+def report_view(request):
+    """
+    計測結果のレポート（計測が有効なときの、スタッフのみ）
+    共有の設定は DEBUG = True なので DEBUG では判定しない（クエリの内容や URL が見えてしまう）
+    ・team: チーム（アプリ名）で絞り込む
+    ・since: 直近何秒分か（省略時は全件）
+    ・limit: チームごとの表示件数（既定 10）
+    """
+    if not profiling_enabled():
+        return JsonResponse({"error": "profiling is disabled"}, status=404)
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    if request.method != "GET":
+        return JsonResponse({"error": "GET required"}, status=405)
+
+    try:
+        limit = int(request.GET.get("limit", 10))
+        since = float(request.GET["since"]) if request.GET.get("since") else None
+    except ValueError:
+        return JsonResponse({"error": "limit / since must be numbers"}, status=400)
+
+    team = request.GET.get("team") or None
+    rows = get_store().rows(since=time.time() - since if since else None, team=team)
+    return JsonResponse({"requests": len(rows), **report(rows, limit=limit)})
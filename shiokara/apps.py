@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ShiokaraConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shiokara'
+
+    def ready(self):
+        # 企業検索用のカラムを書き込み時に更新するシグナルを登録
+        from . import signals  # noqa: F401
@@ -0,0 +1,187 @@
+# shiokara/journal.py
+"""
+登録・口コミ投稿をフィクスチャに残すための追記専用ジャーナル。
+
+以前は書き込みのたびに persons.json / company_reviews.json 全体を読み込んで
+書き直していたため、件数に比例して遅くなり、同時に書き込むと片方が消えていた。
+ここでは 1 レコード 1 行の JSON Lines を排他ロック付きで追記するだけにして、
+フィクスチャ形式（JSON 配列）は compact_fixture_journal コマンドでまとめて作る。
+
+各行は Django の jsonl シリアライザと同じ形式なので、
+`manage.py loaddata persons_journal.jsonl --database=shiokara` でそのまま読み込める。
+同じ pk の行が複数ある場合は後の行が優先される。
+"""
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import CompanyReview, Person
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+FIXTURE_DIR = Path(settings.BASE_DIR) / "shiokara" / "fixtures"
+
+PERSON_FIXTURE_PATH = FIXTURE_DIR / "persons.json"
+PERSON_JOURNAL_PATH = FIXTURE_DIR / "persons_journal.jsonl"
+REVIEW_FIXTURE_PATH = FIXTURE_DIR / "company_reviews.json"
+REVIEW_JOURNAL_PATH = FIXTURE_DIR / "company_reviews_journal.jsonl"
+
+# (ジャーナル, 書き出し先フィクスチャ) の組
+JOURNALS = [
+    (PERSON_JOURNAL_PATH, PERSON_FIXTURE_PATH),
+    (REVIEW_JOURNAL_PATH, REVIEW_FIXTURE_PATH),
+]
+
+
+@contextmanager
+def locked(path: Path, mode: str):
+    """ファイルを開いて排他ロックを取る（プロセス間で有効）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, mode, encoding="utf-8") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield f
+        finally:
+            f.flush()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def append_record(path: Path, obj: dict) -> None:
+    """ジャーナルに 1 行追記する（既存の内容は読まない）"""
+    line = json.dumps(obj, ensure_ascii=False) + "\n"
+    with locked(path, "a") as f:
+        f.seek(0, os.SEEK_END)
+        f.write(line)
+
+
+def serialize_person(person: Person) -> dict:
+    return {
+        "model": "shiokara.person",
+        "pk": person.pk,
+        "fields": {
+            "student_id": person.student_id,
+            "course": person.course,
+            "grade": person.grade,
+            "department_name": person.department_name,
+            "lab_field": person.lab_field,
+            "gender": getattr(person, 'gender', ''),
+            "password": person.password,
+            "nickname": getattr(person, 'nickname', ''),
+            "icon_picture": getattr(person, 'icon_picture', ''),
+            "created_at": person.created_at.isoformat(),
+            "seen_dept_tutorial": person.seen_dept_tutorial,
+            "seen_search_tutorial": person.seen_search_tutorial,
+            "seen_points_tutorial": person.seen_points_tutorial,
+            "points": person.points,
+        },
+    }
+
+
+def serialize_review(review: CompanyReview) -> dict:
+    return {
+        "model": "shiokara.companyreview",
+        "pk": review.pk,
+        "fields": {
+            "company": review.company_id,
+            "grade": review.grade,
+            "department_name": review.department_name,
+            "lab_field": review.lab_field,
+            "gender": review.gender,
+            "comment": review.comment,
+            "rating": review.rating,
+            "created_at": review.created_at.isoformat(),
+        },
+    }
+
+
+def record_person(person: Person) -> None:
+    """Person の現在の状態をジャーナルに追記する（新規登録・更新どちらも）"""
+    append_record(PERSON_JOURNAL_PATH, serialize_person(person))
+
+
+def record_review(review: CompanyReview) -> None:
+    """投稿された口コミをジャーナルに追記する"""
+    append_record(REVIEW_JOURNAL_PATH, serialize_review(review))
+
+
+def read_fixture(path: Path) -> list:
+    if not path.exists():
+        return []
+    try:
+        text = path.read_text(encoding="utf-8")
+        return json.loads(text) if text.strip() else []
+    except json.JSONDecodeError:
+        return []
+
+
+def merge_journal(fixture: list, journal_lines) -> list:
+    """
+    フィクスチャの内容にジャーナルの行を順に適用する。
+    同じ (model, pk) は後の行で置き換え、新しいものは末尾に追加する。
+    """
+    merged = {}
+    for obj in fixture:
+        merged[(obj.get("model"), obj.get("pk"))] = obj
+    for line in journal_lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            # 書き込み途中で止まった行などは読み飛ばす
+            continue
+        merged[(obj.get("model"), obj.get("pk"))] = obj
+    return list(merged.values())
+
+
+def _write_fixture(path: Path, data: list) -> int:
+    """一時ファイルに書いてから置き換える（途中で落ちても壊れたフィクスチャを残さない）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+def compact(journal_path: Path, fixture_path: Path, output_path: Path = None) -> int:
+    """
+    ジャーナルをフィクスチャ（JSON 配列）にまとめる。
+
+    output_path を省略した場合はフィクスチャを置き換えてジャーナルを空にする。
+    指定した場合はそこへ書き出すだけで、フィクスチャとジャーナルはそのまま残す。
+    ジャーナルのロックを持ったまま行うので、その間の追記は待たされるが失われない。
+
+    戻り値: 書き出したレコード件数
+    """
+    if not journal_path.exists():
+        # まだ追記がなければフィクスチャをそのまま使う（空のジャーナルは作らない）
+        data = read_fixture(fixture_path)
+        return _write_fixture(output_path, data) if output_path is not None else len(data)
+
+    with locked(journal_path, "a+") as journal:
+        journal.seek(0)
+        data = merge_journal(read_fixture(fixture_path), journal)
+        _write_fixture(output_path or fixture_path, data)
+
+        if output_path is None:
+            journal.seek(0)
+            journal.truncate()
+
+    return len(data)
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from shiokara import journal
+
+
+class Command(BaseCommand):
+    help = (
+        'Merges the append-only journals (persons_journal.jsonl, company_reviews_journal.jsonl) '
+        'into the JSON fixtures. With --export, writes the merged fixtures to another directory '
+        'and leaves the journals untouched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--export', metavar='DIR', help='Write merged fixtures to DIR instead of compacting in place')
+
+    def handle(self, *args, **options):
+        export_dir = Path(options['export']) if options['export'] else None
+
+        for journal_path, fixture_path in journal.JOURNALS:
+            output_path = export_dir / fixture_path.name if export_dir else None
+            count = journal.compact(journal_path, fixture_path, output_path=output_path)
+            target = output_path or fixture_path
+            self.stdout.write(self.style.SUCCESS(f"Wrote {count} records to {target}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from shiokara.search import rebuild_company_search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the company search index (FTS table and facet columns on Company).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='shiokara', help='DB alias (default: shiokara)')
+
+    def handle(self, *args, **options):
+        count = rebuild_company_search(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index for {count} companies."))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from shiokara.points import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = 'Checks that every Person.points equals the sum of their PointTransaction history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Append adjustment transactions for mismatches')
+        parser.add_argument('--database', default='shiokara', help='DB alias (default: shiokara)')
+
+    def handle(self, *args, **options):
+        mismatches = reconcile_balances(fix=options['fix'], using=options['database'])
+        for person_id, points, total in mismatches:
+            self.stdout.write(f"person {person_id}: points={points} ledger={total}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All balances match the ledger."))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Recorded {len(mismatches)} adjustment transactions."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(mismatches)} balances differ from the ledger (use --fix)."))
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:19
+
+from django.db import migrations, models
+
+
+# 企業名・紹介文の全文検索インデックス（外部コンテンツ型 FTS5 + trigram トークナイザ）
+# Company の INSERT / UPDATE / DELETE に合わせてトリガーで同期する
+CREATE_COMPANY_FTS = [
+    """
+    CREATE VIRTUAL TABLE shiokara_company_fts USING fts5(
+        name, description,
+        content='shiokara_company', content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER shiokara_company_fts_ai AFTER INSERT ON shiokara_company BEGIN
+        INSERT INTO shiokara_company_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER shiokara_company_fts_ad AFTER DELETE ON shiokara_company BEGIN
+        INSERT INTO shiokara_company_fts(shiokara_company_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER shiokara_company_fts_au AFTER UPDATE OF name, description ON shiokara_company BEGIN
+        INSERT INTO shiokara_company_fts(shiokara_company_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO shiokara_company_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO shiokara_company_fts(shiokara_company_fts) VALUES ('rebuild')",
+]
+
+DROP_COMPANY_FTS = [
+    "DROP TRIGGER IF EXISTS shiokara_company_fts_au",
+    "DROP TRIGGER IF EXISTS shiokara_company_fts_ad",
+    "DROP TRIGGER IF EXISTS shiokara_company_fts_ai",
+    "DROP TABLE IF EXISTS shiokara_company_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiokara', '0004_company_internship_deadline_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='area_regions',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='勤務地域ビット'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='department_bits',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='対象学科ビット'),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='口コミ件数'),
+        ),
+        migrations.RunSQL(CREATE_COMPANY_FTS, DROP_COMPANY_FTS),
+    ]
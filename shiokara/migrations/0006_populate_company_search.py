@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+# shiokara/search.py の AREA_KEYWORDS と同じ順序・内容
+AREA_KEYWORDS = {
+    "tokai": ["愛知", "岐阜", "三重", "静岡"],
+    "capital": ["東京", "神奈川", "千葉", "埼玉"],
+    "kansai": ["大阪", "京都", "兵庫", "滋賀", "奈良"],
+    "nationwide": ["全国", "全国勤務", "全国拠点"],
+}
+
+
+def populate_company_search(apps, schema_editor):
+    """既存の企業に勤務地域ビット・学科ビット・口コミ件数を設定"""
+    Company = apps.get_model('shiokara', 'Company')
+    CompanyReview = apps.get_model('shiokara', 'CompanyReview')
+
+    db_alias = schema_editor.connection.alias
+
+    review_counts = dict(
+        CompanyReview.objects.using(db_alias).values_list('company_id').annotate(n=Count('pk')).order_by()
+    )
+    department_bits = {}
+    for company_id, department_id in Company.departments.through.objects.using(db_alias).values_list(
+        'company_id', 'department_id'
+    ):
+        # search.department_bit() と同じく、BigIntegerField に収まらない pk の学科はビットを持たない
+        if 0 <= department_id <= 62:
+            department_bits[company_id] = department_bits.get(company_id, 0) | (1 << department_id)
+
+    companies = list(Company.objects.using(db_alias).all())
+    for company in companies:
+        area_regions = 0
+        for i, keywords in enumerate(AREA_KEYWORDS.values()):
+            if company.area and any(kw in company.area for kw in keywords):
+                area_regions |= 1 << i
+        company.area_regions = area_regions
+        company.department_bits = department_bits.get(company.pk, 0)
+        company.review_count = review_counts.get(company.pk, 0)
+    Company.objects.using(db_alias).bulk_update(
+        companies, ['area_regions', 'department_bits', 'review_count'], batch_size=500
+    )
+
+    print(f"企業検索カラム設定: {len(companies)}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：非正規化カラムを初期値に戻す"""
+    Company = apps.get_model('shiokara', 'Company')
+    db_alias = schema_editor.connection.alias
+
+    Company.objects.using(db_alias).update(area_regions=0, department_bits=0, review_count=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiokara', '0005_company_search_facets'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_company_search, reverse_migration),
+    ]
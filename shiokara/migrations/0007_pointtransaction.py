@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiokara', '0006_populate_company_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointTransaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(verbose_name='増減')),
+                ('balance_after', models.IntegerField(verbose_name='増減後の残高')),
+                ('reason', models.CharField(choices=[('opening', '初期ポイント'), ('company_view', '企業詳細の閲覧'), ('review', '口コミ投稿'), ('feedback', 'サイト要望'), ('adjustment', '残高調整')], max_length=20, verbose_name='理由')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='shiokara.company', verbose_name='対象企業')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_transactions', to='shiokara.person')),
+            ],
+            options={
+                'verbose_name': 'ポイント履歴',
+                'verbose_name_plural': 'ポイント履歴',
+                'ordering': ['-created_at', '-pk'],
+                'indexes': [models.Index(fields=['person', '-created_at'], name='shiokara_po_person__952dd4_idx')],
+            },
+        ),
+    ]
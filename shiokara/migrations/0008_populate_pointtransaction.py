@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def create_opening_transactions(apps, schema_editor):
+    """既存の学生の現在のポイントを初期ポイントとして履歴に記録"""
+    Person = apps.get_model('shiokara', 'Person')
+    PointTransaction = apps.get_model('shiokara', 'PointTransaction')
+
+    db_alias = schema_editor.connection.alias
+
+    transactions = [
+        PointTransaction(person_id=person_id, amount=points, balance_after=points, reason='opening')
+        for person_id, points in Person.objects.using(db_alias).values_list('pk', 'points')
+    ]
+    PointTransaction.objects.using(db_alias).bulk_create(transactions, batch_size=500)
+
+    print(f"ポイント履歴作成: {len(transactions)}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：ポイント履歴を削除"""
+    PointTransaction = apps.get_model('shiokara', 'PointTransaction')
+    db_alias = schema_editor.connection.alias
+
+    PointTransaction.objects.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shiokara', '0007_pointtransaction'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_transactions, reverse_migration),
+    ]
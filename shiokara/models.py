@@ -48,6 +48,11 @@ class Company(models.Model):
         verbose_name="対象学科",
     )
 
+    # 企業検索用の非正規化カラム（shiokara/search.py とシグナルで更新する）
+    area_regions = models.PositiveIntegerField("勤務地域ビット", default=0, editable=False)
+    department_bits = models.BigIntegerField("対象学科ビット", default=0, editable=False)
+    review_count = models.PositiveIntegerField("口コミ件数", default=0, editable=False)
+
     class Meta:
         verbose_name = "企業"
         verbose_name_plural = "企業"
@@ -175,4 +180,33 @@ class SiteFeedback(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self) -> str:
-        return f"{self.person.student_id} のフィードバック ({self.created_at.date()})"
\ No newline at end of file
+        return f"{self.person.student_id} のフィードバック ({self.created_at.date()})"
+
+class PointTransaction(models.Model):
+    """ポイントの増減履歴。Person.points はこの履歴の合計と一致する（shiokara/points.py 経由で更新する）"""
+
+    REASON_CHOICES = [
+        ("opening", "初期ポイント"),
+        ("company_view", "企業詳細の閲覧"),
+        ("review", "口コミ投稿"),
+        ("feedback", "サイト要望"),
+        ("adjustment", "残高調整"),
+    ]
+
+    person = models.ForeignKey(Person, on_delete=models.CASCADE, related_name="point_transactions")
+    amount = models.IntegerField("増減")
+    balance_after = models.IntegerField("増減後の残高")
+    reason = models.CharField("理由", max_length=20, choices=REASON_CHOICES)
+    company = models.ForeignKey(
+        Company, on_delete=models.SET_NULL, null=True, blank=True, related_name="+", verbose_name="対象企業",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "ポイント履歴"
+        verbose_name_plural = "ポイント履歴"
+        ordering = ["-created_at", "-pk"]
+        indexes = [models.Index(fields=["person", "-created_at"])]
+
+    def __str__(self) -> str:
+        return f"{self.person.student_id} {self.amount:+d}pt ({self.get_reason_display()})"
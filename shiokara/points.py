@@ -0,0 +1,177 @@
+# shiokara/points.py
+"""
+ポイントの増減をまとめて扱うサービス
+
+以前は company_detail / site_feedback / company_experience_post がそれぞれ
+F('points') ± n の更新をしてから Person を読み直しており、履歴も残っていなかった。
+ここでは 1 つのトランザクションで残高を条件付きの UPDATE で更新して新しい残高を読み、
+同じトランザクションで PointTransaction（と企業閲覧時は CompanyView）を記録する。
+残高が足りない減算は UPDATE の WHERE 条件で弾くため、同時に閲覧しても残高がマイナスにならない。
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import CompanyView, Person, PointTransaction
+
+DB_ALIAS = "shiokara"
+
+# 企業詳細の閲覧に必要なポイント
+COMPANY_VIEW_COST = 1
+# 口コミ投稿・サイト要望で付与するポイント
+REVIEW_REWARD = 5
+FEEDBACK_REWARD = 1
+
+
+class InsufficientPoints(Exception):
+    """残高が足りず減算できなかった"""
+
+
+def _apply(person_id, amount, using):
+    """
+    残高に amount を加算し、新しい残高を返す（残高がマイナスになる場合は None）
+    残高の条件付き UPDATE で減算を弾くので、同時に更新しても残高がマイナスにならない。
+    呼び出し側のトランザクション内で実行し、更新した行をそのまま読み直す。
+    """
+    people = Person.objects.using(using).filter(pk=person_id)
+    if not people.filter(points__gte=-amount).update(points=F("points") + amount):
+        return None
+    return people.values_list("points", flat=True).get()
+
+
+def _record(person_id, amount, reason, company=None, using=DB_ALIAS):
+    balance = _apply(person_id, amount, using)
+    if balance is None:
+        raise InsufficientPoints
+    PointTransaction.objects.using(using).create(
+        person_id=person_id,
+        amount=amount,
+        balance_after=balance,
+        reason=reason,
+        company=company,
+    )
+    return balance
+
+
+def credit(person, amount, reason, company=None, using=DB_ALIAS):
+    """
+    ポイントを付与する
+
+    Args:
+        person (Person): 対象の学生（points は新しい残高に書き換える）
+        amount (int): 付与するポイント（正の数）
+        reason (str): PointTransaction.REASON_CHOICES のキー
+        company (Company): 関連する企業（任意）
+        using (str): DBエイリアス
+
+    Returns:
+        int: 付与後の残高
+    """
+    with transaction.atomic(using=using):
+        person.points = _record(person.pk, amount, reason, company, using)
+    return person.points
+
+
+def debit(person, amount, reason, company=None, using=DB_ALIAS):
+    """
+    ポイントを消費する（残高不足なら InsufficientPoints を送出し、何も変更しない）
+
+    Returns:
+        int: 消費後の残高
+    """
+    with transaction.atomic(using=using):
+        person.points = _record(person.pk, -amount, reason, company, using)
+    return person.points
+
+
+def charge_company_view(person, company, using=DB_ALIAS):
+    """
+    企業詳細の閲覧でポイントを消費し、閲覧履歴を記録する
+    閲覧済みの企業ではポイントを消費しない
+
+    Args:
+        person (Person): 閲覧する学生（points は新しい残高に書き換える）
+        company (Company): 閲覧する企業
+        using (str): DBエイリアス
+
+    Returns:
+        tuple: (残高, 今回ポイントを消費したか)
+
+    Raises:
+        InsufficientPoints: 未閲覧で残高が足りない場合
+    """
+    # 閲覧済みなら何もしない（2回目以降の閲覧はこの 1 クエリだけ）
+    if CompanyView.objects.using(using).filter(person=person, company=company).exists():
+        return person.points, False
+    try:
+        with transaction.atomic(using=using):
+            # 閲覧履歴の unique 制約で「1社につき1回だけ消費」を保証する
+            CompanyView.objects.using(using).create(person=person, company=company)
+            debit(person, COMPANY_VIEW_COST, "company_view", company=company, using=using)
+    except IntegrityError:
+        # 閲覧済み（同時リクエストで先に記録された場合も含む）
+        return person.points, False
+    return person.points, True
+
+
+def history(person, limit=None, using=DB_ALIAS):
+    """
+    ポイントの増減履歴を新しい順に返す
+
+    Args:
+        person (Person): 対象の学生
+        limit (int): 件数の上限（None なら全件）
+        using (str): DBエイリアス
+
+    Returns:
+        QuerySet: PointTransaction
+    """
+    qs = PointTransaction.objects.using(using).filter(person=person).select_related("company")
+    return qs[:limit] if limit else qs
+
+
+def open_account(person, using=DB_ALIAS):
+    """登録時の初期ポイントを履歴に記録する（残高は変えない）"""
+    PointTransaction.objects.using(using).create(
+        person=person, amount=person.points, balance_after=person.points, reason="opening",
+    )
+
+
+def find_mismatches(using=DB_ALIAS):
+    """
+    Person.points と履歴の合計が一致しない学生を探す
+
+    Returns:
+        list: (person_id, Person.points, 履歴の合計) のタプル
+    """
+    ledger = dict(
+        PointTransaction.objects.using(using).values_list("person_id").annotate(total=Sum("amount")).order_by()
+    )
+    return [
+        (person_id, points, ledger.get(person_id, 0))
+        for person_id, points in Person.objects.using(using).values_list("pk", "points").order_by("pk")
+        if points != ledger.get(person_id, 0)
+    ]
+
+
+def reconcile_balances(fix=False, using=DB_ALIAS):
+    """
+    残高と履歴を突き合わせる
+    fix=True の場合は差分を "adjustment" として履歴に追記し、履歴を残高に合わせる
+    （管理画面などで points を直接書き換えた分を履歴に残すため。残高自体は変更しない）
+
+    Returns:
+        list: find_mismatches() の結果
+    """
+    mismatches = find_mismatches(using=using)
+    if fix and mismatches:
+        with transaction.atomic(using=using):
+            PointTransaction.objects.using(using).bulk_create([
+                PointTransaction(
+                    person_id=person_id,
+                    amount=points - total,
+                    balance_after=points,
+                    reason="adjustment",
+                )
+                for person_id, points, total in mismatches
+            ])
+    return mismatches
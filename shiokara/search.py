@@ -0,0 +1,303 @@
+# shiokara/search.py
+"""
+企業検索エンジン
+
+以前の company_search は name / description への icontains（LIKE の全件走査）と、
+勤務地キーワードごとの icontains の OR、学科の JOIN + distinct、
+口コミ件数の Count("reviews") を毎回組み合わせていた。
+
+ここでは
+- キーワード: SQLite FTS5（trigram トークナイザ）の全文検索インデックス shiokara_company_fts
+  （日本語は分かち書きしなくても 3 文字単位で部分一致できる）
+- 勤務地: Company.area_regions（地域ごとのビット）
+- 学科: Company.department_bits（Department の pk ごとのビット。ビットに収まらない pk の学科は中間テーブルで照合）
+- 口コミ件数: Company.review_count
+の事前計算済みカラムだけで絞り込み・並べ替え・ファセット集計を行う。
+
+FTS インデックスは migrations/0005 のトリガーで Company と同期し、
+ファセット用カラムは signals.py で更新する。
+不整合が疑われるときは `manage.py rebuild_company_search` で作り直せる。
+"""
+import re
+
+from django.db import connections, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import GreaterThan
+
+from .models import Company, CompanyReview
+
+DB_ALIAS = "shiokara"
+
+FTS_TABLE = "shiokara_company_fts"
+
+# 勤務地カテゴリ → area のキーワード例
+AREA_KEYWORDS = {
+    "tokai": ["愛知", "岐阜", "三重", "静岡"],
+    "capital": ["東京", "神奈川", "千葉", "埼玉"],
+    "kansai": ["大阪", "京都", "兵庫", "滋賀", "奈良"],
+    "nationwide": ["全国", "全国勤務", "全国拠点"],
+}
+
+# 勤務地カテゴリ → area_regions のビット（定義順に割り当て。追加時は末尾に足すこと）
+AREA_REGION_BITS = {key: 1 << i for i, key in enumerate(AREA_KEYWORDS)}
+
+# department_bits（符号付き 64 ビット）で扱える学科の pk の上限（1 << 63 は BigIntegerField に入らない）
+MAX_DEPARTMENT_BIT = 62
+
+# trigram トークナイザは 3 文字未満の語を MATCH できない
+TRIGRAM_MIN_LENGTH = 3
+
+
+def area_regions_for(area):
+    """勤務地の文字列から area_regions のビットを計算する"""
+    if not area:
+        return 0
+    bits = 0
+    for key, keywords in AREA_KEYWORDS.items():
+        if any(kw in area for kw in keywords):
+            bits |= AREA_REGION_BITS[key]
+    return bits
+
+
+def department_bit(department_id):
+    """
+    学科の pk に対応するビット
+    pk が MAX_DEPARTMENT_BIT を超える学科はビットを持たず 0 を返す（検索時は中間テーブルで照合する）
+    """
+    if 0 <= department_id <= MAX_DEPARTMENT_BIT:
+        return 1 << department_id
+    return 0
+
+
+def department_bits_for(department_ids):
+    bits = 0
+    for department_id in department_ids:
+        bits |= department_bit(department_id)
+    return bits
+
+
+# =========================
+# 非正規化カラムの更新
+# =========================
+
+def refresh_review_counts(company_ids, using=DB_ALIAS):
+    """指定した企業の review_count を口コミテーブルから数え直す"""
+    company_ids = set(company_ids)
+    if not company_ids:
+        return
+    counts = dict(
+        CompanyReview.objects.using(using).filter(company_id__in=company_ids)
+        .values_list("company_id").annotate(n=Count("pk")).order_by()
+    )
+    for company_id in company_ids:
+        Company.objects.using(using).filter(pk=company_id).update(review_count=counts.get(company_id, 0))
+
+
+def refresh_department_bits(company_ids, using=DB_ALIAS):
+    """指定した企業の department_bits を中間テーブルから計算し直す"""
+    company_ids = set(company_ids)
+    if not company_ids:
+        return
+    bits = dict.fromkeys(company_ids, 0)
+    through = Company.departments.through.objects.using(using).filter(company_id__in=company_ids)
+    for company_id, department_id in through.values_list("company_id", "department_id"):
+        bits[company_id] |= department_bit(department_id)
+    for company_id, value in bits.items():
+        Company.objects.using(using).filter(pk=company_id).update(department_bits=value)
+
+
+def rebuild_company_search(using=DB_ALIAS):
+    """
+    全企業のファセット用カラムと FTS インデックスを作り直す
+
+    Returns:
+        int: 対象にした企業の件数
+    """
+    review_counts = dict(
+        CompanyReview.objects.using(using).values_list("company_id").annotate(n=Count("pk")).order_by()
+    )
+    department_bits = {}
+    for company_id, department_id in Company.departments.through.objects.using(using).values_list(
+        "company_id", "department_id"
+    ):
+        department_bits[company_id] = department_bits.get(company_id, 0) | department_bit(department_id)
+
+    companies = list(Company.objects.using(using).only("pk", "area"))
+    for company in companies:
+        company.area_regions = area_regions_for(company.area)
+        company.department_bits = department_bits.get(company.pk, 0)
+        company.review_count = review_counts.get(company.pk, 0)
+
+    with transaction.atomic(using=using):
+        Company.objects.using(using).bulk_update(
+            companies, ["area_regions", "department_bits", "review_count"], batch_size=500
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    return len(companies)
+
+
+# =========================
+# 検索
+# =========================
+
+def split_terms(query):
+    """キーワードを空白（全角含む）で区切る"""
+    return [term for term in re.split(r"\s+", query.replace("　", " ")) if term]
+
+
+def _escape_like(term):
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def keyword_condition(query):
+    """
+    キーワード（空白区切りで AND）に一致する企業の Q を返す
+    3 文字以上の語は FTS の MATCH、短い語は FTS テーブル上の LIKE で照合する
+    """
+    match_terms = []
+    where = []
+    params = []
+    for term in split_terms(query):
+        if len(term) >= TRIGRAM_MIN_LENGTH:
+            # フレーズとして扱う（" は二重にしてエスケープ）
+            match_terms.append('"%s"' % term.replace('"', '""'))
+        else:
+            like = f"%{_escape_like(term)}%"
+            where.append("(name LIKE %s ESCAPE '\\' OR description LIKE %s ESCAPE '\\')")
+            params.extend([like, like])
+    if match_terms:
+        where.insert(0, f"{FTS_TABLE} MATCH %s")
+        params.insert(0, " AND ".join(match_terms))
+    if not where:
+        return Q()
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE " + " AND ".join(where)
+    return Q(pk__in=RawSQL(sql, params))
+
+
+def _has_bit(field, bit):
+    return GreaterThan(F(field).bitand(bit), 0)
+
+
+def department_condition(department_ids, using=DB_ALIAS):
+    """
+    指定した学科（いずれか）が対象の企業の Q を返す
+    ビットを持つ学科は department_bits、持たない学科は中間テーブルの EXISTS で照合する
+    """
+    department_ids = list(department_ids)
+    bits = department_bits_for(department_ids)
+    overflow_ids = [department_id for department_id in department_ids if not department_bit(department_id)]
+
+    condition = Q(_has_bit("department_bits", bits)) if bits else Q(pk__in=[])
+    if overflow_ids:
+        through = Company.departments.through.objects.using(using)
+        condition |= Exists(through.filter(company_id=OuterRef("pk"), department_id__in=overflow_ids))
+    return condition
+
+
+def _has_briefing():
+    return Q(oncampus_briefing__isnull=False) & ~Q(oncampus_briefing="")
+
+
+def search_companies(
+    departments,
+    query="",
+    dept_shorts=(),
+    lab_code="",
+    area_key="",
+    recommend=False,
+    briefing=False,
+    logic="and",
+    sort="name",
+    using=DB_ALIAS,
+):
+    """
+    企業を検索し、結果とファセット件数を返す
+
+    Args:
+        departments (iterable): 全学科（学科ファセットのキーと short_name → pk の解決に使う）
+        query (str): キーワード（空白区切りで AND）
+        dept_shorts (iterable): 学科 short_name（複数なら OR）
+        lab_code (str): 研究室コード（oncampus_briefing に含まれている想定）
+        area_key (str): 勤務地カテゴリ（AREA_KEYWORDS のキー）
+        recommend (bool): 推薦ありのみ
+        briefing (bool): 学内説明会ありのみ
+        logic (str): 勤務地・推薦・説明会の組み合わせ方（"and" / "or"）
+        sort (str): employees / starting_salary / annual_holidays / review_count / name
+        using (str): DBエイリアス
+
+    Returns:
+        tuple: (企業のクエリセット, ファセット件数の dict)
+            ファセット件数はキーワード・研究室コードに一致した企業に対する
+            学科別・勤務地別・推薦あり・説明会ありの件数
+    """
+    departments = list(departments)
+    base = Company.objects.using(using).all()
+
+    # キーワード・研究室コード（常にAND条件で適用）
+    if query:
+        base = base.filter(keyword_condition(query))
+    if lab_code:
+        base = base.filter(oncampus_briefing__icontains=lab_code)
+
+    # ファセット件数（1 回の集計クエリ）
+    aggregates = {"total": Count("pk")}
+    for dept in departments:
+        aggregates[f"dept_{dept.pk}"] = Count("pk", filter=department_condition([dept.pk], using=using))
+    for key, bit in AREA_REGION_BITS.items():
+        aggregates[f"area_{key}"] = Count("pk", filter=_has_bit("area_regions", bit))
+    aggregates["recommend"] = Count("pk", filter=Q(tut_recommendation=True))
+    aggregates["briefing"] = Count("pk", filter=_has_briefing())
+    counts = base.aggregate(**aggregates)
+    facets = {
+        "total": counts["total"],
+        "departments": {dept.short_name: counts[f"dept_{dept.pk}"] for dept in departments},
+        "areas": {key: counts[f"area_{key}"] for key in AREA_REGION_BITS},
+        "recommend": counts["recommend"],
+        "briefing": counts["briefing"],
+    }
+
+    companies = base
+
+    # 学科フィルタ（常にAND条件で適用、複数指定なら OR）
+    dept_ids = [dept.pk for dept in departments if dept.short_name in set(dept_shorts)]
+    if dept_ids:
+        companies = companies.filter(department_condition(dept_ids, using=using))
+    elif any(dept_shorts):
+        # 存在しない学科が指定された
+        companies = companies.none()
+
+    # 企業フィルタ（勤務地、推薦あり、学内説明会あり）のみAND/OR対象
+    company_filter_qs = []
+    if area_key in AREA_REGION_BITS:
+        company_filter_qs.append(_has_bit("area_regions", AREA_REGION_BITS[area_key]))
+    if recommend:
+        company_filter_qs.append(Q(tut_recommendation=True))
+    if briefing:
+        company_filter_qs.append(_has_briefing())
+
+    if company_filter_qs:
+        # lookup 式と Q を混在できるよう Q で包んでから結合する
+        combined_q = Q(company_filter_qs[0])
+        for q in company_filter_qs[1:]:
+            if logic == "or":
+                combined_q |= Q(q)
+            else:
+                combined_q &= Q(q)
+        companies = companies.filter(combined_q)
+
+    # ソート
+    if sort == "employees":
+        companies = companies.order_by("-employees", "name")
+    elif sort == "starting_salary":
+        companies = companies.order_by("-starting_salary", "name")
+    elif sort == "annual_holidays":
+        companies = companies.order_by("-annual_holidays", "name")
+    elif sort == "review_count":
+        companies = companies.order_by("-review_count", "name")
+    else:
+        companies = companies.order_by("name")
+
+    return companies.prefetch_related("departments"), facets
@@ -0,0 +1,56 @@
+# shiokara/sidebar.py
+"""
+サイドバー（学科から探す）用の学科一覧キャッシュ
+
+サイドバーは全ページに出るが、中身（学科と学科ごとの企業数）は企業の追加・編集時にしか変わらない。
+そこで学科一覧をプロセス内に保持し、Django のキャッシュに置いたバージョン値と照合して使い回す。
+企業・学科が変わったときは signals.py から invalidate_sidebar() を呼んでバージョンを更新する。
+（キャッシュを共有設定にすれば、他プロセスの保持分もバージョン不一致で作り直される）
+"""
+import uuid
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Department
+
+DB_ALIAS = "shiokara"
+
+VERSION_KEY = "shiokara:sidebar:version"
+
+# (バージョン, 学科リスト)
+_cached = (None, None)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 未設定・追い出された場合は新しいバージョンを発行する（古い保持分とは一致しない）
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_sidebar():
+    """学科一覧のキャッシュを無効化する（企業・学科の変更時に呼ぶ）"""
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def get_sidebar_departments(using=DB_ALIAS):
+    """
+    サイドバー用の学科一覧を返す
+
+    Returns:
+        list: company_count（対象企業数）を付けた Department（読み取り専用として扱うこと）
+    """
+    global _cached
+    version = _current_version()
+    cached_version, departments = _cached
+    if departments is not None and cached_version == version:
+        return departments
+
+    departments = list(
+        Department.objects.using(using).annotate(company_count=Count("companies")).order_by("pk")
+    )
+    _cached = (version, departments)
+    return departments
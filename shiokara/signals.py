@@ -0,0 +1,62 @@
+"""
+企業・口コミの書き込みに合わせて企業検索用の非正規化カラムとサイドバーのキャッシュを更新するシグナル
+（FTS インデックスはマイグレーションで作成した DB トリガーが更新する）
+学生の登録時には初期ポイントをポイント履歴に記録する
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Company, CompanyReview, Department, Person
+from .points import open_account
+from .search import area_regions_for, refresh_department_bits, refresh_review_counts
+from .sidebar import invalidate_sidebar
+
+
+@receiver(pre_save, sender=Company)
+def set_area_regions(sender, instance, **kwargs):
+    # fixture 読み込み（raw）でもそのまま保存されるよう、保存前にインスタンスへ設定する
+    instance.area_regions = area_regions_for(instance.area)
+
+
+@receiver(post_save, sender=CompanyReview)
+@receiver(post_delete, sender=CompanyReview)
+def refresh_company_review_count(sender, instance, using, **kwargs):
+    refresh_review_counts([instance.company_id], using=using)
+
+
+@receiver(m2m_changed, sender=Company.departments.through)
+def refresh_company_department_bits(sender, instance, action, using, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            refresh_department_bits([instance.pk], using=using)
+        return
+
+    # 学科側から変更された場合は pk_set が企業のID（clear のときは事前に控えておく）
+    if action == "pre_clear":
+        instance._cleared_company_ids = list(instance.companies.using(using).values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove"):
+        refresh_department_bits(pk_set or [], using=using)
+    elif action == "post_clear":
+        refresh_department_bits(getattr(instance, "_cleared_company_ids", []), using=using)
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def invalidate_sidebar_on_change(sender, **kwargs):
+    invalidate_sidebar()
+
+
+@receiver(m2m_changed, sender=Company.departments.through)
+def invalidate_sidebar_on_departments_change(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_sidebar()
+
+
+@receiver(post_save, sender=Person)
+def open_point_account(sender, instance, created, using, raw=False, **kwargs):
+    # 登録時の初期ポイントを履歴に残す（fixture 読み込み分は reconcile_points で補う）
+    if created and not raw:
+        open_account(instance, using=using)
@@ -1,3 +1,167 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from . import points
+from .models import Company, CompanyReview, CompanyView, Department, Person, PointTransaction
+from .search import AREA_REGION_BITS, MAX_DEPARTMENT_BIT, department_bit, rebuild_company_search, search_companies
+
+DB = "shiokara"
+
+
+def create_person(student_id="S001", **fields):
+    return Person.objects.using(DB).create(
+        student_id=student_id, course="B", grade=3, department_name="情報", lab_field="AI", password="pw", **fields
+    )
+
+
+class PointsTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.person = create_person(points=3)
+        self.company = Company.objects.using(DB).create(name="ポイント株式会社")
+
+    def ledger(self):
+        return list(
+            PointTransaction.objects.using(DB).filter(person=self.person)
+            .order_by("pk").values_list("reason", "amount", "balance_after")
+        )
+
+    def test_credit_and_debit_record_balance(self):
+        self.assertEqual(points.credit(self.person, points.REVIEW_REWARD, "review"), 8)
+        self.assertEqual(points.debit(self.person, 2, "company_view", company=self.company), 6)
+
+        self.assertEqual(Person.objects.using(DB).get(pk=self.person.pk).points, 6)
+        self.assertEqual(self.ledger(), [("opening", 3, 3), ("review", 5, 8), ("company_view", -2, 6)])
+        self.assertEqual(points.find_mismatches(), [])
+
+    def test_overdraft_is_rejected_without_changes(self):
+        with self.assertRaises(points.InsufficientPoints):
+            points.debit(self.person, 4, "company_view", company=self.company)
+
+        self.assertEqual(Person.objects.using(DB).get(pk=self.person.pk).points, 3)
+        self.assertEqual(self.ledger(), [("opening", 3, 3)])
+
+        # 閲覧の課金も、残高が足りなければ閲覧履歴ごと取り消す
+        Person.objects.using(DB).filter(pk=self.person.pk).update(points=0)
+        self.person.points = 0
+        with self.assertRaises(points.InsufficientPoints):
+            points.charge_company_view(self.person, self.company)
+        self.assertFalse(CompanyView.objects.using(DB).filter(person=self.person).exists())
+
+    def test_company_view_is_charged_once(self):
+        self.assertEqual(points.charge_company_view(self.person, self.company), (2, True))
+        self.assertEqual(points.charge_company_view(self.person, self.company), (2, False))
+        self.assertEqual(self.ledger()[-1], ("company_view", -1, 2))
+
+    def test_reconcile_appends_adjustments(self):
+        # 管理画面などで残高を直接書き換えた
+        Person.objects.using(DB).filter(pk=self.person.pk).update(points=10)
+        other = create_person("S002")
+
+        out = StringIO()
+        call_command("reconcile_points", stdout=out)
+        self.assertIn(f"person {self.person.pk}: points=10 ledger=3", out.getvalue())
+        self.assertEqual(len(self.ledger()), 1)
+
+        call_command("reconcile_points", "--fix", stdout=StringIO())
+        self.assertEqual(self.ledger()[-1], ("adjustment", 7, 10))
+        self.assertEqual(points.find_mismatches(), [])
+        self.assertEqual(PointTransaction.objects.using(DB).filter(person=other).count(), 1)
+
+
+class CompanySearchTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.cs = Department.objects.using(DB).create(pk=1, name="情報・知能工学系", short_name="cs")
+        self.ee = Department.objects.using(DB).create(pk=2, name="電気・電子情報工学系", short_name="ee")
+        # 学科ビットに収まらない pk（中間テーブルで照合する）
+        self.me = Department.objects.using(DB).create(pk=MAX_DEPARTMENT_BIT + 8, name="機械工学系", short_name="me")
+
+        self.toyota = Company.objects.using(DB).create(
+            name="サンプル自動車", description="自動車の設計と製造", area="愛知県豊田市", tut_recommendation=True,
+        )
+        self.tokyo = Company.objects.using(DB).create(
+            name="東京ソフトウェア", description="業務システムの受託開発", area="東京都", oncampus_briefing="CS-AI",
+        )
+        self.nationwide = Company.objects.using(DB).create(
+            name="全国電機", description="電機メーカー。自動車向けの部品も製造", area="全国拠点",
+        )
+        self.toyota.departments.add(self.cs, self.me)
+        self.tokyo.departments.add(self.cs)
+        self.nationwide.departments.add(self.ee)
+
+    def search(self, **kwargs):
+        companies, facets = search_companies(Department.objects.using(DB).all(), **kwargs)
+        return [company.name for company in companies], facets
+
+    def test_keyword_terms_are_anded(self):
+        self.assertEqual(self.search(query="自動車")[0], ["サンプル自動車", "全国電機"])
+        # 全角空白で区切っても AND
+        self.assertEqual(self.search(query="自動車　設計")[0], ["サンプル自動車"])
+        # 3 文字未満の語（LIKE で照合）との組み合わせ
+        self.assertEqual(self.search(query="部品 製造")[0], ["全国電機"])
+        self.assertEqual(self.search(query="自動車 受託")[0], [])
+        # FTS の構文として解釈されない
+        self.assertEqual(self.search(query='"OR" 100%')[0], [])
+
+        # FTS インデックスは企業の更新・削除にトリガーで追従する
+        self.tokyo.description = "自動車向けの組み込みソフトウェア"
+        self.tokyo.save()
+        self.assertEqual(self.search(query="自動車 ソフトウェア")[0], ["東京ソフトウェア"])
+        self.tokyo.delete()
+        self.assertEqual(self.search(query="ソフトウェア")[0], [])
+
+    def test_filters_and_facets(self):
+        names, facets = self.search(query="自動車")
+        self.assertEqual(facets["total"], 2)
+        self.assertEqual(facets["departments"], {"cs": 1, "ee": 1, "me": 1})
+        self.assertEqual(facets["areas"], {"tokai": 1, "capital": 0, "kansai": 0, "nationwide": 1})
+        self.assertEqual((facets["recommend"], facets["briefing"]), (1, 0))
+
+        self.assertEqual(self.search(dept_shorts=["cs"])[0], ["サンプル自動車", "東京ソフトウェア"])
+        self.assertEqual(self.search(dept_shorts=["me"])[0], ["サンプル自動車"])
+        self.assertEqual(self.search(dept_shorts=["ee", "me"])[0], ["サンプル自動車", "全国電機"])
+        self.assertEqual(self.search(dept_shorts=["unknown"])[0], [])
+
+        self.assertEqual(self.search(area_key="capital", briefing=True)[0], ["東京ソフトウェア"])
+        self.assertEqual(self.search(area_key="tokai", briefing=True)[0], [])
+        self.assertEqual(
+            self.search(area_key="tokai", briefing=True, logic="or")[0], ["サンプル自動車", "東京ソフトウェア"]
+        )
+        self.assertEqual(self.search(lab_code="AI")[0], ["東京ソフトウェア"])
+
+    def test_signals_refresh_facet_columns(self):
+        self.assertEqual(Company.objects.using(DB).get(pk=self.toyota.pk).area_regions, AREA_REGION_BITS["tokai"])
+        self.assertEqual(Company.objects.using(DB).get(pk=self.toyota.pk).department_bits, department_bit(1))
+
+        review = CompanyReview.objects.using(DB).create(company=self.tokyo, rating=4)
+        CompanyReview.objects.using(DB).create(company=self.tokyo, rating=5)
+        self.assertEqual(Company.objects.using(DB).get(pk=self.tokyo.pk).review_count, 2)
+        review.delete()
+        self.assertEqual(Company.objects.using(DB).get(pk=self.tokyo.pk).review_count, 1)
+        self.assertEqual(self.search(sort="review_count")[0][0], "東京ソフトウェア")
+
+        # 企業側・学科側のどちらから変更しても追従する
+        self.tokyo.departments.add(self.ee)
+        self.assertEqual(self.search(dept_shorts=["ee"])[0], ["全国電機", "東京ソフトウェア"])
+        self.ee.companies.remove(self.nationwide)
+        self.assertEqual(self.search(dept_shorts=["ee"])[0], ["東京ソフトウェア"])
+        self.cs.companies.clear()
+        self.assertEqual(self.search(dept_shorts=["cs"])[0], [])
+        self.assertEqual(Company.objects.using(DB).get(pk=self.tokyo.pk).department_bits, department_bit(2))
+
+        self.tokyo.area = "大阪府"
+        self.tokyo.save()
+        self.assertEqual(self.search(area_key="kansai")[0], ["東京ソフトウェア"])
+
+    def test_rebuild_company_search(self):
+        Company.objects.using(DB).update(area_regions=0, department_bits=0, review_count=5)
+
+        self.assertEqual(rebuild_company_search(), 3)
+        self.assertEqual(self.search(dept_shorts=["cs"], area_key="tokai")[0], ["サンプル自動車"])
+        self.assertEqual(self.search(query="自動車")[1]["total"], 2)
+        self.assertFalse(Company.objects.using(DB).exclude(review_count=0).exists())
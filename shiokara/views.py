@@ -2,26 +2,27 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Q, Avg, Count, F
+from django.db import transaction
+from django.db.models import Avg
 from django.utils import timezone
 from datetime import timedelta
 from django.views.decorators.cache import never_cache
 from django.conf import settings
+import copy
 import json
 from pathlib import Path
 
-from .models import Department, Company, CompanyReview, Person, CompanyView, SiteFeedback
+from .models import Company, CompanyReview, Person, CompanyView, SiteFeedback
 from .forms import PersonLoginForm  # いまは未使用でもOK
+from . import journal
+from . import points
+from .search import search_companies
+from .sidebar import get_sidebar_departments
 
 
 # このアプリが使う DB のエイリアス名
 DB_ALIAS = "shiokara"
 
-# フィクスチャ用パス
-FIXTURE_PATH = Path(settings.BASE_DIR) / "shiokara" / "fixtures" / "company_reviews.json"
-PERSON_FIXTURE_PATH = Path(settings.BASE_DIR) / "shiokara" / "fixtures" / "persons.json"
-
-
 # =========================
 # ログイン関連（共通ヘルパー）
 # =========================
@@ -30,14 +31,15 @@ def get_current_person(request):
     """
     セッションに保存された person_id から Person を取得する。
     ログイン中なら Person、未ログインなら None を返す。
+    同じリクエスト内では 1 回だけ DB から読み、以降は request に保持した値を返す。
     """
-    person_id = request.session.get("person_id")
-    if not person_id:
-        return None
-    try:
-        return Person.objects.using(DB_ALIAS).get(pk=person_id)
-    except Person.DoesNotExist:
-        return None
+    if not hasattr(request, "_shiokara_person"):
+        person = None
+        person_id = request.session.get("person_id")
+        if person_id:
+            person = Person.objects.using(DB_ALIAS).filter(pk=person_id).first()
+        request._shiokara_person = person
+    return request._shiokara_person
 
 
 def render_with_person(request, template_name, context=None):
@@ -48,9 +50,10 @@ def render_with_person(request, template_name, context=None):
     if context is None:
         context = {}
     context["person"] = get_current_person(request)
-    # 全ページでサイドバーに表示するために departments を追加
+    # 全ページでサイドバーに表示する学科一覧（企業が変わるまでプロセス内でキャッシュ）
+    context["sidebar_departments"] = get_sidebar_departments(using=DB_ALIAS)
     if "departments" not in context:
-        context["departments"] = Department.objects.using(DB_ALIAS).prefetch_related("companies").all()
+        context["departments"] = context["sidebar_departments"]
     return render(request, template_name, context)
 
 
@@ -64,84 +67,6 @@ def logout_view(request):
     return redirect("shiokara:login")
 
 
-def append_person_to_fixture(person: Person) -> None:
-    """登録された Person を JSON フィクスチャに 1 件追記する"""
-
-    if PERSON_FIXTURE_PATH.exists():
-        try:
-            text = PERSON_FIXTURE_PATH.read_text(encoding="utf-8")
-            data = json.loads(text) if text.strip() else []
-        except json.JSONDecodeError:
-            data = []
-    else:
-        data = []
-
-    obj = {
-        "model": "shiokara.person",
-        "pk": person.pk,
-        "fields": {
-            "student_id": person.student_id,
-            "course": person.course,
-            "grade": person.grade,
-            "department_name": person.department_name,
-            "lab_field": person.lab_field,
-            "gender": getattr(person, 'gender', ''),
-            "password": person.password,
-            "nickname": getattr(person, 'nickname', ''),
-            "icon_picture": getattr(person, 'icon_picture', ''),
-            "created_at": person.created_at.isoformat(),
-            "seen_dept_tutorial": person.seen_dept_tutorial,
-            "seen_search_tutorial": person.seen_search_tutorial,
-            "seen_points_tutorial": person.seen_points_tutorial,
-            "points": person.points,
-        },
-    }
-
-    data.append(obj)
-
-    PERSON_FIXTURE_PATH.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-
-
-def update_person_in_fixture(person: Person) -> None:
-    """既存の Person をフィクスチャで更新する（チュートリアル表示済み etc）"""
-    
-    if not PERSON_FIXTURE_PATH.exists():
-        return
-    
-    try:
-        text = PERSON_FIXTURE_PATH.read_text(encoding="utf-8")
-        data = json.loads(text) if text.strip() else []
-    except json.JSONDecodeError:
-        return
-    
-    # 該当する pk を持つ Person を探して更新
-    for obj in data:
-        if obj.get("pk") == person.pk and obj.get("model") == "shiokara.person":
-            obj["fields"].update({
-                "student_id": person.student_id,
-                "course": person.course,
-                "grade": person.grade,
-                "department_name": person.department_name,
-                "lab_field": person.lab_field,
-                "gender": getattr(person, 'gender', ''),
-                "password": person.password,
-                "created_at": person.created_at.isoformat(),
-                "seen_dept_tutorial": person.seen_dept_tutorial,
-                "seen_search_tutorial": person.seen_search_tutorial,
-                "seen_points_tutorial": person.seen_points_tutorial,
-                "points": person.points,
-            })
-            break
-    
-    PERSON_FIXTURE_PATH.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-
-
 # =========================
 # ログイン / 新規登録画面
 # =========================
@@ -235,7 +160,7 @@ def register_view(request):
                 gender=gender,
                 password=password,
             )
-            append_person_to_fixture(person)
+            journal.record_person(person)
             request.session["person_id"] = person.id
             return redirect("shiokara:department_list")
 
@@ -264,7 +189,6 @@ def my_page(request):
         # アイコン画像をアップロード
         if icon_file:
             import os
-            from django.conf import settings
             
             # ファイル名を生成（学籍番号_元のファイル名）
             ext = os.path.splitext(icon_file.name)[1]
@@ -293,20 +217,19 @@ def my_page(request):
                 destination.write(icon_path_obj.read())
                 icon_path_obj.close()
             
-            # フィクスチャも更新
-            append_person_to_fixture(Person.objects.using(DB_ALIAS).get(pk=person.pk))
+            # フィクスチャ用のジャーナルにも記録
+            journal.record_person(Person.objects.using(DB_ALIAS).get(pk=person.pk))
         
         return redirect("shiokara:my_page")
 
-    # リフレッシュして favorites を取得
-    try:
-        refreshed = Person.objects.using(DB_ALIAS).get(pk=person.pk)
-        favorites = refreshed.favorites.all()
-    except Exception:
-        refreshed = person
-        favorites = []
+    favorites = person.favorites.all()
+    point_history = points.history(person, limit=20, using=DB_ALIAS)
 
-    return render_with_person(request, "teams/shiokara/my_page.html", {"person": refreshed, "favorites": favorites})
+    return render_with_person(request, "teams/shiokara/my_page.html", {
+        "person": person,
+        "favorites": favorites,
+        "point_history": point_history,
+    })
 
 
 def site_feedback(request):
@@ -329,17 +252,16 @@ def site_feedback(request):
         elif len(feedback_text) < 10:
             error = "要望は10文字以上入力してください。"
         else:
-            # フィードバックを保存
-            SiteFeedback.objects.using(DB_ALIAS).create(
-                person=person,
-                feedback_text=feedback_text
-            )
-
-            # ポイントを付与（+1）
-            Person.objects.using(DB_ALIAS).filter(pk=person.pk).update(points=F('points') + 1)
+            # フィードバックの保存とポイント付与（+1）を同じトランザクションで行う
+            with transaction.atomic(using=DB_ALIAS):
+                SiteFeedback.objects.using(DB_ALIAS).create(
+                    person=person,
+                    feedback_text=feedback_text
+                )
+                points.credit(person, points.FEEDBACK_REWARD, "feedback", using=DB_ALIAS)
 
             # セッションに付与情報を入れてリダイレクト先でポップアップ表示する
-            request.session['points_awarded'] = 1
+            request.session['points_awarded'] = points.FEEDBACK_REWARD
             success = True
 
     # 既存のフィードバック件数を取得
@@ -361,13 +283,9 @@ def department_list(request):
     """
     学科一覧ページ
     """
-    departments = (
-        Department.objects.using(DB_ALIAS)
-        .all()
-        .prefetch_related("companies")
-    )
+    # 学科ごとの企業数はサイドバーと同じキャッシュから取る
     context = {
-        "departments": departments,
+        "departments": get_sidebar_departments(using=DB_ALIAS),
     }
     # チュートリアルの自動起動判定（ログイン中かつ未表示の場合）
     person = get_current_person(request)
@@ -406,9 +324,9 @@ def tutorial_seen(request):
     # 更新（using DB alias を指定）
     Person.objects.using(DB_ALIAS).filter(pk=person.pk).update(**{update_field: True})
     
-    # DB から最新の person データを取得して persons.json にも保存
-    updated_person = Person.objects.using(DB_ALIAS).get(pk=person.pk)
-    update_person_in_fixture(updated_person)
+    # リクエスト内の person にも反映してジャーナルに記録
+    setattr(person, update_field, True)
+    journal.record_person(person)
     
     # セッション内の person は次回取得時に DB から刷新されるためそのままで良い
     return JsonResponse({"ok": True, "type": tutorial_type})
@@ -420,15 +338,6 @@ def tutorial_seen(request):
 # 企業検索
 # =========================
 
-# 勤務地カテゴリ → area のキーワード例
-AREA_KEYWORDS = {
-    "tokai": ["愛知", "岐阜", "三重", "静岡"],
-    "capital": ["東京", "神奈川", "千葉", "埼玉"],
-    "kansai": ["大阪", "京都", "兵庫", "滋賀", "奈良"],
-    "nationwide": ["全国", "全国勤務", "全国拠点"],
-}
-
-
 def company_search(request):
     """
     企業検索ページ
@@ -455,89 +364,33 @@ def company_search(request):
     sort = request.GET.get("sort", "name")
     lab_code = request.GET.get("lab", "").strip()
 
-    # ベースとなるクエリセット ＋ レビュー件数を annotate
-    companies = (
-        Company.objects.using(DB_ALIAS)
-        .all()
-        .prefetch_related("departments")
-        .annotate(
-            review_count=Count("reviews")  # related_name="reviews" を想定
-        )
+    # 学科プルダウン用（検索結果のファセット件数を載せるので、キャッシュの学科はコピーして使う）
+    departments = [copy.copy(dept) for dept in get_sidebar_departments(using=DB_ALIAS)]
+
+    # FTS インデックスと事前計算済みカラムで絞り込む（shiokara/search.py）
+    companies, facets = search_companies(
+        departments,
+        query=query,
+        dept_shorts=dept_shorts,
+        lab_code=lab_code,
+        area_key=area_key,
+        recommend=recommend == "1",
+        briefing=briefing == "1",
+        logic=filter_logic,
+        sort=sort,
+        using=DB_ALIAS,
     )
-
-    # キーワード検索（常にAND条件で適用）
-    if query:
-        companies = companies.filter(
-            Q(name__icontains=query) | Q(description__icontains=query)
-        )
-
-    # 学科フィルタ（常にAND条件で適用、複数指定なら OR）
-    if dept_shorts:
-        q_dept = Q()
-        for short in dept_shorts:
-            if short:
-                q_dept |= Q(departments__short_name=short)
-        if q_dept:
-            companies = companies.filter(q_dept)
-
-    # 研究室コード（常にAND条件で適用）
-    if lab_code:
-        companies = companies.filter(Q(oncampus_briefing__icontains=lab_code))
-
-    # 企業フィルタ（勤務地、推薦あり、学内説明会あり）のみAND/OR対象
-    company_filter_qs = []
-
-    # 勤務地フィルタ
-    if area_key:
-        keywords = AREA_KEYWORDS.get(area_key, [])
-        if keywords:
-            q_area = Q()
-            for kw in keywords:
-                q_area |= Q(area__icontains=kw)
-            company_filter_qs.append(q_area)
-
-    # 推薦あり
-    if recommend == "1":
-        company_filter_qs.append(Q(tut_recommendation=True))
-
-    # 学内説明会あり（oncampus_briefing が空/NULLでないもの）
-    if briefing == "1":
-        company_filter_qs.append(
-            Q(oncampus_briefing__isnull=False) & ~Q(oncampus_briefing="")
-        )
-
-    # 企業フィルタのみAND / OR でまとめて適用
-    if company_filter_qs:
-        combined_q = company_filter_qs[0]
-        for q in company_filter_qs[1:]:
-            if filter_logic == "or":
-                combined_q |= q
-            else:
-                combined_q &= q
-        companies = companies.filter(combined_q).distinct()
-
-    # ソート
-    if sort == "employees":
-        companies = companies.order_by("-employees", "name")
-    elif sort == "starting_salary":
-        companies = companies.order_by("-starting_salary", "name")
-    elif sort == "annual_holidays":
-        companies = companies.order_by("-annual_holidays", "name")
-    elif sort == "review_count":
-        companies = companies.order_by("-review_count", "name")
-    else:
+    if sort not in ("employees", "starting_salary", "annual_holidays", "review_count"):
         sort = "name"
-        companies = companies.order_by("name")
-
-    # 学科プルダウン用
-    departments = Department.objects.using(DB_ALIAS).all()
+    for dept in departments:
+        dept.facet_count = facets["departments"].get(dept.short_name, 0)
 
     # 閲覧済み企業一覧（ログイン中のみ）
     person = get_current_person(request)
     if person:
         viewed_company_ids = list(CompanyView.objects.using(DB_ALIAS).filter(person=person).values_list('company_id', flat=True))
         # お気に入り企業一覧（ログイン中のみ）
-        favorite_company_ids = list(Person.objects.using(DB_ALIAS).filter(pk=person.pk).values_list('favorites__pk', flat=True))
+        favorite_company_ids = list(person.favorites.values_list('pk', flat=True))
     else:
         viewed_company_ids = []
         favorite_company_ids = []
@@ -569,6 +422,7 @@ def company_search(request):
         "filter_logic": filter_logic,
         "sort": sort,
         "lab_code": lab_code,
+        "facets": facets,
     }
     return render_with_person(request, "teams/shiokara/company_search.html", context)
 
@@ -582,37 +436,20 @@ def company_detail(request, pk):
         # 未ログインならログイン画面へ
         return redirect("shiokara:login")
 
-    # リフレッシュされた person 情報を取得
-    person = Person.objects.using(DB_ALIAS).get(pk=person.pk)
     # ポイント付与ポップアップ用フラグ（POST→redirect 後に表示するため session から取得）
     points_awarded = request.session.pop('points_awarded', None)
 
-    if person.points < 1:
+    if person.points < points.COMPANY_VIEW_COST:
         # ポイント不足: 専用のロック画面を表示
         return render_with_person(request, "teams/shiokara/company_detail_locked.html", {"company": company})
 
-    # 既にこのユーザーがこの企業を閲覧済みかを確認
-    viewed_exists = CompanyView.objects.using(DB_ALIAS).filter(person=person, company=company).exists()
-    first_point_usage = False
-    if not viewed_exists:
-        # 1ポイント消費（条件付きで安全に更新）
-        updated = Person.objects.using(DB_ALIAS).filter(pk=person.pk, points__gte=1).update(points=F('points') - 1)
-        if not updated:
-            # まれに同時更新で失敗した場合
-            return render_with_person(request, "teams/shiokara/company_detail_locked.html", {"company": company})
-
-        # 初回ポイント消費判定
-        first_point_usage = True
-
-        # 閲覧履歴を作成（以後この企業はポイントを消費しない）
-        try:
-            CompanyView.objects.using(DB_ALIAS).create(person=person, company=company)
-        except Exception:
-            # unique 制約違反等は無視して続行
-            pass
-
-        # 再取得して最新ポイント反映
-        person = Person.objects.using(DB_ALIAS).get(pk=person.pk)
+    # 未閲覧なら1ポイント消費して閲覧履歴を作成（以後この企業はポイントを消費しない）
+    # person.points は消費後の残高に更新されるので読み直しは不要
+    try:
+        _, first_point_usage = points.charge_company_view(person, company, using=DB_ALIAS)
+    except points.InsufficientPoints:
+        # まれに同時更新で残高が足りなくなった場合
+        return render_with_person(request, "teams/shiokara/company_detail_locked.html", {"company": company})
 
     sort = request.GET.get("sort", "new")
 
@@ -635,7 +472,7 @@ def company_detail(request, pk):
         "first_point_usage": first_point_usage,
         "seen_points_tutorial": getattr(person, "seen_points_tutorial", False) if person else False,
         # このユーザーがこの企業をお気に入り登録しているか
-        "is_favorite": bool(person and Person.objects.using(DB_ALIAS).filter(pk=person.pk, favorites__pk=company.pk).exists()),
+        "is_favorite": person.favorites.filter(pk=company.pk).exists(),
     }
     return render_with_person(request, "teams/shiokara/company_detail.html", context)
 
@@ -659,16 +496,12 @@ def company_experience_post(request, pk):
         "rating": "",
     }
     # ログインユーザーの情報があればプリセット
-    try:
-        refreshed = Person.objects.using(DB_ALIAS).get(pk=person.pk)
-        initial.update({
-            "grade": f"{refreshed.course}{refreshed.grade}",
-            "department_name": refreshed.department_name,
-            "lab_field": refreshed.lab_field,
-            "gender": getattr(refreshed, "gender", "no_answer") or "no_answer",
-        })
-    except Exception:
-        pass
+    initial.update({
+        "grade": f"{person.course}{person.grade}",
+        "department_name": person.department_name,
+        "lab_field": person.lab_field,
+        "gender": getattr(person, "gender", "no_answer") or "no_answer",
+    })
     error = None
 
     if request.method == "POST":
@@ -708,22 +541,23 @@ def company_experience_post(request, pk):
             if latest and latest.created_at and latest.created_at >= ten_minutes_ago:
                 error = "この企業には直近10分以内に口コミが投稿されています。しばらく待ってから再度投稿してください。"
             else:
-                review = CompanyReview.objects.using(DB_ALIAS).create(
-                    company=company,
-                    grade=grade,
-                    department_name=department_name,
-                    lab_field=lab_field,
-                    gender=gender,
-                    comment=comment,
-                    rating=rating,
-                )
+                # 口コミの保存と投稿者へのポイント付与（+5）を同じトランザクションで行う
+                with transaction.atomic(using=DB_ALIAS):
+                    review = CompanyReview.objects.using(DB_ALIAS).create(
+                        company=company,
+                        grade=grade,
+                        department_name=department_name,
+                        lab_field=lab_field,
+                        gender=gender,
+                        comment=comment,
+                        rating=rating,
+                    )
+                    points.credit(person, points.REVIEW_REWARD, "review", company=company, using=DB_ALIAS)
+
+                journal.record_review(review)
 
-                append_review_to_fixture(review)
-
-                # 投稿者にポイント付与（+5）
-                Person.objects.using(DB_ALIAS).filter(pk=person.pk).update(points=F('points') + 5)
                 # セッションに付与情報を入れてリダイレクト先でポップアップ表示する
-                request.session['points_awarded'] = 5
+                request.session['points_awarded'] = points.REVIEW_REWARD
 
                 return redirect("shiokara:company_detail", pk=company.pk)
 
@@ -742,9 +576,6 @@ def toggle_favorite(request, pk):
     if not person:
         return redirect("shiokara:login")
 
-    # リフレッシュ
-    person = Person.objects.using(DB_ALIAS).get(pk=person.pk)
-
     # トグル
     exists = person.favorites.filter(pk=company.pk).exists()
     try:
@@ -763,41 +594,6 @@ def toggle_favorite(request, pk):
 
     return redirect("shiokara:company_detail", pk=company.pk)
 
-def append_review_to_fixture(review: CompanyReview) -> None:
-    """投稿されたレビューを JSON フィクスチャに 1 件追記する"""
-
-    if FIXTURE_PATH.exists():
-        try:
-            text = FIXTURE_PATH.read_text(encoding="utf-8")
-            data = json.loads(text) if text.strip() else []
-        except json.JSONDecodeError:
-            data = []
-    else:
-        data = []
-
-    obj = {
-        "model": "shiokara.companyreview",
-        "pk": review.pk,
-        "fields": {
-            "company": review.company_id,
-            "grade": review.grade,
-            "department_name": review.department_name,
-            "lab_field": review.lab_field,
-            "gender": review.gender,
-            "comment": review.comment,
-            "rating": review.rating,
-            "created_at": review.created_at.isoformat(),
-        },
-    }
-
-    data.append(obj)
-
-    FIXTURE_PATH.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
-
-
 def sitemap(request):
     """
     サイトマップページ。
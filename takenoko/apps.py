@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TakenokoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'takenoko'
+
+    def ready(self):
+        # 商品画像のアップロード時に一覧用のサムネイルを作る
+        from thumbnails.derivatives import register
+        register(self.get_model('ItemImage'))
@@ -1,6 +1,9 @@
+from pbl_project.context_processors import LazyValue
+
 from .views import get_current_user
 
 def takenoko_user(request):
+    # /takenoko/ のページだけで呼ばれ（settings.APP_CONTEXT_PROCESSORS）、テンプレートが使ったときだけ読み込む
     return {
-        'takenoko_user': get_current_user(request),
-    }
\ No newline at end of file
+        'takenoko_user': LazyValue(lambda: get_current_user(request)),
+    }
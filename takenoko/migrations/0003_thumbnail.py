@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('takenoko', '0002_initial_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, default='', editable=False, max_length=255, upload_to='takenoko/items/thumbs/', verbose_name='サムネイル'),
+        ),
+    ]
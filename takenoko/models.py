@@ -4,6 +4,8 @@ from uuid import uuid4
 import os
 from datetime import datetime
 
+from thumbnails.derivatives import thumbnail_url
+
 # アバター画像のファイル名を生成する関数
 def avatar_upload_path(instance, filename):
     """
@@ -104,6 +106,9 @@ class Tag(models.Model):
 class ItemImage(models.Model):
     item = models.ForeignKey('Item', on_delete=models.CASCADE, related_name='images', verbose_name="商品")
     image = models.ImageField("画像", upload_to=item_image_upload_path)
+    # 一覧用のサムネイル（thumbnails.derivatives が image から作る）
+    thumbnail = models.ImageField("サムネイル", upload_to='takenoko/items/thumbs/', max_length=255, blank=True, default='',
+                                  editable=False)
     order = models.PositiveIntegerField("画像順序", default=1)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
@@ -115,6 +120,11 @@ class ItemImage(models.Model):
     def __str__(self):
         return f"{self.item.name} - 画像{self.order}"
 
+    @property
+    def thumbnail_url(self):
+        """一覧用のサムネイルの URL（作れない場合は元の画像）"""
+        return thumbnail_url(self)
+
 # --- 対象学年 ---
 class TargetGrade(models.Model):
     code = models.CharField("学年コード", max_length=10, unique=True, primary_key=True)
@@ -174,7 +184,6 @@ class Item(models.Model):
         return f"{self.name} - {self.price}"
     
     def get_main_image(self):
-        """メイン画像を取得（最初の画像）"""
-        if self.images.exists():
-            return self.images.first()
-        return None
\ No newline at end of file
+        """メイン画像を取得（最初の画像）。images を prefetch していればクエリを発行しない"""
+        images = list(self.images.all())
+        return images[0] if images else None
\ No newline at end of file
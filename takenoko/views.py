@@ -51,7 +51,8 @@ def main(request):
     if price_filter == 'free':
         items = items.filter(price=0)
     
-    items = items[:12]
+    # カードのメイン画像をまとめて読み込む（get_main_image が商品ごとにクエリを発行しないように）
+    items = items.prefetch_related('images')[:12]
     
     # 登録されているすべてのタグを取得
     tags = Tag.objects.all()
@@ -67,14 +68,16 @@ def main(request):
 def purchased_items(request):
     current_user = get_current_user(request)
     # 自分が購入者で、取引中または取引成立のアイテムを取得
-    items = Item.objects.filter(buyer=current_user, status__in=['negotiation', 'sold']).order_by('-updated_at')
+    items = Item.objects.filter(
+        buyer=current_user, status__in=['negotiation', 'sold']
+    ).prefetch_related('images').order_by('-updated_at')
     return render(request, 'teams/takenoko/purchased_items.html', {"items": items})
 
 @takenoko_login_required
 def listing_items(request):
     user = get_current_user(request)
     # ログインユーザーが出品した商品を取得（新着順）
-    items = Item.objects.filter(seller=user).order_by('-created_at')
+    items = Item.objects.filter(seller=user).prefetch_related('images').order_by('-created_at')
     return render(request, 'teams/takenoko/listing_items.html', {"items": items})
 
 def product_details(request):
@@ -0,0 +1,573 @@
+"""
+プロジェクトのコンパイル（PDF のキャッシュとワーカープール）
+
+以前の compile_project はクリックのたびに全 ProjectFile を一時ディレクトリへ書き出し、
+リクエストのスレッドで latexmk の終了を最大 60 秒待っていた。内容が同じでも毎回最初からコンパイルしていた。
+
+ここでは
+- ファイル名・内容・メインファイル・コンパイラから SHA-256 のダイジェストを作り、
+  コンパイルした PDF をダイジェストをファイル名にしてディスクに保存する（同じ内容なら即座に返す）
+- キャッシュにない場合は CompileQueue のワーカースレッドでコンパイルし、リクエストはジョブを返してすぐ戻る。
+  同じ内容のジョブは 1 つにまとめ、作成者ごとに同時に受け付けるジョブ数を制限する
+- ブラウザはジョブの状態 API をポーリングし、完了したら PDF の URL を読み込む
+- コンパイルはプロジェクトごとの作業ディレクトリ（WorkspaceCache）で行う。変わったファイルだけを書き直し、
+  .aux / .toc / .bbl などの中間ファイルを残すので、latexmk は 2 回目以降たいてい 1 パスで済む。
+  作業ディレクトリは合計サイズが TEAM_TEXTEX_WORKSPACE_BUDGET_MB を超えたら、最後に使われたものが古い順に消す
+
+数式などのスニペット（api/compile_latex.py）は compile_snippet() で、リクエストごとの一時ディレクトリで
+コンパイルし、同じ PDF のキャッシュに入れる。同じ内容の同時リクエストは 1 回のコンパイルにまとめる。
+
+コンパイラは差し替え可能:
+    settings.TEAM_TEXTEX_COMPILER = 'team_TeXTeX.compiler.LatexmkCompiler'
+    settings.TEAM_TEXTEX_SNIPPET_COMPILER = 'team_TeXTeX.compiler.LualatexCompiler'
+または set_compiler() でテスト用の偽コンパイラを設定する。
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# バイナリファイルは ProjectFile.content に "[BASE64]" + Base64 文字列で保存されている
+BASE64_PREFIX = '[BASE64]'
+
+# 完了したジョブの状態を保持する件数（古いものから忘れる）
+JOB_HISTORY = 200
+
+DIGEST_RE = re.compile(r'[0-9a-f]{64}')
+
+
+class CompileError(Exception):
+    """コンパイルできなかった（メッセージとコンパイラのログを持つ）"""
+
+    def __init__(self, message, log=''):
+        super().__init__(message)
+        self.message = message
+        self.log = log
+
+
+class CompilerNotFound(CompileError):
+    """コンパイラのコマンドがサーバーにない"""
+
+
+class CompileLimitExceeded(Exception):
+    """作成者ごとの同時コンパイル数の上限を超えた"""
+
+
+class CommandCompiler:
+    """TeX のコマンドを workdir で実行するコンパイラ（サブクラスで command() を決める）"""
+
+    # ダイジェストに含める名前（コンパイラを替えたら別のキャッシュになる）
+    name = None
+    # 終了コードが 0 以外なら、PDF ができていても失敗とするか
+    require_success = True
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout or getattr(settings, 'TEAM_TEXTEX_COMPILE_TIMEOUT', 60)
+
+    def command(self, main):
+        raise NotImplementedError
+
+    def compile(self, workdir, main):
+        """
+        workdir にあるメインファイルをコンパイルする
+
+        Returns:
+            tuple: (生成された PDF のパス, コンパイラのログ)
+
+        Raises:
+            CompileError: コンパイルに失敗した場合
+        """
+        cmd = self.command(main)
+        try:
+            process = subprocess.run(
+                cmd, cwd=workdir, timeout=self.timeout, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except subprocess.TimeoutExpired:
+            raise CompileError('Compilation timed out.')
+        except FileNotFoundError:
+            raise CompilerNotFound(f"Backend Error: '{cmd[0]}' command not found on server.")
+
+        log = process.stdout.decode('utf-8', errors='replace') + process.stderr.decode('utf-8', errors='replace')
+        if self.require_success and process.returncode != 0:
+            raise CompileError('Compilation failed.', log)
+        pdf_path = Path(workdir) / (os.path.splitext(main)[0] + '.pdf')
+        if not pdf_path.exists():
+            raise CompileError('PDF not generated.', log)
+        return pdf_path, log
+
+
+class LatexmkCompiler(CommandCompiler):
+    """latexmk でプロジェクトをコンパイルする標準のコンパイラ"""
+
+    name = 'latexmk'
+
+    def command(self, main):
+        # -interaction=nonstopmode: エラーで止まらないようにする
+        # エンジン（uplatex + dvipdfmx 等）はプロジェクトの .latexmkrc の設定に従う
+        return ['latexmk', '-interaction=nonstopmode', main]
+
+
+class LualatexCompiler(CommandCompiler):
+    """
+    lualatex で 1 回だけコンパイルする、数式などのスニペット用の標準のコンパイラ
+    エラーがあっても PDF ができていれば成功とする
+    """
+
+    name = 'lualatex'
+    require_success = False
+
+    def command(self, main):
+        return ['lualatex', '-interaction=nonstopmode', main]
+
+
+# 用途ごとのコンパイラの設定名と既定値
+COMPILER_SETTINGS = {
+    'project': ('TEAM_TEXTEX_COMPILER', 'team_TeXTeX.compiler.LatexmkCompiler'),
+    'snippet': ('TEAM_TEXTEX_SNIPPET_COMPILER', 'team_TeXTeX.compiler.LualatexCompiler'),
+}
+
+_compilers = {}
+
+
+def get_compiler(kind='project'):
+    """設定されたコンパイラを返す（kind は 'project' または 'snippet'）"""
+    if kind not in _compilers:
+        setting_name, default = COMPILER_SETTINGS[kind]
+        _compilers[kind] = import_string(getattr(settings, setting_name, default))()
+    return _compilers[kind]
+
+
+def set_compiler(compiler, kind='project'):
+    """
+    コンパイラを差し替える（テスト用）
+
+    Returns:
+        差し替え前のコンパイラ
+    """
+    previous = _compilers.get(kind)
+    if compiler is None:
+        _compilers.pop(kind, None)
+    else:
+        _compilers[kind] = compiler
+    return previous
+
+
+def build_dir():
+    """コンパイル結果を置くディレクトリ（settings.TEAM_TEXTEX_BUILD_DIR）"""
+    return Path(getattr(settings, 'TEAM_TEXTEX_BUILD_DIR', settings.BASE_DIR / 'team_TeXTeX' / 'build'))
+
+
+# -------------------------
+# プロジェクトの内容
+# -------------------------
+
+class ProjectSnapshot:
+    """
+    コンパイルするプロジェクトの内容
+    ワーカーが DB を読まずに済むよう、リクエストの中で読み込んでおく
+    """
+
+    def __init__(self, project_id, owner_id, main, files, compiler_name):
+        self.project_id = project_id
+        self.owner_id = owner_id
+        self.main = main
+        self.files = files
+        # ファイルごとのハッシュ（作業ディレクトリの同期で、変わったファイルを見分けるのにも使う）
+        self.file_hashes = {filename: _digest([content]) for filename, content in files}
+        self.digest = _digest(
+            [compiler_name, main] + [part for item in sorted(self.file_hashes.items()) for part in item]
+        )
+
+
+def _digest(parts):
+    """文字列の並びの SHA-256（区切りが曖昧にならないよう、各要素の長さを前に付ける）"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode('utf-8')
+        digest.update(b'%d:' % len(data))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def snapshot_project(project, compiler=None):
+    """
+    プロジェクトのファイルを読み込む
+
+    Raises:
+        CompileError: メインの TeX ファイルがない場合
+    """
+    compiler = compiler or get_compiler()
+    rows = list(project.files.order_by('id').values_list('filename', 'content', 'is_main'))
+
+    # メイン指定がない場合は、拡張子が .tex の最初のファイルを使用する
+    main = next((filename for filename, _, is_main in rows if is_main), None)
+    if main is None:
+        main = next((filename for filename, _, _ in rows if filename.endswith('.tex')), None)
+    if main is None:
+        raise CompileError('Main TeX file not found.')
+
+    files = [(filename, content or '') for filename, content, _ in rows]
+    return ProjectSnapshot(project.id, project.owner_id, main, files, compiler.name)
+
+
+def write_file(workdir, filename, content):
+    """ProjectFile の内容を workdir に書き出す（Base64 のファイルはバイナリに戻す）"""
+    root = os.path.realpath(workdir)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root:
+        raise CompileError(f'Invalid file name: {filename}')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    if content.startswith(BASE64_PREFIX):
+        with open(path, 'wb') as dst:
+            dst.write(base64.b64decode(content[len(BASE64_PREFIX):]))
+    else:
+        with open(path, 'w', encoding='utf-8') as dst:
+            dst.write(content)
+
+
+# -------------------------
+# 作業ディレクトリ
+# -------------------------
+
+# 作業ディレクトリごとのロック（同じプロジェクトの別の内容のジョブが同時に書き込まないようにする）
+_workspace_locks = defaultdict(threading.Lock)
+_workspace_locks_lock = threading.Lock()
+
+
+def _workspace_lock(path):
+    with _workspace_locks_lock:
+        return _workspace_locks[str(path)]
+
+
+def _tree_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class WorkspaceCache:
+    """
+    プロジェクトごとの作業ディレクトリ
+    最後に書き出したファイルのハッシュを MANIFEST に記録し、次のコンパイルでは変わったファイルだけを書き直す
+    （消えたファイルは消す）。中間ファイルには触らない
+    """
+
+    MANIFEST = '.textex-workspace.json'
+
+    def __init__(self, root, budget_bytes):
+        self.root = Path(root)
+        self.budget_bytes = budget_bytes
+
+    def path(self, project_id):
+        return self.root / str(project_id)
+
+    @contextmanager
+    def open(self, snapshot):
+        """
+        スナップショットの内容に同期した作業ディレクトリを返す
+        コンパイルに失敗した場合は、壊れた中間ファイルを持ち越さないよう作業ディレクトリごと消す
+        """
+        workdir = self.path(snapshot.project_id)
+        with _workspace_lock(workdir):
+            try:
+                self._sync(workdir, snapshot)
+                yield workdir
+            except BaseException:
+                shutil.rmtree(workdir, ignore_errors=True)
+                raise
+        self._evict(keep=workdir)
+
+    def _sync(self, workdir, snapshot):
+        manifest_path = workdir / self.MANIFEST
+        try:
+            written = json.loads(manifest_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            # 初回、または記録が壊れている場合は作り直す
+            shutil.rmtree(workdir, ignore_errors=True)
+            written = {}
+        workdir.mkdir(parents=True, exist_ok=True)
+
+        for filename in set(written) - set(snapshot.file_hashes):
+            path = workdir / filename
+            if path.is_file():
+                path.unlink()
+        for filename, content in snapshot.files:
+            if written.get(filename) != snapshot.file_hashes[filename]:
+                write_file(workdir, filename, content)
+
+        # 最後に使われた時刻として MANIFEST の mtime を使う
+        manifest_path.write_text(json.dumps(snapshot.file_hashes), encoding='utf-8')
+
+    def _evict(self, keep):
+        """合計サイズが予算を超えていれば、最後に使われたのが古い作業ディレクトリから消す"""
+        entries = []
+        for workdir in self.root.iterdir():
+            if not workdir.is_dir() or workdir == keep:
+                continue
+            try:
+                last_used = (workdir / self.MANIFEST).stat().st_mtime
+            except FileNotFoundError:
+                last_used = 0
+            entries.append((last_used, workdir))
+        sizes = {workdir: _tree_size(workdir) for _, workdir in entries}
+        total = _tree_size(keep) + sum(sizes.values())
+
+        for _, workdir in sorted(entries):
+            if total <= self.budget_bytes:
+                break
+            lock = _workspace_lock(workdir)
+            # コンパイル中の作業ディレクトリは消さない
+            if lock.acquire(blocking=False):
+                try:
+                    shutil.rmtree(workdir, ignore_errors=True)
+                finally:
+                    lock.release()
+                total -= sizes[workdir]
+
+
+def get_workspaces():
+    budget_mb = getattr(settings, 'TEAM_TEXTEX_WORKSPACE_BUDGET_MB', 500)
+    return WorkspaceCache(build_dir() / 'workspaces', budget_mb * 1024 * 1024)
+
+
+# -------------------------
+# PDF のキャッシュ
+# -------------------------
+
+class PdfCache:
+    """
+    ダイジェストをファイル名にした PDF のキャッシュ
+    max_files を超えたら、最後に使われた（mtime が古い）ものから消す
+    """
+
+    def __init__(self, root, max_files):
+        self.root = Path(root)
+        self.max_files = max_files
+
+    def path(self, digest):
+        return self.root / f'{digest}.pdf'
+
+    def get(self, digest):
+        """キャッシュがあればそのパスを返す"""
+        path = self.path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def store(self, digest, pdf_path):
+        """PDF をキャッシュに入れる（読み込み中のリクエストが壊れたファイルを見ないよう、置き換えで書き込む）"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as dst, open(pdf_path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, self.path(digest))
+        self._prune()
+
+    def _prune(self):
+        entries = []
+        for path in self.root.glob('*.pdf'):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                pass
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_files, 0)]:
+            path.unlink(missing_ok=True)
+
+
+def get_pdf_cache():
+    return PdfCache(build_dir() / 'pdf', getattr(settings, 'TEAM_TEXTEX_PDF_CACHE_SIZE', 200))
+
+
+# -------------------------
+# ジョブとワーカープール
+# -------------------------
+
+class CompileJob:
+    """1 回のコンパイル（status は queued / running / done / failed）"""
+
+    def __init__(self, snapshot, status='queued'):
+        self.id = uuid.uuid4().hex
+        self.project_id = snapshot.project_id
+        self.owner_id = snapshot.owner_id
+        self.digest = snapshot.digest
+        self.status = status
+        self.message = ''
+        self.log = ''
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def as_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'digest': self.digest,
+            'message': self.message,
+            'log': self.log,
+        }
+
+
+class CompileQueue:
+    """
+    コンパイルのジョブをワーカースレッドで実行する
+    同じダイジェストのジョブが実行中ならそれを返し、作成者ごとに未完了のジョブ数を制限する
+    """
+
+    def __init__(self, workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='textex-compile')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._finished = deque()
+
+    def submit(self, snapshot, compiler, cache, workspaces, per_owner):
+        """
+        ジョブを登録する
+
+        Raises:
+            CompileLimitExceeded: 作成者の未完了のジョブが per_owner 件以上ある場合
+        """
+        with self._lock:
+            job = self._active.get(snapshot.digest)
+            if job is not None:
+                return job
+            if sum(1 for active in self._active.values() if active.owner_id == snapshot.owner_id) >= per_owner:
+                raise CompileLimitExceeded()
+            job = CompileJob(snapshot)
+            self._jobs[job.id] = job
+            self._active[job.digest] = job
+        self._executor.submit(self._run, job, snapshot, compiler, cache, workspaces)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, snapshot, compiler, cache, workspaces):
+        job.status = 'running'
+        try:
+            with workspaces.open(snapshot) as workdir:
+                pdf_path, job.log = compiler.compile(workdir, snapshot.main)
+                cache.store(job.digest, pdf_path)
+        except CompileError as e:
+            job.message, job.log = e.message, e.log
+            job.status = 'failed'
+        except Exception as e:
+            logger.exception('team_TeXTeX: compile job %s failed', job.id)
+            job.message = f'Internal Server Error: {e}'
+            job.status = 'failed'
+        else:
+            job.status = 'done'
+        finally:
+            with self._lock:
+                del self._active[job.digest]
+                self._finished.append(job.id)
+                while len(self._finished) > JOB_HISTORY:
+                    self._jobs.pop(self._finished.popleft(), None)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """ワーカープール（settings.TEAM_TEXTEX_COMPILE_WORKERS 本のスレッド）を返す"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = CompileQueue(getattr(settings, 'TEAM_TEXTEX_COMPILE_WORKERS', 2))
+        return _queue
+
+
+def start_compile(project):
+    """
+    プロジェクトのコンパイルを始める
+
+    Returns:
+        CompileJob: キャッシュにあれば完了済み（status='done'）のジョブ、なければ登録したジョブ
+
+    Raises:
+        CompileError: メインの TeX ファイルがない場合
+        CompileLimitExceeded: 作成者の同時コンパイル数の上限を超えた場合
+    """
+    compiler = get_compiler()
+    snapshot = snapshot_project(project, compiler)
+    cache = get_pdf_cache()
+    if cache.get(snapshot.digest):
+        return CompileJob(snapshot, status='done')
+    per_owner = getattr(settings, 'TEAM_TEXTEX_COMPILE_JOBS_PER_OWNER', 2)
+    return get_queue().submit(snapshot, compiler, cache, get_workspaces(), per_owner)
+
+
+# -------------------------
+# スニペット
+# -------------------------
+
+SNIPPET_FILENAME = 'document.tex'
+
+# コンパイル中のスニペットのダイジェストごとのロック
+_snippet_locks = {}
+_snippet_locks_lock = threading.Lock()
+
+
+def compile_snippet(latex_code):
+    """
+    LaTeX のスニペットをコンパイルして PDF のキャッシュに入れる
+    リクエストごとに別の一時ディレクトリを使うので、別の内容のリクエストは並行してコンパイルできる
+
+    Returns:
+        tuple: (PDF のダイジェスト, コンパイラのログ（キャッシュにあった場合は空）)
+
+    Raises:
+        CompileError: コンパイルに失敗した場合
+    """
+    compiler = get_compiler('snippet')
+    digest = _digest(['snippet', compiler.name, latex_code])
+    cache = get_pdf_cache()
+    if cache.get(digest):
+        return digest, ''
+
+    with _snippet_locks_lock:
+        lock = _snippet_locks.setdefault(digest, threading.Lock())
+    try:
+        with lock:
+            # 同じ内容の先行リクエストがコンパイルし終えていれば、その結果を使う
+            if cache.get(digest):
+                return digest, ''
+            with tempfile.TemporaryDirectory(prefix='textex-snippet-') as workdir:
+                with open(os.path.join(workdir, SNIPPET_FILENAME), 'w', encoding='utf-8') as f:
+                    f.write(latex_code)
+                pdf_path, log = compiler.compile(workdir, SNIPPET_FILENAME)
+                cache.store(digest, pdf_path)
+            return digest, log
+    finally:
+        with _snippet_locks_lock:
+            if _snippet_locks.get(digest) is lock:
+                del _snippet_locks[digest]
@@ -84,14 +84,9 @@ document.addEventListener('DOMContentLoaded', function () {
   }
 
   /**
-   * PDFをロード・リロードする関数 (外部から呼べるようにwindowに公開するか、イベントで連携)
-   * @param {string} url - PDFのURL
+   * エラー表示用コンテナを取得または作成する
    */
-  window.loadPDF = function (url) {
-    currentPdfUrl = url;
-    console.log("Loading PDF from:", url);
-
-    // エラー表示用コンテナを取得または作成
+  function getErrorContainer() {
     let errorContainer = document.getElementById('pdf-error-container');
     if (!errorContainer) {
       errorContainer = document.createElement('div');
@@ -111,19 +106,57 @@ document.addEventListener('DOMContentLoaded', function () {
       // canvasContainerの親要素に追加するが、canvasContainer自体を隠す必要があるかもしれない
       canvasContainer.appendChild(errorContainer);
     }
+    return errorContainer;
+  }
+
+  /**
+   * ローディング表示を消し、コンパイルボタンを元に戻す
+   */
+  function finishCompiling() {
+    const overlay = document.getElementById('loading-overlay');
+    if (overlay) overlay.style.display = 'none';
+
+    // コンパイル完了フラグ OFF & ボタン復帰
+    window.isCompiling = false;
+    const compileButton = document.getElementById('compile-button');
+    if (compileButton) {
+      compileButton.disabled = false;
+      compileButton.innerHTML = '<span class="material-symbols-rounded">play_arrow</span>';
+    }
+  }
+
+  /**
+   * エラー（メッセージとコンパイルログ）を表示する
+   * ログにはユーザーのTeXソースが含まれるので、HTMLとしてではなくテキストとして表示する
+   */
+  function showError(message, log) {
+    finishCompiling();
+    const errorContainer = getErrorContainer();
+    pdfCanvas.style.display = 'none';
+    errorContainer.style.display = 'block';
+    errorContainer.textContent = log ? `${message}\n\n${log}` : message;
+  }
+
+  /**
+   * PDFをロード・リロードする関数 (外部から呼べるようにwindowに公開するか、イベントで連携)
+   * @param {string} url - PDFのURL
+   */
+  window.loadPDF = function (url) {
+    currentPdfUrl = url;
+    console.log("Loading PDF from:", url);
 
     // まずエラーを非表示、Canvasを表示
+    const errorContainer = getErrorContainer();
     errorContainer.style.display = 'none';
-    errorContainer.innerHTML = '';
+    errorContainer.textContent = '';
     pdfCanvas.style.display = 'block';
 
     // FetchでPDFを取得することでステータスコードを確認
     fetch(url)
       .then(response => {
         if (!response.ok) {
-          // エラーの場合 (500 Internal Server Errorなど)
           return response.text().then(text => {
-            throw new Error("Compilation Error:\n" + text);
+            throw new Error(text);
           });
         }
         return response.blob();
@@ -139,54 +172,40 @@ document.addEventListener('DOMContentLoaded', function () {
       })
       .then(function (pdf) {
         pdfDoc = pdf;
-        // console.log("PDF Loaded. Pages:", pdf.numPages);
-        // console.log("PDF Loaded. Pages:", pdf.numPages);
         return renderPage(pageNum);
       })
-      .then(function () {
-        // ローディング非表示
-        const overlay = document.getElementById('loading-overlay');
-        if (overlay) overlay.style.display = 'none';
-
-        // コンパイル完了フラグ OFF & ボタン復帰
-        window.isCompiling = false;
-        const compileButton = document.getElementById('compile-button');
-        if (compileButton) {
-          compileButton.disabled = false;
-          compileButton.innerHTML = '<span class="material-symbols-rounded">play_arrow</span>';
-        }
-
-      }, function (reason) {
+      .then(finishCompiling, function (reason) {
         // PDF loading error
         console.error('Error loading PDF:', reason);
+        showError('PDFの読み込みに失敗しました。', reason.message || String(reason));
+      });
+  };
 
-        // ローディング非表示 (エラー時も)
-        const overlay = document.getElementById('loading-overlay');
-        if (overlay) overlay.style.display = 'none';
-
-        // コンパイル完了フラグ OFF & ボタン復帰
-        window.isCompiling = false;
-        const compileButton = document.getElementById('compile-button');
-        if (compileButton) {
-          compileButton.disabled = false;
-          compileButton.innerHTML = '<span class="material-symbols-rounded">play_arrow</span>';
-        }
-
-        // エラーを画面に表示
-        // pdfCanvas.style.display = 'none'; // This is already handled below
-        // errorContainer.style.display = 'block'; // This is already handled below
-        // ... error display logic can remain or be improved here
-        pdfCanvas.style.display = 'none';
-        errorContainer.style.display = 'block';
-        // HTMLタグが含まれている場合があるのでinnerHTMLを使うが、XSSに注意
-        // views.pyからは <br><pre>...</pre> で返ってくる想定
-        // エラーメッセージの prefix "Compilation Error:\n" を除去して表示
-        let msg = reason.message || reason;
-        if (typeof msg === 'string' && msg.startsWith("Compilation Error:\n")) {
-          msg = msg.substring("Compilation Error:\n".length);
+  /**
+   * プロジェクトのコンパイルを依頼し、完了したらPDFを表示する
+   * サーバーはジョブを返してすぐ戻るので、完了（done / failed）までジョブの状態をポーリングする
+   * @param {string} url - コンパイルAPIのURL
+   */
+  window.compileProject = function (url) {
+    const poll = (pollUrl, delay) => fetch(pollUrl)
+      .then(response => response.json().then(job => ({ response, job })))
+      .then(({ response, job }) => {
+        if (job.status === 'done') {
+          window.loadPDF(job.pdf_url);
+        } else if (job.status === 'failed' && response.status === 429) {
+          // 同時コンパイル数の上限：少し待ってから依頼し直す
+          setTimeout(() => poll(url, delay), 1000);
+        } else if (job.status === 'failed') {
+          showError(job.message, job.log);
+        } else {
+          setTimeout(() => poll(job.status_url, Math.min(delay * 1.5, 2000)), delay);
         }
-        errorContainer.innerHTML = msg;
+      })
+      .catch(error => {
+        console.error('Error compiling project:', error);
+        showError('コンパイルの状態を取得できませんでした。', String(error));
       });
+    poll(url, 300);
   };
 
   // --------------------------------------------------------
@@ -1,3 +1,247 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
 
-# Create your tests here.
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from . import compiler
+from .models import Project, ProjectFile, Users
+
+
+class FakeCompiler:
+    """
+    latexmk の代わりに、メインファイルの内容をそのまま PDF として書き出すコンパイラ
+    内容に \\error があれば失敗し、gate を設定すると開くまでコンパイルを止める
+    中間ファイル main.aux を書き、前回の main.aux が残っていたかを reused_aux に記録する
+    """
+
+    name = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = None
+        self.reused_aux = []
+        self._lock = threading.Lock()
+
+    def compile(self, workdir, main):
+        with self._lock:
+            self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        aux_path = Path(workdir) / 'main.aux'
+        self.reused_aux.append(aux_path.exists())
+        aux_path.write_text('aux', encoding='utf-8')
+        source = (Path(workdir) / main).read_text(encoding='utf-8')
+        if '\\error' in source:
+            raise compiler.CompileError('Compilation failed.', '! Undefined control sequence.')
+        pdf_path = Path(workdir) / 'main.pdf'
+        pdf_path.write_bytes(b'%PDF-fake\n' + source.encode('utf-8'))
+        return pdf_path, 'fake log'
+
+
+class FakeCompilerMixin:
+    """ビルド用の一時ディレクトリと偽コンパイラを設定する"""
+
+    compiler_kind = 'project'
+
+    def setUp(self):
+        build_dir = tempfile.mkdtemp()
+        self.workspaces = Path(build_dir) / 'workspaces'
+        self.addCleanup(shutil.rmtree, build_dir, ignore_errors=True)
+        settings_override = override_settings(TEAM_TEXTEX_BUILD_DIR=build_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.compiler = FakeCompiler()
+        previous = compiler.set_compiler(self.compiler, self.compiler_kind)
+        self.addCleanup(compiler.set_compiler, previous, self.compiler_kind)
+
+
+class CompileProjectTest(FakeCompilerMixin, TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        super().setUp()
+
+        self.owner = Users.objects.create(user_id=1, user='Alice')
+        self.project = Project.objects.create(name='Report', owner=self.owner)
+        self.main = ProjectFile.objects.create(project=self.project, filename='main.tex', content='Hello', is_main=True)
+
+    def compile(self, project=None):
+        return self.client.get(reverse('team_TeXTeX:compile_project', args=[(project or self.project).id]))
+
+    def wait(self, response):
+        """ジョブが完了するまで状態 API をポーリングし、最後の状態を返す"""
+        data = response.json()
+        deadline = time.monotonic() + 5
+        while data['status'] in ('queued', 'running'):
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+            data = self.client.get(data['status_url']).json()
+        return data
+
+    def test_compile_runs_in_background_and_serves_pdf(self):
+        response = self.compile()
+        self.assertEqual(response.status_code, 202)
+
+        data = self.wait(response)
+        self.assertEqual(data['status'], 'done')
+        pdf = self.client.get(data['pdf_url'])
+        self.assertEqual(pdf['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(pdf.streaming_content), b'%PDF-fake\nHello')
+
+    def test_same_content_is_served_from_cache(self):
+        first = self.wait(self.compile())
+
+        response = self.compile()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pdf_url'], first['pdf_url'])
+        self.assertEqual(self.compiler.calls, 1)
+
+        # 内容が変われば別のダイジェストでコンパイルし直す
+        self.main.content = 'Hello again'
+        self.main.save()
+        second = self.wait(self.compile())
+        self.assertNotEqual(second['pdf_url'], first['pdf_url'])
+        self.assertEqual(self.compiler.calls, 2)
+
+    def test_failed_compile_returns_log_and_is_not_cached(self):
+        self.main.content = '\\error'
+        self.main.save()
+
+        data = self.wait(self.compile())
+        self.assertEqual(data['status'], 'failed')
+        self.assertEqual(data['log'], '! Undefined control sequence.')
+
+        self.assertEqual(self.compile().status_code, 202)
+
+    def test_jobs_are_shared_and_limited_per_owner(self):
+        self.compiler.gate = threading.Event()
+        self.addCleanup(self.compiler.gate.set)
+        other = Project.objects.create(name='Slides', owner=self.owner)
+        ProjectFile.objects.create(project=other, filename='slides.tex', content='Slides')
+
+        with override_settings(TEAM_TEXTEX_COMPILE_JOBS_PER_OWNER=1):
+            first = self.compile().json()
+            self.assertEqual(self.compile().json()['job_id'], first['job_id'])
+            self.assertEqual(self.compile(other).status_code, 429)
+
+        self.compiler.gate.set()
+        self.assertEqual(self.wait(self.client.get(first['status_url']))['status'], 'done')
+        self.assertEqual(self.compiler.calls, 1)
+
+    def test_missing_main_file_and_unknown_pdf(self):
+        self.main.delete()
+        self.assertEqual(self.compile().status_code, 400)
+
+        response = self.client.get(reverse('team_TeXTeX:project_pdf', args=[self.project.id, '0' * 64]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_workspace_keeps_intermediate_files_and_syncs_changes(self):
+        ProjectFile.objects.create(project=self.project, filename='chapters/one.tex', content='One')
+        extra = ProjectFile.objects.create(project=self.project, filename='extra.tex', content='Extra')
+        self.wait(self.compile())
+        workdir = self.workspaces / str(self.project.id)
+        chapter_mtime = (workdir / 'chapters' / 'one.tex').stat().st_mtime_ns
+
+        self.main.content = 'Edited'
+        self.main.save()
+        extra.delete()
+        time.sleep(0.01)
+        self.assertEqual(self.wait(self.compile())['status'], 'done')
+
+        self.assertEqual(self.compiler.reused_aux, [False, True])
+        self.assertEqual((workdir / 'main.tex').read_text(encoding='utf-8'), 'Edited')
+        # 変わっていないファイルは書き直さず、消えたファイルは消す
+        self.assertEqual((workdir / 'chapters' / 'one.tex').stat().st_mtime_ns, chapter_mtime)
+        self.assertFalse((workdir / 'extra.tex').exists())
+
+    def test_failed_compile_discards_workspace(self):
+        self.wait(self.compile())
+        self.main.content = '\\error'
+        self.main.save()
+        self.wait(self.compile())
+        self.assertFalse((self.workspaces / str(self.project.id)).exists())
+
+        self.main.content = 'Fixed'
+        self.main.save()
+        self.wait(self.compile())
+        self.assertEqual(self.compiler.reused_aux, [False, True, False])
+
+    def test_least_recently_used_workspace_is_evicted_over_budget(self):
+        other = Project.objects.create(name='Slides', owner=self.owner)
+        ProjectFile.objects.create(project=other, filename='slides.tex', content='Slides')
+
+        with override_settings(TEAM_TEXTEX_WORKSPACE_BUDGET_MB=0):
+            self.wait(self.compile())
+            self.wait(self.compile(other))
+
+        self.assertFalse((self.workspaces / str(self.project.id)).exists())
+        self.assertTrue((self.workspaces / str(other.id)).exists())
+
+
+class CompileLatexApiTest(FakeCompilerMixin, TestCase):
+    compiler_kind = 'snippet'
+
+    def post(self, latex_code):
+        return self.client.post(reverse('team_TeXTeX:api_compile_latex'), {'latex_code': latex_code}).json()
+
+    def test_returns_pdf_url_instead_of_base64(self):
+        data = self.post('$x^2$')
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['log'], 'fake log')
+        self.assertNotIn('pdf_base64', data)
+
+        pdf = self.client.get(data['pdf_url'])
+        self.assertEqual(pdf['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(pdf.streaming_content), b'%PDF-fake\n$x^2$')
+
+    def test_same_snippet_is_compiled_once(self):
+        self.compiler.gate = threading.Event()
+        self.addCleanup(self.compiler.gate.set)
+        results = []
+
+        def post():
+            results.append(Client().post(reverse('team_TeXTeX:api_compile_latex'), {'latex_code': 'same'}).json())
+
+        threads = [threading.Thread(target=post) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        self.compiler.gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.compiler.calls, 1)
+        self.assertEqual(len({data['pdf_url'] for data in results}), 1)
+        self.assertEqual(self.post('same')['pdf_url'], results[0]['pdf_url'])
+        self.assertEqual(self.compiler.calls, 1)
+
+    def test_different_snippets_compile_in_parallel(self):
+        self.compiler.gate = threading.Event()
+        self.addCleanup(self.compiler.gate.set)
+        threads = [
+            threading.Thread(target=lambda code=code: Client().post(
+                reverse('team_TeXTeX:api_compile_latex'), {'latex_code': code}
+            ))
+            for code in ('a', 'b', 'c')
+        ]
+        for thread in threads:
+            thread.start()
+
+        # 3 件とも同時にコンパイラに入っている（共有ディレクトリで直列化されていない）
+        deadline = time.monotonic() + 5
+        while self.compiler.calls < 3:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.compiler.gate.set()
+        for thread in threads:
+            thread.join()
+
+    def test_compile_error_returns_log(self):
+        data = self.post('\\error')
+        self.assertEqual(data['status'], 'error')
+        self.assertEqual(data['log'], '! Undefined control sequence.')
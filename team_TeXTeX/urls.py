@@ -1,6 +1,6 @@
 from django.urls import path
 from . import views
-from .api.compile_latex import compile_latex
+from .api.compile_latex import compile_latex, compile_latex_pdf
 
 app_name = "team_TeXTeX"
 urlpatterns = [
@@ -23,6 +23,7 @@ urlpatterns = [
 
     # APIエンドポイント
     path('api/compile/', compile_latex, name='api_compile_latex'),
+    path('api/compile/pdf/<str:digest>/', compile_latex_pdf, name='api_compile_latex_pdf'),
     path('api/favorite_toggle/', views.toggle_favorite, name='toggle_favorite'),
     path('api/save_file/', views.save_file, name='save_file'),
     path('api/file/list/', views.get_project_files, name='get_project_files'),
@@ -36,6 +37,8 @@ urlpatterns = [
     path('api/project/rename/', views.rename_project, name='rename_project'),
     path('api/project/<int:project_id>/download/', views.download_project, name='download_project'),
     path('project/<int:project_id>/compile/', views.compile_project, name='compile_project'),
+    path('project/<int:project_id>/pdf/<str:digest>/', views.project_pdf, name='project_pdf'),
+    path('api/compile/job/<str:job_id>/', views.compile_status, name='compile_status'),
     path('main/url/', views.url, name='url'),
 
     # カスタム404エラーページ
@@ -1,94 +1,73 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from .models import Member, Groups, Contents, Users, Favorites, Slugs
-from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
 from django.db.models import F
 import json
 from django.views.decorators.clickjacking import xframe_options_exempt
-import subprocess
-import tempfile
 import os
+from . import compiler
 from .models import Member, Groups, Contents, Users, Favorites, Slugs, Project, ProjectFile
 
-@xframe_options_exempt
+def _compile_job_response(job):
+    """コンパイルのジョブの状態を返す（完了していれば PDF の URL、未完了なら状態 API の URL を付ける）"""
+    data = job.as_dict()
+    if job.status == 'done':
+        data['pdf_url'] = reverse('team_TeXTeX:project_pdf', args=[job.project_id, job.digest])
+    elif not job.finished:
+        data['status_url'] = reverse('team_TeXTeX:compile_status', args=[job.id])
+    return JsonResponse(data, status=200 if job.finished else 202)
+
+@require_GET
 def compile_project(request, project_id):
     """
-    指定されたプロジェクトのファイルを一時ディレクトリに展開し、latexmkでコンパイルしてPDFを返す
+    指定されたプロジェクトのコンパイルを始め、ジョブの状態を返す
+    同じ内容のPDFがキャッシュにあればすぐに完了（done）を返す
     """
     project = get_object_or_404(Project, pk=project_id)
-    files = project.files.all()
-    
-    # メインファイルを特定
-    main_file_obj = files.filter(is_main=True).first()
-    if not main_file_obj:
-        # メイン指定がない場合は、拡張子が.texの最初のファイルを使用するか、エラーにする
-        # ここでは簡易的に最初の.texファイルを使用
-        main_file_obj = files.filter(filename__endswith='.tex').first()
-    
-    if not main_file_obj:
-         return HttpResponse("Main TeX file not found.", status=400)
-
-    # 一時ディレクトリで作業
     try:
-        with tempfile.TemporaryDirectory() as tmpdirname:
-            # ファイルを展開
-            for f in files:
-                file_path = os.path.join(tmpdirname, f.filename)
-                # ディレクトリ階層がある場合は作成
-                dirname = os.path.dirname(file_path)
-                if dirname and not os.path.exists(dirname):
-                    os.makedirs(dirname, exist_ok=True)
-                
-                if f.content and f.content.startswith("[BASE64]"):
-                    # Base64デコードしてバイナリ書き込み
-                    import base64
-                    binary_data = base64.b64decode(f.content[8:])
-                    with open(file_path, 'wb') as dst:
-                        dst.write(binary_data)
-                else:
-                    # 通常のテキスト書き込み
-                    with open(file_path, 'w', encoding='utf-8') as dst:
-                        dst.write(f.content or "")
-            
-            # latexmk実行
-            # -interaction=nonstopmode: エラーで止まらないようにする
-            # -pdf: PDFを出力 (pdflatex) -> jsarticle等の場合エラーになる
-            # -pdfdvi: DVI経由でPDFを作成 (uplatex + dvipdfmx) -> .latexmkrcの設定に従うはず
-            # -pdfdvi: DVI経由でPDFを作成 (uplatex + dvipdfmx) -> .latexmkrcの設定に従うはず
-            # 明示的に .latexmkrc を読み込ませる (-r .latexmkrc) -> 自動読み込みと重複して警告が出るため削除
-            cmd = ['latexmk', '-interaction=nonstopmode', main_file_obj.filename]
-            
-            try:
-                # Capture output for debugging
-                process = subprocess.run(cmd, cwd=tmpdirname, check=True, timeout=60, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            except subprocess.TimeoutExpired:
-                 return HttpResponse("Compilation timed out.", status=500)
-            except FileNotFoundError:
-                 return HttpResponse("Backend Error: 'latexmk' command not found on server.", status=500)
-            except subprocess.CalledProcessError as e:
-                 # コンパイルエラーの場合
-                 error_msg = e.stderr.decode('utf-8', errors='replace')
-                 print(f"Compilation Failed: {error_msg}") # Console log
-                 return HttpResponse(f"Compilation failed:<br><pre>{error_msg}</pre>", status=500)
-            
-            # 生成されたPDFを探す
-            pdf_filename = os.path.splitext(main_file_obj.filename)[0] + '.pdf'
-            pdf_path = os.path.join(tmpdirname, pdf_filename)
-            
-            if os.path.exists(pdf_path):
-                with open(pdf_path, 'rb') as f:
-                    pdf_content = f.read()
-                
-                response = HttpResponse(pdf_content, content_type='application/pdf')
-                response['Content-Disposition'] = f'inline; filename="{pdf_filename}"'
-                return response
-            else:
-                return HttpResponse("PDF not generated.", status=500)
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return HttpResponse(f"Internal Server Error: {str(e)}", status=500)
+        job = compiler.start_compile(project)
+    except compiler.CompileError as e:
+        return JsonResponse({'status': 'failed', 'message': e.message, 'log': e.log}, status=400)
+    except compiler.CompileLimitExceeded:
+        response = JsonResponse(
+            {'status': 'failed', 'message': 'Too many compilations in progress. Please wait.', 'log': ''}, status=429
+        )
+        response['Retry-After'] = '1'
+        return response
+    return _compile_job_response(job)
+
+@require_GET
+def compile_status(request, job_id):
+    """
+    コンパイルのジョブの状態を返す（ブラウザがポーリングする）
+    """
+    job = compiler.get_queue().get(job_id)
+    if job is None:
+        return JsonResponse({'status': 'failed', 'message': 'Job not found.', 'log': ''}, status=404)
+    return _compile_job_response(job)
+
+def cached_pdf_response(digest, filename):
+    """
+    キャッシュしたPDFをそのままストリームで返す（URLに内容のダイジェストを含むので、ブラウザに長くキャッシュさせる）
+    """
+    pdf_path = compiler.get_pdf_cache().get(digest) if compiler.DIGEST_RE.fullmatch(digest) else None
+    if pdf_path is None:
+        raise Http404('PDF not found.')
+    response = FileResponse(open(pdf_path, 'rb'), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+@xframe_options_exempt
+@require_GET
+def project_pdf(request, project_id, digest):
+    """
+    プロジェクトのコンパイル結果のPDFを返す
+    """
+    return cached_pdf_response(digest, f'project_{project_id}.pdf')
 
 def get_data_for_table(request):
     """
@@ -4,7 +4,7 @@ from .models import Event, Memo, QuestionAnswer
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ("title", "start_time", "end_time")
+    list_display = ("title", "account", "start_time", "end_time")
     list_filter = ("start_time", "end_time")
     search_fields = ("title",)
 
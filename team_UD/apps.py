@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TeamUdConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team_UD'
+
+    def ready(self):
+        # カレンダーのキャッシュの無効化と、面接の質問の索引を更新するシグナルを登録
+        from . import signals  # noqa: F401
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_UD', '0013_memo_job_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='events', to='team_UD.account'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['account', 'start_time'], name='team_ud_event_account_start'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_UD', '0014_event_account'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterviewQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=100)),
+                ('interview_date', models.DateField(blank=True, null=True)),
+                ('question', models.TextField()),
+                ('question_hash', models.CharField(max_length=64)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='team_UD.company')),
+                ('memo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='indexed_questions', to='team_UD.memo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'stage', 'question_hash'], name='team_ud_question_company'), models.Index(fields=['question_hash'], name='team_ud_question_hash')],
+            },
+        ),
+    ]
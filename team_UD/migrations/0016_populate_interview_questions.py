@@ -0,0 +1,58 @@
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+# team_UD/question_index.py の INTERVIEW_STAGES・normalize_question と同じ内容
+INTERVIEW_STAGES = ['一次面接', '二次面接', '三次面接', '最終面接', 'グループディスカッション']
+
+_SPACES = re.compile(r'\s+')
+
+
+def question_hash(text):
+    text = unicodedata.normalize('NFKC', text)
+    text = _SPACES.sub(' ', text).strip().casefold().rstrip('?').rstrip()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def populate_interview_questions(apps, schema_editor):
+    """既存の面接系のメモの質問を索引に書き出す"""
+    Memo = apps.get_model('team_UD', 'Memo')
+    InterviewQuestion = apps.get_model('team_UD', 'InterviewQuestion')
+
+    db_alias = schema_editor.connection.alias
+
+    rows = []
+    memos = Memo.objects.using(db_alias).filter(interview_stage__in=INTERVIEW_STAGES).exclude(interview_questions='')
+    for memo in memos.iterator():
+        for line in memo.interview_questions.split('\n'):
+            question = line.strip()
+            if question:
+                rows.append(InterviewQuestion(
+                    memo_id=memo.pk,
+                    company_id=memo.company_id,
+                    stage=memo.interview_stage,
+                    interview_date=memo.interview_date,
+                    question=question,
+                    question_hash=question_hash(question),
+                ))
+    InterviewQuestion.objects.using(db_alias).bulk_create(rows, batch_size=500)
+    print(f"面接の質問の索引作成: {len(rows)}件")
+
+
+def clear_interview_questions(apps, schema_editor):
+    InterviewQuestion = apps.get_model('team_UD', 'InterviewQuestion')
+    InterviewQuestion.objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_UD', '0015_interviewquestion'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_interview_questions, clear_interview_questions),
+    ]
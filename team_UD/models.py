@@ -33,11 +33,18 @@ class Company(models.Model):
 
 
 class Event(models.Model):
+    # アカウント（ユーザー）。未設定のイベントは全員のカレンダーに表示する共通のイベント
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, null=True, blank=True, related_name='events')
     title = models.CharField(max_length=200)  # イベントのタイトル
     description = models.TextField(blank=True)  # イベントの説明
     start_time = models.DateTimeField()  # 開始日時
     end_time = models.DateTimeField()  # 終了日時
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'start_time'], name='team_ud_event_account_start'),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -86,3 +93,25 @@ class QuestionAnswer(models.Model):
     def __str__(self):
         company_name = self.company.name if self.company else '共通質問'
         return f"{company_name}: {self.question[:30]}"
+
+
+class InterviewQuestion(models.Model):
+    """
+    メモの interview_questions を 1 行ずつ書き出した質問の索引（メモの保存時に更新する）
+    question_hash は表記ゆれを正規化した質問文のハッシュで、同じ質問の集計に使う
+    """
+    memo = models.ForeignKey(Memo, on_delete=models.CASCADE, related_name='indexed_questions')
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True)  # メモの会社
+    stage = models.CharField(max_length=100)  # メモの面接段階
+    interview_date = models.DateField(null=True, blank=True)  # メモの面接日
+    question = models.TextField()  # 質問内容（入力されたまま）
+    question_hash = models.CharField(max_length=64)  # 正規化した質問内容のハッシュ
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['company', 'stage', 'question_hash'], name='team_ud_question_company'),
+            models.Index(fields=['question_hash'], name='team_ud_question_hash'),
+        ]
+
+    def __str__(self):
+        return f"{self.stage}: {self.question[:30]}"
@@ -0,0 +1,75 @@
+"""
+面接で聞かれた質問の索引（InterviewQuestion）
+
+以前の get_statistics / get_company_questions は、呼ばれるたびに面接系のメモをすべて読み、
+interview_questions を改行で分割して Python で会社・面接段階ごとに集計していた。
+
+ここではメモの保存時（signals.py）にそのメモの質問を 1 行ずつ InterviewQuestion に書き出しておき、
+表記ゆれを正規化した質問文のハッシュで同じ質問をまとめる。
+統計と会社ごとの質問一覧は (会社, 面接段階, ハッシュ) の GROUP BY で件数を数え、多く聞かれた順に並べる。
+"""
+
+import hashlib
+import re
+import unicodedata
+
+from django.db.models import Count, Max, Min
+
+from .models import InterviewQuestion
+
+DB = 'team_UD'
+
+# 質問を集計する面接系の段階（表示順）
+INTERVIEW_STAGES = ['一次面接', '二次面接', '三次面接', '最終面接', 'グループディスカッション']
+
+_SPACES = re.compile(r'\s+')
+
+
+def split_questions(text):
+    """interview_questions を 1 行 1 問に分ける（空行は除く）"""
+    return [line.strip() for line in (text or '').split('\n') if line.strip()]
+
+
+def normalize_question(text):
+    """全角・半角、空白、大文字・小文字、末尾の「？」の違いをそろえる"""
+    text = unicodedata.normalize('NFKC', text)
+    text = _SPACES.sub(' ', text).strip().casefold()
+    return text.rstrip('?').rstrip()
+
+
+def question_hash(text):
+    return hashlib.sha256(normalize_question(text).encode('utf-8')).hexdigest()
+
+
+def index_memo(memo, using=DB):
+    """メモの質問を索引に書き出す（書き出し済みの分は置き換える）"""
+    InterviewQuestion.objects.using(using).filter(memo_id=memo.pk).delete()
+    if memo.interview_stage not in INTERVIEW_STAGES:
+        return
+    InterviewQuestion.objects.using(using).bulk_create([
+        InterviewQuestion(
+            memo_id=memo.pk,
+            company_id=memo.company_id,
+            stage=memo.interview_stage,
+            interview_date=memo.interview_date,
+            question=question,
+            question_hash=question_hash(question),
+        )
+        for question in split_questions(memo.interview_questions)
+    ])
+
+
+def question_groups(queryset):
+    """
+    同じ面接段階・同じ質問をまとめ、聞かれた回数の多い順に並べる
+
+    Returns:
+        QuerySet: {"stage", "question_hash", "question", "count", "date", "memo_id"}
+        （question は代表の表記、date と memo_id は最も新しいもの）
+    """
+    return queryset.values('stage', 'question_hash').annotate(
+        question=Min('question'),
+        count=Count('id'),
+        date=Max('interview_date'),
+        memo_id=Max('memo_id'),
+    ).order_by('-count', 'question', 'stage')
@@ -0,0 +1,220 @@
+"""
+カレンダー（月・週・期間の表示）用の予定の日別バケット
+
+以前の calendar_view は、カレンダーのマスごとに今月のイベント全体を走査して（最大 42 マス × イベント数）
+その日のイベントを選んでいた。また Event にアカウントがなく、全員のイベントが全員のカレンダーに出ていた。
+
+ここでは
+- アカウントのイベント（と、アカウント未設定の共通のイベント）・メモを月ごとに 1 回ずつ取得し、
+  1 回の走査で日ごとのバケットに振り分ける
+- 複数日にまたがるイベントは期間内の各日のバケットに入れ、前後の日に続いているかを付ける
+- 月ごとのバケットを (アカウント, 年月) ごとに Django のキャッシュに置き、週・期間の表示もそれを組み合わせて作る
+メモの保存・削除時は views から invalidate_month() を呼び、その日を含む月のキャッシュを消す。
+イベントは管理画面から変更されるので、signals.py から invalidate_events() を呼んで全アカウント分を無効化する。
+"""
+
+import calendar
+import uuid
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Event, Memo
+
+DB = 'team_UD'
+
+CACHE_KEY = 'team_UD:calendar:{account_id}:{year}-{month:02d}:{version}'
+EVENTS_VERSION_KEY = 'team_UD:calendar:events_version'
+CACHE_TIMEOUT = 60 * 60
+
+# 期間表示で一度に返す最大の日数
+MAX_RANGE_DAYS = 62
+
+ONE_DAY = timedelta(days=1)
+
+_calendar = calendar.Calendar(firstweekday=calendar.SUNDAY)
+
+
+def _events_version():
+    version = cache.get(EVENTS_VERSION_KEY)
+    if version is None:
+        # 未設定・追い出された場合は新しいバージョンを発行する（古いキャッシュとは一致しない）
+        cache.add(EVENTS_VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(EVENTS_VERSION_KEY)
+    return version
+
+
+def _cache_key(account_id, year, month, version):
+    return CACHE_KEY.format(account_id=account_id, year=year, month=month, version=version)
+
+
+def invalidate_events():
+    """全アカウントの月のキャッシュを無効化する（イベントの変更時に呼ぶ）"""
+    cache.set(EVENTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate_month(account_id, *days):
+    """指定した日を含む月のキャッシュを消す（メモの保存・削除時に、変更前後の日付を渡す）"""
+    version = _events_version()
+    cache.delete_many({_cache_key(account_id, day.year, day.month, version) for day in days if day})
+
+
+def _month_bounds(year, month):
+    first = date(year, month, 1)
+    return first, date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _event_days(event):
+    """イベントが表示される最初と最後の日（ローカル時刻）。ちょうど 0 時に終わるイベントは前日までとする"""
+    start_day = timezone.localdate(event.start_time)
+    if event.end_time <= event.start_time:
+        return start_day, start_day
+    return start_day, timezone.localdate(event.end_time - timedelta(microseconds=1))
+
+
+def _serialize_event(event):
+    return {
+        "id": event.id,
+        "title": event.title,
+        "description": event.description,
+        "start_time": timezone.localtime(event.start_time).isoformat(),
+        "end_time": timezone.localtime(event.end_time).isoformat(),
+    }
+
+
+def _serialize_memo(memo):
+    return {
+        "id": memo.id,
+        "title": memo.title,
+        "company_name": memo.company.name if memo.company else "",
+        "job_category": memo.job_category,
+        "interview_stage": memo.interview_stage,
+    }
+
+
+def _build_month(account_id, year, month):
+    """
+    1 か月分の日ごとのバケットを作る
+
+    Returns:
+        dict: {"YYYY-MM-DD": {"events": [...], "memos": [...]}}（月のすべての日）
+    """
+    first, last = _month_bounds(year, month)
+    days = {}
+    day = first
+    while day <= last:
+        days[day.isoformat()] = {"events": [], "memos": []}
+        day += ONE_DAY
+
+    events = Event.objects.using(DB).filter(
+        Q(account_id=account_id) | Q(account__isnull=True),
+        Q(end_time__gte=_start_of_day(first)) | Q(start_time__gte=_start_of_day(first)),
+        start_time__lt=_start_of_day(last + ONE_DAY),
+    ).order_by('start_time', 'id')
+    for event in events:
+        start_day, end_day = _event_days(event)
+        item = _serialize_event(event)
+        day = max(start_day, first)
+        while day <= min(end_day, last):
+            days[day.isoformat()]["events"].append(
+                dict(item, continues_before=day > start_day, continues_after=day < end_day)
+            )
+            day += ONE_DAY
+
+    memos = Memo.objects.using(DB).filter(
+        account_id=account_id, date__gte=first, date__lte=last
+    ).select_related('company').order_by('created_at', 'id')
+    for memo in memos:
+        days[memo.date.isoformat()]["memos"].append(_serialize_memo(memo))
+
+    return days
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def get_days(account_id, start, end):
+    """
+    start から end まで（両端を含む）の日ごとの予定を返す
+    月ごとのバケットをキャッシュから取り出し、なければ作ってキャッシュに置く
+
+    Returns:
+        list: {"date": "YYYY-MM-DD", "events": [...], "memos": [...]} を日付順に並べたもの
+    """
+    version = _events_version()
+    keys = {_cache_key(account_id, year, month, version): (year, month) for year, month in _months(start, end)}
+    cached = cache.get_many(keys)
+    missing = {}
+    for key, (year, month) in keys.items():
+        if key not in cached:
+            missing[key] = _build_month(account_id, year, month)
+    if missing:
+        cache.set_many(missing, CACHE_TIMEOUT)
+        cached.update(missing)
+
+    buckets = {}
+    for month_days in cached.values():
+        buckets.update(month_days)
+    result = []
+    day = start
+    while day <= end:
+        result.append(dict(buckets[day.isoformat()], date=day.isoformat()))
+        day += ONE_DAY
+    return result
+
+
+def month_view(account_id, year, month, adjacent=True):
+    """
+    月表示（日曜日始まりの週ごと）の予定
+
+    Args:
+        adjacent (bool): False なら前月・次月の日のマスには予定を入れない（そのぶんの月を読まない）
+
+    Returns:
+        list: 週ごとの {"date", "day", "in_month", "events", "memos"} のリスト
+    """
+    weeks = _calendar.monthdatescalendar(year, month)
+    if adjacent:
+        start, end = weeks[0][0], weeks[-1][-1]
+    else:
+        start, end = _month_bounds(year, month)
+    days = {item["date"]: item for item in get_days(account_id, start, end)}
+
+    result = []
+    for week in weeks:
+        cells = []
+        for day in week:
+            item = days.get(day.isoformat(), {"events": [], "memos": []})
+            cells.append(dict(item, date=day.isoformat(), day=day.day, in_month=day.month == month))
+        result.append(cells)
+    return result
+
+
+def week_view(account_id, day):
+    """day を含む週（日曜日から土曜日まで）の予定"""
+    start = day - timedelta(days=(day.weekday() + 1) % 7)
+    return get_days(account_id, start, start + timedelta(days=6))
+
+
+def range_view(account_id, start, end):
+    """
+    任意の期間の予定
+
+    Raises:
+        ValueError: 終了日が開始日より前、または MAX_RANGE_DAYS 日を超える期間
+    """
+    if end < start:
+        raise ValueError("終了日は開始日以降にしてください")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"期間は{MAX_RANGE_DAYS}日以内にしてください")
+    return get_days(account_id, start, end)
@@ -0,0 +1,24 @@
+"""
+イベントの変更に合わせてカレンダーのキャッシュを無効化するシグナル
+（メモは views の save_memo / delete_memo で、その日を含む月だけを無効化する）
+メモの保存時には面接で聞かれた質問の索引を更新する（削除時は InterviewQuestion ごと消える）
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Event, Memo
+from .question_index import index_memo
+from .schedule import invalidate_events
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_calendar_events(sender, **kwargs):
+    invalidate_events()
+
+
+@receiver(post_save, sender=Memo)
+def index_memo_questions(sender, instance, using, **kwargs):
+    # fixture 読み込み（raw）でも索引に入るよう、常に書き出す
+    index_memo(instance, using=using)
@@ -1,3 +1,179 @@
+import json
+from datetime import date, datetime
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import schedule
+from .models import Account, Company, Event, InterviewQuestion, Memo, QuestionAnswer
+
+
+def local_datetime(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class CalendarScheduleTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        cache.clear()
+        self.account = Account.objects.using("team_UD").create(username="alice", password="pw")
+        self.other = Account.objects.using("team_UD").create(username="bob", password="pw")
+        session = self.client.session
+        session["user_id"] = self.account.id
+        session.save()
+
+        # 3/30 から 4/2 まで（4/2 の 0 時ちょうどに終わるので 4/1 まで）
+        Event.objects.using("team_UD").create(
+            account=self.account, title="Trip",
+            start_time=local_datetime(2030, 3, 30, 10), end_time=local_datetime(2030, 4, 2),
+        )
+        Event.objects.using("team_UD").create(
+            title="Holiday", start_time=local_datetime(2030, 3, 20, 9), end_time=local_datetime(2030, 3, 20, 18),
+        )
+        Event.objects.using("team_UD").create(
+            account=self.other, title="Not mine",
+            start_time=local_datetime(2030, 3, 20, 9), end_time=local_datetime(2030, 3, 20, 18),
+        )
+        Memo.objects.using("team_UD").create(
+            account=self.account, title="Interview", content="", date=date(2030, 3, 20)
+        )
+
+    def titles(self, day, kind="events"):
+        return [item["title"] for item in day[kind]]
+
+    def test_days_are_bucketed_per_account_and_span_multiple_days(self):
+        days = {day["date"]: day for day in schedule.get_days(self.account.id, date(2030, 3, 19), date(2030, 4, 2))}
+
+        self.assertEqual(self.titles(days["2030-03-20"]), ["Holiday"])
+        self.assertEqual(self.titles(days["2030-03-20"], "memos"), ["Interview"])
+        self.assertEqual([d for d, day in days.items() if "Trip" in self.titles(day)],
+                         ["2030-03-30", "2030-03-31", "2030-04-01"])
+        first, last = days["2030-03-30"]["events"][0], days["2030-04-01"]["events"][0]
+        self.assertEqual((first["continues_before"], first["continues_after"]), (False, True))
+        self.assertEqual((last["continues_before"], last["continues_after"]), (True, False))
+
+    def test_month_is_cached_until_memo_changes(self):
+        url = reverse("team_UD:get_calendar_month", args=[2030, 3])
+        weeks = self.client.get(url).json()["weeks"]
+        self.assertEqual([cell["date"] for cell in weeks[0]][:2], ["2030-02-24", "2030-02-25"])
+        self.assertEqual(len(weeks), 6)
+
+        with self.assertNumQueries(0, using="team_UD"):
+            schedule.month_view(self.account.id, 2030, 3)
+
+        response = self.client.post(
+            reverse("team_UD:save_memo"),
+            json.dumps({"date": "2030-03-21", "title": "Follow up", "content": ""}),
+            content_type="application/json",
+        )
+        memo_id = response.json()["id"]
+        days = {day["date"]: day for day in self.client.get(
+            reverse("team_UD:get_calendar_week", args=[2030, 3, 21])
+        ).json()["days"]}
+        self.assertEqual(list(days)[0], "2030-03-17")
+        self.assertEqual(self.titles(days["2030-03-21"], "memos"), ["Follow up"])
+
+        # 別の月へ移したメモは、元の月からも消える
+        self.client.post(
+            reverse("team_UD:save_memo"),
+            json.dumps({"id": memo_id, "date": "2030-04-03", "title": "Follow up", "content": ""}),
+            content_type="application/json",
+        )
+        days = {day["date"]: day for day in schedule.get_days(self.account.id, date(2030, 3, 21), date(2030, 4, 3))}
+        self.assertEqual(self.titles(days["2030-03-21"], "memos"), [])
+        self.assertEqual(self.titles(days["2030-04-03"], "memos"), ["Follow up"])
+
+        self.client.delete(reverse("team_UD:delete_memo", args=[memo_id]))
+        self.assertEqual(self.titles(schedule.get_days(self.account.id, date(2030, 4, 3), date(2030, 4, 3))[0],
+                                     "memos"), [])
+
+    def test_event_changes_invalidate_cache(self):
+        schedule.month_view(self.account.id, 2030, 3)
+        Event.objects.using("team_UD").filter(title="Holiday").get().delete()
+        days = schedule.get_days(self.account.id, date(2030, 3, 20), date(2030, 3, 20))
+        self.assertEqual(self.titles(days[0]), [])
+
+    def test_range_api_validates_period(self):
+        url = reverse("team_UD:get_calendar_range")
+        days = self.client.get(url, {"start": "2030-03-31", "end": "2030-04-01"}).json()["days"]
+        self.assertEqual([self.titles(day) for day in days], [["Trip"], ["Trip"]])
+
+        self.assertEqual(self.client.get(url, {"start": "2030-04-01", "end": "2030-03-31"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start": "2030-01-01", "end": "2030-12-31"}).status_code, 400)
+
+    def test_calendar_view_renders_buckets(self):
+        response = self.client.get(reverse("team_UD:calendar"), {"year": 2030, "month": 3})
+        self.assertContains(response, "Holiday")
+        self.assertContains(response, "continues-after")
+        self.assertNotContains(response, "Not mine")
+
+
+class InterviewQuestionIndexTest(TestCase):
+    databases = "__all__"
+
+    def setUp(self):
+        self.account = Account.objects.using("team_UD").create(username="alice", password="pw")
+        self.company = Company.objects.using("team_UD").create(name="テスト索引株式会社")
+        self.other_company = Company.objects.using("team_UD").create(name="テスト索引商事")
+        session = self.client.session
+        session["user_id"] = self.account.id
+        session.save()
+
+        self.memo = self.save_memo(self.company, "一次面接", "志望動機は？\n自己PRをしてください")
+        self.save_memo(self.company, "一次面接", "志望動機は\n\n学生時代に力を入れたこと")
+        self.save_memo(self.company, "最終面接", "志望動機は？")
+        self.save_memo(self.company, "説明会", "説明会の質問は数えない")
+        self.save_memo(self.other_company, "二次面接", "逆質問はありますか")
+
+    def save_memo(self, company, stage, questions, memo_id=None):
+        data = {
+            "date": "2030-03-01", "content": "", "company_id": company.id,
+            "interview_stage": stage, "interview_questions": questions,
+        }
+        if memo_id:
+            data["id"] = memo_id
+        response = self.client.post(reverse("team_UD:save_memo"), json.dumps(data), content_type="application/json")
+        return response.json()["id"]
+
+    def statistics(self, **params):
+        return self.client.get(reverse("team_UD:get_statistics"), dict(search="テスト索引", **params)).json()
+
+    def test_statistics_rank_questions_by_frequency(self):
+        with self.assertNumQueries(3, using="team_UD"):
+            data = self.statistics()
+
+        self.assertEqual([company["company_name"] for company in data["statistics"]], ["テスト索引商事", "テスト索引株式会社"])
+        stages = data["statistics"][1]["stages"]
+        self.assertEqual([stage["stage"] for stage in stages], ["一次面接", "最終面接"])
+        self.assertEqual(
+            [(q["question"], q["count"]) for q in stages[0]["questions"]],
+            [("志望動機は", 2), ("学生時代に力を入れたこと", 1), ("自己PRをしてください", 1)],
+        )
+
+        page = self.statistics(page_size=1, page=2)
+        self.assertEqual([company["company_name"] for company in page["statistics"]], ["テスト索引株式会社"])
+        self.assertEqual((page["num_pages"], page["has_next"]), (2, False))
+
+    def test_saving_memo_replaces_its_questions(self):
+        self.save_memo(self.company, "一次面接", "自己PRをしてください", memo_id=self.memo)
+        questions = InterviewQuestion.objects.using("team_UD").filter(memo_id=self.memo)
+        self.assertEqual(list(questions.values_list("question", flat=True)), ["自己PRをしてください"])
+
+        self.client.delete(reverse("team_UD:delete_memo", args=[self.memo]))
+        self.assertFalse(questions.exists())
+
+    def test_company_questions_match_answers_across_spelling(self):
+        QuestionAnswer.objects.using("team_UD").create(
+            account=self.account, company=self.company, question="志望動機は?", answer="御社の理念に共感したためです"
+        )
 
-# Create your tests here.
+        data = self.client.get(
+            reverse("team_UD:get_company_questions", args=[self.company.id]), {"page_size": 2}
+        ).json()
+        self.assertEqual((data["total"], data["answered"], data["has_next"]), (4, 2, True))
+        first = data["questions"][0]
+        self.assertEqual((first["question"], first["stage"], first["count"]), ("志望動機は", "一次面接", 2))
+        self.assertTrue(first["has_answer"])
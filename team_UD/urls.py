@@ -6,6 +6,9 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("calendar/", views.calendar_view, name="calendar"),
     path("api/companies/", views.get_companies, name="get_companies"),
+    path("api/calendar/<int:year>/<int:month>/", views.get_calendar_month, name="get_calendar_month"),
+    path("api/calendar/week/<int:year>/<int:month>/<int:day>/", views.get_calendar_week, name="get_calendar_week"),
+    path("api/calendar/range/", views.get_calendar_range, name="get_calendar_range"),
     path("api/memo/<int:year>/<int:month>/<int:day>/", views.get_memo_by_date, name="get_memo_by_date"),
     path("api/memo/save/", views.save_memo, name="save_memo"),
     path("api/memo/delete/<int:memo_id>/", views.delete_memo, name="delete_memo"),
@@ -1,14 +1,14 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from .models import Member, Event, Memo, Account, Company
-from datetime import datetime, timedelta
-import calendar
+from django.core.paginator import Paginator
+from django.db.models import Count
+from .models import Memo, Account, Company, InterviewQuestion, QuestionAnswer
+from .question_index import INTERVIEW_STAGES, question_groups, question_hash
+from . import schedule
+from datetime import datetime
 import json
 
-# カレンダーを日曜日始まりに設定
-calendar.setfirstweekday(calendar.SUNDAY)
-
 
 def index(request):
     return redirect("team_UD:calendar")
@@ -44,66 +44,26 @@ def calendar_view(request):
         year = int(request.GET.get("year", today.year))
         month = int(request.GET.get("month", today.month))
 
-    # 月の最初と最後の日を取得
-    first_day = datetime(year, month, 1)
-    last_day = datetime(year, month, calendar.monthrange(year, month)[1])
-
-    # 今月のイベントを取得
-    events = (
-        Event.objects.using("team_UD")
-        .filter(start_time__year=year, start_time__month=month)
-        .order_by("start_time")
-    )
-
-    # 今月のメモを取得
-    memos = (
-        Memo.objects.using("team_UD")
-        .filter(date__year=year, date__month=month, account_id=user_id)
-        .select_related("company")
-    )
-
-    # メモを日付でグループ化
-    memos_by_date = {}
-    for memo in memos:
-        date_key = memo.date.day
-        if date_key not in memos_by_date:
-            memos_by_date[date_key] = []
-        memos_by_date[date_key].append(memo)
-
-    # カレンダーの日付データを生成
-    cal = calendar.monthcalendar(year, month)
+    # 日ごとのイベント・メモ（前月・次月のマスは空欄）
     calendar_days = []
-
-    for week in cal:
-        for day in week:
-            if day == 0:
-                # 前月または次月の日付（空欄）
+    for week in schedule.month_view(user_id, year, month, adjacent=False):
+        for cell in week:
+            if not cell["in_month"]:
                 calendar_days.append(
                     {"day": "", "is_other_month": True, "is_today": False, "events": [], "memos": []}
                 )
             else:
-                # 今月の日付
-                current_date = datetime(year, month, day)
-                is_today = current_date.date() == today.date()
-
-                # その日のイベントを取得
-                day_events = [e for e in events if e.start_time.day == day]
-                
-                # その日のメモを取得
-                day_memos = memos_by_date.get(day, [])
-
                 calendar_days.append(
                     {
-                        "day": day,
+                        "day": cell["day"],
                         "is_other_month": False,
-                        "is_today": is_today,
-                        "events": day_events,
-                        "memos": day_memos,
+                        "is_today": cell["date"] == today.date().isoformat(),
+                        "events": cell["events"],
+                        "memos": cell["memos"],
                     }
                 )
 
     context = {
-        "events": events,
         "calendar_days": calendar_days,
         "current_month": f"{year}年{month}月",
         "year": year,
@@ -140,6 +100,50 @@ def get_companies(request):
             return JsonResponse({"error": str(e)}, status=400)
 
 
+@csrf_exempt
+def get_calendar_month(request, year, month):
+    """月表示の予定を取得するAPI（前月・次月のマスを含む週ごとのリスト）"""
+    if request.method == "GET":
+        try:
+            if "user_id" not in request.session:
+                return JsonResponse({"error": "ログインが必要です"}, status=401)
+
+            weeks = schedule.month_view(request.session["user_id"], year, month)
+            return JsonResponse({"year": year, "month": month, "weeks": weeks}, status=200)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+
+@csrf_exempt
+def get_calendar_week(request, year, month, day):
+    """指定した日を含む週（日曜日から土曜日まで）の予定を取得するAPI"""
+    if request.method == "GET":
+        try:
+            if "user_id" not in request.session:
+                return JsonResponse({"error": "ログインが必要です"}, status=401)
+
+            days = schedule.week_view(request.session["user_id"], datetime(year, month, day).date())
+            return JsonResponse({"days": days}, status=200)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+
+@csrf_exempt
+def get_calendar_range(request):
+    """期間（?start=YYYY-MM-DD&end=YYYY-MM-DD）の予定を取得するAPI"""
+    if request.method == "GET":
+        try:
+            if "user_id" not in request.session:
+                return JsonResponse({"error": "ログインが必要です"}, status=401)
+
+            start = datetime.strptime(request.GET.get("start", ""), "%Y-%m-%d").date()
+            end = datetime.strptime(request.GET.get("end", ""), "%Y-%m-%d").date()
+            days = schedule.range_view(request.session["user_id"], start, end)
+            return JsonResponse({"days": days}, status=200)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+
 @csrf_exempt
 def get_memo_by_date(request, year, month, day):
     """特定の日付のメモを取得するAPI"""
@@ -214,6 +218,7 @@ def save_memo(request):
             if memo_id:
                 # 既存のメモを更新（自分のメモのみ）
                 memo = Memo.objects.using("team_UD").get(id=memo_id, account_id=user_id)
+                previous_date = memo.date
                 memo.title = title
                 memo.content = content
                 memo.date = target_date
@@ -222,6 +227,7 @@ def save_memo(request):
                 memo.interview_date = interview_date
                 memo.interview_questions = interview_questions
                 memo.save(using="team_UD")
+                schedule.invalidate_month(user_id, previous_date, memo.date)
             else:
                 # 新しいメモを作成
                 account = Account.objects.using("team_UD").get(id=user_id)
@@ -236,6 +242,7 @@ def save_memo(request):
                     interview_questions=interview_questions,
                 )
                 memo.save(using="team_UD")
+                schedule.invalidate_month(user_id, memo.date)
 
             return JsonResponse(
                 {
@@ -270,6 +277,7 @@ def delete_memo(request, memo_id):
             # 自分のメモのみ削除可能
             memo = Memo.objects.using("team_UD").get(id=memo_id, account_id=user_id)
             memo.delete(using="team_UD")
+            schedule.invalidate_month(user_id, memo.date)
             return JsonResponse({"message": "削除しました"}, status=200)
         except Memo.DoesNotExist:
             return JsonResponse({"error": "メモが見つかりません"}, status=404)
@@ -346,9 +354,18 @@ def statistics_view(request):
     return render(request, "teams/team_UD/statistics.html")
 
 
+def _page(request, queryset, default_size, max_size=100):
+    """?page=&page_size= で queryset をページに分ける"""
+    try:
+        page_size = min(max(int(request.GET.get("page_size", default_size)), 1), max_size)
+    except ValueError:
+        page_size = default_size
+    return Paginator(queryset, page_size).get_page(request.GET.get("page"))
+
+
 @csrf_exempt
 def get_statistics(request):
-    """統計データを取得するAPI"""
+    """統計データを取得するAPI（会社ごとに、面接段階別の質問を聞かれた回数の多い順に返す）"""
     if request.method == "GET":
         try:
             # ログインチェック
@@ -356,59 +373,50 @@ def get_statistics(request):
                 return JsonResponse({"error": "ログインが必要です"}, status=401)
             
             search_query = request.GET.get("search", "").strip()
+            stage = request.GET.get("stage", "").strip()
             
-            # 面接系イベントのみを対象
-            interview_stages = ['一次面接', '二次面接', '三次面接', '最終面接', 'グループディスカッション']
-            
-            # interview_questionsが空でないメモのみを取得
-            memos = Memo.objects.using("team_UD").filter(
-                interview_stage__in=interview_stages,
-                interview_questions__isnull=False
-            ).exclude(interview_questions='').select_related('company')
-            
-            # 会社名で検索
+            # 会社が設定された面接系のメモの質問
+            questions = InterviewQuestion.objects.using("team_UD").filter(company__isnull=False)
             if search_query:
-                memos = memos.filter(company__name__icontains=search_query)
+                questions = questions.filter(company__name__icontains=search_query)
+            if stage:
+                questions = questions.filter(stage=stage)
+            
+            # 会社名順に会社をページに分ける
+            companies = _page(
+                request,
+                questions.values("company_id", "company__name").annotate(count=Count("id")).order_by("company__name"),
+                default_size=20,
+            )
+            statistics = {
+                company["company_id"]: {"company_id": company["company_id"], "company_name": company["company__name"],
+                                        "stages": {}}
+                for company in companies
+            }
             
-            # 会社×面接段階でグループ化
-            statistics = {}
-            for memo in memos:
-                if not memo.company:
-                    continue
-                    
-                company_name = memo.company.name
-                stage = memo.interview_stage
-                
-                if company_name not in statistics:
-                    statistics[company_name] = {}
-                
-                if stage not in statistics[company_name]:
-                    statistics[company_name][stage] = []
-                
-                # 質問をリストに追加
-                questions = memo.interview_questions.split('\n')
-                for question in questions:
-                    question = question.strip()
-                    if question:
-                        statistics[company_name][stage].append(question)
+            # 会社×面接段階×質問ごとに件数を数える
+            groups = question_groups(questions.filter(company_id__in=statistics)).values(
+                "company_id", "stage", "question", "count"
+            )
+            for group in groups:
+                stages = statistics[group["company_id"]]["stages"]
+                stages.setdefault(group["stage"], []).append({"question": group["question"], "count": group["count"]})
             
-            # レスポンス用にフォーマット
+            # レスポンス用にフォーマット（面接段階は選考の順）
             result = []
-            for company_name in sorted(statistics.keys()):
-                company_data = {
-                    "company_name": company_name,
-                    "stages": []
-                }
-                for stage in interview_stages:
-                    if stage in statistics[company_name]:
-                        company_data["stages"].append({
-                            "stage": stage,
-                            "questions": statistics[company_name][stage]
-                        })
-                if company_data["stages"]:
-                    result.append(company_data)
+            for company in statistics.values():
+                company["stages"] = [
+                    {"stage": name, "questions": company["stages"][name]}
+                    for name in INTERVIEW_STAGES if name in company["stages"]
+                ]
+                result.append(company)
             
-            return JsonResponse({"statistics": result}, status=200)
+            return JsonResponse({
+                "statistics": result,
+                "page": companies.number,
+                "num_pages": companies.paginator.num_pages,
+                "has_next": companies.has_next(),
+            }, status=200)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
 
@@ -473,46 +481,27 @@ def get_company_questions(request, company_id):
             except Company.DoesNotExist:
                 return JsonResponse({"error": "会社が見つかりません"}, status=404)
             
-            # 過去のメモから質問を抽出
-            interview_stages = ['一次面接', '二次面接', '三次面接', '最終面接', 'グループディスカッション']
-            memos = Memo.objects.using("team_UD").filter(
-                company_id=company_id,
-                interview_stage__in=interview_stages,
-                interview_questions__isnull=False
-            ).exclude(interview_questions='')
+            # 過去のメモの質問を、同じ面接段階・同じ質問ごとに聞かれた回数の多い順で
+            questions = InterviewQuestion.objects.using("team_UD").filter(company_id=company_id)
+            page = _page(request, question_groups(questions), default_size=50)
             
-            # 質問を収集
-            questions_from_memos = []
-            for memo in memos:
-                questions = memo.interview_questions.split('\n')
-                for question in questions:
-                    question = question.strip()
-                    if question:
-                        questions_from_memos.append({
-                            "question": question,
-                            "stage": memo.interview_stage,
-                            "date": memo.interview_date.strftime("%Y-%m-%d") if memo.interview_date else None,
-                            "memo_id": memo.id
-                        })
-            
-            # ユーザーの回答を取得
-            from .models import QuestionAnswer
+            # ユーザーの回答を取得（表記ゆれがあっても同じ質問への回答として扱う）
             answers = QuestionAnswer.objects.using("team_UD").filter(
                 account_id=user_id,
                 company_id=company_id
             )
-            
-            answer_dict = {ans.question: ans for ans in answers}
+            answer_dict = {question_hash(ans.question): ans for ans in answers}
+            answered_hashes = [key for key, ans in answer_dict.items() if ans.answer]
             
             # 質問と回答をマージ
             result = []
-            for q in questions_from_memos:
-                question_text = q["question"]
-                answer = answer_dict.get(question_text)
+            for q in page:
+                answer = answer_dict.get(q["question_hash"])
                 result.append({
-                    "question": question_text,
+                    "question": q["question"],
                     "stage": q["stage"],
-                    "date": q["date"],
+                    "count": q["count"],
+                    "date": q["date"].strftime("%Y-%m-%d") if q["date"] else None,
                     "memo_id": q["memo_id"],
                     "answer": answer.answer if answer else "",
                     "answer_id": answer.id if answer else None,
@@ -521,7 +510,12 @@ def get_company_questions(request, company_id):
             
             return JsonResponse({
                 "company_name": company.name,
-                "questions": result
+                "questions": result,
+                "total": page.paginator.count,
+                "answered": question_groups(questions.filter(question_hash__in=answered_hashes)).count(),
+                "page": page.number,
+                "num_pages": page.paginator.num_pages,
+                "has_next": page.has_next(),
             }, status=200)
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
@@ -548,7 +542,6 @@ def save_question_answer(request):
             account = Account.objects.using("team_UD").get(id=user_id)
             company = Company.objects.using("team_UD").get(id=company_id)
             
-            from .models import QuestionAnswer
             # 既存の回答があれば更新、なければ作成
             answer_obj, created = QuestionAnswer.objects.using("team_UD").get_or_create(
                 account=account,
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TeamGiryulinkConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "team_giryulink"
+
+    def ready(self):
+        # Generate listing thumbnails when a product image is uploaded
+        from thumbnails.derivatives import register
+        register(self.get_model("Product"))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_giryulink', '0010_product_buyer_confirmed_product_seller_confirmed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='thumbnail',
+            field=models.ImageField(blank=True, default='', editable=False, max_length=255, upload_to='team_giryulink/products/thumbs/'),
+        ),
+    ]
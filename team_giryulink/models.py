@@ -3,6 +3,8 @@ from django.db import models
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
 
+from thumbnails.derivatives import thumbnail_url
+
 def validate_tut_email(value):
     """Validate that email ends with @tut.jp"""
     if not value.endswith('@tut.jp'):
@@ -37,6 +39,9 @@ class Product(models.Model):
     title = models.CharField(max_length=200)
     price = models.IntegerField(default=0)
     image = models.ImageField(upload_to="team_giryulink/products/", blank=True, null=True)
+    # Listing thumbnail generated from image (see thumbnails.derivatives)
+    thumbnail = models.ImageField(upload_to="team_giryulink/products/thumbs/", max_length=255, blank=True, default="",
+                                  editable=False)
     description = models.TextField(blank=True)
     user = models.ForeignKey(GiryulinkUser, on_delete=models.CASCADE, related_name='products', null=True, blank=True)
     buyer = models.ForeignKey(GiryulinkUser, on_delete=models.SET_NULL, related_name='purchased_products', null=True, blank=True)
@@ -47,6 +52,11 @@ class Product(models.Model):
     def __str__(self):
         return self.title
     
+    @property
+    def thumbnail_url(self):
+        """URL of the listing thumbnail (falls back to the original image)"""
+        return thumbnail_url(self)
+
     @property
     def is_sold(self):
         """Check if product is already sold"""
@@ -8,20 +8,22 @@ Team Tansaibou ダッシュボード用APIビュー
 - daily_comparison: 日別比較（1日目vs2日目）
 - product_ranking: 商品別売上ランキング
 - stock_prediction: 売り切れ予測・ロス予測
+- dashboard_snapshot: 上記すべてを1回で返す（ETag 対応）
+
+売上はすべて時間帯別の集計テーブル（HourlySales / HourlyProductSales）から読む。
+集計テーブルは取引の登録・編集時に sales_rollup.py で更新される。
+各パネルの計算は dashboard.py の Dashboard にまとめてある。
 """
 
-from django.http import JsonResponse
-from django.db.models import Sum, Count, F
-from django.utils import timezone
-from datetime import datetime, timedelta
-from decimal import Decimal
+import hashlib
+
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import parse_etags, quote_etag
 from functools import wraps
 
-from .models import Store, Product, ProductSet, Transaction, TransactionItem
+from .dashboard import Dashboard
 from .views import get_current_store
 
-DB = 'team_tansaibou'
-
 
 def api_login_required(view_func):
     """API用のログイン必須デコレータ"""
@@ -35,299 +37,60 @@ def api_login_required(view_func):
     return wrapper
 
 
-def get_today_range():
-    """今日の開始・終了時刻を取得"""
-    today = timezone.localtime(timezone.now()).date()
-    start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
-    end = timezone.make_aware(datetime.combine(today, datetime.max.time()))
-    return start, end
-
-
 @api_login_required
 def today_sales(request):
     """本日の売上合計・件数"""
-    store = request.current_store
-    start, end = get_today_range()
-
-    transactions = Transaction.objects.using(DB).filter(
-        store=store,
-        transaction_date__range=(start, end)
-    )
-
-    result = transactions.aggregate(
-        total=Sum('total_amount'),
-        count=Count('id')
-    )
-
-    return JsonResponse({
-        'total_sales': int(result['total'] or 0),
-        'transaction_count': result['count'] or 0,
-    })
+    return JsonResponse(Dashboard(request.current_store).today_sales())
 
 
 @api_login_required
 def hourly_stats(request):
     """時間帯別の売上・件数（本日分）"""
-    store = request.current_store
-    start, end = get_today_range()
-
-    transactions = Transaction.objects.using(DB).filter(
-        store=store,
-        transaction_date__range=(start, end)
-    )
-
-    # 時間帯別に集計
-    hourly_data = {}
-    for hour in range(9, 21):  # 9時〜20時
-        hourly_data[hour] = {'sales': 0, 'count': 0}
-
-    for trans in transactions:
-        hour = timezone.localtime(trans.transaction_date).hour
-        if hour in hourly_data:
-            hourly_data[hour]['sales'] += int(trans.total_amount)
-            hourly_data[hour]['count'] += 1
-
-    # グラフ用にリスト形式に変換
-    labels = [f'{h}:00' for h in range(9, 21)]
-    sales = [hourly_data[h]['sales'] for h in range(9, 21)]
-    counts = [hourly_data[h]['count'] for h in range(9, 21)]
-
-    return JsonResponse({
-        'labels': labels,
-        'sales': sales,
-        'counts': counts,
-    })
+    return JsonResponse(Dashboard(request.current_store).hourly_stats())
 
 
 @api_login_required
 def yearly_comparison(request):
     """年度比較（去年vs今年）- 学祭期間の比較"""
-    store = request.current_store
-
-    # 今年と去年の同じ日付範囲で比較
-    # 学祭は通常11月の土日に開催と仮定
-    now = timezone.localtime(timezone.now())
-    this_year = now.year
-    last_year = this_year - 1
-
-    def get_year_sales(year):
-        """指定年の売上を取得"""
-        year_start = timezone.make_aware(datetime(year, 1, 1))
-        year_end = timezone.make_aware(datetime(year, 12, 31, 23, 59, 59))
-
-        result = Transaction.objects.using(DB).filter(
-            store=store,
-            transaction_date__range=(year_start, year_end)
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        return {
-            'sales': int(result['total'] or 0),
-            'count': result['count'] or 0
-        }
-
-    this_year_data = get_year_sales(this_year)
-    last_year_data = get_year_sales(last_year)
-
-    return JsonResponse({
-        'labels': [str(last_year), str(this_year)],
-        'sales': [last_year_data['sales'], this_year_data['sales']],
-        'counts': [last_year_data['count'], this_year_data['count']],
-    })
+    return JsonResponse(Dashboard(request.current_store).yearly_comparison())
 
 
 @api_login_required
 def daily_comparison(request):
     """日別比較（1日目vs2日目）- 学祭の日別比較"""
-    store = request.current_store
-
-    # 最初の取引日を1日目として、その翌日を2日目とする
-    first_trans = Transaction.objects.using(DB).filter(
-        store=store
-    ).order_by('transaction_date').first()
-
-    if not first_trans:
-        return JsonResponse({
-            'labels': ['1日目', '2日目'],
-            'sales': [0, 0],
-            'counts': [0, 0],
-        })
-
-    day1 = timezone.localtime(first_trans.transaction_date).date()
-    day2 = day1 + timedelta(days=1)
-
-    def get_day_sales(date):
-        """指定日の売上を取得"""
-        start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
-        end = timezone.make_aware(datetime.combine(date, datetime.max.time()))
-
-        result = Transaction.objects.using(DB).filter(
-            store=store,
-            transaction_date__range=(start, end)
-        ).aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-        return {
-            'sales': int(result['total'] or 0),
-            'count': result['count'] or 0
-        }
-
-    day1_data = get_day_sales(day1)
-    day2_data = get_day_sales(day2)
-
-    return JsonResponse({
-        'labels': [f'1日目 ({day1.strftime("%m/%d")})', f'2日目 ({day2.strftime("%m/%d")})'],
-        'sales': [day1_data['sales'], day2_data['sales']],
-        'counts': [day1_data['count'], day2_data['count']],
-    })
+    return JsonResponse(Dashboard(request.current_store).daily_comparison())
 
 
 @api_login_required
 def product_ranking(request):
     """商品別売上ランキング（本日分）"""
-    store = request.current_store
-    start, end = get_today_range()
-
-    # 通常商品の集計
-    product_items = TransactionItem.objects.using(DB).filter(
-        transaction__store=store,
-        transaction__transaction_date__range=(start, end),
-        product__isnull=False
-    ).values(
-        'product__id', 'product__name', 'product__stock', 'product__current_price'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_sales=Sum('subtotal')
-    )
-
-    # セット商品の集計
-    set_items = TransactionItem.objects.using(DB).filter(
-        transaction__store=store,
-        transaction__transaction_date__range=(start, end),
-        product_set__isnull=False
-    ).values(
-        'product_set__id', 'product_set__name', 'product_set__price'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_sales=Sum('subtotal')
-    )
-
-    ranking = []
-
-    for item in product_items:
-        ranking.append({
-            'name': item['product__name'],
-            'type': '通常',
-            'quantity': item['total_quantity'],
-            'sales': int(item['total_sales']),
-            'stock': item['product__stock'],
-            'price': int(item['product__current_price']),
-        })
-
-    for item in set_items:
-        # セット商品の在庫は計算で取得
-        try:
-            product_set = ProductSet.objects.using(DB).get(id=item['product_set__id'])
-            stock = product_set.get_stock_status()
-        except ProductSet.DoesNotExist:
-            stock = 0
-
-        ranking.append({
-            'name': item['product_set__name'],
-            'type': 'セット',
-            'quantity': item['total_quantity'],
-            'sales': int(item['total_sales']),
-            'stock': stock,
-            'price': int(item['product_set__price']),
-        })
-
-    # 売上金額でソート
-    ranking.sort(key=lambda x: x['sales'], reverse=True)
-
-    return JsonResponse({
-        'ranking': ranking[:10],  # 上位10件
-    })
+    return JsonResponse(Dashboard(request.current_store).product_ranking())
 
 
 @api_login_required
 def stock_prediction(request):
     """売り切れ予測・ロス予測"""
-    store = request.current_store
-    start, end = get_today_range()
-
-    # 現在時刻と経過時間を計算
-    now = timezone.localtime(timezone.now())
-    hours_elapsed = max((now - start).total_seconds() / 3600, 0.1)  # 最低0.1時間
-
-    # 営業終了時刻（20時と仮定）
-    closing_hour = 20
-    remaining_hours = max(closing_hour - now.hour - now.minute / 60, 0)
+    return JsonResponse(Dashboard(request.current_store).stock_prediction())
 
-    # 本日の商品別販売数を取得
-    product_sales = TransactionItem.objects.using(DB).filter(
-        transaction__store=store,
-        transaction__transaction_date__range=(start, end),
-        product__isnull=False
-    ).values('product__id').annotate(
-        total_quantity=Sum('quantity')
-    )
 
-    product_sales_dict = {
-        item['product__id']: item['total_quantity']
-        for item in product_sales
-    }
-
-    # 全商品の予測を計算
-    products = Product.objects.using(DB).filter(store=store, is_active=True)
-
-    sellout_predictions = []
-    loss_predictions = []
-
-    for product in products:
-        sold_qty = product_sales_dict.get(product.id, 0)
-        sales_rate = sold_qty / hours_elapsed if hours_elapsed > 0 else 0  # 個/時間
-
-        if sales_rate > 0:
-            # 売り切れ予測時間
-            time_to_sellout = product.stock / sales_rate
-
-            if time_to_sellout < 0.5:
-                status = 'critical'
-            elif time_to_sellout < 1:
-                status = 'warning'
-            else:
-                status = 'ok'
-
-            sellout_predictions.append({
-                'name': product.name,
-                'current_stock': product.stock,
-                'sales_rate': round(sales_rate, 1),
-                'time_to_sellout': round(time_to_sellout, 1),
-                'status': status,
-            })
-
-        # ロス予測（残り営業時間での予測残数）
-        predicted_remaining = product.stock - (sales_rate * remaining_hours)
-        if predicted_remaining > 0:
-            loss_predictions.append({
-                'name': product.name,
-                'current_stock': product.stock,
-                'predicted_remaining': max(0, round(predicted_remaining)),
-                'loss_amount': max(0, round(predicted_remaining * float(product.current_price))),
-            })
-
-    # 売り切れ予測をステータス（危険度）順にソート
-    status_order = {'critical': 0, 'warning': 1, 'ok': 2}
-    sellout_predictions.sort(key=lambda x: (status_order[x['status']], x['time_to_sellout']))
-
-    # ロス予測をロス金額順にソート
-    loss_predictions.sort(key=lambda x: x['loss_amount'], reverse=True)
-
-    return JsonResponse({
-        'sellout_predictions': sellout_predictions[:10],
-        'loss_predictions': loss_predictions[:10],
-        'hours_elapsed': round(hours_elapsed, 1),
-        'remaining_hours': round(remaining_hours, 1),
-    })
+@api_login_required
+def dashboard_snapshot(request):
+    """
+    ダッシュボードの全パネルを1回で返す
+
+    ETag は Dashboard.version()（集計テーブルの最終更新・在庫・需要予測の区切り）のハッシュ。
+    If-None-Match が一致すれば全パネルを計算せずに 304 を返す。
+    売上も在庫も変わっていなければ本文を送らず、画面側も再描画しない。
+    """
+    dashboard = Dashboard(request.current_store)
+    # スナップショットより先に読むので、計算中に売上が変わっても次のリクエストで取り直される
+    etag = quote_etag(hashlib.md5(repr(dashboard.version()).encode()).hexdigest())
+
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(dashboard.snapshot())
+    response['ETag'] = etag
+    # 毎回サーバーに問い合わせさせる（古いスナップショットをキャッシュから使わせない）
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TeamTansaibouConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team_tansaibou'
+
+    def ready(self):
+        # ダッシュボード用の売上集計を取引の書き込み時に更新するシグナルを登録
+        from . import signals  # noqa: F401
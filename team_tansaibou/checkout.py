@@ -0,0 +1,208 @@
+"""
+レジの会計処理（カートから取引・取引明細を作成し、在庫を減らす）
+
+以前は register_sale がカートの行ごとに Product を取得して TransactionItem を作成し、
+TransactionItem.save() の中で在庫を読み直して stock -= n で保存していた。
+2台のレジが同じ商品を同時に売ると、片方の減算が上書きされて在庫がずれる。
+
+ここでは 1 トランザクションの中で
+- 商品・セット商品（と構成商品）をそれぞれ 1 クエリで取得し
+- 在庫の減算を「在庫が足りる場合だけ減らす」条件付き UPDATE 1 文で行い
+- 取引明細を bulk_create でまとめて作成する
+ので、カートの行数によらずクエリ数が一定で、同時に会計しても在庫が正しく保たれる。
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from .models import Product, ProductSet, ProductSetItem, Transaction, TransactionItem
+from .sales_rollup import record_items_created
+
+DB = 'team_tansaibou'
+
+
+class InsufficientStock(Exception):
+    """在庫が足りない行があり、会計できなかった"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__(' / '.join(s['message'] for s in shortages))
+
+
+def parse_cart(cart_data):
+    """
+    カート（画面から送られる JSON）を会計用の行に変換する
+
+    Args:
+        cart_data (list): [{'type': 'product' | 'product_set', 'id', 'price', 'quantity'}, ...]
+
+    Returns:
+        list: {'type', 'id', 'quantity', 'price'} の辞書のリスト
+
+    Raises:
+        ValueError: 数量・価格が不正な場合
+    """
+    lines = []
+    for item in cart_data:
+        quantity = int(item['quantity'])
+        price = Decimal(str(item['price']))
+        if quantity < 1 or price < 0:
+            raise ValueError('数量または価格が不正です')
+        lines.append({
+            'type': 'product' if item['type'] == 'product' else 'product_set',
+            'id': int(item['id']),
+            'quantity': quantity,
+            'price': price,
+        })
+    return lines
+
+
+def _load_items(store, lines, using):
+    """カートの商品・セット商品と、在庫を減らす商品を 1 種類につき 1 クエリで取得する"""
+    product_ids = {line['id'] for line in lines if line['type'] == 'product'}
+    set_ids = {line['id'] for line in lines if line['type'] == 'product_set'}
+
+    product_sets = ProductSet.objects.using(using).filter(store=store, id__in=set_ids).in_bulk()
+    if len(product_sets) != len(set_ids):
+        raise ProductSet.DoesNotExist
+    components = defaultdict(list)
+    for item in ProductSetItem.objects.using(using).filter(product_set_id__in=set_ids):
+        components[item.product_set_id].append((item.product_id, item.quantity))
+
+    stock_ids = product_ids | {product_id for items in components.values() for product_id, _ in items}
+    products = Product.objects.using(using).filter(id__in=stock_ids).in_bulk()
+    if not product_ids <= {pk for pk, p in products.items() if p.store_id == store.id}:
+        raise Product.DoesNotExist
+    return products, product_sets, components
+
+
+def _stock_demand(lines, components):
+    """商品ごとに減らす在庫数（セット商品は構成商品に展開する）"""
+    demand = defaultdict(int)
+    for line in lines:
+        if line['type'] == 'product':
+            demand[line['id']] += line['quantity']
+        else:
+            for product_id, per_set in components[line['id']]:
+                demand[product_id] += per_set * line['quantity']
+    return demand
+
+
+def _find_shortages(lines, demand, stock, products, product_sets, components):
+    """在庫が足りない行を、画面に出すメッセージ付きで返す"""
+    short = {product_id for product_id, quantity in demand.items() if stock.get(product_id, 0) < quantity}
+    shortages = []
+    for index, line in enumerate(lines):
+        if line['type'] == 'product':
+            if line['id'] not in short:
+                continue
+            product = products[line['id']]
+            available = stock.get(line['id'], 0)
+            message = f'{product.name}の在庫が不足しています。必要: {line["quantity"]}, 在庫: {available}'
+        else:
+            items = components[line['id']]
+            if not any(product_id in short for product_id, _ in items):
+                continue
+            product_set = product_sets[line['id']]
+            available = min((stock.get(product_id, 0) // per_set for product_id, per_set in items), default=0)
+            details = ', '.join(
+                f'{products[product_id].name}(必要: {demand[product_id]}, 在庫: {stock.get(product_id, 0)})'
+                for product_id, _ in items if product_id in short
+            )
+            message = f'セット商品「{product_set.name}」の構成商品の在庫が不足しています: {details}'
+        shortages.append({
+            'line': index,
+            'type': line['type'],
+            'id': line['id'],
+            'requested': line['quantity'],
+            'available': available,
+            'message': message,
+        })
+    return shortages
+
+
+def _reduce_stock(demand, using):
+    """
+    在庫を条件付き UPDATE 1 文で減らす
+    1 商品でも在庫が足りなければ WHERE に一致する行数が減るので False を返す
+    （足りた商品は減算されているので、呼び出し側でロールバックすること）
+    """
+    if not demand:
+        return True
+    enough = Q()
+    for product_id, quantity in demand.items():
+        enough |= Q(pk=product_id, stock__gte=quantity)
+    updated = Product.objects.using(using).filter(enough).update(
+        stock=F('stock') - Case(
+            *(When(pk=product_id, then=Value(quantity)) for product_id, quantity in demand.items()),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    )
+    return updated == len(demand)
+
+
+def checkout(store, cart_data, transaction_date, payment_method, recorded_by_id, notes='', using=DB):
+    """
+    カートを会計し、取引を作成する
+
+    Args:
+        store (Store): 店舗
+        cart_data (list): 画面から送られたカート（parse_cart() を参照）
+        transaction_date (datetime | str): 販売日時
+        payment_method (str): 支払方法
+        recorded_by_id (int): 担当者ID
+        notes (str): メモ
+        using (str): DBエイリアス
+
+    Returns:
+        Transaction: 作成した取引
+
+    Raises:
+        ValueError: カートが空・数量が不正な場合
+        Product.DoesNotExist / ProductSet.DoesNotExist: 店舗に存在しない商品が含まれる場合
+        InsufficientStock: 在庫が足りない行がある場合（何も変更しない）
+    """
+    lines = parse_cart(cart_data)
+    if not lines:
+        raise ValueError('カートが空です')
+
+    with transaction.atomic(using=using):
+        products, product_sets, components = _load_items(store, lines, using)
+        demand = _stock_demand(lines, components)
+        in_stock = _reduce_stock(demand, using)
+        if not in_stock:
+            # 在庫が足りた商品の減算も取り消す
+            transaction.set_rollback(True, using=using)
+        else:
+            trans = Transaction.objects.using(using).create(
+                transaction_date=transaction_date,
+                total_amount=sum((line['price'] * line['quantity'] for line in lines), Decimal('0')),
+                recorded_by_id=recorded_by_id,
+                payment_method=payment_method,
+                notes=notes,
+                store=store,
+            )
+            # bulk_create では TransactionItem.save()（在庫減算）もシグナルも動かないので、
+            # 小計はここで計算し、売上集計は record_items_created() で反映する
+            items = TransactionItem.objects.using(using).bulk_create([
+                TransactionItem(
+                    transaction=trans,
+                    product_id=line['id'] if line['type'] == 'product' else None,
+                    product_set_id=line['id'] if line['type'] == 'product_set' else None,
+                    quantity=line['quantity'],
+                    price_at_sale=line['price'],
+                    subtotal=line['price'] * line['quantity'],
+                )
+                for line in lines
+            ])
+            record_items_created(trans, items, using=using)
+
+    if not in_stock:
+        # 同時に売れた分も含めた最新の在庫で、不足している行を調べる
+        stock = dict(Product.objects.using(using).filter(id__in=demand).values_list('id', 'stock'))
+        raise InsufficientStock(_find_shortages(lines, demand, stock, products, product_sets, components))
+    return trans
@@ -0,0 +1,303 @@
+"""
+ダッシュボードの各パネルの計算
+
+以前はパネルごとに API を呼び、それぞれが集計テーブルを読み直していた（6 リクエスト・十数クエリ）。
+Dashboard は店舗の時間帯別売上・本日の商品別売上・商品・セット商品を 1 回ずつ読み込み、
+それを使い回して全パネルを計算する。api_views の各エンドポイントと
+まとめて返す snapshot エンドポイントの両方がこのクラスを使う。
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .forecast import CLOSING_HOUR, OPENING_HOUR, forecast_slot, get_demand_forecast, predict_stock
+from .models import HourlyProductSales, HourlySales, Product, ProductSet, ProductSetItem
+
+DB = 'team_tansaibou'
+
+# グラフに出す時間帯（開店〜閉店の時間帯）
+BUSINESS_HOURS = range(OPENING_HOUR, CLOSING_HOUR + 1)
+
+
+def compute_set_stock(set_ids, using=DB):
+    """
+    セット商品の在庫（何セット作れるか）を構成商品の在庫からまとめて計算する
+    ProductSet.get_stock_status() と同じ値を、セットの数によらず 1 クエリで求める
+
+    Returns:
+        dict: {セット商品ID: 在庫数}（構成商品がないセットは 0）
+    """
+    stock = dict.fromkeys(set_ids, 0)
+    available = defaultdict(list)
+    for set_id, quantity, product_stock in ProductSetItem.objects.using(using).filter(
+        product_set_id__in=stock
+    ).values_list('product_set_id', 'quantity', 'product__stock'):
+        available[set_id].append(product_stock // quantity)
+    for set_id, counts in available.items():
+        stock[set_id] = min(counts)
+    return stock
+
+
+class Dashboard:
+    """
+    1 店舗分のダッシュボード
+
+    読み込んだデータは cached_property で保持するので、
+    snapshot() で全パネルを計算してもクエリは各データにつき 1 回だけ発行される。
+    """
+
+    def __init__(self, store, now=None, using=DB):
+        self.store = store
+        self.using = using
+        self.now = timezone.localtime(now or timezone.now())
+        self.today = self.now.date()
+        self.today_start = self._day_start(self.today)
+
+    @staticmethod
+    def _day_start(day):
+        return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+    # -------------------------
+    # 共有データの読み込み
+    # -------------------------
+
+    @cached_property
+    def hourly_rows(self):
+        """
+        店舗の時間帯別売上（時間帯順）
+        編集で取引が別の時間帯へ移ると件数0の行が残るため除く
+
+        Returns:
+            list: (ローカル時刻の時間帯, 売上, 件数) のタプル
+        """
+        return [
+            (timezone.localtime(hour), int(sales), count)
+            for hour, sales, count in HourlySales.objects.using(self.using).filter(
+                store=self.store,
+                transaction_count__gt=0
+            ).order_by('hour').values_list('hour', 'sales', 'transaction_count')
+        ]
+
+    @cached_property
+    def today_item_rows(self):
+        """本日の商品・セット商品ごとの販売数と売上（販売数0は除く）"""
+        return list(HourlyProductSales.objects.using(self.using).filter(
+            store=self.store,
+            hour__gte=self.today_start,
+            hour__lt=self._day_start(self.today + timedelta(days=1))
+        ).values('product_id', 'product_set_id').annotate(
+            total_quantity=Sum('quantity'),
+            total_sales=Sum('sales')
+        ).filter(total_quantity__gt=0).order_by('product_id', 'product_set_id'))
+
+    @cached_property
+    def products(self):
+        """店舗の販売中の商品と、本日売れた商品（名前順）"""
+        sold_ids = [row['product_id'] for row in self.today_item_rows if row['product_id']]
+        return list(Product.objects.using(self.using).filter(
+            Q(store=self.store, is_active=True) | Q(id__in=sold_ids)
+        ).order_by('name', 'id'))
+
+    @cached_property
+    def sold_sets(self):
+        """本日売れたセット商品と、その在庫"""
+        set_ids = [row['product_set_id'] for row in self.today_item_rows if row['product_set_id']]
+        product_sets = ProductSet.objects.using(self.using).filter(id__in=set_ids).in_bulk()
+        return product_sets, compute_set_stock(product_sets, using=self.using)
+
+    def _totals(self, start, end):
+        """start 以上 end 未満の時間帯の売上合計・件数"""
+        sales = count = 0
+        for hour, hour_sales, hour_count in self.hourly_rows:
+            if start <= hour < end:
+                sales += hour_sales
+                count += hour_count
+        return {'sales': sales, 'count': count}
+
+    # -------------------------
+    # パネル
+    # -------------------------
+
+    def today_sales(self):
+        """本日の売上合計・件数"""
+        result = self._totals(self.today_start, self._day_start(self.today + timedelta(days=1)))
+        return {
+            'total_sales': result['sales'],
+            'transaction_count': result['count'],
+        }
+
+    def hourly_stats(self):
+        """時間帯別の売上・件数（本日分）"""
+        hourly_data = {hour: {'sales': 0, 'count': 0} for hour in BUSINESS_HOURS}
+        for hour_start, sales, count in self.hourly_rows:
+            if hour_start.date() == self.today and hour_start.hour in hourly_data:
+                hourly_data[hour_start.hour]['sales'] += sales
+                hourly_data[hour_start.hour]['count'] += count
+
+        return {
+            'labels': [f'{h}:00' for h in BUSINESS_HOURS],
+            'sales': [hourly_data[h]['sales'] for h in BUSINESS_HOURS],
+            'counts': [hourly_data[h]['count'] for h in BUSINESS_HOURS],
+        }
+
+    def yearly_comparison(self):
+        """年度比較（去年vs今年）- 学祭期間の比較"""
+        this_year = self.now.year
+        last_year = this_year - 1
+        boundaries = [timezone.make_aware(datetime(year, 1, 1)) for year in (last_year, this_year, this_year + 1)]
+        last_year_data = self._totals(boundaries[0], boundaries[1])
+        this_year_data = self._totals(boundaries[1], boundaries[2])
+
+        return {
+            'labels': [str(last_year), str(this_year)],
+            'sales': [last_year_data['sales'], this_year_data['sales']],
+            'counts': [last_year_data['count'], this_year_data['count']],
+        }
+
+    def daily_comparison(self):
+        """日別比較（1日目vs2日目）- 最初の取引日を1日目、その翌日を2日目とする"""
+        if not self.hourly_rows:
+            return {
+                'labels': ['1日目', '2日目'],
+                'sales': [0, 0],
+                'counts': [0, 0],
+            }
+
+        day1 = self.hourly_rows[0][0].date()
+        day2 = day1 + timedelta(days=1)
+        day1_data = self._totals(self._day_start(day1), self._day_start(day2))
+        day2_data = self._totals(self._day_start(day2), self._day_start(day2 + timedelta(days=1)))
+
+        return {
+            'labels': [f'1日目 ({day1.strftime("%m/%d")})', f'2日目 ({day2.strftime("%m/%d")})'],
+            'sales': [day1_data['sales'], day2_data['sales']],
+            'counts': [day1_data['count'], day2_data['count']],
+        }
+
+    def product_ranking(self):
+        """商品別売上ランキング（本日分・上位10件）"""
+        products = {product.id: product for product in self.products}
+        product_sets, set_stock = self.sold_sets
+
+        ranking = []
+        for row in self.today_item_rows:
+            product = products.get(row['product_id'])
+            if product:
+                ranking.append({
+                    'name': product.name,
+                    'type': '通常',
+                    'quantity': row['total_quantity'],
+                    'sales': int(row['total_sales']),
+                    'stock': product.stock,
+                    'price': int(product.current_price),
+                })
+
+        for row in self.today_item_rows:
+            product_set = product_sets.get(row['product_set_id'])
+            if product_set:
+                ranking.append({
+                    'name': product_set.name,
+                    'type': 'セット',
+                    'quantity': row['total_quantity'],
+                    'sales': int(row['total_sales']),
+                    'stock': set_stock[product_set.id],
+                    'price': int(product_set.price),
+                })
+
+        # 売上金額でソート
+        ranking.sort(key=lambda x: x['sales'], reverse=True)
+
+        return {
+            'ranking': ranking[:10],
+        }
+
+    def stock_prediction(self):
+        """
+        売り切れ予測・ロス予測
+        販売ペースと閉店までの売れ方は forecast.py の需要予測（セット商品の構成商品も含む）を使い、
+        在庫は最新の値を使う
+        """
+        forecast = get_demand_forecast(self.store, self.now, lambda: self.hourly_rows, using=self.using)
+
+        sellout_predictions = []
+        loss_predictions = []
+
+        for product in self.products:
+            if not (product.store_id == self.store.id and product.is_active):
+                continue
+            sales_rate, time_to_sellout, predicted_remaining = predict_stock(forecast, product.id, product.stock)
+
+            if time_to_sellout is not None:
+                if time_to_sellout < 0.5:
+                    status = 'critical'
+                elif time_to_sellout < 1:
+                    status = 'warning'
+                else:
+                    status = 'ok'
+
+                sellout_predictions.append({
+                    'name': product.name,
+                    'current_stock': product.stock,
+                    'sales_rate': round(sales_rate, 1),
+                    'time_to_sellout': round(time_to_sellout, 1),
+                    'status': status,
+                })
+
+            # ロス予測（閉店時の予測残数）
+            if predicted_remaining > 0:
+                loss_predictions.append({
+                    'name': product.name,
+                    'current_stock': product.stock,
+                    'predicted_remaining': max(0, round(predicted_remaining)),
+                    'loss_amount': max(0, round(predicted_remaining * float(product.current_price))),
+                })
+
+        # 売り切れ予測をステータス（危険度）順、ロス予測をロス金額順にソート
+        status_order = {'critical': 0, 'warning': 1, 'ok': 2}
+        sellout_predictions.sort(key=lambda x: (status_order[x['status']], x['time_to_sellout']))
+        loss_predictions.sort(key=lambda x: x['loss_amount'], reverse=True)
+
+        return {
+            'sellout_predictions': sellout_predictions[:10],
+            'loss_predictions': loss_predictions[:10],
+            'hours_elapsed': round(forecast['hours_elapsed'], 1),
+            'remaining_hours': round(forecast['remaining_hours'], 1),
+        }
+
+    def version(self):
+        """
+        snapshot() の内容を決める入力の版（ETag 用）
+        全パネルを計算せずに、集計テーブルの最終更新・商品の在庫・日付・需要予測の区切りだけを読む
+
+        Returns:
+            tuple: 入力が変わらなければ同じ値
+        """
+        rollups = [
+            tuple(model.objects.using(self.using).filter(store=self.store).aggregate(
+                rows=Count('pk'), updated_at=Max('updated_at')
+            ).values())
+            for model in (HourlySales, HourlyProductSales)
+        ]
+        # 在庫は会計時に F() で減らすため updated_at は変わらない。値そのものを含める
+        products = list(Product.objects.using(self.using).filter(store=self.store).order_by('id').values_list(
+            'id', 'stock', 'is_active', 'updated_at'
+        ))
+        product_sets = list(ProductSet.objects.using(self.using).filter(store=self.store).order_by('id').values_list(
+            'id', 'updated_at'
+        ))
+        return (self.today.isoformat(), forecast_slot(self.now), rollups, products, product_sets)
+
+    def snapshot(self):
+        """全パネルをまとめて計算する"""
+        return {
+            'today_sales': self.today_sales(),
+            'hourly_stats': self.hourly_stats(),
+            'yearly_comparison': self.yearly_comparison(),
+            'daily_comparison': self.daily_comparison(),
+            'product_ranking': self.product_ranking(),
+            'stock_prediction': self.stock_prediction(),
+        }
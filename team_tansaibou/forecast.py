@@ -0,0 +1,213 @@
+"""
+売り切れ・ロス予測のための商品別の需要予測
+
+以前の stock_prediction は「本日の販売数 ÷ 0時からの経過時間」を販売ペースとし、
+残りの時間も同じペースで売れると仮定していた。これだと昼のピークと夕方の落ち込みを区別できず、
+セット商品として売れた分も構成商品の在庫の減り方に反映されなかった。
+
+ここでは
+- 本日の時間帯別の販売数（セット商品は構成商品の数量に展開する）を商品ごとに並べ、
+  直近の時間帯ほど重く見る指数加重で販売ペースを求める
+- 去年の時間帯別の取引件数（年度比較と同じ HourlySales）から 1 日の売れ方の形（時間帯ごとの重み）を作り、
+  販売ペースをその形に沿って残りの時間帯へ割り振る
+- 時間帯の重みは全商品で共通なので、商品ごとには基準ペース 1 つを計算するだけで済む
+予測は店舗ごとに CACHE_TIMEOUT 秒の区切り（forecast_slot）単位でキャッシュし、
+在庫はキャッシュせず呼び出し側で最新の値を当てる。
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.cache import cache
+
+from .models import HourlyProductSales, ProductSetItem
+
+DB = 'team_tansaibou'
+
+# 営業時間（開店・閉店の時刻）。開店前に売れていれば、その時間帯から観測する
+OPENING_HOUR = 9
+CLOSING_HOUR = 20
+
+# 指数加重の半減期（時間）：2 時間前の販売は直近の半分の重みで数える
+HALF_LIFE_HOURS = 2.0
+
+# 去年の売れ方をどれだけ信じるか（残りは時間帯によらない一様な重み）
+CURVE_BLEND = 0.5
+
+CACHE_KEY = 'team_tansaibou:forecast:{store_id}:{slot}'
+CACHE_TIMEOUT = 60
+
+
+def _hour_start(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_curve(hourly_rows, year):
+    """
+    去年の時間帯別の取引件数から、時刻（0〜23時）ごとの売れ方の重みを作る
+    去年のデータがなければ一様な重みになる
+
+    Args:
+        hourly_rows (list): Dashboard.hourly_rows（(ローカル時刻の時間帯, 売上, 件数)）
+        year (int): 対象の年（去年）
+
+    Returns:
+        list: 24 要素の重み（合計 1）
+    """
+    counts = [0] * 24
+    for hour, _, count in hourly_rows:
+        if hour.year == year:
+            counts[hour.hour] += count
+    total = sum(counts)
+    if not total:
+        return [1 / 24] * 24
+    return [CURVE_BLEND * count / total + (1 - CURVE_BLEND) / 24 for count in counts]
+
+
+def _today_quantities(store, day_start, using):
+    """
+    本日の時間帯別・商品別の販売数（セット商品は構成商品に展開する）
+
+    Returns:
+        dict: {(ローカル時刻の時間帯, 商品ID): 販売数}
+    """
+    rows = list(HourlyProductSales.objects.using(using).filter(
+        store=store,
+        hour__gte=day_start,
+        hour__lt=day_start + timedelta(days=1),
+        quantity__gt=0
+    ).values_list('hour', 'product_id', 'product_set_id', 'quantity'))
+
+    components = defaultdict(list)
+    set_ids = {product_set_id for _, _, product_set_id, _ in rows if product_set_id}
+    for set_id, product_id, per_set in ProductSetItem.objects.using(using).filter(
+        product_set_id__in=set_ids
+    ).values_list('product_set_id', 'product_id', 'quantity'):
+        components[set_id].append((product_id, per_set))
+
+    quantities = defaultdict(int)
+    for hour, product_id, product_set_id, quantity in rows:
+        if product_id:
+            quantities[(hour, product_id)] += quantity
+        for component_id, per_set in components.get(product_set_id, ()):
+            quantities[(hour, component_id)] += per_set * quantity
+    return quantities
+
+
+def build_demand_forecast(store, now, hourly_rows, using=DB):
+    """
+    商品ごとの需要予測を計算する
+
+    Args:
+        store (Store): 店舗
+        now (datetime): 現在時刻（ローカル時刻）
+        hourly_rows (list): Dashboard.hourly_rows（去年の売れ方に使う）
+        using (str): DBエイリアス
+
+    Returns:
+        dict: {
+            'rates': {商品ID: 基準ペース},
+            'current_weight': 現在の時間帯の重み（基準ペース × 重み = 現在の販売ペース[個/時]）,
+            'slots': 閉店までの (長さ[時間], 重み) のリスト,
+            'hours_elapsed': 観測した時間, 'remaining_hours': 閉店までの時間,
+        }
+    """
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    current_hour = _hour_start(now)
+    curve = _hour_curve(hourly_rows, now.year - 1)
+    quantities = _today_quantities(store, day_start, using)
+
+    # 観測期間：開店（それより前に売れていればその時間帯）から現在まで
+    sold_hours = [hour for hour, _ in quantities if hour <= current_hour]
+    first_hour = min(sold_hours + [day_start + timedelta(hours=OPENING_HOUR)])
+    observed = []
+    hour = first_hour
+    while hour <= current_hour:
+        exposure = min((now - hour).total_seconds() / 3600, 1.0)
+        age = (current_hour - hour).total_seconds() / 3600
+        observed.append((hour, exposure, 0.5 ** (age / HALF_LIFE_HOURS)))
+        hour += timedelta(hours=1)
+
+    # 基準ペース = Σ 重み×販売数 / Σ 重み×観測時間×時間帯の重み
+    # （去年の売れ方で割り戻すので、ピーク時間帯の販売だけで 1 日のペースを高く見積もらない）
+    exposure_total = sum(weight * exposure * curve[hour.hour] for hour, exposure, weight in observed)
+    rates = {}
+    if exposure_total > 0:
+        decay = {hour: weight for hour, _, weight in observed}
+        weighted = defaultdict(float)
+        for (hour, product_id), quantity in quantities.items():
+            if hour in decay:
+                weighted[product_id] += decay[hour] * quantity
+        rates = {product_id: total / exposure_total for product_id, total in weighted.items()}
+
+    # 閉店までの残り時間を時間帯ごとに区切る（最初は現在の時間帯の残り）
+    closing = day_start + timedelta(hours=CLOSING_HOUR)
+    slots = []
+    start = now
+    while start < closing:
+        end = min(_hour_start(start) + timedelta(hours=1), closing)
+        slots.append(((end - start).total_seconds() / 3600, curve[start.hour]))
+        start = end
+
+    return {
+        'rates': rates,
+        'current_weight': curve[now.hour],
+        'slots': slots,
+        'hours_elapsed': sum(exposure for _, exposure, _ in observed),
+        'remaining_hours': sum(length for length, _ in slots),
+    }
+
+
+def forecast_slot(now):
+    """
+    予測のキャッシュの区切り（CACHE_TIMEOUT 秒ごとに変わる番号）
+    同じ区切りの間は同じ予測を返すので、ダッシュボードの ETag にも使える
+    """
+    return int(now.timestamp()) // CACHE_TIMEOUT
+
+
+def get_demand_forecast(store, now, load_hourly_rows, using=DB):
+    """
+    店舗の需要予測を返す（forecast_slot() の区切りごとにキャッシュする）
+
+    Args:
+        load_hourly_rows (callable): 時間帯別売上を返す関数（キャッシュがない場合だけ呼ぶ）
+    """
+    key = CACHE_KEY.format(store_id=store.id, slot=forecast_slot(now))
+    forecast = cache.get(key)
+    if forecast is None:
+        forecast = build_demand_forecast(store, now, load_hourly_rows(), using=using)
+        cache.set(key, forecast, CACHE_TIMEOUT)
+    return forecast
+
+
+def predict_stock(forecast, product_id, stock):
+    """
+    1 商品の在庫の見通し
+
+    Args:
+        forecast (dict): build_demand_forecast() の戻り値
+        product_id (int): 商品ID
+        stock (int): 現在の在庫
+
+    Returns:
+        tuple: (現在の販売ペース[個/時], 売り切れまでの時間[時間]（売れていなければ None）, 閉店時の予測残数)
+    """
+    rate = forecast['rates'].get(product_id, 0.0)
+    current_rate = rate * forecast['current_weight']
+    if rate <= 0:
+        return current_rate, None, stock
+
+    remaining = stock
+    elapsed = 0.0
+    time_to_sellout = 0.0 if stock <= 0 else None
+    for length, weight in forecast['slots']:
+        demand = rate * weight * length
+        if time_to_sellout is None and demand >= remaining > 0:
+            time_to_sellout = elapsed + length * remaining / demand
+        remaining -= demand
+        elapsed += length
+    if time_to_sellout is None:
+        # 閉店までに売り切れない場合は、閉店後も現在のペースで売れ続けたときの時間
+        time_to_sellout = elapsed + max(remaining, 0) / current_rate
+    return current_rate, time_to_sellout, remaining
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from team_tansaibou.sales_rollup import rebuild_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the hourly sales rollup tables used by the dashboard APIs from all transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='team_tansaibou', help='DB alias (default: team_tansaibou)')
+
+    def handle(self, *args, **options):
+        hourly_count, product_count = rebuild_sales_rollups(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {hourly_count} hourly sales rows and {product_count} hourly product sales rows."
+        ))
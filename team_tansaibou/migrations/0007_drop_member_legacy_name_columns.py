@@ -0,0 +1,47 @@
+# Generated manually - Drop the legacy first_name/last_name columns left by 0006
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    0006 は Member の状態から first_name/last_name を外したが、列は DB に残したままだった。
+    NOT NULL で既定値もないため、0006 以降は新しい担当者を登録できない（INSERT が失敗する）。
+
+    0001 で作られた列は 0006 まで残っているので、状態にだけいったん戻してから RemoveField で削除する。
+    列の削除は Django のスキーマエディタに任せる（DROP COLUMN が使えない SQLite 3.35 未満ではテーブルを作り直す）。
+    """
+
+    dependencies = [
+        ('team_tansaibou', '0006_change_member_fields'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                # 状態だけに DB 上の列を戻す（DB は変更しない）
+                migrations.SeparateDatabaseAndState(
+                    state_operations=[
+                        migrations.AddField(
+                            model_name='member',
+                            name='first_name',
+                            field=models.CharField(default='', max_length=100),
+                        ),
+                        migrations.AddField(
+                            model_name='member',
+                            name='last_name',
+                            field=models.CharField(default='', max_length=100),
+                        ),
+                    ],
+                ),
+                migrations.RemoveField(
+                    model_name='member',
+                    name='first_name',
+                ),
+                migrations.RemoveField(
+                    model_name='member',
+                    name='last_name',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:47
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_tansaibou', '0007_drop_member_legacy_name_columns'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='member',
+            options={'verbose_name': '担当者', 'verbose_name_plural': '担当者'},
+        ),
+        migrations.CreateModel(
+            name='HourlySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='時間帯（開始時刻）')),
+                ('sales', models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=12, verbose_name='売上')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='取引件数')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_sales', to='team_tansaibou.store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': '時間帯別売上',
+                'verbose_name_plural': '時間帯別売上',
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='時間帯（開始時刻）')),
+                ('quantity', models.IntegerField(default=0, verbose_name='販売数')),
+                ('sales', models.DecimalField(decimal_places=0, default=Decimal('0'), max_digits=12, verbose_name='売上')),
+                ('product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='team_tansaibou.product', verbose_name='商品')),
+                ('product_set', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='team_tansaibou.productset', verbose_name='セット商品')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_product_sales', to='team_tansaibou.store', verbose_name='店舗')),
+            ],
+            options={
+                'verbose_name': '時間帯別商品売上',
+                'verbose_name_plural': '時間帯別商品売上',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='hourlysales',
+            constraint=models.UniqueConstraint(fields=('store', 'hour'), name='tansaibou_hourlysales_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyproductsales',
+            constraint=models.UniqueConstraint(condition=models.Q(('product__isnull', False)), fields=('store', 'hour', 'product'), name='tansaibou_hourlyproductsales_product_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlyproductsales',
+            constraint=models.UniqueConstraint(condition=models.Q(('product_set__isnull', False)), fields=('store', 'hour', 'product_set'), name='tansaibou_hourlyproductsales_set_unique'),
+        ),
+    ]
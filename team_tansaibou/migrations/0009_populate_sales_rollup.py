@@ -0,0 +1,73 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def populate_sales_rollup(apps, schema_editor):
+    """既存の取引から時間帯別の売上集計を作成"""
+    Transaction = apps.get_model('team_tansaibou', 'Transaction')
+    TransactionItem = apps.get_model('team_tansaibou', 'TransactionItem')
+    HourlySales = apps.get_model('team_tansaibou', 'HourlySales')
+    HourlyProductSales = apps.get_model('team_tansaibou', 'HourlyProductSales')
+
+    db_alias = schema_editor.connection.alias
+
+    def hour_bucket(value):
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+    sales = defaultdict(lambda: [Decimal('0'), 0])
+    buckets = {}
+    for row in Transaction.objects.using(db_alias).filter(store__isnull=False).values(
+        'pk', 'store_id', 'transaction_date', 'total_amount'
+    ):
+        bucket = (row['store_id'], hour_bucket(row['transaction_date']))
+        buckets[row['pk']] = bucket
+        sales[bucket][0] += row['total_amount']
+        sales[bucket][1] += 1
+
+    products = defaultdict(lambda: [0, Decimal('0')])
+    for row in TransactionItem.objects.using(db_alias).filter(transaction__store__isnull=False).values(
+        'transaction_id', 'product_id', 'product_set_id', 'quantity', 'subtotal'
+    ):
+        if not (row['product_id'] or row['product_set_id']):
+            continue
+        totals = products[(*buckets[row['transaction_id']], row['product_id'], row['product_set_id'])]
+        totals[0] += row['quantity']
+        totals[1] += row['subtotal']
+
+    HourlySales.objects.using(db_alias).bulk_create([
+        HourlySales(store_id=store_id, hour=hour, sales=total, transaction_count=count)
+        for (store_id, hour), (total, count) in sales.items()
+    ], batch_size=1000)
+    HourlyProductSales.objects.using(db_alias).bulk_create([
+        HourlyProductSales(store_id=store_id, hour=hour, product_id=product_id,
+                           product_set_id=product_set_id, quantity=quantity, sales=total)
+        for (store_id, hour, product_id, product_set_id), (quantity, total) in products.items()
+    ], batch_size=1000)
+
+    print(f"売上集計作成: 時間帯別{len(sales)}件、商品別{len(products)}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：集計を削除"""
+    HourlySales = apps.get_model('team_tansaibou', 'HourlySales')
+    HourlyProductSales = apps.get_model('team_tansaibou', 'HourlyProductSales')
+    db_alias = schema_editor.connection.alias
+
+    HourlySales.objects.using(db_alias).all().delete()
+    HourlyProductSales.objects.using(db_alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_tansaibou', '0008_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_sales_rollup, reverse_migration),
+    ]
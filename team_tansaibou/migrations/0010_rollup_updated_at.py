@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_tansaibou', '0009_populate_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hourlyproductsales',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+        migrations.AddField(
+            model_name='hourlysales',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='更新日時'),
+        ),
+    ]
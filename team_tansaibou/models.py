@@ -426,3 +426,92 @@ class TransactionItem(models.Model):
 
         if is_new:
             self.check_and_reduce_stock()
+
+
+class HourlySales(models.Model):
+    """
+    店舗ごと・1時間ごとの売上集計（ダッシュボードAPI用）
+    取引の登録・編集・削除のたびに sales_rollup.py で差分更新する
+    """
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='hourly_sales',
+        verbose_name='店舗'
+    )
+    hour = models.DateTimeField(verbose_name='時間帯（開始時刻）')
+    sales = models.DecimalField(
+        max_digits=12,
+        decimal_places=0,
+        default=Decimal('0'),
+        verbose_name='売上'
+    )
+    transaction_count = models.IntegerField(default=0, verbose_name='取引件数')
+    # ダッシュボードの ETag 用（F() での差分更新でも sales_rollup.py が更新する）
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日時')
+
+    class Meta:
+        verbose_name = '時間帯別売上'
+        verbose_name_plural = '時間帯別売上'
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'hour'], name='tansaibou_hourlysales_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}時 - {self.sales}円 ({self.transaction_count}件)"
+
+
+class HourlyProductSales(models.Model):
+    """
+    店舗ごと・1時間ごと・商品（セット商品）ごとの販売数集計（ダッシュボードAPI用）
+    product と product_set はどちらか一方のみ入る
+    """
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='hourly_product_sales',
+        verbose_name='店舗'
+    )
+    hour = models.DateTimeField(verbose_name='時間帯（開始時刻）')
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='商品'
+    )
+    product_set = models.ForeignKey(
+        ProductSet,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name='セット商品'
+    )
+    quantity = models.IntegerField(default=0, verbose_name='販売数')
+    sales = models.DecimalField(
+        max_digits=12,
+        decimal_places=0,
+        default=Decimal('0'),
+        verbose_name='売上'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新日時')
+
+    class Meta:
+        verbose_name = '時間帯別商品売上'
+        verbose_name_plural = '時間帯別商品売上'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['store', 'hour', 'product'],
+                condition=models.Q(product__isnull=False),
+                name='tansaibou_hourlyproductsales_product_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['store', 'hour', 'product_set'],
+                condition=models.Q(product_set__isnull=False),
+                name='tansaibou_hourlyproductsales_set_unique',
+            ),
+        ]
+
+    def __str__(self):
+        item = self.product or self.product_set
+        return f"{self.hour:%Y-%m-%d %H}時 - {item} x{self.quantity}"
@@ -0,0 +1,269 @@
+"""
+ダッシュボード用の売上集計（HourlySales / HourlyProductSales）の増分更新
+
+ダッシュボードは学祭中に頻繁に再読み込みされるため、APIのたびに取引を全件集計し直さず、
+取引・取引明細の登録・編集・削除のたびに該当する時間帯（正時単位）の集計行を差分で更新する。
+signals.py から呼ばれ、取引の保存と同じトランザクションの中で実行される。
+（レジの会計で bulk_create した明細は checkout.py が record_items_created() で反映する）
+店舗が未設定の取引はダッシュボードに出ないため集計しない。
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import HourlyProductSales, HourlySales, Transaction, TransactionItem
+
+DB = 'team_tansaibou'
+
+
+def hour_bucket(value):
+    """
+    取引日時をローカル時刻の正時に切り捨てる
+
+    Args:
+        value (datetime | str): 取引日時（ビューではフォームの文字列のまま保存されることがある）
+
+    Returns:
+        datetime: タイムゾーン付きの時間帯の開始時刻
+    """
+    if isinstance(value, str):
+        value = Transaction._meta.get_field('transaction_date').to_python(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return timezone.localtime(value).replace(minute=0, second=0, microsecond=0)
+
+
+def _item_key(product_id, product_set_id):
+    if product_id:
+        return {'product_id': product_id}
+    if product_set_id:
+        return {'product_set_id': product_set_id}
+    return None
+
+
+def _bump(model, key, deltas, using):
+    """
+    集計行に差分を加える
+    加算時は集計行がなければ作成し、減算時は作成しない（集計の再構築前の取引など）
+    """
+    qs = model.objects.using(using).filter(**key)
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    # update() では auto_now が働かないので、更新日時も明示する
+    if qs.update(**updates, updated_at=timezone.now()):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic(using=using):
+            model.objects.using(using).create(**key, **deltas)
+    except IntegrityError:
+        # 同時に作成された場合は、作成された行に加算する
+        qs.update(**updates, updated_at=timezone.now())
+
+
+def _add_sales(store_id, hour, amount, count, using):
+    if store_id:
+        _bump(HourlySales, {'store_id': store_id, 'hour': hour},
+              {'sales': amount, 'transaction_count': count}, using)
+
+
+def _add_item(store_id, hour, key, quantity, sales, using):
+    if store_id and key:
+        _bump(HourlyProductSales, {'store_id': store_id, 'hour': hour, **key},
+              {'quantity': quantity, 'sales': sales}, using)
+
+
+def _transaction_bucket(item, using):
+    """明細が属する取引の (店舗ID, 時間帯) を返す（取引が見つからなければ None）"""
+    if TransactionItem.transaction.is_cached(item):
+        trans = item.transaction
+        return trans.store_id, hour_bucket(trans.transaction_date)
+    row = Transaction.objects.using(using).filter(pk=item.transaction_id).values(
+        'store_id', 'transaction_date'
+    ).first()
+    if row is None:
+        return None
+    return row['store_id'], hour_bucket(row['transaction_date'])
+
+
+def load_previous_transaction(trans, using=DB):
+    """保存前の取引の集計キーと金額をDBから読み込む（新規作成なら None）"""
+    if trans.pk is None:
+        return None
+    return Transaction.objects.using(using).filter(pk=trans.pk).values(
+        'store_id', 'transaction_date', 'total_amount'
+    ).first()
+
+
+def load_previous_item(item, using=DB):
+    """保存前の取引明細をDBから読み込む（新規作成なら None）"""
+    if item.pk is None:
+        return None
+    return TransactionItem.objects.using(using).filter(pk=item.pk).values(
+        'transaction_id', 'product_id', 'product_set_id', 'quantity', 'subtotal'
+    ).first()
+
+
+def record_transaction_saved(trans, previous, using=DB):
+    """
+    取引の登録・編集を集計に反映する
+    日時や店舗が変わった場合は、明細の集計も新しい時間帯へ移す
+
+    Args:
+        trans (Transaction): 保存後の取引
+        previous (dict): load_previous_transaction() の戻り値
+        using (str): DBエイリアス
+    """
+    new_hour = hour_bucket(trans.transaction_date)
+    amount = Decimal(str(trans.total_amount))
+    with transaction.atomic(using=using):
+        if previous:
+            old_hour = hour_bucket(previous['transaction_date'])
+            moved = (previous['store_id'], old_hour) != (trans.store_id, new_hour)
+            if not moved and previous['total_amount'] == amount:
+                return
+            _add_sales(previous['store_id'], old_hour, -previous['total_amount'], -1, using)
+            if moved:
+                items = TransactionItem.objects.using(using).filter(transaction_id=trans.pk).values(
+                    'product_id', 'product_set_id'
+                ).annotate(total_quantity=Sum('quantity'), total_sales=Sum('subtotal')).order_by()
+                for item in items:
+                    key = _item_key(item['product_id'], item['product_set_id'])
+                    _add_item(previous['store_id'], old_hour, key,
+                              -item['total_quantity'], -item['total_sales'], using)
+                    _add_item(trans.store_id, new_hour, key,
+                              item['total_quantity'], item['total_sales'], using)
+        _add_sales(trans.store_id, new_hour, amount, 1, using)
+
+
+def record_transaction_deleted(trans, using=DB):
+    """取引の削除を集計に反映する（明細の分は明細の削除時に反映される）"""
+    _add_sales(trans.store_id, hour_bucket(trans.transaction_date),
+               -Decimal(str(trans.total_amount)), -1, using)
+
+
+def record_item_saved(item, previous, using=DB):
+    """
+    取引明細の登録・編集を集計に反映する
+
+    Args:
+        item (TransactionItem): 保存後の取引明細
+        previous (dict): load_previous_item() の戻り値
+        using (str): DBエイリアス
+    """
+    with transaction.atomic(using=using):
+        if previous:
+            old = TransactionItem(transaction_id=previous['transaction_id'])
+            bucket = _transaction_bucket(old, using)
+            if bucket:
+                _add_item(*bucket, _item_key(previous['product_id'], previous['product_set_id']),
+                          -previous['quantity'], -previous['subtotal'], using)
+        bucket = _transaction_bucket(item, using)
+        if bucket:
+            _add_item(*bucket, _item_key(item.product_id, item.product_set_id),
+                      item.quantity, item.subtotal, using)
+
+
+def record_item_deleted(item, using=DB):
+    """取引明細の削除を集計に反映する"""
+    bucket = _transaction_bucket(item, using)
+    if bucket:
+        _add_item(*bucket, _item_key(item.product_id, item.product_set_id),
+                  -item.quantity, -item.subtotal, using)
+
+
+def record_items_created(trans, items, using=DB):
+    """
+    bulk_create した取引明細をまとめて集計に反映する（bulk_create ではシグナルが動かないため）
+    既存の集計行の読み込み・加算・作成をそれぞれ 1 クエリで行う
+
+    Args:
+        trans (Transaction): 明細の取引
+        items (list): 作成した TransactionItem
+        using (str): DBエイリアス
+    """
+    if not trans.store_id:
+        return
+    hour = hour_bucket(trans.transaction_date)
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    for item in items:
+        if _item_key(item.product_id, item.product_set_id):
+            key_totals = totals[(item.product_id, item.product_set_id)]
+            key_totals[0] += item.quantity
+            key_totals[1] += item.subtotal
+    if not totals:
+        return
+
+    product_ids = [product_id for product_id, _ in totals if product_id]
+    set_ids = [product_set_id for _, product_set_id in totals if product_set_id]
+    with transaction.atomic(using=using):
+        existing = {
+            (row.product_id, row.product_set_id): row
+            for row in HourlyProductSales.objects.using(using).filter(store_id=trans.store_id, hour=hour).filter(
+                Q(product_id__in=product_ids) | Q(product_set_id__in=set_ids)
+            )
+        }
+        to_update, to_create = [], []
+        now = timezone.now()
+        for (product_id, product_set_id), (quantity, sales) in totals.items():
+            row = existing.get((product_id, product_set_id))
+            if row:
+                row.quantity = F('quantity') + quantity
+                row.sales = F('sales') + sales
+                row.updated_at = now
+                to_update.append(row)
+            else:
+                to_create.append(HourlyProductSales(
+                    store_id=trans.store_id, hour=hour, product_id=product_id,
+                    product_set_id=product_set_id, quantity=quantity, sales=sales,
+                ))
+        if to_update:
+            HourlyProductSales.objects.using(using).bulk_update(to_update, ['quantity', 'sales', 'updated_at'])
+        if to_create:
+            HourlyProductSales.objects.using(using).bulk_create(to_create)
+
+
+def rebuild_sales_rollups(using=DB):
+    """
+    取引から集計テーブルを作り直す
+
+    Returns:
+        tuple: (HourlySales の件数, HourlyProductSales の件数)
+    """
+    sales = defaultdict(lambda: [Decimal('0'), 0])
+    buckets = {}
+    for row in Transaction.objects.using(using).filter(store__isnull=False).values(
+        'pk', 'store_id', 'transaction_date', 'total_amount'
+    ).iterator():
+        bucket = (row['store_id'], hour_bucket(row['transaction_date']))
+        buckets[row['pk']] = bucket
+        sales[bucket][0] += row['total_amount']
+        sales[bucket][1] += 1
+
+    products = defaultdict(lambda: [0, Decimal('0')])
+    for row in TransactionItem.objects.using(using).filter(transaction__store__isnull=False).values(
+        'transaction_id', 'product_id', 'product_set_id', 'quantity', 'subtotal'
+    ).iterator():
+        if not (row['product_id'] or row['product_set_id']):
+            continue
+        totals = products[(*buckets[row['transaction_id']], row['product_id'], row['product_set_id'])]
+        totals[0] += row['quantity']
+        totals[1] += row['subtotal']
+
+    with transaction.atomic(using=using):
+        HourlySales.objects.using(using).all().delete()
+        HourlyProductSales.objects.using(using).all().delete()
+        HourlySales.objects.using(using).bulk_create([
+            HourlySales(store_id=store_id, hour=hour, sales=total, transaction_count=count)
+            for (store_id, hour), (total, count) in sales.items()
+        ], batch_size=1000)
+        HourlyProductSales.objects.using(using).bulk_create([
+            HourlyProductSales(store_id=store_id, hour=hour, product_id=product_id,
+                               product_set_id=product_set_id, quantity=quantity, sales=total)
+            for (store_id, hour, product_id, product_set_id), (quantity, total) in products.items()
+        ], batch_size=1000)
+    return len(sales), len(products)
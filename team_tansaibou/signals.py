@@ -0,0 +1,56 @@
+"""
+取引・取引明細の書き込みに合わせてダッシュボード用の売上集計を更新するシグナル
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Transaction, TransactionItem
+from .sales_rollup import (
+    load_previous_item,
+    load_previous_transaction,
+    record_item_deleted,
+    record_item_saved,
+    record_transaction_deleted,
+    record_transaction_saved,
+)
+
+
+@receiver(pre_save, sender=Transaction)
+def load_transaction_before_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    # 編集時は変更前の値との差分で集計を更新するため、保存前の値を保持しておく
+    instance._previous_rollup_state = load_previous_transaction(instance, using=using)
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollup_on_transaction_save(sender, instance, using, raw=False, **kwargs):
+    # fixture読み込み時は rebuild_sales_rollup に任せる
+    if raw:
+        return
+    record_transaction_saved(instance, getattr(instance, '_previous_rollup_state', None), using=using)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollup_on_transaction_delete(sender, instance, using, **kwargs):
+    record_transaction_deleted(instance, using=using)
+
+
+@receiver(pre_save, sender=TransactionItem)
+def load_item_before_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    instance._previous_rollup_state = load_previous_item(instance, using=using)
+
+
+@receiver(post_save, sender=TransactionItem)
+def update_rollup_on_item_save(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    record_item_saved(instance, getattr(instance, '_previous_rollup_state', None), using=using)
+
+
+@receiver(post_delete, sender=TransactionItem)
+def update_rollup_on_item_delete(sender, instance, using, **kwargs):
+    record_item_deleted(instance, using=using)
@@ -8,6 +8,7 @@ Team Tansaibou POS システムの包括的なテストスイート
 - エッジケース（在庫不足、バリデーションエラー）
 """
 
+from django.db.models import F
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.core.exceptions import ValidationError
@@ -721,3 +722,440 @@ class IntegrationTest(TestCase):
 
         # セット在庫: min(10/1, 25/1) = 10セット
         self.assertEqual(self.product_set.get_stock_status(), 10)
+
+
+class SalesRollupTest(TestCase):
+    """時間帯別売上集計とダッシュボードAPIのテスト"""
+
+    databases = ['default', 'team_tansaibou']
+
+    def setUp(self):
+        """テストデータの準備（店舗にログインした状態にする）"""
+        from team_tansaibou.models import Store
+        from team_tansaibou.views import SESSION_KEY
+        from django.core.cache import cache
+
+        # 売り切れ予測は店舗ごとにキャッシュされるので、前のテストの予測を残さない
+        cache.clear()
+
+        self.store = Store(username='rollup', name='集計テスト店')
+        self.store.set_password('password')
+        self.store.save(using='team_tansaibou')
+
+        self.member = Member.objects.using('team_tansaibou').create(store=self.store, name='田中 一郎')
+        self.product = Product.objects.using('team_tansaibou').create(
+            store=self.store, name='焼きそば', current_price=Decimal('300'), stock=100
+        )
+        component = Product.objects.using('team_tansaibou').create(
+            store=self.store, name='ドリンク', current_price=Decimal('150'), stock=100
+        )
+        self.product_set = ProductSet.objects.using('team_tansaibou').create(
+            store=self.store, name='焼きそばセット', price=Decimal('400')
+        )
+        ProductSetItem.objects.using('team_tansaibou').create(
+            product_set=self.product_set, product=component, quantity=1
+        )
+
+        self.client = Client()
+        session = self.client.session
+        session[SESSION_KEY] = self.store.id
+        session.save()
+
+        today = timezone.localtime(timezone.now()).date()
+        self.ten_oclock = timezone.make_aware(timezone.datetime.combine(today, timezone.datetime.min.time())) \
+            + timezone.timedelta(hours=10)
+
+    def register(self, when, cart):
+        response = self.client.post(reverse('team_tansaibou:register_sale'), {
+            'transaction_date': when.isoformat(),
+            'payment_method': 'cash',
+            'recorded_by': self.member.id,
+            'cart_items': json.dumps(cart),
+        })
+        self.assertEqual(response.status_code, 302)
+        return Transaction.objects.using('team_tansaibou').order_by('-id').first()
+
+    def api(self, name):
+        response = self.client.get(reverse(f'team_tansaibou:api_{name}'))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_register_sale_updates_rollup(self):
+        """販売登録で時間帯別・商品別の集計が加算される"""
+        from team_tansaibou.models import HourlyProductSales, HourlySales
+
+        self.register(self.ten_oclock + timezone.timedelta(minutes=5), [
+            {'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 2},
+        ])
+        self.register(self.ten_oclock + timezone.timedelta(minutes=40), [
+            {'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 1},
+            {'type': 'product_set', 'id': self.product_set.id, 'price': 400, 'quantity': 1},
+        ])
+
+        hourly = HourlySales.objects.using('team_tansaibou').get(store=self.store)
+        self.assertEqual(hourly.hour, self.ten_oclock)
+        self.assertEqual(hourly.sales, Decimal('1300'))
+        self.assertEqual(hourly.transaction_count, 2)
+        product_row = HourlyProductSales.objects.using('team_tansaibou').get(product=self.product)
+        self.assertEqual((product_row.quantity, product_row.sales), (3, Decimal('900')))
+
+        self.assertEqual(self.api('today_sales'), {'total_sales': 1300, 'transaction_count': 2})
+        hourly_stats = self.api('hourly_stats')
+        self.assertEqual(hourly_stats['sales'][hourly_stats['labels'].index('10:00')], 1300)
+        self.assertEqual(hourly_stats['counts'][hourly_stats['labels'].index('10:00')], 2)
+
+        ranking = self.api('product_ranking')['ranking']
+        self.assertEqual([(r['name'], r['quantity'], r['sales']) for r in ranking],
+                         [('焼きそば', 3, 900), ('焼きそばセット', 1, 400)])
+        self.assertEqual(ranking[1]['stock'], 99)
+
+        daily = self.api('daily_comparison')
+        self.assertEqual((daily['sales'], daily['counts']), ([1300, 0], [2, 0]))
+        yearly = self.api('yearly_comparison')
+        self.assertEqual((yearly['sales'], yearly['counts']), ([0, 1300], [0, 2]))
+
+    def test_sale_edit_moves_rollup(self):
+        """販売日時の編集で集計が別の時間帯へ移る"""
+        from team_tansaibou.models import HourlyProductSales, HourlySales
+
+        trans = self.register(self.ten_oclock, [
+            {'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 2},
+        ])
+        moved_to = self.ten_oclock + timezone.timedelta(hours=3)
+        response = self.client.post(reverse('team_tansaibou:sale_edit', args=[trans.id]), {
+            'transaction_date': moved_to.isoformat(),
+            'payment_method': 'cash',
+            'recorded_by': self.member.id,
+        })
+        self.assertEqual(response.status_code, 302)
+
+        rows = HourlySales.objects.using('team_tansaibou').filter(store=self.store)
+        self.assertEqual(
+            {(r.hour, r.sales, r.transaction_count) for r in rows},
+            {(self.ten_oclock, Decimal('0'), 0), (moved_to, Decimal('600'), 1)},
+        )
+        self.assertEqual(
+            HourlyProductSales.objects.using('team_tansaibou').get(product=self.product, hour=moved_to).quantity, 2
+        )
+        hourly_stats = self.api('hourly_stats')
+        self.assertEqual(hourly_stats['counts'][hourly_stats['labels'].index('13:00')], 1)
+        self.assertEqual(hourly_stats['counts'][hourly_stats['labels'].index('10:00')], 0)
+
+    def test_delete_and_rebuild(self):
+        """取引の削除が集計から差し引かれ、再構築しても同じ値になる"""
+        from team_tansaibou.models import HourlyProductSales, HourlySales
+        from team_tansaibou.sales_rollup import rebuild_sales_rollups
+
+        self.register(self.ten_oclock, [
+            {'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 2},
+        ])
+        trans = self.register(self.ten_oclock, [
+            {'type': 'product_set', 'id': self.product_set.id, 'price': 400, 'quantity': 2},
+        ])
+        trans.delete(using='team_tansaibou')
+
+        def snapshot():
+            return (
+                sorted(HourlySales.objects.using('team_tansaibou').filter(transaction_count__gt=0)
+                       .values_list('hour', 'sales', 'transaction_count')),
+                sorted(HourlyProductSales.objects.using('team_tansaibou').filter(quantity__gt=0)
+                       .values_list('hour', 'product_id', 'product_set_id', 'quantity', 'sales')),
+            )
+
+        incremental = snapshot()
+        self.assertEqual(incremental[0], [(self.ten_oclock, Decimal('600'), 1)])
+        self.assertEqual(incremental[1], [(self.ten_oclock, self.product.id, None, 2, Decimal('600'))])
+
+        rebuild_sales_rollups()
+        self.assertEqual(snapshot(), incremental)
+
+
+    def test_snapshot_matches_panel_apis(self):
+        """スナップショットは各パネルのAPIと同じ内容を返す"""
+        self.register(self.ten_oclock, [
+            {'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 2},
+            {'type': 'product_set', 'id': self.product_set.id, 'price': 400, 'quantity': 1},
+        ])
+
+        snapshot = self.api('snapshot')
+        for name in ['today_sales', 'hourly_stats', 'yearly_comparison', 'daily_comparison',
+                     'product_ranking', 'stock_prediction']:
+            self.assertEqual(snapshot[name], self.api(name), name)
+        # セット商品の在庫は構成商品の在庫から計算される（ドリンク 100 - 1）
+        self.assertEqual(
+            [(item['name'], item['stock']) for item in snapshot['product_ranking']['ranking']],
+            [('焼きそば', 98), ('焼きそばセット', 99)],
+        )
+
+    def test_snapshot_etag(self):
+        """ETag が一致すれば全パネルを計算せずに 304、売上・在庫が変われば新しい内容を返す"""
+        from unittest import mock
+        from team_tansaibou.dashboard import Dashboard
+
+        url = reverse('team_tansaibou:api_snapshot')
+        etag = self.client.get(url)['ETag']
+
+        with mock.patch.object(Dashboard, 'snapshot', side_effect=AssertionError('snapshot computed')):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        # 在庫だけの変更（会計と同じく F() で減らす）でも ETag が変わる
+        Product.objects.using('team_tansaibou').filter(pk=self.product.pk).update(stock=F('stock') - 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.register(self.ten_oclock, [{'type': 'product', 'id': self.product.id, 'price': 300, 'quantity': 1}])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['today_sales']['total_sales'], 300)
+
+    def test_snapshot_query_count_does_not_grow_with_sets(self):
+        """売れたセット商品が増えてもスナップショットのクエリ数は変わらない"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+
+        def sell_new_set(i):
+            product_set = ProductSet.objects.using('team_tansaibou').create(
+                store=self.store, name=f'セット{i}', price=Decimal('500')
+            )
+            ProductSetItem.objects.using('team_tansaibou').create(
+                product_set=product_set, product=self.product, quantity=2
+            )
+            self.register(self.ten_oclock, [
+                {'type': 'product_set', 'id': product_set.id, 'price': 500, 'quantity': 1},
+            ])
+
+        sell_new_set(0)
+        with CaptureQueriesContext(connections['team_tansaibou']) as few:
+            self.api('snapshot')
+        for i in range(1, 5):
+            sell_new_set(i)
+        with CaptureQueriesContext(connections['team_tansaibou']) as many:
+            self.api('snapshot')
+        self.assertEqual(len(few), len(many))
+
+
+class ForecastTest(TestCase):
+    """需要予測（forecast.py）のテスト"""
+
+    databases = ['team_tansaibou']
+
+    def setUp(self):
+        """テストデータの準備（2025/11/15 13:30 の時点で予測する）"""
+        from django.core.cache import cache
+        from team_tansaibou.models import Store
+
+        cache.clear()
+        self.store = Store(username='forecast', name='予測テスト店')
+        self.store.set_password('password')
+        self.store.save(using='team_tansaibou')
+
+        self.yakisoba = Product.objects.using('team_tansaibou').create(
+            store=self.store, name='焼きそば', current_price=Decimal('300'), stock=50
+        )
+        self.drink = Product.objects.using('team_tansaibou').create(
+            store=self.store, name='ドリンク', current_price=Decimal('150'), stock=50
+        )
+        self.product_set = ProductSet.objects.using('team_tansaibou').create(
+            store=self.store, name='ドリンク2本セット', price=Decimal('250')
+        )
+        ProductSetItem.objects.using('team_tansaibou').create(
+            product_set=self.product_set, product=self.drink, quantity=2
+        )
+        self.now = timezone.make_aware(timezone.datetime(2025, 11, 15, 13, 30))
+
+    def sell(self, hour, quantity, product=None, product_set=None, day=None):
+        """day（既定は本日）の hour 時台に売れたことにする"""
+        from team_tansaibou.models import HourlyProductSales, HourlySales
+
+        when = (day or self.now).replace(hour=hour, minute=0)
+        HourlySales.objects.using('team_tansaibou').create(
+            store=self.store, hour=when, sales=Decimal('100') * quantity, transaction_count=quantity
+        )
+        HourlyProductSales.objects.using('team_tansaibou').create(
+            store=self.store, hour=when, product=product, product_set=product_set,
+            quantity=quantity, sales=Decimal('100') * quantity
+        )
+
+    def forecast(self):
+        from team_tansaibou.dashboard import Dashboard
+        from team_tansaibou.forecast import build_demand_forecast
+
+        return build_demand_forecast(self.store, self.now, Dashboard(self.store, now=self.now).hourly_rows)
+
+    def test_set_sales_count_toward_components(self):
+        """セット商品の販売は構成商品の需要として数える"""
+        self.sell(13, 3, product_set=self.product_set)
+
+        forecast = self.forecast()
+        self.assertEqual(set(forecast['rates']), {self.drink.id})
+        self.assertEqual(forecast['remaining_hours'], 6.5)
+
+    def test_recent_sales_weigh_more(self):
+        """同じ数量なら、直近に売れた商品のほうが販売ペースが高い"""
+        self.sell(9, 6, product=self.drink)
+        self.sell(13, 6, product=self.yakisoba)
+
+        rates = self.forecast()['rates']
+        self.assertGreater(rates[self.yakisoba.id], rates[self.drink.id])
+
+    def test_previous_year_curve_shapes_remaining_demand(self):
+        """去年の午後に売れていれば、残り時間の需要を多めに見積もる"""
+        from team_tansaibou.forecast import predict_stock
+
+        self.sell(13, 6, product=self.yakisoba)
+        flat = predict_stock(self.forecast(), self.yakisoba.id, 50)
+
+        last_year = self.now.replace(year=2024)
+        self.sell(10, 2, product=self.yakisoba, day=last_year)
+        for hour in range(13, 18):
+            self.sell(hour, 10, product=self.yakisoba, day=last_year)
+        curved = predict_stock(self.forecast(), self.yakisoba.id, 50)
+
+        # (現在の販売ペース, 売り切れまでの時間, 閉店時の予測残数)
+        self.assertLess(curved[2], flat[2])
+        self.assertLess(curved[1], flat[1])
+
+    def test_forecast_is_cached_per_store(self):
+        """キャッシュがあれば需要予測のクエリを発行しない"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from team_tansaibou.dashboard import Dashboard
+
+        self.sell(13, 6, product=self.yakisoba)
+        Dashboard(self.store, now=self.now).stock_prediction()
+        with CaptureQueriesContext(connections['team_tansaibou']) as queries:
+            prediction = Dashboard(self.store, now=self.now).stock_prediction()
+        # 本日の商品別売上と商品（在庫は毎回最新の値を使う）の読み込みだけ
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([p['name'] for p in prediction['sellout_predictions']], ['焼きそば'])
+
+class CheckoutTest(TestCase):
+    """会計処理（checkout）のテスト"""
+
+    databases = ['default', 'team_tansaibou']
+
+    def setUp(self):
+        """テストデータの準備"""
+        from team_tansaibou.models import Store
+
+        self.store = Store(username='checkout', name='会計テスト店')
+        self.store.set_password('password')
+        self.store.save(using='team_tansaibou')
+        self.member = Member.objects.using('team_tansaibou').create(store=self.store, name='高橋 三郎')
+
+        self.products = [
+            Product.objects.using('team_tansaibou').create(
+                store=self.store, name=f'商品{i}', current_price=Decimal('100'), stock=10
+            )
+            for i in range(4)
+        ]
+        self.product_set = ProductSet.objects.using('team_tansaibou').create(
+            store=self.store, name='2点セット', price=Decimal('180')
+        )
+        for product in self.products[:2]:
+            ProductSetItem.objects.using('team_tansaibou').create(
+                product_set=self.product_set, product=product, quantity=1
+            )
+
+    def checkout(self, cart):
+        from team_tansaibou.checkout import checkout
+
+        return checkout(self.store, cart, timezone.now(), 'cash', self.member.id)
+
+    def stocks(self):
+        return [p.stock for p in Product.objects.using('team_tansaibou').filter(store=self.store).order_by('id')]
+
+    def test_checkout_reduces_stock_and_creates_items(self):
+        """商品とセット商品の在庫を減らし、明細を作成する"""
+        trans = self.checkout([
+            {'type': 'product', 'id': self.products[0].id, 'price': 100, 'quantity': 2},
+            {'type': 'product_set', 'id': self.product_set.id, 'price': 180, 'quantity': 3},
+        ])
+
+        self.assertEqual(trans.total_amount, Decimal('740'))
+        self.assertEqual(
+            sorted(trans.items.values_list('quantity', 'subtotal')),
+            [(2, Decimal('200')), (3, Decimal('540'))],
+        )
+        # 商品0: 10 - 2 - 3、商品1: 10 - 3
+        self.assertEqual(self.stocks(), [5, 7, 10, 10])
+
+    def test_query_count_does_not_grow_with_cart(self):
+        """カートの行数が増えてもクエリ数は変わらない"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+
+        set_line = {'type': 'product_set', 'id': self.product_set.id, 'price': 180, 'quantity': 1}
+        small = [{'type': 'product', 'id': self.products[0].id, 'price': 100, 'quantity': 1}, set_line]
+        large = [
+            {'type': 'product', 'id': product.id, 'price': 100, 'quantity': 1} for product in self.products
+        ] + [set_line]
+
+        # 初回は集計行の作成が入るので、同じ時間帯の行を作っておく
+        self.checkout(large)
+        with CaptureQueriesContext(connections['team_tansaibou']) as small_queries:
+            self.checkout(small)
+        with CaptureQueriesContext(connections['team_tansaibou']) as large_queries:
+            self.checkout(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_shortage_reports_lines_and_changes_nothing(self):
+        """在庫不足の行を報告し、在庫・取引は変更しない"""
+        from team_tansaibou.checkout import InsufficientStock
+
+        with self.assertRaises(InsufficientStock) as cm:
+            self.checkout([
+                {'type': 'product', 'id': self.products[2].id, 'price': 100, 'quantity': 1},
+                {'type': 'product', 'id': self.products[0].id, 'price': 100, 'quantity': 6},
+                {'type': 'product_set', 'id': self.product_set.id, 'price': 180, 'quantity': 5},
+            ])
+
+        shortages = cm.exception.shortages
+        # 商品0 は単品 6 + セット 5 = 11 > 10 なので、単品の行とセットの行が不足
+        self.assertEqual([(s['line'], s['requested'], s['available']) for s in shortages], [(1, 6, 10), (2, 5, 10)])
+        self.assertIn('商品0', shortages[1]['message'])
+        self.assertEqual(self.stocks(), [10, 10, 10, 10])
+        self.assertFalse(Transaction.objects.using('team_tansaibou').exists())
+
+    def test_checkout_updates_sales_rollup(self):
+        """bulk_create した明細も時間帯別の集計に反映される"""
+        from team_tansaibou.models import HourlyProductSales, HourlySales
+
+        cart = [
+            {'type': 'product', 'id': self.products[0].id, 'price': 100, 'quantity': 2},
+            {'type': 'product_set', 'id': self.product_set.id, 'price': 180, 'quantity': 1},
+        ]
+        self.checkout(cart)
+        self.checkout(cart)
+
+        self.assertEqual(HourlySales.objects.using('team_tansaibou').get().transaction_count, 2)
+        rows = HourlyProductSales.objects.using('team_tansaibou').order_by('product_set_id')
+        self.assertEqual(
+            [(r.product_id, r.product_set_id, r.quantity, r.sales) for r in rows],
+            [(self.products[0].id, None, 4, Decimal('400')), (None, self.product_set.id, 2, Decimal('360'))],
+        )
+
+    def test_register_sale_shows_shortages(self):
+        """販売登録画面で在庫不足の行がメッセージで表示される"""
+        from team_tansaibou.views import SESSION_KEY
+
+        client = Client()
+        session = client.session
+        session[SESSION_KEY] = self.store.id
+        session.save()
+
+        response = client.post(reverse('team_tansaibou:register_sale'), {
+            'transaction_date': timezone.now().isoformat(),
+            'payment_method': 'cash',
+            'recorded_by': self.member.id,
+            'cart_items': json.dumps([{'type': 'product', 'id': self.products[3].id, 'price': 100, 'quantity': 11}]),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '商品3の在庫が不足しています。必要: 11, 在庫: 10')
+        self.assertEqual(self.stocks(), [10, 10, 10, 10])
@@ -43,4 +43,5 @@ urlpatterns = [
     path('api/dashboard/daily-comparison/', api_views.daily_comparison, name='api_daily_comparison'),
     path('api/dashboard/product-ranking/', api_views.product_ranking, name='api_product_ranking'),
     path('api/dashboard/stock-prediction/', api_views.stock_prediction, name='api_stock_prediction'),
+    path('api/dashboard/snapshot/', api_views.dashboard_snapshot, name='api_snapshot'),
 ]
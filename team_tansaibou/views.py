@@ -18,10 +18,10 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db import transaction as db_transaction
 from django.utils import timezone
-from decimal import Decimal
 from functools import wraps
 
-from .models import Store, Member, Product, ProductSet, ProductSetItem, Transaction, TransactionItem
+from .models import Store, Member, Product, ProductSet, ProductSetItem, Transaction
+from .checkout import InsufficientStock, checkout
 
 DB = 'team_tansaibou'
 LOGIN_URL = 'team_tansaibou:login'
@@ -269,45 +269,16 @@ def register_sale(request):
             import json
             cart_data = json.loads(cart_items)
 
-            with db_transaction.atomic():
-                total_amount = Decimal('0')
-                for item in cart_data:
-                    total_amount += Decimal(str(item['price'])) * int(item['quantity'])
-
-                trans = Transaction.objects.using(DB).create(
-                    transaction_date=transaction_date,
-                    total_amount=total_amount,
-                    recorded_by_id=recorded_by_id,
-                    payment_method=payment_method,
-                    notes=notes,
-                    store=store
-                )
-
-                for item in cart_data:
-                    item_type = item['type']
-                    item_id = item['id']
-                    quantity = int(item['quantity'])
-                    price = Decimal(str(item['price']))
-
-                    if item_type == 'product':
-                        product = Product.objects.using(DB).get(id=item_id, store=store)
-                        TransactionItem.objects.using(DB).create(
-                            transaction=trans,
-                            product=product,
-                            quantity=quantity,
-                            price_at_sale=price
-                        )
-                    else:
-                        product_set = ProductSet.objects.using(DB).get(id=item_id, store=store)
-                        TransactionItem.objects.using(DB).create(
-                            transaction=trans,
-                            product_set=product_set,
-                            quantity=quantity,
-                            price_at_sale=price
-                        )
-
-                messages.success(request, f'販売を登録しました（合計: ¥{total_amount:,}、商品数: {len(cart_data)}）')
-                return redirect('team_tansaibou:register_sale')
+            trans = checkout(
+                store,
+                cart_data,
+                transaction_date=transaction_date,
+                payment_method=payment_method,
+                recorded_by_id=recorded_by_id,
+                notes=notes,
+            )
+            messages.success(request, f'販売を登録しました（合計: ¥{trans.total_amount:,}、商品数: {len(cart_data)}）')
+            return redirect('team_tansaibou:register_sale')
 
         except json.JSONDecodeError:
             messages.error(request, 'カートデータの形式が不正です')
@@ -315,6 +286,12 @@ def register_sale(request):
             messages.error(request, '選択した商品が見つかりません')
         except ProductSet.DoesNotExist:
             messages.error(request, '選択した商品セットが見つかりません')
+        except InsufficientStock as e:
+            for shortage in e.shortages:
+                messages.error(request, shortage['message'])
+            if not e.shortages:
+                # 不足を調べる間に他のレジの取消などで在庫が戻った場合
+                messages.error(request, '在庫が変動したため登録できませんでした。もう一度お試しください')
         except ValueError as e:
             pass  # Already handled above
         except Exception as e:
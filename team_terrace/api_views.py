@@ -1,10 +1,26 @@
 import json
 
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404
 from django.views import View
 
-from .models import ChatMessage, ChatRoom
+from .events import hub
+from .likes import change_like_count, room_like_counts
+from .models import ChatMessage, ChatRoom, Reaction, ReactionCount
+
+# リアクション一覧で一度に返す最大件数（古いものは返さない）
+REACTION_WINDOW = 100
+
+
+def _cursor_param(request, name):
+    """GETパラメータのカーソル（0以上の整数）を返す. 未指定なら None, 不正なら ValueError."""
+    value = request.GET.get(name)
+    if value in (None, ""):
+        return None
+    if not value.isdigit():
+        raise ValueError(f"{name} must be a non-negative integer")
+    return int(value)
 
 
 class PostMessageView(View):
@@ -87,8 +103,6 @@ class PostReactionView(View):
             if not reaction_type:
                 return JsonResponse({"error": "reaction_type is required"}, status=400)
 
-            from .models import Reaction
-
             reaction = Reaction.objects.using("team_terrace").create(room=room, reaction_type=reaction_type)
             return JsonResponse({"id": reaction.id, "reaction_type": reaction.reaction_type}, status=201)
         except json.JSONDecodeError:
@@ -96,17 +110,35 @@ class PostReactionView(View):
 
 
 class GetReactionsView(View):
-    """リアクション一覧を取得するAPI."""
+    """リアクション一覧を取得するAPI.
+
+    after_id より後のリアクションのうち新しい REACTION_WINDOW 件と,
+    種類ごとのリアクション数（ReactionCount の集計）を返す.
+    """
 
     def get(self, request, room_id):
         """リアクション取得処理."""
         room = get_object_or_404(ChatRoom.objects.using("team_terrace"), uuid=room_id)
-        from .models import Reaction
+        try:
+            after_id = _cursor_param(request, "after_id")
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
 
-        reactions = Reaction.objects.using("team_terrace").filter(room=room).order_by("created_at")
+        reactions = Reaction.objects.using("team_terrace").filter(room=room)
+        if after_id:
+            reactions = reactions.filter(id__gt=after_id)
+        # 新しい順に REACTION_WINDOW 件取り, 古い順に並べ直す
+        reactions = list(reactions.order_by("-id")[:REACTION_WINDOW])[::-1]
+        counts = ReactionCount.objects.using("team_terrace").filter(room=room, count__gt=0)
 
         data = [{"id": r.id, "reaction_type": r.reaction_type} for r in reactions]
-        return JsonResponse({"reactions": data})
+        return JsonResponse(
+            {
+                "reactions": data,
+                "last_id": reactions[-1].id if reactions else after_id or 0,
+                "counts": {c.reaction_type: c.count for c in counts},
+            }
+        )
 
 
 class PostLikeView(View):
@@ -114,10 +146,11 @@ class PostLikeView(View):
 
     def post(self, request, message_id):
         """いいね投稿処理."""
-        message = get_object_or_404(ChatMessage.objects.using("team_terrace"), id=message_id)
-        message.like_count += 1
-        message.save()
-        return JsonResponse({"id": message.id, "like_count": message.like_count}, status=201)
+        try:
+            _, like_count = change_like_count(message_id, 1)
+        except ChatMessage.DoesNotExist:
+            raise Http404("No ChatMessage matches the given query.")
+        return JsonResponse({"id": message_id, "like_count": like_count}, status=201)
 
 
 class PostUnlikeView(View):
@@ -125,22 +158,63 @@ class PostUnlikeView(View):
 
     def post(self, request, message_id):
         """いいね解除処理."""
-        message = get_object_or_404(ChatMessage.objects.using("team_terrace"), id=message_id)
-        if message.like_count > 0:
-            message.like_count -= 1
-            message.save()
-        return JsonResponse({"id": message.id, "like_count": message.like_count}, status=200)
+        try:
+            _, like_count = change_like_count(message_id, -1)
+        except ChatMessage.DoesNotExist:
+            raise Http404("No ChatMessage matches the given query.")
+        return JsonResponse({"id": message_id, "like_count": like_count}, status=200)
 
 
 class GetLikesView(View):
-    """ルーム内のいいね一覧を取得するAPI."""
+    """ルーム内のいいね数を取得するAPI.
+
+    since（前回の version）を指定すると, それ以降にいいね数が変わったメッセージだけを返す
+    （0件になったメッセージも含む）. 指定しなければ, いいねが1以上のメッセージをすべて返す.
+    いいねのバッファ（likes.py）にまだ書き込まれていない増減があるメッセージは, 常にその数で返す.
+    """
 
     def get(self, request, room_id):
-        """いいね一覧取得処理."""
+        """いいね数取得処理."""
         room = get_object_or_404(ChatRoom.objects.using("team_terrace"), uuid=room_id)
-        # いいねが1以上のメッセージのみ取得
-        messages = ChatMessage.objects.using("team_terrace").filter(room=room, like_count__gt=0)
+        try:
+            since = _cursor_param(request, "since")
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        messages = ChatMessage.objects.using("team_terrace").filter(room=room)
+        if since is None:
+            messages = messages.filter(like_count__gt=0)
+        else:
+            messages = messages.filter(like_version__gt=since)
 
         # {message_id: count} の辞書形式で返す
-        data = {str(m.id): m.like_count for m in messages}
-        return JsonResponse({"likes": data})
+        data = {str(m_id): count for m_id, count in messages.values_list("id", "like_count")}
+        for m_id, count in room_like_counts(room.uuid).items():
+            if count or since is not None:
+                data[str(m_id)] = count
+            else:
+                data.pop(str(m_id), None)
+        return JsonResponse({"likes": data, "version": room.like_version})
+
+
+class RoomEventsView(View):
+    """ルームのイベント（新着メッセージ・返信・リアクション・いいね数の変化）をロングポーリングで返すAPI.
+
+    cursor 以降のイベントがあればすぐに返し, なければ最大 timeout 秒待ってから空で返す.
+    cursor がない・古い場合は reset を返すので, クライアントは一覧 API で状態を取り直してから
+    返された cursor で待ち直す. 非同期ビューなので, ASGI で動かせば待機中にワーカーを占有しない.
+    """
+
+    timeout = 25
+
+    async def get(self, request, room_id):
+        """イベント取得処理."""
+        cursor = request.GET.get("cursor")
+        # チャンネルがあるルームは存在確認済みなので, 待ち直しのたびに DB を読まない
+        if not hub.has_room(room_id):
+            exists = await sync_to_async(ChatRoom.objects.using("team_terrace").filter(uuid=room_id).exists)()
+            if not exists:
+                raise Http404("ChatRoom not found")
+            hub.cursor(room_id)
+        result = await hub.wait(room_id, cursor, self.timeout)
+        return JsonResponse(result)
@@ -6,3 +6,7 @@ class TeamTerraceConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "team_terrace"
+
+    def ready(self):
+        """ルームのイベントを配信するシグナルを登録する."""
+        from . import signals  # noqa: F401
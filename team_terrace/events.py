@@ -0,0 +1,147 @@
+"""チャットルームのイベント配信（プロセス内 pub/sub）.
+
+以前は room.js が 2 秒ごとにメッセージ・リアクション・いいねの 3 つの API をポーリングしており、
+開いているブラウザの数だけ SQLite への問い合わせと ChatRoom の取得が発生していた.
+
+ここではルームごとに連番付きのイベント（新着メッセージ・返信・リアクション・いいね数の変化）を
+メモリ上に直近 HISTORY_SIZE 件だけ保持し, 待機中のロングポーリングへまとめて通知する.
+カーソル（プロセスごとの epoch と連番）以降のイベントは DB を読まずに返せるため,
+何も起きていないルームはタイムアウトごとに 1 リクエストしか発生しない.
+
+イベントはプロセス内にしかないため, 複数プロセスで動かす場合は同じルームの利用者が
+同じプロセスに振り分けられる必要がある. プロセスが再起動して epoch が変わった場合や,
+カーソルが保持件数より古い場合は reset を返し, クライアントは一覧 API で状態を取り直す.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import uuid
+from collections import deque
+
+from django.db import transaction
+
+# ルームごとに保持するイベント数
+HISTORY_SIZE = 500
+
+
+class _RoomChannel:
+    """1 ルーム分のイベント履歴と待機者."""
+
+    def __init__(self):
+        self.seq = 0
+        self.events = deque(maxlen=HISTORY_SIZE)
+        self.waiters = set()
+
+
+class RoomEventHub:
+    """ルームごとのイベントを保持し, 待機中のリクエストへ通知する.
+
+    publish() は同期ビュー（スレッド）からも呼ばれるため, 待機者の Future は
+    それぞれのイベントループへ call_soon_threadsafe で完了させる（閉じたループの待機者は飛ばす）.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._rooms: dict[str, _RoomChannel] = {}
+
+    def _channel(self, room_id) -> _RoomChannel:
+        return self._rooms.setdefault(str(room_id), _RoomChannel())
+
+    def has_room(self, room_id) -> bool:
+        """ルームのチャンネルがこのプロセスにあるかどうかを返す."""
+        with self._lock:
+            return str(room_id) in self._rooms
+
+    def cursor(self, room_id) -> str:
+        """ルームの現在のカーソルを返す（チャンネルがなければ作成する）."""
+        with self._lock:
+            return self._format_cursor(self._channel(room_id).seq)
+
+    def publish(self, room_id, event_type: str, data: dict) -> None:
+        """イベントを追加し, 待機中のリクエストを起こす.
+
+        Args:
+            room_id: ルームの UUID.
+            event_type (str): "message" / "reply" / "reaction" / "like".
+            data (dict): イベントの内容.
+        """
+        with self._lock:
+            channel = self._channel(room_id)
+            channel.seq += 1
+            channel.events.append({"seq": channel.seq, "type": event_type, "data": data})
+            waiters, channel.waiters = channel.waiters, set()
+        for loop, future in waiters:
+            # タイムアウトしたリクエストのループは閉じていることがある（WSGI では async ビューごとにループを作って閉じる）.
+            # 起こす必要はないので飛ばし, 残りの待機者とコミット済みの書き込みのレスポンスに影響させない.
+            if loop.is_closed():
+                continue
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # is_closed() の確認後に閉じられた
+                pass
+
+    def since(self, room_id, cursor: str | None) -> dict:
+        """カーソルより後のイベントを返す.
+
+        Returns:
+            dict: {"cursor": 新しいカーソル, "events": イベントのリスト, "reset": 状態の取り直しが必要か}.
+        """
+        with self._lock:
+            return self._since(self._channel(room_id), cursor)
+
+    async def wait(self, room_id, cursor: str | None, timeout: float) -> dict:
+        """カーソルより後のイベントがあれば返し, なければ最大 timeout 秒待つ."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            channel = self._channel(room_id)
+            result = self._since(channel, cursor)
+            if result["events"] or result["reset"]:
+                return result
+            waiter = (loop, loop.create_future())
+            channel.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                channel.waiters.discard(waiter)
+        return self.since(room_id, cursor)
+
+    def _format_cursor(self, seq: int) -> str:
+        return f"{self.epoch}-{seq}"
+
+    def _since(self, channel: _RoomChannel, cursor: str | None) -> dict:
+        seq = _parse_cursor(cursor, self.epoch)
+        oldest = channel.events[0]["seq"] if channel.events else channel.seq + 1
+        if seq is None or seq > channel.seq or seq < oldest - 1:
+            return {"cursor": self._format_cursor(channel.seq), "events": [], "reset": True}
+        events = [event for event in channel.events if event["seq"] > seq]
+        return {"cursor": self._format_cursor(channel.seq), "events": events, "reset": False}
+
+
+def _parse_cursor(cursor: str | None, epoch: str) -> int | None:
+    """カーソルの連番を返す（別プロセス・再起動前のカーソルや不正な値なら None）."""
+    if not cursor:
+        return None
+    cursor_epoch, _, seq = cursor.partition("-")
+    if cursor_epoch != epoch or not seq.isdigit():
+        return None
+    return int(seq)
+
+
+def _wake(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+hub = RoomEventHub()
+
+
+def publish_on_commit(room_id, event_type: str, data: dict, using: str = "team_terrace") -> None:
+    """書き込みがコミットされてからイベントを配信する（ロールバックされた書き込みは配信しない）."""
+    transaction.on_commit(lambda: hub.publish(room_id, event_type, data), using=using)
@@ -0,0 +1,208 @@
+"""メッセージのいいね数の更新.
+
+以前の PostLikeView / PostUnlikeView は like_count を読んで +1 し, 行全体を save() していたため,
+同時に押されたいいねが失われていた. ここでは F() を使った UPDATE 1 文で増減し,
+ルームの版数（ChatRoom.like_version）と同じトランザクションで更新する.
+
+settings.TEAM_TERRACE_LIKE_COALESCE_SECONDS を 0 より大きくすると, いいねをプロセス内のバッファに溜め,
+その秒数ごとにルーム単位でまとめて UPDATE する（人気のメッセージへの連打を 1 回の書き込みにまとめる）.
+バッファ中の増減は読み出し（like_count / room_like_counts）で加算するので, 同じプロセスからは常に最新の数が見える.
+プロセスが落ちるとバッファ中のいいねは失われ, 複数プロセスでは互いのバッファが見えないため, 既定では無効.
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Greatest
+
+from .events import hub, publish_on_commit
+from .models import ChatMessage, ChatRoom
+
+DB = "team_terrace"
+
+
+def _apply_like_delta(message_id: int, delta: int, using: str = DB) -> tuple:
+    """いいね数を UPDATE で増減する（0 未満にはしない）.
+
+    Returns:
+        tuple: (ルームの UUID, 更新後のいいね数).
+
+    Raises:
+        ChatMessage.DoesNotExist: メッセージが存在しない場合.
+    """
+    messages = ChatMessage.objects.using(using).filter(id=message_id)
+    with transaction.atomic(using=using):
+        target = messages.filter(like_count__gte=-delta) if delta < 0 else messages
+        # メッセージには進めた後のルームの版数を入れ, 更新できたときだけルームの版数を進める
+        next_version = Subquery(
+            ChatRoom.objects.using(using).filter(uuid=OuterRef("room_id")).values("like_version")[:1]
+        ) + 1
+        if target.update(like_count=F("like_count") + delta, like_version=next_version):
+            ChatRoom.objects.using(using).filter(messages__id=message_id).update(like_version=F("like_version") + 1)
+            changed = True
+        else:
+            changed = False
+        room_id, like_count = messages.values_list("room_id", "like_count").get()
+        if changed:
+            publish_on_commit(room_id, "like", {"message_id": message_id, "like_count": like_count}, using)
+    return room_id, like_count
+
+
+class LikeBuffer:
+    """いいねの増減をメモリに溜め, 一定間隔でまとめて書き込むバッファ.
+
+    メッセージごとに DB 上のいいね数（_base）, 書き込み待ちの増減（_pending）, 書き込み中の増減（_flushing）を持ち,
+    その合計を現在のいいね数として扱う. 書き込みが終わった分は _base に移すので, 書き込みの前後で数はずれない.
+    書き込みは最初の増減から interval 秒後にタイマーのスレッドで行い, 終了時にも残りを書き込む.
+    """
+
+    def __init__(self, interval: float, using: str = DB):
+        self.interval = interval
+        self.using = using
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._base: dict[int, list] = {}
+        self._pending: dict[int, int] = {}
+        self._flushing: dict[int, int] = {}
+        self._timer = None
+
+    def _count(self, message_id: int) -> int:
+        return self._base[message_id][1] + self._flushing.get(message_id, 0) + self._pending.get(message_id, 0)
+
+    def change(self, message_id: int, delta: int) -> tuple:
+        """いいね数を増減する（0 未満にはしない）.
+
+        Returns:
+            tuple: (ルームの UUID, 増減後のいいね数).
+
+        Raises:
+            ChatMessage.DoesNotExist: メッセージが存在しない場合.
+        """
+        with self._lock:
+            known = message_id in self._base
+        if not known:
+            # バッファにないメッセージは書き込み待ちもないので, DB の値をそのまま基準にできる
+            row = ChatMessage.objects.using(self.using).values_list("room_id", "like_count").get(id=message_id)
+        with self._lock:
+            if not known:
+                self._base.setdefault(message_id, list(row))
+            room_id = self._base[message_id][0]
+            current = self._count(message_id)
+            like_count = max(current + delta, 0)
+            if like_count != current:
+                self._pending[message_id] = self._pending.get(message_id, 0) + like_count - current
+                if self._timer is None:
+                    self._timer = threading.Timer(self.interval, self._flush_from_timer)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if like_count != current:
+            hub.publish(room_id, "like", {"message_id": message_id, "like_count": like_count})
+        return room_id, like_count
+
+    def room_counts(self, room_id) -> dict:
+        """ルーム内でバッファにあるメッセージの現在のいいね数を返す.
+
+        Returns:
+            dict: {メッセージID: いいね数}.
+        """
+        room_id = str(room_id)
+        with self._lock:
+            return {
+                message_id: self._count(message_id)
+                for message_id, (message_room_id, _) in self._base.items()
+                if str(message_room_id) == room_id
+            }
+
+    def flush(self) -> None:
+        """書き込み待ちの増減をルームごとに 1 回の UPDATE で書き込む."""
+        with self._flush_lock:
+            with self._lock:
+                self._flushing, self._pending = self._pending, {}
+                self._timer = None
+                batch = {message_id: delta for message_id, delta in self._flushing.items() if delta}
+                rooms = {}
+                for message_id, delta in batch.items():
+                    rooms.setdefault(self._base[message_id][0], {})[message_id] = delta
+            try:
+                with transaction.atomic(using=self.using):
+                    for room_id, deltas in rooms.items():
+                        version = ChatRoom.next_like_version(room_id, using=self.using)
+                        ChatMessage.objects.using(self.using).filter(id__in=deltas).update(
+                            like_count=Greatest(
+                                F("like_count") + Case(
+                                    *[When(id=message_id, then=Value(delta)) for message_id, delta in deltas.items()],
+                                    default=Value(0),
+                                    output_field=IntegerField(),
+                                ),
+                                Value(0),
+                            ),
+                            like_version=version,
+                        )
+            except Exception:
+                # 書き込めなかった分は次回に回す
+                with self._lock:
+                    for message_id, delta in self._flushing.items():
+                        self._pending[message_id] = self._pending.get(message_id, 0) + delta
+                    self._flushing = {}
+                raise
+            with self._lock:
+                for message_id, delta in self._flushing.items():
+                    self._base[message_id][1] += delta
+                self._flushing = {}
+                # 書き込み待ちのないメッセージは次に押されたときに DB から読み直す
+                for message_id in [m for m in self._base if m not in self._pending]:
+                    del self._base[message_id]
+
+    def _flush_from_timer(self) -> None:
+        try:
+            self.flush()
+        finally:
+            connections[self.using].close()
+
+
+def _create_buffer():
+    interval = getattr(settings, "TEAM_TERRACE_LIKE_COALESCE_SECONDS", 0)
+    if not interval:
+        return None
+    like_buffer = LikeBuffer(interval)
+    atexit.register(like_buffer.flush)
+    return like_buffer
+
+
+buffer = _create_buffer()
+
+
+def change_like_count(message_id: int, delta: int) -> tuple:
+    """メッセージのいいね数を delta だけ増減する（0 未満にはしない）.
+
+    バッファが有効ならバッファに溜め, そうでなければその場で UPDATE する.
+
+    Args:
+        message_id (int): メッセージID.
+        delta (int): 増減数（いいねは 1, 解除は -1）.
+
+    Returns:
+        tuple: (ルームの UUID, 増減後のいいね数).
+
+    Raises:
+        ChatMessage.DoesNotExist: メッセージが存在しない場合.
+    """
+    if buffer is not None:
+        return buffer.change(message_id, delta)
+    return _apply_like_delta(message_id, delta)
+
+
+def room_like_counts(room_id) -> dict:
+    """バッファにある（まだ DB に書き込まれていない増減を含む）ルーム内のいいね数を返す.
+
+    Returns:
+        dict: {メッセージID: いいね数}（バッファが無効なら空）.
+    """
+    if buffer is None:
+        return {}
+    return buffer.room_counts(room_id)
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('team_terrace', '0007_chatmessage_like_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reaction_type', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='like_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='like_version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'like_version'], name='terrace_msg_like_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='reactioncount',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='team_terrace.chatroom'),
+        ),
+        migrations.AddConstraint(
+            model_name='reactioncount',
+            constraint=models.UniqueConstraint(fields=('room', 'reaction_type'), name='terrace_reaction_count_unique'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def populate_reaction_counts(apps, schema_editor):
+    """既存のリアクションから集計を作成し, いいね済みのメッセージに版数を付ける."""
+    Reaction = apps.get_model("team_terrace", "Reaction")
+    ReactionCount = apps.get_model("team_terrace", "ReactionCount")
+    ChatMessage = apps.get_model("team_terrace", "ChatMessage")
+    ChatRoom = apps.get_model("team_terrace", "ChatRoom")
+
+    db_alias = schema_editor.connection.alias
+
+    counts = Reaction.objects.using(db_alias).values("room_id", "reaction_type").annotate(total=Count("id")).order_by()
+    ReactionCount.objects.using(db_alias).bulk_create(
+        [
+            ReactionCount(room_id=row["room_id"], reaction_type=row["reaction_type"], count=row["total"])
+            for row in counts
+        ],
+        batch_size=1000,
+    )
+
+    # 既存のいいねは版数 1 として扱う（since=0 の差分取得で全件返る）
+    liked = ChatMessage.objects.using(db_alias).filter(like_count__gt=0)
+    ChatRoom.objects.using(db_alias).filter(messages__in=liked).update(like_version=1)
+    updated = liked.update(like_version=1)
+
+    print(f"リアクション集計作成: {len(counts)}件、いいね済みメッセージ: {updated}件")
+
+
+def reverse_migration(apps, schema_editor):
+    """ロールバック：集計を削除し, 版数を戻す."""
+    ReactionCount = apps.get_model("team_terrace", "ReactionCount")
+    ChatMessage = apps.get_model("team_terrace", "ChatMessage")
+    ChatRoom = apps.get_model("team_terrace", "ChatRoom")
+    db_alias = schema_editor.connection.alias
+
+    ReactionCount.objects.using(db_alias).all().delete()
+    ChatMessage.objects.using(db_alias).update(like_version=0)
+    ChatRoom.objects.using(db_alias).update(like_version=0)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("team_terrace", "0008_reaction_count_like_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_reaction_counts, reverse_migration),
+    ]
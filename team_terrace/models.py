@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import uuid
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
 
 
 class Member(models.Model):
@@ -33,6 +33,8 @@ class ChatRoom(models.Model):
     uuid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
+    # ルーム内のいいね数が変わるたびに増える版数（いいねの差分取得用）
+    like_version = models.BigIntegerField(default=0)
 
     def __str__(self):
         """ChatRoomの文字列表現を返す.
@@ -42,6 +44,21 @@ class ChatRoom(models.Model):
         """
         return self.title
 
+    @classmethod
+    def next_like_version(cls, room_id, using: str = "team_terrace") -> int:
+        """ルームのいいねの版数を1つ進めて返す.
+
+        Args:
+            room_id: ルームの UUID.
+            using (str): DBエイリアス.
+
+        Returns:
+            int: 進めた後の版数（変更したメッセージの like_version に設定する）.
+        """
+        with transaction.atomic(using=using):
+            cls.objects.using(using).filter(uuid=room_id).update(like_version=models.F("like_version") + 1)
+            return cls.objects.using(using).values_list("like_version", flat=True).get(uuid=room_id)
+
 
 class ChatMessageQuerySet(models.QuerySet):
     """ChatMessageのカスタムQuerySet."""
@@ -77,9 +94,16 @@ class ChatMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_question = models.BooleanField(default=False)
     like_count = models.IntegerField(default=0)
+    # いいね数を最後に変更したときのルームの版数（ChatRoom.like_version）
+    like_version = models.BigIntegerField(default=0)
 
     objects = ChatMessageQuerySet.as_manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["room", "like_version"], name="terrace_msg_like_version_idx"),
+        ]
+
     def reply(self, content: str):
         """スレッドへの返信を作成する.
 
@@ -142,3 +166,48 @@ class Reaction(models.Model):
     def __str__(self):
         """文字列表現."""
         return f"{self.reaction_type} in {self.room}"
+
+
+class ReactionCount(models.Model):
+    """ルームごと・種類ごとのリアクション数の集計.
+
+    リアクションの作成・削除時に signals.py で差分更新する.
+
+    Attributes:
+        room (ChatRoom): 集計対象のルーム.
+        reaction_type (str): リアクションの種類.
+        count (int): リアクション数.
+    """
+
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name="reaction_counts")
+    reaction_type = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["room", "reaction_type"], name="terrace_reaction_count_unique"),
+        ]
+
+    def __str__(self):
+        """文字列表現."""
+        return f"{self.reaction_type} x{self.count} in {self.room_id}"
+
+    @classmethod
+    def add(cls, room_id, reaction_type: str, delta: int, using: str = "team_terrace") -> None:
+        """集計にリアクション数の差分を加える（集計行がなければ作成する）.
+
+        Args:
+            room_id: ルームの UUID.
+            reaction_type (str): リアクションの種類.
+            delta (int): 加える数（削除時は負の数）.
+            using (str): DBエイリアス.
+        """
+        qs = cls.objects.using(using).filter(room_id=room_id, reaction_type=reaction_type)
+        if qs.update(count=models.F("count") + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic(using=using):
+                cls.objects.using(using).create(room_id=room_id, reaction_type=reaction_type, count=delta)
+        except IntegrityError:
+            # 同時に作成された場合は, 作成された行に加算する
+            qs.update(count=models.F("count") + delta)
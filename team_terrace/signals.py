@@ -0,0 +1,53 @@
+"""ルームのイベント（メッセージ・返信・リアクション・いいね）の配信と, リアクション数の集計を行うシグナル."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .events import publish_on_commit
+from .models import ChatMessage, Reaction, ReactionCount, ThreadReply
+
+
+@receiver(post_save, sender=ChatMessage)
+def publish_message(sender, instance, created, using, raw=False, **kwargs):
+    """新着メッセージ, またはいいね数の変化を配信する.
+
+    いいね・いいね解除の API は likes.py で UPDATE するのでここを通らない（likes.py が配信する）.
+    """
+    if raw:
+        return
+    if created:
+        data = {"id": instance.id, "content": instance.content, "is_question": instance.is_question}
+        publish_on_commit(instance.room_id, "message", data, using)
+    else:
+        data = {"message_id": instance.id, "like_count": instance.like_count}
+        publish_on_commit(instance.room_id, "like", data, using)
+
+
+@receiver(post_save, sender=ThreadReply)
+def publish_reply(sender, instance, created, using, raw=False, **kwargs):
+    """スレッドへの返信を配信する."""
+    if raw or not created:
+        return
+    data = {
+        "message_id": instance.parent_message_id,
+        "id": instance.id,
+        "content": instance.content,
+        "created_at": instance.created_at.isoformat(),
+    }
+    publish_on_commit(instance.parent_message.room_id, "reply", data, using)
+
+
+@receiver(post_save, sender=Reaction)
+def publish_reaction(sender, instance, created, using, raw=False, **kwargs):
+    """リアクションを集計に加えて配信する."""
+    if raw or not created:
+        return
+    ReactionCount.add(instance.room_id, instance.reaction_type, 1, using=using)
+    data = {"id": instance.id, "reaction_type": instance.reaction_type}
+    publish_on_commit(instance.room_id, "reaction", data, using)
+
+
+@receiver(post_delete, sender=Reaction)
+def discount_reaction(sender, instance, using, **kwargs):
+    """削除されたリアクションを集計から除く."""
+    ReactionCount.add(instance.room_id, instance.reaction_type, -1, using=using)
@@ -180,19 +180,39 @@ function applyLikesToDOM(likesMap) {
   });
 }
 
+// ルーム内のいいね数 { message_id: count } と, その版数（次回は差分だけ取得する）
+let likesState = {};
+let likesVersion = null;
+
 async function fetchLikes() {
   try {
-    const res = await fetch(`/team_terrace/api/room/${roomId}/likes/`);
-    if (!res.ok) return {};
+    let url = `/team_terrace/api/room/${roomId}/likes/`;
+    if (likesVersion !== null) {
+      url += `?since=${likesVersion}`;
+    }
+    const res = await fetch(url);
+    if (!res.ok) return likesState;
 
     const data = await res.json();
-    const likesMap = data.likes || {}; // { message_id: count }
+    if (likesVersion === null) {
+      likesState = {};
+    }
+    Object.entries(data.likes || {}).forEach(([id, count]) => setLikeState(id, count));
+    likesVersion = data.version;
 
-    applyLikesToDOM(likesMap);
-    return likesMap;
+    applyLikesToDOM(likesState);
+    return likesState;
   } catch (error) {
     console.error('Error fetching likes:', error);
-    return {};
+    return likesState;
+  }
+}
+
+function setLikeState(messageId, count) {
+  if (count > 0) {
+    likesState[String(messageId)] = count;
+  } else {
+    delete likesState[String(messageId)];
   }
 }
 
@@ -279,13 +299,7 @@ async function openThread(messageId) {
       if (data.replies.length === 0) {
         threadMessages.innerHTML = '<p style="color: var(--text-muted); text-align: center; padding: 20px;">返信はまだありません</p>';
       } else {
-        data.replies.forEach((r, index) => {
-          const div = document.createElement('div');
-          div.className = 'reply';
-          div.textContent = r.content;
-          div.style.animationDelay = `${index * 0.1}s`;
-          threadMessages.appendChild(div);
-        });
+        data.replies.forEach((r, index) => appendReply(r, index));
       }
     }
   } catch (error) {
@@ -300,6 +314,20 @@ async function openThread(messageId) {
   }, 100);
 }
 
+// 返信を表示する関数（同じIDの返信は追加しない）
+function appendReply(reply, index = 0) {
+  if (threadMessages.querySelector(`[data-reply-id="${reply.id}"]`)) return;
+  const placeholder = threadMessages.querySelector('p');
+  if (placeholder) placeholder.remove();
+
+  const div = document.createElement('div');
+  div.className = 'reply';
+  div.dataset.replyId = String(reply.id);
+  div.textContent = reply.content;
+  div.style.animationDelay = `${index * 0.1}s`;
+  threadMessages.appendChild(div);
+}
+
 function closeModal() {
   modal.style.display = "none";
   currentThreadId = null;
@@ -467,11 +495,6 @@ function initMessageTextareaBehavior() {
 initSendModeSegment();
 initMessageTextareaBehavior();
 
-// 初回ロード
-fetchMessages();
-fetchReactions();
-fetchLikes();
-
 // いいね順に手動で並び替え（更新）する
 function sortMessagesByLikes(likesMap) {
   // Only reorder existing message elements; do not change polling behavior.
@@ -551,15 +574,57 @@ if (sortLikesUpdateBtn) {
 // Initial state: time mode
 setSortMode('time');
 
-// ポーリング開始 (2秒間隔)
-setInterval(() => {
-  fetchMessages();
-  fetchReactions();
-  fetchLikes();
-}, 2000);
+// --- Room Events (long polling) ---
+// サーバーは cursor 以降のイベントがあればすぐ返し, なければ最大25秒待ってから空で返す.
+// reset が返ったとき（初回・サーバー再起動など）は一覧APIで状態を取り直す.
+let eventCursor = null;
+
+function applyEvent(event) {
+  const data = event.data;
+  if (event.type === 'message') {
+    appendMessage(data);
+  } else if (event.type === 'like') {
+    setLikeState(data.message_id, data.like_count);
+    const countSpan = document.getElementById(`like-count-${data.message_id}`);
+    if (countSpan) countSpan.textContent = data.like_count;
+  } else if (event.type === 'reaction') {
+    if (!myReactionIds.delete(data.id)) showReactionAnimation(data.reaction_type);
+  } else if (event.type === 'reply') {
+    if (currentThreadId === data.message_id) appendReply(data);
+  }
+}
+
+async function pollEvents() {
+  while (true) {
+    try {
+      let url = `/team_terrace/api/room/${roomId}/events/`;
+      if (eventCursor) {
+        url += `?cursor=${encodeURIComponent(eventCursor)}`;
+      }
+      const res = await fetch(url);
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+      const data = await res.json();
+      eventCursor = data.cursor;
+      if (data.reset) {
+        likesVersion = null;
+        await fetchMessages();
+        await fetchLikes();
+      } else {
+        data.events.forEach(applyEvent);
+      }
+    } catch (error) {
+      console.error('Error fetching room events:', error);
+      await new Promise(resolve => setTimeout(resolve, 2000));
+    }
+  }
+}
+
+pollEvents();
 
 // --- Reaction Logic ---
-let lastReactionId = 0;
+// 自分が送ったリアクション（送信時にアニメーション済みなのでイベントでは表示しない）
+const myReactionIds = new Set();
 
 async function sendReaction(type) {
   try {
@@ -572,6 +637,8 @@ async function sendReaction(type) {
       body: JSON.stringify({ reaction_type: type })
     });
     if (res.ok) {
+      const reaction = await res.json();
+      myReactionIds.add(reaction.id);
       showReactionAnimation(type);
     }
   } catch (error) {
@@ -579,27 +646,6 @@ async function sendReaction(type) {
   }
 }
 
-async function fetchReactions() {
-  try {
-    const res = await fetch(`/team_terrace/api/room/${roomId}/reactions/list/`);
-    if (res.ok) {
-      const data = await res.json();
-      let maxId = lastReactionId;
-      data.reactions.forEach(r => {
-        if (r.id > lastReactionId) {
-          if (lastReactionId !== 0) {
-            showReactionAnimation(r.reaction_type);
-          }
-          if (r.id > maxId) maxId = r.id;
-        }
-      });
-      lastReactionId = maxId;
-    }
-  } catch (error) {
-    console.error('Error fetching reactions:', error);
-  }
-}
-
 function showReactionAnimation(type) {
   const canvas = document.getElementById('reaction-canvas');
   const el = document.createElement('div');
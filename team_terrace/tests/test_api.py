@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.urls import reverse
 
@@ -153,3 +155,92 @@ class ReactionAPITests(TestCase):
         data = response.json()
         self.assertTrue(len(data["reactions"]) > 0)
         self.assertEqual(data["reactions"][0]["reaction_type"], "laugh")
+
+    def test_get_reactions_after_id(self):
+        """after_id 以降のリアクションと, 種類ごとのリアクション数を返す."""
+        url = reverse("team_terrace:post_reaction", args=[self.room.uuid])
+        for reaction_type in ["clap", "clap", "like"]:
+            self.client.post(url, {"reaction_type": reaction_type}, content_type="application/json")
+        first = Reaction.objects.using("team_terrace").filter(room=self.room).order_by("id").first()
+
+        response = self.client.get(reverse("team_terrace:get_reactions", args=[self.room.uuid]), {"after_id": first.id})
+        self.assertEqual(response.status_code, 200)
+
+        data = response.json()
+        self.assertEqual([r["reaction_type"] for r in data["reactions"]], ["clap", "like"])
+        self.assertEqual(data["last_id"], data["reactions"][-1]["id"])
+        self.assertEqual(data["counts"], {"clap": 2, "like": 1})
+
+        # 最新の last_id 以降は空で, カーソルはそのまま
+        response = self.client.get(
+            reverse("team_terrace:get_reactions", args=[self.room.uuid]), {"after_id": data["last_id"]}
+        )
+        self.assertEqual(response.json()["reactions"], [])
+        self.assertEqual(response.json()["last_id"], data["last_id"])
+
+    def test_get_reactions_returns_latest_window(self):
+        """リアクションが多い場合は新しいものから REACTION_WINDOW 件だけ返す."""
+        for i in range(5):
+            Reaction.objects.using("team_terrace").create(room=self.room, reaction_type=f"r{i}")
+
+        with mock.patch("team_terrace.api_views.REACTION_WINDOW", 2):
+            response = self.client.get(reverse("team_terrace:get_reactions", args=[self.room.uuid]))
+
+        data = response.json()
+        self.assertEqual([r["reaction_type"] for r in data["reactions"]], ["r3", "r4"])
+        self.assertEqual(sum(data["counts"].values()), 5)
+
+    def test_reaction_count_follows_delete(self):
+        """リアクションを削除すると集計からも除かれる."""
+        reaction = Reaction.objects.using("team_terrace").create(room=self.room, reaction_type="like")
+        reaction.delete()
+
+        response = self.client.get(reverse("team_terrace:get_reactions", args=[self.room.uuid]))
+        self.assertEqual(response.json()["counts"], {})
+
+    def test_invalid_after_id(self):
+        """after_id が整数でなければ400を返す."""
+        response = self.client.get(reverse("team_terrace:get_reactions", args=[self.room.uuid]), {"after_id": "x"})
+        self.assertEqual(response.status_code, 400)
+
+
+class LikesAPITests(TestCase):
+    """いいね数の差分取得APIのテスト."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        """テストデータのセットアップ."""
+        self.room = ChatRoom.objects.using("team_terrace").create(title="Likes API Room")
+        self.messages = [
+            ChatMessage.objects.using("team_terrace").create(room=self.room, content=f"Msg {i}") for i in range(3)
+        ]
+        self.url = reverse("team_terrace:get_likes", args=[self.room.uuid])
+
+    def like(self, message, action="post_like"):
+        """いいね（解除）APIを呼び出す."""
+        self.client.post(reverse(f"team_terrace:{action}", args=[message.id]))
+
+    def test_likes_since_version(self):
+        """since 以降にいいね数が変わったメッセージだけを返す."""
+        self.like(self.messages[0])
+        self.like(self.messages[1])
+
+        full = self.client.get(self.url).json()
+        self.assertEqual(full["likes"], {str(self.messages[0].id): 1, str(self.messages[1].id): 1})
+        self.assertEqual(full["version"], 2)
+
+        # 変化がなければ空
+        self.assertEqual(self.client.get(self.url, {"since": full["version"]}).json(), {"likes": {}, "version": 2})
+
+        # いいね解除で 0 になったメッセージも差分に含まれる
+        self.like(self.messages[1], "post_unlike")
+        self.like(self.messages[2])
+        delta = self.client.get(self.url, {"since": full["version"]}).json()
+        self.assertEqual(delta["likes"], {str(self.messages[1].id): 0, str(self.messages[2].id): 1})
+        self.assertEqual(delta["version"], 4)
+
+    def test_unlike_at_zero_does_not_bump_version(self):
+        """いいねが0のときの解除は版数を進めない."""
+        self.like(self.messages[0], "post_unlike")
+        self.assertEqual(self.client.get(self.url, {"since": 0}).json(), {"likes": {}, "version": 0})
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from team_terrace.api_views import RoomEventsView
+from team_terrace.events import hub
+from team_terrace.models import ChatMessage, ChatRoom
+
+
+@mock.patch.object(RoomEventsView, "timeout", 0.05)
+class RoomEventsAPITests(TestCase):
+    """ルームのイベント配信APIのテスト."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        """テストデータのセットアップ."""
+        self.room = ChatRoom.objects.using("team_terrace").create(title="Events Room")
+        self.url = reverse("team_terrace:room_events", args=[self.room.uuid])
+
+    def poll(self, cursor=None):
+        """イベントAPIを呼び出して結果を返す."""
+        response = self.client.get(self.url, {"cursor": cursor} if cursor else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def post(self, url, data=None):
+        """書き込みAPIを呼び出し, コミット後のイベント配信まで実行する."""
+        with self.captureOnCommitCallbacks(using="team_terrace", execute=True):
+            response = self.client.post(url, data or {}, content_type="application/json")
+        self.assertIn(response.status_code, (200, 201))
+        return response.json()
+
+    def test_first_poll_returns_cursor_with_reset(self):
+        """カーソルなしの呼び出しは, 状態の取り直し（reset）と現在のカーソルを返す."""
+        data = self.poll()
+        self.assertTrue(data["reset"])
+        self.assertEqual(data["events"], [])
+        self.assertTrue(data["cursor"])
+
+    def test_unknown_room_returns_404(self):
+        """存在しないルームは404を返す."""
+        response = self.client.get(reverse("team_terrace:room_events", args=[uuid.uuid4()]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_events_since_cursor(self):
+        """メッセージ・返信・リアクション・いいねがカーソル以降のイベントとして返る."""
+        cursor = self.poll()["cursor"]
+
+        message = self.post(
+            reverse("team_terrace:post_message", args=[self.room.uuid]), {"content": "Hello", "is_question": True}
+        )
+        reply = self.post(reverse("team_terrace:post_reply", args=[message["id"]]), {"content": "Answer"})
+        reaction = self.post(reverse("team_terrace:post_reaction", args=[self.room.uuid]), {"reaction_type": "clap"})
+        self.post(reverse("team_terrace:post_like", args=[message["id"]]))
+
+        data = self.poll(cursor)
+        self.assertFalse(data["reset"])
+        self.assertEqual([e["type"] for e in data["events"]], ["message", "reply", "reaction", "like"])
+        self.assertEqual(data["events"][0]["data"], {"id": message["id"], "content": "Hello", "is_question": True})
+        self.assertEqual(data["events"][1]["data"]["id"], reply["id"])
+        self.assertEqual(data["events"][2]["data"], {"id": reaction["id"], "reaction_type": "clap"})
+        self.assertEqual(data["events"][3]["data"], {"message_id": message["id"], "like_count": 1})
+
+        # 新しいカーソルからは何も返らない
+        self.assertEqual(self.poll(data["cursor"])["events"], [])
+
+    def test_idle_poll_does_not_query_database(self):
+        """イベントがなければタイムアウトまで待って空で返し, DBは読まない."""
+        cursor = self.poll()["cursor"]
+        with self.assertNumQueries(0, using="team_terrace"):
+            data = self.poll(cursor)
+        self.assertEqual(data, {"cursor": cursor, "events": [], "reset": False})
+
+    def test_waiting_poll_wakes_on_publish(self):
+        """待機中のリクエストは, 別スレッドからの配信ですぐに返る."""
+        cursor = self.poll()["cursor"]
+        timer = threading.Timer(0.1, hub.publish, args=(self.room.uuid, "reaction", {"id": 1, "reaction_type": "like"}))
+
+        with mock.patch.object(RoomEventsView, "timeout", 5):
+            timer.start()
+            start = time.monotonic()
+            data = self.poll(cursor)
+        timer.join()
+
+        self.assertLess(time.monotonic() - start, 4)
+        self.assertEqual([e["type"] for e in data["events"]], ["reaction"])
+
+    def test_stale_cursor_requests_reset(self):
+        """別プロセス（再起動前）のカーソルには reset を返す."""
+        data = self.poll("00000000-3")
+        self.assertTrue(data["reset"])
+
+    def test_rolled_back_writes_are_not_published(self):
+        """コミットされなかった書き込みは配信しない."""
+        cursor = self.poll()["cursor"]
+        with self.captureOnCommitCallbacks(using="team_terrace", execute=False):
+            ChatMessage.objects.using("team_terrace").create(room=self.room, content="Discarded")
+        self.assertEqual(self.poll(cursor)["events"], [])
+
+    def test_publish_skips_waiters_with_closed_loop(self):
+        """タイムアウトで終了したリクエストの（閉じた）ループがあっても, 他の待機者を起こし, 書き込みは成功する."""
+        closed_loop = asyncio.new_event_loop()
+        stale = closed_loop.create_future()
+        closed_loop.close()
+        live_loop = asyncio.new_event_loop()
+        self.addCleanup(live_loop.close)
+        live = live_loop.create_future()
+        with hub._lock:
+            hub._channel(self.room.uuid).waiters.update({(closed_loop, stale), (live_loop, live)})
+
+        self.post(reverse("team_terrace:post_message", args=[self.room.uuid]), {"content": "Hello"})
+        live_loop.run_until_complete(asyncio.wait_for(live, 1))
+
+        # ループが閉じる直前（is_closed() の確認後）に閉じられた場合も同じ
+        with hub._lock:
+            hub._channel(self.room.uuid).waiters.add((closed_loop, closed_loop.create_future()))
+        with mock.patch.object(closed_loop, "is_closed", return_value=False):
+            hub.publish(self.room.uuid, "reaction", {"id": 1, "reaction_type": "like"})
@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from team_terrace import likes
+from team_terrace.events import hub
+from team_terrace.likes import LikeBuffer, change_like_count
+from team_terrace.models import ChatMessage, ChatRoom
+
+
+def run_in_threads(target, threads, per_thread):
+    """target(i) を threads 個のスレッドから per_thread 回ずつ同時に呼び出し, 戻り値をスレッドごとに返す."""
+    barrier = threading.Barrier(threads)
+    results = [[] for _ in range(threads)]
+    errors = []
+
+    def worker(index):
+        try:
+            barrier.wait()
+            for i in range(per_thread):
+                results[index].append(target(i))
+        except Exception as e:  # メインスレッドで検証する
+            errors.append(e)
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class ConcurrentLikeTests(TransactionTestCase):
+    """同時に押されたいいねが失われないことのテスト."""
+
+    databases = {"default", "team_terrace"}
+
+    def setUp(self):
+        """テストデータのセットアップ."""
+        self.room = ChatRoom.objects.using("team_terrace").create(title="Hot Room")
+        self.message = ChatMessage.objects.using("team_terrace").create(room=self.room, content="Hot")
+
+    def refresh(self):
+        """DB上のメッセージとルームを返す."""
+        message = ChatMessage.objects.using("team_terrace").get(id=self.message.id)
+        room = ChatRoom.objects.using("team_terrace").get(uuid=self.room.uuid)
+        return message, room
+
+    def test_parallel_likes_are_all_counted(self):
+        """8スレッドから同時に1000回いいねしても, すべて数えられる."""
+        results = run_in_threads(lambda i: change_like_count(self.message.id, 1)[1], threads=8, per_thread=125)
+
+        message, room = self.refresh()
+        self.assertEqual(message.like_count, 1000)
+        self.assertEqual(message.like_version, room.like_version)
+        self.assertEqual(room.like_version, 1000)
+        # 各スレッドが受け取るいいね数は増え続ける
+        for counts in results:
+            self.assertEqual(counts, sorted(set(counts)))
+
+    def test_parallel_unlikes_stop_at_zero(self):
+        """いいね数より多く同時に解除しても, 0未満にならない."""
+        ChatMessage.objects.using("team_terrace").filter(id=self.message.id).update(like_count=100)
+
+        run_in_threads(lambda i: change_like_count(self.message.id, -1), threads=8, per_thread=25)
+
+        message, room = self.refresh()
+        self.assertEqual(message.like_count, 0)
+        self.assertEqual(room.like_version, 100)
+
+    def test_parallel_likes_through_buffer(self):
+        """バッファ経由で同時に5000回いいねしても, 書き込み後の数が一致し, 途中の数も減らない."""
+        other = ChatMessage.objects.using("team_terrace").create(room=self.room, content="Other", like_count=3)
+        like_buffer = LikeBuffer(interval=0.01)
+
+        def like(i):
+            message_id = other.id if i % 50 == 0 else self.message.id
+            return message_id, like_buffer.change(message_id, 1)[1]
+
+        with mock.patch.object(likes, "buffer", like_buffer):
+            results = run_in_threads(like, threads=20, per_thread=250)
+            like_buffer.flush()
+
+        message, room = self.refresh()
+        other.refresh_from_db()
+        self.assertEqual(message.like_count, 4900)
+        self.assertEqual(other.like_count, 3 + 100)
+        self.assertEqual(message.like_version, room.like_version)
+        # 書き込みはまとめて行われる
+        self.assertLess(room.like_version, 5000)
+        for rows in results:
+            counts = [count for message_id, count in rows if message_id == self.message.id]
+            self.assertEqual(counts, sorted(set(counts)))
+
+
+class LikeBufferTests(TestCase):
+    """いいねのバッファのテスト."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        """テストデータのセットアップ."""
+        self.room = ChatRoom.objects.using("team_terrace").create(title="Buffer Room")
+        self.message = ChatMessage.objects.using("team_terrace").create(room=self.room, content="Hello", like_count=2)
+        self.buffer = LikeBuffer(interval=60)
+        patcher = mock.patch.object(likes, "buffer", self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(lambda: self.buffer._timer and self.buffer._timer.cancel())
+
+    def test_buffered_likes_are_visible_before_flush(self):
+        """書き込み前のいいねもAPIの応答といいね一覧に反映される."""
+        response = self.client.post(reverse("team_terrace:post_like", args=[self.message.id]))
+        self.assertEqual(response.json(), {"id": self.message.id, "like_count": 3})
+
+        self.message.refresh_from_db()
+        self.assertEqual(self.message.like_count, 2)
+
+        url = reverse("team_terrace:get_likes", args=[self.room.uuid])
+        self.assertEqual(self.client.get(url).json()["likes"], {str(self.message.id): 3})
+        self.assertEqual(self.client.get(url, {"since": 0}).json()["likes"], {str(self.message.id): 3})
+
+    def test_flush_writes_batched_counts(self):
+        """flush で増減がまとめて書き込まれ, 版数が1つ進む."""
+        for _ in range(5):
+            self.buffer.change(self.message.id, 1)
+        for _ in range(10):
+            self.buffer.change(self.message.id, -1)
+
+        with CaptureQueriesContext(connections["team_terrace"]) as queries:
+            self.buffer.flush()
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 2)  # ルームの版数とメッセージのいいね数
+
+        self.message.refresh_from_db()
+        self.room.refresh_from_db()
+        self.assertEqual(self.message.like_count, 0)
+        self.assertEqual(self.message.like_version, 1)
+        self.assertEqual(self.room.like_version, 1)
+        self.assertEqual(self.buffer.room_counts(self.room.uuid), {})
+
+    def test_like_succeeds_when_a_waiter_loop_is_closed(self):
+        """待機していたリクエストのループが閉じていても, 数えたいいねはエラーにならずに返る."""
+        closed_loop = asyncio.new_event_loop()
+        waiter = (closed_loop, closed_loop.create_future())
+        closed_loop.close()
+        with hub._lock:
+            hub._channel(self.room.uuid).waiters.add(waiter)
+
+        response = self.client.post(reverse("team_terrace:post_like", args=[self.message.id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["like_count"], 3)
+
+    def test_unknown_message_returns_404(self):
+        """存在しないメッセージへのいいねは404を返す."""
+        response = self.client.post(reverse("team_terrace:post_like", args=[999999]))
+        self.assertEqual(response.status_code, 404)
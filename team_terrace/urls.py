@@ -15,4 +15,5 @@ urlpatterns = [
     path("api/messages/<int:message_id>/like/", api_views.PostLikeView.as_view(), name="post_like"),
     path("api/messages/<int:message_id>/unlike/", api_views.PostUnlikeView.as_view(), name="post_unlike"),
     path("api/room/<uuid:room_id>/likes/", api_views.GetLikesView.as_view(), name="get_likes"),
+    path("api/room/<uuid:room_id>/events/", api_views.RoomEventsView.as_view(), name="room_events"),
 ]
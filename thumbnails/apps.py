@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class ThumbnailsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'thumbnails'
+    verbose_name = '画像のサムネイル'
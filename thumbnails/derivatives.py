@@ -0,0 +1,164 @@
+"""
+アップロード画像から一覧用のサムネイルを作る
+
+team_giryulink の商品一覧や takenoko のトップは、アップロードされた元の画像をそのまま一覧のタイルに使っており、
+数 MB のスマートフォンの写真を 200〜256px の枠に表示していた。
+
+ここでは Pillow で元の画像から
+- EXIF の向きを反映し（撮影時の向きのまま横倒しにならないように）
+- 長辺を THUMBNAILS_SIZE px に縮小して
+- WebP に再エンコードした（EXIF などのメタデータは含めない）
+サムネイルを作り、元の画像と同じディレクトリの thumbs/ に内容のハッシュを含むファイル名で保存する。
+内容が変われば URL も変わるので、ブラウザのキャッシュを長く持たせても古い画像は出ない。
+
+サムネイルのパスはモデルのフィールドに持つ。register() したモデルは、画像のアップロード時（シグナル）に作り、
+まだないものは thumbnail_url() で最初に表示するときに作る。既存の画像は manage.py make_thumbnails で作る。
+作れなかった画像はフィールドに FAILED を記録し、画像が差し替えられるまで（表示のたびに）作り直さない。
+"""
+
+import hashlib
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models.signals import post_delete, post_save, pre_save
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Pillow で開けない・大きすぎる画像はサムネイルを作らず、元の画像を使う
+IMAGE_ERRORS = (OSError, ValueError, Image.DecompressionBombError)
+
+# サムネイルを作れなかったことを表すフィールドの値（thumbs/ 以下の実際のパスとは重ならない）
+FAILED = '!failed'
+
+# {モデル: (元の画像のフィールド名, サムネイルのフィールド名)}
+_registry = {}
+
+
+def thumbnail_size():
+    # 一覧のタイル（最大 256px）を高精細な画面でもぼやけずに表示できる大きさ
+    return getattr(settings, 'THUMBNAILS_SIZE', 512)
+
+
+def render_thumbnail(file):
+    """
+    画像ファイルからサムネイル（WebP）のバイト列を作る
+
+    Raises:
+        OSError, ValueError, Image.DecompressionBombError: 画像として読めない場合
+    """
+    size = thumbnail_size()
+    with Image.open(file) as image:
+        # JPEG は縮小しながら読み込む（数 MB の写真でも全画素を展開しない）
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+        else:
+            image = image.convert('RGB')
+        image.thumbnail((size, size), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, 'WEBP', quality=getattr(settings, 'THUMBNAILS_QUALITY', 80), method=4)
+        return output.getvalue()
+
+
+def thumbnail_name(source_name, data):
+    """元の画像のパスとサムネイルの内容から、サムネイルのパス（thumbs/{元の名前}.{ハッシュ}.webp）を作る"""
+    directory, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0][:100]
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return posixpath.join(directory, 'thumbs', f'{stem}.{digest}.webp')
+
+
+def register(model, source_field='image', thumbnail_field='thumbnail'):
+    """モデルの画像のアップロード時にサムネイルを作り、削除時に消すようにする（AppConfig.ready から呼ぶ）"""
+    _registry[model] = (source_field, thumbnail_field)
+    uid = f'thumbnails:{model._meta.label}'
+    pre_save.connect(_mark_new_upload, sender=model, dispatch_uid=uid)
+    post_save.connect(_refresh_after_save, sender=model, dispatch_uid=uid)
+    post_delete.connect(_delete_thumbnail, sender=model, dispatch_uid=uid)
+
+
+def registered_models():
+    """register() されたモデルと、その (元の画像のフィールド名, サムネイルのフィールド名)"""
+    return list(_registry.items())
+
+
+def update_thumbnail(instance):
+    """
+    元の画像からサムネイルを作り直してフィールドに保存する（前のサムネイルは消す）
+    元の画像がない場合はサムネイルを空にし、画像として読めない場合は FAILED を記録する
+
+    Returns:
+        str: サムネイルのパス（作れなかった場合は None）
+    """
+    source_field, thumbnail_field = _registry[type(instance)]
+    source = getattr(instance, source_field)
+    storage = instance._meta.get_field(thumbnail_field).storage
+    old_name = getattr(instance, thumbnail_field).name
+
+    new_name = None
+    value = ''
+    if source:
+        try:
+            with source.open('rb'):
+                data = render_thumbnail(source)
+        except IMAGE_ERRORS as e:
+            logger.warning("サムネイルを作れませんでした: %s (%s)", source.name, e)
+            value = FAILED
+        else:
+            new_name = value = thumbnail_name(source.name, data)
+            if not storage.exists(new_name):
+                storage.save(new_name, ContentFile(data))
+
+    if old_name and old_name not in (new_name, FAILED):
+        storage.delete(old_name)
+    # save() を呼ぶとシグナルが再び動くので、サムネイルのフィールドだけを更新する
+    type(instance)._default_manager.using(instance._state.db).filter(pk=instance.pk).update(
+        **{thumbnail_field: value}
+    )
+    setattr(instance, thumbnail_field, value)
+    return new_name
+
+
+def thumbnail_url(instance):
+    """
+    一覧に表示するサムネイルの URL
+    サムネイルがまだなければその場で作り、作れなければ元の画像の URL を返す（画像がなければ空文字）
+    作れなかったことが記録済み（FAILED）なら、作り直さずに元の画像の URL を返す
+    """
+    source_field, thumbnail_field = _registry[type(instance)]
+    source, thumbnail = getattr(instance, source_field), getattr(instance, thumbnail_field)
+    if not source:
+        return ''
+    if thumbnail.name == FAILED or (not thumbnail and not update_thumbnail(instance)):
+        return source.url
+    return getattr(instance, thumbnail_field).url
+
+
+def _mark_new_upload(sender, instance, raw=False, **kwargs):
+    # 保存前の FieldFile が未保存（_committed が False）なら、新しいファイルがアップロードされた
+    # （同じファイル名で置き換えられても検出できるよう、名前ではなくこちらで判定する）
+    source_field, _ = _registry[sender]
+    instance._thumbnail_outdated = not raw and not getattr(instance, source_field)._committed
+
+
+def _refresh_after_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    source_field, thumbnail_field = _registry[sender]
+    source, thumbnail = getattr(instance, source_field), getattr(instance, thumbnail_field)
+    if getattr(instance, '_thumbnail_outdated', False) or bool(source) != bool(thumbnail):
+        update_thumbnail(instance)
+    instance._thumbnail_outdated = False
+
+
+def _delete_thumbnail(sender, instance, **kwargs):
+    _, thumbnail_field = _registry[sender]
+    thumbnail = getattr(instance, thumbnail_field)
+    if thumbnail and thumbnail.name != FAILED:
+        thumbnail.storage.delete(thumbnail.name)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from thumbnails.derivatives import registered_models, update_thumbnail
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates the listing thumbnails for images uploaded before thumbnails existed '
+        '(models registered with thumbnails.derivatives.register).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='Only this model (app_label.Model); repeatable')
+        parser.add_argument('--force', action='store_true', help='Regenerate existing thumbnails and retry images that failed before')
+
+    def handle(self, *args, **options):
+        models = registered_models()
+        if options['model']:
+            labels = {label.lower() for label in options['model']}
+            models = [(model, fields) for model, fields in models if model._meta.label_lower in labels]
+            if not models:
+                raise CommandError(f"No registered model matches {', '.join(options['model'])}")
+
+        for model, (source_field, thumbnail_field) in models:
+            queryset = model._default_manager.exclude(**{source_field: ''}).exclude(**{f'{source_field}__isnull': True})
+            if not options['force']:
+                queryset = queryset.filter(**{thumbnail_field: ''})
+
+            created = failed = 0
+            for instance in queryset:
+                if update_thumbnail(instance):
+                    created += 1
+                else:
+                    failed += 1
+            self.stdout.write(f"{model._meta.label}: {created} thumbnails generated, {failed} failed")
@@ -0,0 +1,120 @@
+import io
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from takenoko.models import Item, ItemImage, TakenokoUser
+from team_giryulink.models import Product
+from thumbnails.derivatives import FAILED
+
+
+def photo(name='photo.jpg', size=(1200, 800), orientation=None):
+    """ノイズの多い（圧縮の効きにくい）写真風の JPEG。orientation を指定すると EXIF の向きを付ける"""
+    image = Image.effect_noise(size, 64).convert('RGB')
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=95, exif=exif)
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+class ThumbnailTest(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.media = Path(media_root)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_upload_creates_small_webp_with_exif_orientation(self):
+        product = Product.objects.create(title='Desk', image=photo(orientation=6))
+        product.refresh_from_db()
+
+        self.assertRegex(product.thumbnail.name, r'^team_giryulink/products/thumbs/photo\.[0-9a-f]{12}\.webp$')
+        with Image.open(self.media / product.thumbnail.name) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            # 右に 90 度回転して表示する写真なので、縦長になる
+            self.assertEqual(thumbnail.size, (341, 512))
+        original_size = (self.media / product.image.name).stat().st_size
+        self.assertLess((self.media / product.thumbnail.name).stat().st_size * 10, original_size)
+
+        response = self.client.get(reverse('team_giryulink:index'))
+        self.assertContains(response, product.thumbnail.url)
+        self.assertNotContains(response, product.image.url)
+
+    def test_replacing_image_with_same_name_regenerates_thumbnail(self):
+        product = Product.objects.create(title='Desk', image=photo())
+        old_thumbnail = product.thumbnail.name
+
+        # 編集画面と同じく、元のファイルを消してから同じ名前でアップロードする
+        product.image.delete(save=False)
+        product.image = photo()
+        product.save()
+
+        self.assertNotEqual(product.thumbnail.name, old_thumbnail)
+        self.assertFalse((self.media / old_thumbnail).exists())
+        self.assertTrue((self.media / product.thumbnail.name).exists())
+
+        product.save()  # 画像を変えない保存では作り直さない
+        self.assertTrue((self.media / product.thumbnail.name).exists())
+
+        product.delete()
+        self.assertFalse((self.media / product.thumbnail.name).exists())
+
+    def test_thumbnail_is_created_on_first_request_or_falls_back(self):
+        product = Product.objects.create(title='Desk', image=photo())
+        Product.objects.filter(pk=product.pk).update(thumbnail='')
+        product = Product.objects.get(pk=product.pk)
+
+        url = product.thumbnail_url
+        self.assertTrue(url.endswith('.webp'))
+        self.assertEqual(Product.objects.get(pk=product.pk).thumbnail.url, url)
+
+        with self.assertLogs('thumbnails.derivatives', 'WARNING'):
+            broken = Product.objects.create(
+                title='Broken', image=SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+            )
+        self.assertEqual(Product.objects.get(pk=broken.pk).thumbnail.name, FAILED)
+        # 失敗は記録済みなので、表示のたびに画像を開き直したり UPDATE したりしない
+        broken = Product.objects.get(pk=broken.pk)
+        with self.assertNumQueries(0, using='team_giryulink'):
+            self.assertEqual(broken.thumbnail_url, broken.image.url)
+        self.assertEqual(Product.objects.create(title='No image').thumbnail_url, '')
+
+        # 画像を差し替えれば作り直す
+        broken.image = photo()
+        broken.save()
+        self.assertTrue(broken.thumbnail_url.endswith('.webp'))
+
+    def test_backfill_command(self):
+        seller = TakenokoUser.objects.create(email='seller@example.com', nickname='seller', student_id='T001')
+        item = Item.objects.create(name='Textbook', price=500, seller=seller)
+        image = ItemImage.objects.create(item=item, image=photo('book.png', size=(900, 900)))
+        ItemImage.objects.filter(pk=image.pk).update(thumbnail='')
+
+        out = io.StringIO()
+        call_command('make_thumbnails', '--model', 'takenoko.ItemImage', stdout=out)
+        self.assertIn('takenoko.ItemImage: 1 thumbnails generated, 0 failed', out.getvalue())
+        image.refresh_from_db()
+        self.assertRegex(image.thumbnail.name, r'^takenoko/items/thumbs/.+\.[0-9a-f]{12}\.webp$')
+
+        # 作れなかった画像は --force のときだけ作り直す
+        ItemImage.objects.filter(pk=image.pk).update(thumbnail=FAILED)
+        call_command('make_thumbnails', '--model', 'takenoko.ItemImage', stdout=out)
+        self.assertIn('takenoko.ItemImage: 0 thumbnails generated, 0 failed', out.getvalue())
+        call_command('make_thumbnails', '--model', 'takenoko.ItemImage', '--force', stdout=out)
+        self.assertEqual(out.getvalue().count('1 thumbnails generated'), 2)
+        image.refresh_from_db()
+
+        response = self.client.get(reverse('takenoko:main'))
+        self.assertContains(response, image.thumbnail.url)